@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Columnar version of calculate.py.
+
+The API payloads are loaded into NumPy arrays once and every cumulative mean /
+std dev comes from running sums (shifted by the first value for stability),
+so each series is O(n) instead of re-slicing the history every day.  Results
+are dicts of arrays (or a pandas DataFrame via to_dataframe); the original
+pvr_results.json / mvrv_results.json files are still written by default, so
+generate_charts.py works unchanged.
+
+    python calculate_columnar.py                # JSON, as calculate.py
+    python calculate_columnar.py --format npz   # pvr_results.npz / mvrv_results.npz
+"""
+
+import argparse
+import json
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from calculate import fetch_data_from_api
+
+Columns = Dict[str, np.ndarray]
+
+
+def column(data: List[Dict], key: str, fallback: str = None) -> np.ndarray:
+    if fallback is None:
+        return np.array([p.get(key, 0) for p in data], dtype=np.float64)
+    return np.array([p.get(key, p.get(fallback, 0)) for p in data], dtype=np.float64)
+
+
+def running_mean_std(values: np.ndarray, ddof: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean and std dev of values[:k+1] for every k, from running sums."""
+    x = np.asarray(values, dtype=np.float64)
+    if len(x) == 0:
+        return x.copy(), x.copy()
+    shifted = x - x[0]
+    k = np.arange(1, len(x) + 1, dtype=np.float64)
+    s1 = np.cumsum(shifted)
+    s2 = np.cumsum(shifted * shifted)
+    mean = x[0] + s1 / k
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = np.maximum(s2 - s1 * s1 / k, 0.0) / (k - ddof)
+    return mean, np.sqrt(var)
+
+
+def calculate_lth_pvr_cumulative(lth_supply: np.ndarray, btc_price: np.ndarray,
+                                 lth_realized_price: np.ndarray) -> Columns:
+    lth_market_cap = lth_supply * btc_price
+    lth_realized_cap = lth_supply * lth_realized_price
+
+    # As in calculate.py, row i uses the first i+1 *positive* market caps
+    positive = lth_market_cap[lth_market_cap > 0]
+    _, std = running_mean_std(positive, ddof=1)
+    count = np.minimum(np.arange(1, len(lth_market_cap) + 1), len(positive))
+    cumulative_std_dev = np.where(count > 1, std[np.maximum(count - 1, 0)] if len(std) else 0.0, 0.0)
+
+    unrealized_profit = lth_market_cap - lth_realized_cap
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pvr_value = np.where(cumulative_std_dev > 0, unrealized_profit / cumulative_std_dev, 0.0)
+
+    return {
+        'lth_supply': lth_supply,
+        'lth_market_cap': lth_market_cap,
+        'lth_realized_cap': lth_realized_cap,
+        'unrealized_profit': unrealized_profit,
+        'cumulative_std_dev': cumulative_std_dev,
+        'pvr_value': pvr_value,
+    }
+
+
+def _bands_cumulative(values: np.ndarray, prefix: str, floor_minus: bool) -> Columns:
+    mean, std = running_mean_std(values, ddof=1)
+    if len(values):
+        mean[0], std[0] = values[0], 0.0    # first row: every band equals the value
+    minus = mean - std
+    return {
+        f'{prefix}_mean': mean,
+        f'{prefix}_plus_1sigma': mean + std,
+        f'{prefix}_plus_2sigma': mean + 2 * std,
+        f'{prefix}_minus_1sigma': np.maximum(minus, 0.0) if floor_minus else minus,
+        f'{prefix}_std_dev': std,
+    }
+
+
+def calculate_pvr_bands_cumulative(pvr_value: np.ndarray) -> Columns:
+    return _bands_cumulative(pvr_value, 'pvr', floor_minus=False)
+
+
+def calculate_pvr_bands_static(pvr_value: np.ndarray) -> Tuple[float, float, Dict[str, float]]:
+    pvr_mean = float(np.mean(pvr_value))
+    pvr_std = float(np.std(pvr_value))
+    bands = {
+        'mean': pvr_mean,
+        'plus_1sigma': pvr_mean + pvr_std,
+        'plus_2sigma': pvr_mean + 2 * pvr_std,
+        'minus_1sigma': pvr_mean - pvr_std,
+    }
+    return pvr_mean, pvr_std, bands
+
+
+def calculate_mvrv_ratio(market_cap: np.ndarray, realized_cap: np.ndarray,
+                         mvrv_ratio: np.ndarray, btc_price: np.ndarray) -> Columns:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        derived = np.where(realized_cap > 0, market_cap / realized_cap, 0.0)
+    mvrv_ratio = np.where((realized_cap > 0) & (mvrv_ratio == 0), derived, mvrv_ratio)
+    return {
+        'mvrv_ratio': mvrv_ratio,
+        'btc_price': btc_price,
+        'market_cap': market_cap,
+        'realized_cap': realized_cap,
+    }
+
+
+def calculate_mvrv_bands_cumulative(mvrv_ratio: np.ndarray) -> Columns:
+    return _bands_cumulative(mvrv_ratio, 'mvrv', floor_minus=True)
+
+
+def calculate_mvrv_bands_static(mvrv_ratio: np.ndarray) -> Tuple[float, float, Dict[str, float]]:
+    values = mvrv_ratio[mvrv_ratio > 0]
+    mvrv_mean = float(np.mean(values))
+    mvrv_std = float(np.std(values))
+    bands = {
+        'mean': mvrv_mean,
+        'plus_1sigma': mvrv_mean + mvrv_std,
+        'plus_2sigma': mvrv_mean + 2 * mvrv_std,
+        'minus_1sigma': max(0, mvrv_mean - mvrv_std),
+    }
+    return mvrv_mean, mvrv_std, bands
+
+
+def convert_pvr_bands_to_price(cols: Columns) -> Columns:
+    supply, rc, std = cols['lth_supply'], cols['lth_realized_cap'], cols['cumulative_std_dev']
+    valid = (supply != 0) & (std != 0)
+    safe_supply = np.where(valid, supply, 1.0)
+    return {
+        f'price_at_{band}': np.where(valid, (cols[band] * std + rc) / safe_supply, 0.0)
+        for band in ('pvr_mean', 'pvr_plus_1sigma', 'pvr_plus_2sigma', 'pvr_minus_1sigma')
+    }
+
+
+def convert_mvrv_bands_to_price(cols: Columns) -> Columns:
+    price, mc, rc = cols['btc_price'], cols['market_cap'], cols['realized_cap']
+    with np.errstate(divide="ignore", invalid="ignore"):
+        supply = np.where(price > 0, mc / price, 0.0)
+    valid = (supply != 0) & (rc != 0)
+    safe_supply = np.where(valid, supply, 1.0)
+    return {
+        f'price_at_{band}': np.where(valid, cols[band] * rc / safe_supply, 0.0)
+        for band in ('mvrv_mean', 'mvrv_plus_1sigma', 'mvrv_plus_2sigma', 'mvrv_minus_1sigma')
+    }
+
+
+def pvr_columns(lth_data: List[Dict]) -> Columns:
+    cols = calculate_lth_pvr_cumulative(
+        column(lth_data, 'lth_supply_btc', 'lth_supply'),
+        column(lth_data, 'btc_price'),
+        column(lth_data, 'lth_realized_price'),
+    )
+    cols.update(calculate_pvr_bands_cumulative(cols['pvr_value']))
+    cols.update(convert_pvr_bands_to_price(cols))
+    return cols
+
+
+def mvrv_columns(mvrv_data: List[Dict]) -> Columns:
+    cols = calculate_mvrv_ratio(
+        column(mvrv_data, 'market_cap_usd', 'market_cap'),
+        column(mvrv_data, 'realized_cap_usd', 'realized_cap'),
+        column(mvrv_data, 'mvrv_ratio'),
+        column(mvrv_data, 'btc_price'),
+    )
+    cols.update(calculate_mvrv_bands_cumulative(cols['mvrv_ratio']))
+    cols.update(convert_mvrv_bands_to_price(cols))
+    return cols
+
+
+def to_dataframe(dates: List[str], cols: Columns):
+    import pandas as pd   # optional; only needed for DataFrame output
+    return pd.DataFrame(cols, index=pd.to_datetime(dates, format='%Y-%m-%d'))
+
+
+def to_records(data: List[Dict], cols: Columns, skip_first: Tuple[str, ...] = ()) -> List[Dict]:
+    """calculate.py's row format: each API point plus the computed fields."""
+    lists = {k: v.tolist() for k, v in cols.items() if k != 'lth_supply'}
+    rows = []
+    for i, point in enumerate(data):
+        row = dict(point)
+        for k, v in lists.items():
+            if i == 0 and k in skip_first:
+                continue
+            row[k] = v[i]
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LTH PVR and MVRV calculator (columnar)")
+    parser.add_argument('--format', choices=('json', 'npz'), default='json')
+    args = parser.parse_args()
+
+    print("LTH PVR and MVRV Calculator (columnar)")
+    print("chartinspect.com\n")
+
+    lth_data, mvrv_api_data = fetch_data_from_api()
+
+    print("Calculating LTH PVR...")
+    pvr = pvr_columns(lth_data)
+
+    print("Calculating MVRV...")
+    mvrv = mvrv_columns(mvrv_api_data)
+
+    print("\nSaving results...")
+    if args.format == 'npz':
+        np.savez('pvr_results.npz', date=np.array([p['date'] for p in lth_data]), **pvr)
+        np.savez('mvrv_results.npz', date=np.array([p['date'] for p in mvrv_api_data]), **mvrv)
+    else:
+        with open('pvr_results.json', 'w') as f:
+            json.dump(to_records(lth_data, pvr, skip_first=('pvr_std_dev',)), f, indent=2)
+        with open('mvrv_results.json', 'w') as f:
+            json.dump(to_records(mvrv_api_data, mvrv, skip_first=('mvrv_std_dev',)), f, indent=2)
+
+    print("Done.\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 """Compute Welford seed values from CI raw response for the rb_bands_state migration."""
-import json, math, statistics
+import math, statistics
 
-with open("ci_bands_raw_response.json") as f:
-    rows = json.load(f)["data"]
+import numpy as np
 
-lth_mcs = [r["lth_market_cap"] for r in rows if r.get("lth_market_cap", 0) > 0]
+from series_store import ci_raw_series
+
+ci = ci_raw_series(["lth_market_cap", "pvr_mean", "pvr_plus_1sigma", "cumulative_std_dev"])
+dates, mc = ci["lth_market_cap"]
+
+lth_mcs = mc[mc > 0].tolist()
 n = len(lth_mcs)
 mean = sum(lth_mcs) / n
 var = statistics.variance(lth_mcs)   # ddof=1 sample variance
@@ -12,7 +16,8 @@ std = math.sqrt(var)
 m2 = var * (n - 1)
 
 # CI's stored constants from the most recent row
-ci_last = rows[-1]
+ci_last = {k: v[-1] for k, (_, v) in ci.items()}
+ci_last["date"] = np.datetime_as_string(dates[-1])
 pvr_mean = ci_last["pvr_mean"]
 pvr_std_from_ci = ci_last["pvr_plus_1sigma"] - pvr_mean  # = 1sigma
 
@@ -0,0 +1,89 @@
+"""
+day_calendar.py
+
+The one time axis shared by the Python tools: int32 day numbers, days since
+1970-01-01 (the axis series_store files, rb_client and ingest already use).
+A series is a (days, values) pair with days sorted ascending and unique, so
+joins, range filters and month boundaries are integer array operations and
+dates become "YYYY-MM-DD" strings only at output.
+
+    days, supply = as_series(series["supply_distribution/supply_lth"])
+    common, (i, j) = align(days, price_days)       # sorted-array merge
+    window = day_range(common, "2020-01-01", "2020-12-31")
+    firsts = month_starts(common)                   # d.day == 1
+    iso_dates(common[window])
+"""
+
+from datetime import date
+
+import numpy as np
+
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+def to_day(iso_date: str) -> int:
+    return date.fromisoformat(iso_date[:10]).toordinal() - _EPOCH
+
+
+def from_day(day: int) -> str:
+    return date.fromordinal(int(day) + _EPOCH).isoformat()
+
+
+def day_numbers(values) -> np.ndarray:
+    """ "YYYY-MM-DD[...]" strings or datetime64 values → int32 day numbers."""
+    a = np.asarray(values)
+    if a.dtype.kind != "M":
+        a = a.astype("U10")
+    return a.astype("datetime64[D]").astype(np.int32)
+
+
+def iso_dates(days) -> list[str]:
+    """Day numbers → "YYYY-MM-DD" strings (output only)."""
+    return np.datetime_as_string(np.asarray(days, dtype="datetime64[D]"), unit="D").tolist()
+
+
+def as_series(series) -> tuple[np.ndarray, np.ndarray]:
+    """
+    A {YYYY-MM-DD: value} dict or a (dates, values) pair (datetime64, strings
+    or day numbers) → (int32 days ascending, float64 values).
+    """
+    if isinstance(series, dict):
+        dates, values = list(series), list(series.values())
+    else:
+        dates, values = series
+    dates = np.asarray(dates)
+    days = dates.astype(np.int32) if dates.dtype.kind in "iu" else day_numbers(dates)
+    values = np.asarray(values, dtype=np.float64)
+    if len(days) > 1 and not (np.diff(days) > 0).all():
+        days, first = np.unique(days, return_index=True)
+        values = values[first]
+    return days, values
+
+
+def align(*days: np.ndarray) -> tuple[np.ndarray, list[np.ndarray]]:
+    """
+    Days present in every sorted array, and each array's index of them:
+    the integer replacement for sorted(set(a) & set(b) & ...).
+    """
+    common = days[0]
+    for other in days[1:]:
+        pos = np.minimum(np.searchsorted(other, common), max(len(other) - 1, 0))
+        common = common[other[pos] == common] if len(other) else common[:0]
+    return common, [np.searchsorted(d, common) for d in days]
+
+
+def day_range(days: np.ndarray, first: str | int | None = None,
+              last: str | int | None = None) -> slice:
+    """Slice of sorted days within [first, last] (either bound may be None)."""
+    def day(x):
+        return to_day(x) if isinstance(x, str) else int(x)
+
+    lo = 0 if first is None else int(np.searchsorted(days, day(first), "left"))
+    hi = len(days) if last is None else int(np.searchsorted(days, day(last), "right"))
+    return slice(lo, hi)
+
+
+def month_starts(days: np.ndarray) -> np.ndarray:
+    """True where the day is the 1st of its month."""
+    d = np.asarray(days).astype("datetime64[D]")
+    return d == d.astype("datetime64[M]").astype("datetime64[D]")
@@ -1,36 +1,18 @@
-import os, urllib.request, urllib.parse, csv, io, json
+from rb_client import to_dict
+from series_store import ci_raw_series, rb_series
 
-TOKEN = os.environ.get("RB_API_TOKEN", "")
-RB_BASE = "https://api.researchbitcoin.net"
-
-def rb_csv(category, data_field, from_time, to_time):
-    params = urllib.parse.urlencode({"resolution": "d1", "from_time": from_time, "to_time": to_time})
-    url = f"{RB_BASE}/v2/{category}/{data_field}?{params}"
-    req = urllib.request.Request(url, headers={"X-API-Token": TOKEN})
-    with urllib.request.urlopen(req, timeout=60) as r:
-        text = r.read().decode()
-    reader = csv.DictReader(io.StringIO(text))
-    result = {}
-    for row in reader:
-        vals = list(row.values())
-        if len(vals) >= 2 and vals[1]:
-            try:
-                result[vals[0][:10]] = float(vals[1])
-            except ValueError:
-                pass
-    return result
-
-supply = rb_csv("supply_distribution", "supply_lth", "2010-01-01", "2010-12-31")
-rp = rb_csv("realizedprice", "realized_price_lth", "2010-01-01", "2010-12-31")
-price = rb_csv("price", "price", "2010-01-01", "2010-12-31")
+rb = rb_series(["supply_distribution/supply_lth", "realizedprice/realized_price_lth", "price/price"],
+               "2010-01-01", "2010-12-31")
+supply = to_dict(*rb["supply_distribution/supply_lth"])
+rp = to_dict(*rb["realizedprice/realized_price_lth"])
+price = to_dict(*rb["price/price"])
 
 print("RB supply_lth rows in 2010:", len(supply))
 print("First dates:", sorted(supply.keys())[:5])
 print()
 
-with open("ci_bands_raw_response.json") as f:
-    ci_data = json.load(f)["data"]
-ci_map = {r["date"]: r for r in ci_data}
+ci = {f: to_dict(*v) for f, v in ci_raw_series(["lth_supply", "lth_realized_price", "btc_price"]).items()}
+ci_map = {d: {f: ci[f][d] for f in ci if d in ci[f]} for d in ci["btc_price"]}
 
 print("Comparison for specific dates:")
 print(f"{'Date':<12} {'RB supply':>16} {'CI supply':>16} {'RB rp':>12} {'CI rp':>12} {'RB price':>10} {'CI price':>10}")
@@ -1,18 +1,21 @@
-import json
-with open("ci_bands_raw_response.json") as f:
-    rows = json.load(f)["data"]
+import numpy as np
+
+from series_store import ci_raw_series
+
+ci = ci_raw_series(["cumulative_std_dev", "lth_pvr", "lth_market_cap", "lth_realized_cap"])
+dates = np.datetime_as_string(ci["cumulative_std_dev"][0])
+cum_std = ci["cumulative_std_dev"][1]
+lth_pvr = ci["lth_pvr"][1]
+unrealized = ci["lth_market_cap"][1] - ci["lth_realized_cap"][1]
 
 print("cumulative_std_dev for first 5 and last 5 rows:")
-for r in rows[:5] + rows[-5:]:
-    d = r["date"]
-    cs = r["cumulative_std_dev"]
-    pvr = r["lth_pvr"]
-    un = r["lth_market_cap"] - r["lth_realized_cap"]
-    pvr_check = un / cs if cs > 0 else 0
-    print(f"  {d}  cum_std={cs:>22,.2f}  lth_pvr={pvr:.6f}  check={pvr_check:.6f}")
+for i in list(range(5)) + list(range(len(dates) - 5, len(dates))):
+    cs = cum_std[i]
+    pvr_check = unrealized[i] / cs if cs > 0 else 0
+    print(f"  {dates[i]}  cum_std={cs:>22,.2f}  lth_pvr={lth_pvr[i]:.6f}  check={pvr_check:.6f}")
 
 print()
-stds = set(r["cumulative_std_dev"] for r in rows)
+stds = np.unique(cum_std)
 print("Unique cumulative_std_dev values:", len(stds))
-print("Min:", min(stds))
-print("Max:", max(stds))
+print("Min:", stds.min())
+print("Max:", stds.max())
@@ -0,0 +1,177 @@
+"""
+Regression check for the shared columnar parsers (ingest.py).
+
+json_columns() must give exactly the days and numeric columns the old
+json.load path gave (every field holding a number in any row, NaN where a row
+lacks it or holds null / a string) for the bundled CI sample and a large
+synthetic payload, at buffer sizes down to a few characters so every
+span / number boundary case is hit.  iter_json_array() must return the
+json.load elements.  read_csv_columns() must agree with csv.DictReader on a
+synthetic VALR-style export, including short rows and empty amounts.
+epoch_seconds() must agree with datetime.fromisoformat for every timestamp
+form (Z, ±HH:MM, ±HHMM, ±HH, fractions) without numpy timezone warnings.
+
+Fails on any mismatch, then times both JSON paths.
+
+    python docs/diag_ingest.py
+"""
+import csv
+import io
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+from ingest import epoch_seconds, iter_json_array, json_columns, read_csv_columns
+
+SAMPLE = Path(__file__).resolve().parent.parent / "ci_lth_pvr_sample.json"
+CHUNKS = (1, 2, 7, 64, 1 << 18)
+
+
+def reference_columns(doc: dict):
+    """The pre-ingest path: json.load, then one Python pass per field."""
+    rows = doc["data"]
+    days = np.array([np.datetime64(r["date"][:10], "D").astype(int) for r in rows], dtype=np.int32)
+    numeric = sorted({k for r in rows for k, v in r.items()
+                      if isinstance(v, (int, float)) and not isinstance(v, bool)} - {"date"})
+    return days, {n: np.array([r.get(n) if isinstance(r.get(n), (int, float))
+                               and not isinstance(r.get(n), bool) else np.nan for r in rows])
+                  for n in numeric}
+
+
+def same_columns(a, b) -> bool:
+    return (np.array_equal(a[0], b[0]) and a[1].keys() == b[1].keys()
+            and all(np.array_equal(a[1][k], b[1][k], equal_nan=True) for k in a[1]))
+
+
+def synthetic_payload(n: int, n_fields: int, seed: int = 3) -> str:
+    rng = random.Random(seed)
+    fields = [f"f{i}" for i in range(n_fields)]
+    rows = [{"date": str(np.datetime64("2010-01-01") + i), "formattedDate": "x",
+             **{f: (rng.uniform(-1e6, 1e6) if rng.random() > 0.01 else None) for f in fields}}
+            for i in range(n)]
+    rows[n // 2]["late_field"] = 1.5e-3
+    rows[n // 3]["f0"] = "n/a"
+    return json.dumps({"success": True, "count": n, "data": rows})
+
+
+def check_json(label: str, text: str, chunks=CHUNKS) -> None:
+    doc = json.loads(text)
+    expected = reference_columns(doc)
+    for cs in chunks:
+        if not same_columns(json_columns(io.StringIO(text), chunk_size=cs), expected):
+            sys.exit(f"FAIL [{label}]: json_columns differs at chunk_size={cs}")
+        if list(iter_json_array(io.StringIO(text), "data", chunk_size=cs)) != doc["data"]:
+            sys.exit(f"FAIL [{label}]: iter_json_array differs at chunk_size={cs}")
+    print(f"  {label:<22} {len(doc['data']):>6} rows × {len(expected[1])} fields ok")
+
+
+def check_csv() -> None:
+    rng = random.Random(7)
+    header = ["date", "transaction type", "debit currency", "debit value", "credit value"]
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(header)
+    for i in range(5000):
+        row = [f"2026-0{1 + i % 9}-1{i % 10} 0{i % 10}:1{i % 6}:0{i % 10} Z",
+               rng.choice(["Limit trade", "Simple Buy", "Send"]), " BTC ",
+               f"{rng.uniform(0, 1e4):,.2f}" if rng.random() > 0.1 else "",
+               f"{rng.random():.8f}"]
+        w.writerow(row[:3] if i % 97 == 0 else row)
+    text = buf.getvalue()
+    got = read_csv_columns(io.StringIO(text), {"date": "stamp", "transaction type": "text",
+                                               "debit currency": "text", "debit value": "float",
+                                               "credit value": "float", "fee": "float"},
+                           optional=("fee",))
+    rows = list(csv.DictReader(io.StringIO(text)))
+    expected_stamps = epoch_seconds([r["date"] for r in rows])
+    if not np.array_equal(got["date"], expected_stamps):
+        sys.exit("FAIL [csv]: date stamps differ")
+    for name in ("transaction type", "debit currency"):
+        if got[name].tolist() != [(r[name] or "").strip() for r in rows]:
+            sys.exit(f"FAIL [csv]: {name} differs")
+    for name in ("debit value", "credit value"):
+        ref = np.array([float(r[name].replace(",", "")) if r[name] else np.nan for r in rows])
+        if not np.array_equal(got[name], ref, equal_nan=True):
+            sys.exit(f"FAIL [csv]: {name} differs")
+    if len(got["fee"]) != len(rows) or not np.isnan(got["fee"]).all():
+        sys.exit("FAIL [csv]: optional column not NaN-filled")
+    try:
+        read_csv_columns(io.StringIO(text), {"amount": "float"})
+        sys.exit("FAIL [csv]: missing column not reported")
+    except ValueError:
+        pass
+    print(f"  {'csv export':<22} {len(rows):>6} rows ok")
+
+
+def check_stamps() -> None:
+    rng = random.Random(11)
+    base = datetime(2019, 1, 1, tzinfo=timezone.utc)
+    texts, expected = [], []
+    for _ in range(3000):
+        t = base + timedelta(seconds=rng.randrange(0, 8 * 365 * 86400))
+        mins = rng.choice([0, 0, 120, -300, 330, -210, 60])
+        local = (t + timedelta(minutes=mins)).replace(tzinfo=None)
+        sign, hh, mm = "-" if mins < 0 else "+", abs(mins) // 60, abs(mins) % 60
+        sep = rng.choice(["T", " "])
+        frac = rng.choice(["", ".5", ".123456"])
+        stamp = local.strftime(f"%Y-%m-%d{sep}%H:%M:%S") + frac
+        suffix = rng.choice([f"{sign}{hh:02d}:{mm:02d}", f"{sign}{hh:02d}{mm:02d}"]
+                            + ([f"{sign}{hh:02d}"] if mm == 0 else [])
+                            + (["Z", " Z", ""] if mins == 0 else []))
+        texts.append(stamp + suffix)
+        expected.append(int(t.timestamp()))
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        got = epoch_seconds(texts)
+    bad = np.flatnonzero(got != np.array(expected))
+    if len(bad):
+        i = int(bad[0])
+        sys.exit(f"FAIL [stamps]: {texts[i]!r} → {got[i]}, expected {expected[i]}")
+    print(f"  {'timestamp offsets':<22} {len(texts):>6} stamps ok")
+
+
+def timed(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    if SAMPLE.exists():
+        check_json("ci_lth_pvr_sample.json", SAMPLE.read_text(encoding="utf-8"))
+    check_json("synthetic", synthetic_payload(300, 6), chunks=(1, 5, 100, 1 << 18))
+    check_json("edge cases", json.dumps({"meta": {"a": [1]}, "data": [
+        {"date": "2020-01-01", "x": 1, "y": None},
+        {"date": "2020-01-02", "x": "bad", "n": {"z": 1}, "flag": True},
+        {"date": "2020-01-03", "y": 2.5e1},
+        {"date": "2020-01-04", "x": -3, "y": 4}]}), chunks=(1, 3, 8, 1000))
+    check_csv()
+    check_stamps()
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+        f.write(synthetic_payload(6000, 30))
+    path = f.name
+    try:
+        old_s, old_peak = timed(lambda: reference_columns(json.load(open(path, encoding="utf-8"))))
+        new_s, new_peak = timed(lambda: json_columns(path))
+    finally:
+        Path(path).unlink()
+    print(f"  6000 × 30 payload: json.load path {old_s * 1e3:.0f} ms (peak {old_peak / 1e6:.1f} MB), "
+          f"json_columns {new_s * 1e3:.0f} ms (peak {new_peak / 1e6:.1f} MB)")
+    print("PASS: ingest parsers match json.load / csv.DictReader")
+
+
+if __name__ == "__main__":
+    main()
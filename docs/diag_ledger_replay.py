@@ -0,0 +1,171 @@
+"""
+Regression check for the bulk ledger replay (ledger_replay.py).
+
+A direct port of ef_post_ledger_and_balances step 3 (per date, per customer:
+previous stored row + the day's lines, computeAnchoredBalance with lazy
+seeding, as-of BTC / USDPC prices, fn_round_financial on every write) runs
+over a synthetic book against an in-memory balances_daily, and replay() must
+reproduce every row it writes.  The book mixes customers with anchors (some
+dated mid-history, so the incremental path runs before them), customers with
+only carry-forward history, brand-new customers, fee-only days and price gaps.
+
+Fails if any balance / price / NAV differs by more than 1e-8, then times a
+full-book replay.
+
+    python docs/diag_ledger_replay.py
+"""
+import random
+import sys
+import time
+
+import numpy as np
+
+from ledger_replay import (
+    SUM_COLS, Anchor, Prices, ledger_from_rows, replay, stored,
+)
+
+TOL = 1e-8
+START = 20000          # days since 1970-01-01 (2024-10-04)
+DAYS = 420
+
+
+def synthetic_book(n_customers: int, days: int, seed: int = 7):
+    rng = random.Random(seed)
+    lines, anchors, balances = [], {}, {}
+    for c in range(1, n_customers + 1):
+        first = START + rng.randrange(days // 2)
+        for d in range(first, START + days):
+            if rng.random() < 0.35:
+                continue
+            for _ in range(rng.randrange(1, 4)):
+                kind = rng.choice(["topup", "withdrawal", "buy", "sell", "fee", "deposit"])
+                lines.append({
+                    "customer_id": c,
+                    "trade_date": str(np.datetime64(d, "D")),
+                    "kind": kind,
+                    "amount_btc": round(rng.uniform(-0.01, 0.02), 8),
+                    "amount_usdt": round(rng.uniform(-300, 600), 2),
+                    "amount_usdpc": round(rng.uniform(-5, 5), 8) if rng.random() < 0.3 else 0,
+                    "amount_zar": round(rng.uniform(-900, 900), 2) if rng.random() < 0.2 else 0,
+                    "fee_btc": round(rng.uniform(0, 1e-5), 8),
+                    "fee_usdt": round(rng.uniform(0, 0.5), 2),
+                    "fee_usdpc": 0,
+                })
+        profile = c % 4
+        if profile in (0, 1):
+            # Carry-forward history: a stored row on some days before / inside the window
+            e_days = sorted(rng.sample(range(first - 5, START + days), 12))
+            balances[c] = {d: stored((rng.uniform(0, 1), rng.uniform(0, 5000),
+                                      rng.uniform(0, 10), rng.uniform(0, 2000),
+                                      rng.uniform(0, 9000))) for d in e_days}
+        if profile == 0:
+            # Anchor mid-history: cells before it take the incremental path
+            anchors[c] = Anchor(first + rng.randrange(days // 3),
+                                (0.5, 1000.0, 2.0, 100.0, 3000.0))
+        elif profile == 2:
+            anchors[c] = Anchor(first - 1, (0.0, 0.0, 0.0, 0.0, 0.0))
+        # profile 3: brand new, no anchor, no history → seeded from the first cell
+    rng.shuffle(lines)
+
+    price_days = [d for d in range(START - 3, START + days) if rng.random() < 0.9]
+    btc = Prices(np.array(price_days[5:], dtype=np.int64),
+                 np.array([60000 + 10 * i for i in range(len(price_days) - 5)], dtype=np.float64))
+    usdpc_days = [d for d in range(START + 30, START + days, 7)]
+    usdpc = Prices(np.array(usdpc_days, dtype=np.int64),
+                   np.array([0.0 if i == 3 else 1 + i * 1e-4 for i in range(len(usdpc_days))]))
+    return lines, anchors, balances, btc, usdpc
+
+
+def naive_ef(lines, anchors, balances, btc: Prices, usdpc: Prices, from_day, to_day):
+    """Line-by-line port of the edge function's loop over an in-memory database."""
+    anchors = dict(anchors)
+    db = {c: dict(rows) for c, rows in balances.items()}
+    by_cell: dict[tuple[int, int], list[dict]] = {}
+    for r in lines:
+        by_cell.setdefault((r["customer_id"], int(np.datetime64(r["trade_date"], "D").astype(int))),
+                           []).append(r)
+
+    date_custs: dict[int, list[int]] = {}
+    for (c, d), rows in by_cell.items():
+        if from_day <= d <= to_day and any(r["kind"] != "fee" for r in rows):
+            date_custs.setdefault(d, []).append(c)
+
+    def sums(rows):
+        s = [0.0] * 8
+        for r in rows:
+            for j, col in enumerate(SUM_COLS[:-1]):
+                s[j] += float(r[col])
+            k = r["kind"].lower()
+            if k in ("topup", "deposit"):
+                s[7] += float(r["amount_usdt"])
+            elif k in ("withdrawal", "withdraw"):
+                s[7] -= abs(float(r["amount_usdt"]))
+        return s
+
+    def asof(p: Prices, d, default):
+        i = np.searchsorted(p.day, d, side="right") - 1
+        return float(p.value[i]) if i >= 0 else default
+
+    out = {}
+    for d in sorted(date_custs):
+        px = asof(btc, d, 0.0)
+        upx = asof(usdpc, d, 1.0) or 1.0
+        for c in date_custs[d]:
+            rows_c = db.setdefault(c, {})
+            before = [x for x in rows_c if x < d]
+            prev = rows_c[max(before)] if before else (0.0,) * 5
+            s = sums(by_cell[(c, d)])
+            vals = (prev[0] + s[0] - s[1], prev[1] + s[2] - s[3], prev[2] + s[4] - s[5],
+                    prev[3] + s[6], max(0.0, prev[4] + s[7]))
+
+            anchor = anchors.get(c)
+            if anchor is None and rows_c:
+                seed = max(before) if before else min(rows_c)
+                anchor = anchors[c] = Anchor(seed, rows_c[seed])
+            if anchor is not None and d >= anchor.day:
+                window = [r for (cc, dd), rs in by_cell.items() if cc == c and anchor.day < dd <= d
+                          for r in rs]
+                s = sums(window)
+                a = anchor.values
+                vals = (a[0] + s[0] - s[1], a[1] + s[2] - s[3], a[2] + s[4] - s[5],
+                        a[3] + s[6], max(0.0, a[4] + s[7]))
+            nav = vals[0] * px + vals[1] + vals[2] * upx
+            rows_c[d] = stored(vals)
+            out[(c, d)] = (*vals, px, upx, nav)
+    return out
+
+
+def main():
+    lines, anchors, balances, btc, usdpc = synthetic_book(24, DAYS)
+    bal_arrays = {c: (np.array(sorted(rows), dtype=np.int64),
+                      np.array([rows[d] for d in sorted(rows)])) for c, rows in balances.items()}
+    ledger = ledger_from_rows(lines)
+    worst = 0.0
+
+    for label, lo, hi in (("whole book", 0, START + DAYS), ("window", START + 150, START + 300)):
+        expected = naive_ef(lines, anchors, balances, btc, usdpc, lo, hi)
+        r = replay(ledger, anchors, bal_arrays, btc, usdpc, lo, hi)
+        got = {(int(c), int(d)): (*r.balances[i], r.btc_price[i], r.usdpc_price[i], r.nav[i])
+               for i, (c, d) in enumerate(zip(r.customer, r.day))}
+        if set(got) != set(expected):
+            sys.exit(f"FAIL [{label}]: {len(set(got) ^ set(expected))} cells differ "
+                     f"(replay {len(got)}, edge function {len(expected)})")
+        err = max(abs(a - b) for k in got for a, b in zip(got[k], expected[k]))
+        print(f"  {label:<12} {len(got):>6} cells, {len(r.seeded)} seeded anchors  "
+              f"max abs err={err:.2e}")
+        worst = max(worst, err)
+    if worst > TOL:
+        sys.exit(f"FAIL: max abs error {worst:.2e} exceeds {TOL:.0e}")
+
+    lines, anchors, balances, btc, usdpc = synthetic_book(600, 730, seed=11)
+    bal_arrays = {c: (np.array(sorted(rows), dtype=np.int64),
+                      np.array([rows[d] for d in sorted(rows)])) for c, rows in balances.items()}
+    t0 = time.perf_counter()
+    r = replay(ledger_from_rows(lines), anchors, bal_arrays, btc, usdpc, 0, START + 730)
+    print(f"  full book    {len(r.day):>6} cells from {len(lines):,} lines in "
+          f"{time.perf_counter() - t0:.2f}s")
+    print(f"PASS: replay matches the edge-function loop within {TOL:.0e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Regression check for the multi-customer simulator (portfolio_sim.py).
+
+Every customer on monthly schedules with no flows or end date must get
+exactly what a line-by-line port of runSimulation (_shared/lth_pvr_simulator.ts,
+USDPC off) gives when run alone from their start day on the same tape: NAV,
+balances, HWM and every fee total.  Customers with flows, end dates or
+quarterly / annual schedules must get the same result in the full book as in
+a book of their own (no state leaks between customers).
+
+Fails on any mismatch, then times a 10k-customer × 10-year book.
+
+    python docs/diag_portfolio_sim.py
+"""
+import sys
+import time
+
+import numpy as np
+
+from portfolio_sim import (
+    CONTRIB_FEE_RATE, TRADE_FEE_RATE, Book, make_book, make_tape, simulate,
+)
+
+RTOL = 1e-9
+
+
+def synthetic_tape(n_days: int, seed: int = 11):
+    rng = np.random.default_rng(seed)
+    days = np.arange(n_days, dtype=np.int32) + 14610          # 2010-01-01
+    price = 400 * np.exp(np.cumsum(rng.normal(0.0015, 0.035, n_days)))
+    action = rng.choice([1, -1, 0], n_days, p=[0.45, 0.2, 0.35]).astype(np.int8)
+    pct = np.where(action == 0, 0.0, rng.choice([0.02, 0.05, 0.1, 0.25, 1.0], n_days))
+    return make_tape(days, price, action, pct)
+
+
+def reference(tape, start: int, upfront: float, monthly: float, plan: str,
+              platform_rate: float, management_rate: float, performance_rate: float) -> dict:
+    """runSimulation's money path for one investor, from the first tape day >= start."""
+    btc = usdt = hwm = hwm_contrib = cnet = 0.0
+    plat = mgmt = perf = exch_usdt = exch_btc = gross_cum = 0.0
+    last_month = last_perf_month = None
+    rows = np.flatnonzero(tape.days >= start)
+    months = tape.days.astype("datetime64[D]").astype("datetime64[M]").astype(str)
+
+    def floor_guard(px):
+        nonlocal btc, usdt, exch_btc
+        if usdt < 0 and btc > 0 and px > 0:
+            sold = min(btc, -usdt / (px * (1 - TRADE_FEE_RATE)))
+            fee = sold * TRADE_FEE_RATE
+            btc -= sold
+            usdt += (sold - fee) * px
+            exch_btc += fee
+
+    for i, d in enumerate(rows.tolist()):
+        px, month = float(tape.price[d]), months[d]
+        gross = upfront if i == 0 and upfront > 0 else 0.0
+        if monthly > 0 and month != last_month:
+            gross += monthly
+        last_month = month
+        if gross > 0:
+            fee = gross * CONTRIB_FEE_RATE
+            p = (gross - fee) * platform_rate if plan == "platform" else 0.0
+            usdt += gross - fee - p
+            cnet += gross - fee - p
+            gross_cum += gross
+            plat += p
+            exch_usdt += fee
+
+        a, pct = int(tape.action[d]), float(tape.pct[d])
+        if a == 1 and pct > 0 and px > 0:
+            spend = usdt * pct
+            if spend > 0:
+                bought = spend / px
+                usdt -= spend
+                btc += bought - bought * TRADE_FEE_RATE
+                exch_btc += bought * TRADE_FEE_RATE
+        elif a == -1 and pct > 0 and px > 0:
+            sold = btc * pct
+            if sold > 0:
+                btc -= sold + sold * TRADE_FEE_RATE
+                usdt += sold * px
+                exch_btc += sold * TRADE_FEE_RATE
+
+        if month != last_perf_month and last_perf_month is not None:
+            since = cnet - hwm_contrib
+            nav_perf = usdt + btc * px - since
+            if nav_perf > hwm and performance_rate > 0:
+                fee = (nav_perf - hwm) * performance_rate
+                usdt -= fee
+                perf += fee
+                floor_guard(px)
+                hwm = usdt + btc * px - since
+                hwm_contrib = cnet
+            elif nav_perf > hwm:
+                hwm = nav_perf
+                hwm_contrib = cnet
+            if plan == "management" and management_rate > 0:
+                fee = max(0.0, (usdt + btc * px) * management_rate / 12)
+                if fee > 0:
+                    usdt -= fee
+                    mgmt += fee
+                    floor_guard(px)
+        last_perf_month = month
+        if i == 0:
+            hwm = usdt + btc * px
+            hwm_contrib = cnet
+
+    px = float(tape.price[-1])
+    return {"nav_usd": usdt + btc * px, "btc_balance": btc, "usdt_balance": usdt,
+            "high_water_mark_usd": hwm, "contrib_gross": gross_cum, "contrib_net": cnet,
+            "platform_fees": plat, "management_fees": mgmt, "performance_fees": perf,
+            "exchange_fees_usdt": exch_usdt, "exchange_fees_btc": exch_btc}
+
+
+def random_book(tape, n: int, seed: int = 5) -> tuple[Book, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    D = len(tape.days)
+    start = tape.days[rng.integers(0, D - 30, n)]
+    start[: n // 10] = tape.days[0] - rng.integers(0, 40, n // 10)   # before the tape
+    start[n // 10: n // 5] += 1                                      # between / on month starts
+    plain = rng.random(n) < 0.6
+    end = np.where(plain | (rng.random(n) < 0.5), np.iinfo(np.int32).max,
+                   start + rng.integers(30, 2000, n)).astype(np.int32)
+    sched = ["monthly", "quarterly", "annual"]
+    flows = []
+    for k in np.flatnonzero(~plain)[::3].tolist():
+        for _ in range(int(rng.integers(1, 6))):
+            flows.append((k, int(start[k] + rng.integers(-10, 1500)),
+                          float(rng.choice([1, -1]) * rng.uniform(10, 5e4))))
+    book = make_book(
+        np.arange(n), start,
+        rng.choice([0.0, 500.0, 10_000.0], n), rng.choice([0.0, 100.0, 1_000.0], n),
+        rng.choice(["platform", "management"], n), end=end,
+        platform_rate=rng.choice([0.0075, 0.005], n),
+        management_rate=rng.choice([0.01, 0.015], n),
+        performance_rate=rng.choice([0.10, 0.0, 0.2], n),
+        management_schedule=np.where(plain, "monthly", rng.choice(sched, n)),
+        performance_schedule=np.where(plain, "monthly", rng.choice(sched, n)),
+        flows=flows,
+    )
+    return book, plain & ~np.isin(np.arange(n), [f[0] for f in flows])
+
+
+def subset(book: Book, k: int) -> Book:
+    sel = book.flow_customer == k
+    return Book(*(col[k:k + 1] for col in book[:11]),
+                np.zeros(int(sel.sum()), dtype=np.int64), book.flow_day[sel], book.flow_amount[sel])
+
+
+def close(a: float, b: float) -> bool:
+    return abs(a - b) <= RTOL * max(1.0, abs(a), abs(b))
+
+
+def main():
+    tape = synthetic_tape(2200)
+    book, plain = random_book(tape, 600)
+    run = simulate(tape, book, keep_daily=True)
+    names = list(reference(tape, 0, 0.0, 0.0, "platform", 0, 0, 0))
+
+    checked = 0
+    for k in np.flatnonzero(plain).tolist():
+        ref = reference(tape, int(book.start[k]), float(book.upfront[k]), float(book.monthly[k]),
+                        "management" if book.management[k] else "platform",
+                        float(book.platform_rate[k]), float(book.management_rate[k]),
+                        float(book.performance_rate[k]))
+        for name in names:
+            if not close(run.totals[name][k], ref[name]):
+                sys.exit(f"FAIL: customer {k} {name} {run.totals[name][k]!r} != runSimulation {ref[name]!r}")
+        checked += 1
+    print(f"  {checked} monthly-schedule customers match the runSimulation port")
+
+    alone = 0
+    for k in np.flatnonzero(~plain).tolist():
+        solo = simulate(tape, subset(book, k), keep_daily=True)
+        for name in run.totals:
+            if not close(run.totals[name][k], solo.totals[name][0]):
+                sys.exit(f"FAIL: customer {k} {name} differs in the full book vs alone")
+        if not np.allclose(run.nav_daily[k], solo.nav_daily[0], rtol=RTOL, equal_nan=True):
+            sys.exit(f"FAIL: customer {k} daily NAV differs in the full book vs alone")
+        alone += 1
+    print(f"  {alone} customers with flows / end dates / schedules match their solo runs")
+
+    agg = np.nansum(run.nav_daily, axis=0)
+    if not np.allclose(agg, run.daily["nav_usd"], rtol=RTOL):
+        sys.exit("FAIL: aggregate daily NAV is not the sum of customer NAVs")
+    if (run.totals["nav_usd"] < -1e-6).any():
+        sys.exit("FAIL: negative customer NAV")
+
+    big_tape = synthetic_tape(3653, seed=2)
+    big, _ = random_book(big_tape, 10_000, seed=9)
+    t0 = time.perf_counter()
+    big_run = simulate(big_tape, big)
+    elapsed = time.perf_counter() - t0
+    print(f"  10,000 customers × 3,653 days ({len(big.flow_amount):,} flows): {elapsed:.2f}s, "
+          f"final NAV ${big_run.totals['nav_usd'].sum():,.0f}")
+    print("PASS: portfolio simulator matches runSimulation per customer")
+
+
+if __name__ == "__main__":
+    main()
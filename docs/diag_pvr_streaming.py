@@ -0,0 +1,123 @@
+"""
+Regression check for the streaming (Welford) cumulative statistics in
+rb_pvr_validation.calculate_pvr_bands.
+
+Runs the current implementation and the original O(n²) np.std() version on
+the same deterministic ~5,800-day synthetic history (zero realised prices at
+the start, as RB returns them) and fails if any row field differs by more than
+1e-9 relative error in either mode.
+
+    python docs/diag_pvr_streaming.py
+"""
+import contextlib
+import io
+import math
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from rb_pvr_validation import BAND_MULTIPLIERS, calculate_pvr_bands
+
+REL_TOL = 1e-9
+
+
+def reference_pvr_bands(supply, realized_price, price, mode):
+    """The pre-Welford implementation, kept verbatim as the oracle."""
+    common_dates = sorted(set(supply) & set(realized_price) & set(price))
+    rows, cumulative_mc = [], []
+    for d in common_dates:
+        lth_s, lth_rp, btc_p = supply[d], realized_price[d], price[d]
+        if lth_s <= 0 or btc_p <= 0:
+            continue
+        lth_mc = lth_s * btc_p
+        cumulative_mc.append(lth_mc)
+        pvr_denominator = float(np.std(cumulative_mc, ddof=1)) if len(cumulative_mc) > 1 else 0.0
+        if lth_rp <= 0:
+            continue
+        lth_rc = lth_s * lth_rp
+        unrealized = lth_mc - lth_rc
+        pvr = unrealized / pvr_denominator if pvr_denominator > 0 else 0.0
+        rows.append({
+            "date": d, "lth_supply": lth_s, "lth_realized_price": lth_rp,
+            "btc_price": btc_p, "lth_market_cap": lth_mc, "lth_realized_cap": lth_rc,
+            "unrealized_profit": unrealized, "cumulative_std_dev": pvr_denominator,
+            "pvr_value": pvr,
+        })
+    non_zero_pvr = np.array([r["pvr_value"] for r in rows if r["pvr_value"] != 0])
+    if mode == "static":
+        for r in rows:
+            r["pvr_mean"] = float(np.mean(non_zero_pvr))
+            r["pvr_std"] = float(np.std(non_zero_pvr, ddof=1))
+    else:
+        pvr_arr = np.array([r["pvr_value"] for r in rows])
+        for i, r in enumerate(rows):
+            slice_ = pvr_arr[:i + 1][pvr_arr[:i + 1] != 0]
+            r["pvr_mean"] = float(np.mean(slice_)) if len(slice_) > 1 else 0.0
+            r["pvr_std"] = float(np.std(slice_, ddof=1)) if len(slice_) > 1 else 0.0
+    for r in rows:
+        for band_key, mult in BAND_MULTIPLIERS.items():
+            pvr_target = r["pvr_mean"] + mult * r["pvr_std"]
+            if r["lth_supply"] > 0 and r["cumulative_std_dev"] > 0:
+                band_price = (pvr_target * r["cumulative_std_dev"] + r["lth_realized_cap"]) / r["lth_supply"]
+            else:
+                band_price = 0.0
+            r[f"price_at_{band_key}"] = band_price
+    return rows
+
+
+def synthetic_series(days=5800, seed=7):
+    """Deterministic supply / realised price / price shaped like the RB series."""
+    rng = np.random.default_rng(seed)
+    start = date(2010, 7, 18)
+    supply, realized, price = {}, {}, {}
+    px, rp = 0.05, 0.0
+    for i in range(days):
+        d = (start + timedelta(days=i)).isoformat()
+        px *= math.exp(rng.normal(0.0019, 0.04))
+        rp = 0.0 if i < 120 else (px if rp == 0 else rp + (px - rp) / 400)
+        supply[d] = 4.0e6 + 1.0e7 * i / days
+        realized[d] = rp
+        price[d] = px
+    return supply, realized, price
+
+
+def main():
+    supply, realized, price = synthetic_series()
+    worst = 0.0
+    for mode in ("static", "cumulative"):
+        t0 = time.perf_counter()
+        expected = reference_pvr_bands(supply, realized, price, mode)
+        t_ref = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, actual = calculate_pvr_bands(supply, realized, price, mode)
+        t_new = time.perf_counter() - t0
+
+        if len(actual) != len(expected):
+            sys.exit(f"FAIL [{mode}]: {len(actual)} rows vs {len(expected)} expected")
+
+        mode_worst, where = 0.0, None
+        for a, e in zip(actual, expected):
+            for k, ev in e.items():
+                if k == "date":
+                    if a[k] != ev:
+                        sys.exit(f"FAIL [{mode}]: date mismatch {a[k]} vs {ev}")
+                    continue
+                scale = max(abs(ev), abs(a[k]))
+                err = abs(a[k] - ev) / scale if scale else 0.0
+                if err > mode_worst:
+                    mode_worst, where = err, (e["date"], k)
+        worst = max(worst, mode_worst)
+        print(f"  {mode:<10}  rows={len(actual):>5}  max rel err={mode_worst:.2e}"
+              f"  at {where}  reference {t_ref:7.3f}s  streaming {t_new:7.3f}s")
+
+    if worst > REL_TOL:
+        sys.exit(f"FAIL: max relative error {worst:.2e} exceeds {REL_TOL:.0e}")
+    print(f"PASS: all fields within {REL_TOL:.0e} relative error")
+
+
+if __name__ == "__main__":
+    main()
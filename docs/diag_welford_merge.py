@@ -0,0 +1,97 @@
+"""
+Regression check for the segment-parallel Welford pass in welford.py.
+
+Compares prefix_cum_std (segments merged with Chan's formula, on worker
+processes) with the plain sequential Welford loop rb_bands_backfill used to
+run, on a deterministic ~5,900-day synthetic LTH market cap history:
+
+  * from scratch, across several segment counts
+  * continuing a stored (n, mean, M2) state, as incremental backfills do
+  * several series-start variants in one prefix_cum_std_many call
+
+Fails if any cum_std or final state differs by more than 1e-9 relative error.
+
+    python docs/diag_welford_merge.py
+"""
+import math
+import sys
+import time
+
+import numpy as np
+
+from welford import prefix_cum_std, prefix_cum_std_many
+
+REL_TOL = 1e-9
+
+
+def sequential(values, start=(0, 0.0, 0.0)):
+    """The original per-day loop, kept verbatim as the oracle."""
+    mc_n, mc_mean, mc_m2 = float(start[0]), start[1], start[2]
+    out = []
+    for lth_mc in values:
+        mc_n   += 1
+        delta   = lth_mc - mc_mean
+        mc_mean += delta / mc_n
+        delta2  = lth_mc - mc_mean
+        mc_m2  += delta * delta2
+        out.append(math.sqrt(mc_m2 / (mc_n - 1)) if mc_n >= 2 else 0.0)
+    return np.array(out), (int(mc_n), mc_mean, mc_m2)
+
+
+def rel_err(a, b) -> float:
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    scale = np.maximum(np.abs(a), np.abs(b))
+    return float(np.max(np.where(scale > 0, np.abs(a - b) / np.where(scale > 0, scale, 1), 0.0)))
+
+
+def check(label, got, want) -> float:
+    (cs, st), (cs_ref, st_ref) = got, want
+    if len(cs) != len(cs_ref) or st[0] != st_ref[0]:
+        sys.exit(f"FAIL [{label}]: n {st[0]} vs {st_ref[0]}")
+    err = max(rel_err(cs, cs_ref), rel_err(st[1:], st_ref[1:]))
+    print(f"  {label:<34}  rows={len(cs):>5}  max rel err={err:.2e}")
+    return err
+
+
+def synthetic_mc(days=5900, seed=11):
+    """Deterministic LTH market cap shaped like supply × price since 2010."""
+    rng = np.random.default_rng(seed)
+    price = 0.05 * np.exp(np.cumsum(rng.normal(0.0019, 0.04, days)))
+    supply = 4.0e6 + 1.0e7 * np.arange(days) / days
+    return supply * price
+
+
+def main():
+    mc = synthetic_mc()
+    worst = 0.0
+
+    t0 = time.perf_counter()
+    ref = sequential(mc)
+    t_seq = time.perf_counter() - t0
+    for workers in (1, 2, 4, 8):
+        t0 = time.perf_counter()
+        got = prefix_cum_std(mc, max_workers=workers, min_segment=256)
+        dt = time.perf_counter() - t0
+        worst = max(worst, check(f"from scratch, {workers} worker(s) ({dt:.3f}s)", got, ref))
+
+    # Incremental: continue the state stored after the first 5,000 days
+    _, stored = sequential(mc[:5000])
+    worst = max(worst, check("continue stored state, 4 workers",
+                             prefix_cum_std(mc[5000:], start=stored, max_workers=4, min_segment=256),
+                             sequential(mc[5000:], start=stored)))
+
+    # Series-start variants (cf. diag_series_start.py), all on one pool
+    offsets = {f"start+{k}d": k for k in (0, 30, 180, 365, 730)}
+    many = prefix_cum_std_many({name: mc[k:] for name, k in offsets.items()},
+                               max_workers=4, min_segment=256)
+    for name, k in offsets.items():
+        worst = max(worst, check(f"variant {name}", many[name], sequential(mc[k:])))
+
+    print(f"  sequential reference: {t_seq:.3f}s")
+    if worst > REL_TOL:
+        sys.exit(f"FAIL: max relative error {worst:.2e} exceeds {REL_TOL:.0e}")
+    print(f"PASS: all cum_std values and final states within {REL_TOL:.0e} relative error")
+
+
+if __name__ == "__main__":
+    main()
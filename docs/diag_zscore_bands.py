@@ -0,0 +1,115 @@
+"""
+Regression check for the generic z-score band engine (zscore_bands.py).
+
+On the deterministic synthetic history from diag_pvr_streaming.py:
+
+  * LTH PVR, static and cumulative, against rb_pvr_validation.calculate_pvr_bands
+    (signal, cum_std, mean / std and every price_at_* column)
+  * streaming: the history split in two, the second half continuing the
+    returned Welford states, against one batch run
+  * rolling mode against a naive per-row window loop
+  * MVRV / MVRV-Z: back-solving each row's own signal returns its price
+
+Fails if anything differs by more than 1e-9 relative error.
+
+    python docs/diag_zscore_bands.py
+"""
+import contextlib
+import io
+import sys
+
+import numpy as np
+
+from diag_pvr_streaming import synthetic_series
+from pvr_bands import band_price_matrix
+from rb_pvr_validation import BAND_MULTIPLIERS, calculate_pvr_bands
+from zscore_bands import METRICS, zscore_bands
+
+REL_TOL = 1e-9
+WINDOW = 365
+
+
+def rel_err(a, b) -> float:
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    if a.shape != b.shape:
+        return np.inf
+    scale = np.maximum(np.abs(a), np.abs(b))
+    return float(np.max(np.where(scale > 0, np.abs(a - b) / np.where(scale > 0, scale, 1), 0.0),
+                        initial=0.0))
+
+
+def report(label, err) -> float:
+    print(f"  {label:<44}  max rel err={err:.2e}")
+    return err
+
+
+def main():
+    supply, realized, price = synthetic_series()
+    dates = sorted(set(supply) & set(realized) & set(price))
+    s = np.array([supply[d] for d in dates])
+    rp = np.array([realized[d] for d in dates])
+    p = np.array([price[d] for d in dates])
+    cols = {"price": p, "lth_supply": s, "lth_realized_cap": s * rp}
+    metric = METRICS["lth_pvr"]
+    worst = 0.0
+
+    # LTH PVR vs the production validation script
+    for mode in ("static", "cumulative"):
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, rows = calculate_pvr_bands(supply, realized, price, mode)
+        b = zscore_bands(metric, cols, BAND_MULTIPLIERS, mode=mode)
+        if [dates[i] for i in b.index] != [r["date"] for r in rows]:
+            sys.exit(f"FAIL [{mode}]: emitted dates differ")
+        err = max(
+            rel_err(b.signal, [r["pvr_value"] for r in rows]),
+            rel_err(b.scale, [r["cumulative_std_dev"] for r in rows]),
+            rel_err(b.mean, [r["pvr_mean"] for r in rows]),
+            rel_err(b.std, [r["pvr_std"] for r in rows]),
+            *(rel_err(b.prices[:, j], [r[f"price_at_{k}"] for r in rows])
+              for j, k in enumerate(b.keys)),
+        )
+        worst = max(worst, report(f"lth_pvr {mode} vs calculate_pvr_bands", err))
+
+    # Streaming: two halves, states carried over, vs one batch
+    cut = len(dates) // 2
+    head = {k: v[:cut] for k, v in cols.items()}
+    tail = {k: v[cut:] for k, v in cols.items()}
+    for mode in ("static", "cumulative"):
+        full = zscore_bands(metric, cols, BAND_MULTIPLIERS, mode=mode)
+        first = zscore_bands(metric, head, BAND_MULTIPLIERS, mode=mode)
+        second = zscore_bands(metric, tail, BAND_MULTIPLIERS, mode=mode,
+                              basis_state=first.basis_state, stats_state=first.stats_state)
+        n_tail = len(second.index)
+        err = max(rel_err(second.scale, full.scale[-n_tail:]),
+                  rel_err(second.signal, full.signal[-n_tail:]),
+                  rel_err(second.stats_state, full.stats_state),
+                  rel_err(second.prices if mode == "cumulative" else second.prices[-1],
+                          full.prices[-n_tail:] if mode == "cumulative" else full.prices[-1]))
+        worst = max(worst, report(f"lth_pvr {mode} streaming vs batch", err))
+
+    # Rolling vs a naive window loop
+    b = zscore_bands(metric, cols, BAND_MULTIPLIERS, mode="rolling", window=WINDOW)
+    nz = b.signal[b.signal != 0]
+    pos = np.cumsum(b.signal != 0)
+    naive_mean = np.array([nz[max(0, c - WINDOW):c].mean() if c > 1 else 0.0 for c in pos])
+    naive_std = np.array([nz[max(0, c - WINDOW):c].std(ddof=1) if c > 1 else 0.0 for c in pos])
+    worst = max(worst, report(f"lth_pvr rolling({WINDOW}) vs naive window",
+                              max(rel_err(b.mean, naive_mean), rel_err(b.std, naive_std))))
+
+    # MVRV / MVRV-Z: the band at each row's own signal is that row's price
+    total = s * 1.9
+    mcols = {"price": p, "supply": total, "realized_cap": total * rp}
+    for name in ("mvrv", "mvrv_z"):
+        b = zscore_bands(METRICS[name], mcols, [0.0], mode="static")
+        offset = mcols["realized_cap"][b.index] if name == "mvrv_z" else np.zeros(len(b.index))
+        own = band_price_matrix(b.scale, offset, total[b.index], b.signal, 0.0, [0.0])[:, 0]
+        valid = b.scale > 0
+        worst = max(worst, report(f"{name} inverse mapping", rel_err(own[valid], p[b.index][valid])))
+
+    if worst > REL_TOL:
+        sys.exit(f"FAIL: max relative error {worst:.2e} exceeds {REL_TOL:.0e}")
+    print(f"PASS: all checks within {REL_TOL:.0e} relative error")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+ingest.py
+
+Shared parsers for the exchange exports, database dumps and band payloads the
+Python tools read, straight into typed columns:
+
+    day      int32   day numbers (day_calendar: days since 1970-01-01)
+    stamp    int64   epoch seconds, UTC
+    float    float64 NaN for empty / null
+    text     str     stripped
+
+CSV files are read with csv.reader (no per-row dicts) a block of rows at a
+time; only the requested columns are pulled out, each converted in one numpy
+pass per block.  JSON payloads are streamed a buffer at a time, so the whole
+document never sits in memory as a list of dicts: iter_json_array decodes one
+element at a time, json_columns one span of whole rows at a time into a float
+block.
+
+    cols = read_csv_columns(path, {"date": "stamp", "debit value": "float",
+                                   "transaction type": "text"})
+    for row in iter_json_array("ci_bands_raw_response.json", "data"): ...
+    days, values = json_columns("ci_bands_raw_response.json", "data", "date",
+                                ["lth_market_cap", "cumulative_std_dev"])
+"""
+
+import csv
+import gc
+import io
+import json
+import re
+from datetime import datetime, timezone
+from itertools import islice
+from operator import itemgetter
+from typing import Iterator
+
+import numpy as np
+
+from day_calendar import day_numbers
+
+CHUNK_SIZE = 1 << 18    # characters read per refill when streaming JSON
+CSV_BLOCK_ROWS = 65536  # CSV rows converted at a time
+KINDS = ("day", "stamp", "float", "text")
+
+_OFFSET = re.compile(r"([+-])(\d{2}):?(\d{2})?$")
+_WS = " \t\n\r"
+_DELIMS = _WS + ",]}:"
+
+
+# ── Column conversions ────────────────────────────────────────────────────────
+def epoch_seconds(values) -> np.ndarray:
+    """
+    Timestamps → int64 epoch seconds.  Accepts "YYYY-MM-DD HH:MM:SS Z" (VALR
+    exports) and ISO 8601 with T, fractional seconds, Z or a UTC offset in any
+    of the forms ±HH:MM, ±HHMM and ±HH (Postgres text output).
+    """
+    s = np.char.strip(np.asarray(values, dtype=str))
+    s = np.char.rstrip(np.char.rstrip(s, "Z"))
+    long = np.char.str_len(s) > 19      # fraction and / or offset
+    for utc in ("+00:00", "+0000", "+00"):
+        hit = long & np.char.endswith(s, utc)
+        if hit.any():
+            s = np.where(hit, np.char.rstrip(np.char.rstrip(s, "0:"), "+"), s)
+            long &= ~hit
+    shift = np.zeros(len(s), dtype=np.int64)
+    for i in np.flatnonzero(long).tolist():
+        x = str(s[i])
+        if m := _OFFSET.search(x, 19):
+            sign = -1 if m[1] == "-" else 1
+            shift[i] = sign * (int(m[2]) * 3600 + int(m[3] or 0) * 60)
+            s[i] = x[:m.start()]
+    return s.astype("datetime64[us]").astype(np.int64) // 1_000_000 - shift
+
+
+def floats(values) -> np.ndarray:
+    """Numbers, numeric strings, "" / None → float64 (NaN for the empties)."""
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+    a = np.char.strip(np.asarray([("" if v is None else str(v)) for v in values], dtype=str))
+    return np.where(a == "", "nan", np.char.replace(a, ",", "")).astype(np.float64)
+
+
+def texts(values) -> np.ndarray:
+    return np.char.strip(np.asarray(values, dtype=str))
+
+
+_CONVERT = {"day": day_numbers, "stamp": epoch_seconds, "float": floats, "text": texts}
+
+
+def to_datetimes(stamps: np.ndarray) -> list[datetime]:
+    """int64 epoch seconds → tz-aware UTC datetimes (for code that needs objects)."""
+    return [d.replace(tzinfo=timezone.utc)
+            for d in np.asarray(stamps).astype("datetime64[s]").astype(datetime).tolist()]
+
+
+# ── CSV ───────────────────────────────────────────────────────────────────────
+def read_csv_columns(source, columns: dict[str, str], optional: tuple[str, ...] = ()
+                     ) -> dict[str, np.ndarray]:
+    """
+    Selected columns of a headed CSV file (path or text stream) as typed
+    arrays, keyed by header name.  Columns listed in optional may be absent
+    from the header and come back empty-valued.
+    """
+    for name, kind in columns.items():
+        if kind not in KINDS:
+            raise ValueError(f"column {name!r}: unknown kind {kind!r}")
+    f = open(source, newline="", encoding="utf-8") if not isinstance(source, io.IOBase) else source
+    gc_was_enabled = gc.isenabled()
+    gc.disable()        # millions of short-lived row lists: no cycles to collect
+    try:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader, [])]
+        missing = [c for c in columns if c not in header and c not in optional]
+        if missing:
+            raise ValueError(f"{getattr(f, 'name', 'CSV')}: missing column(s) {', '.join(missing)}")
+        width = len(header)
+        parts: dict[str, list[np.ndarray]] = {name: [] for name in columns}
+        while rows := [r for r in islice(reader, CSV_BLOCK_ROWS) if r]:
+            if any(len(r) < width for r in rows):
+                rows = [r + [""] * (width - len(r)) for r in rows]
+            for name, kind in columns.items():
+                raw = (list(map(itemgetter(header.index(name)), rows)) if name in header
+                       else [""] * len(rows))
+                parts[name].append(_CONVERT[kind](raw))
+        return {name: np.concatenate(parts[name]) if parts[name] else _CONVERT[kind]([])
+                for name, kind in columns.items()}
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+        if f is not source:
+            f.close()
+
+
+# ── JSON ──────────────────────────────────────────────────────────────────────
+class _Stream:
+    """A text buffer over a file that refills on demand for raw_decode."""
+
+    def __init__(self, f, chunk_size: int):
+        self.f, self.chunk_size = f, chunk_size
+        self.buf, self.pos, self.eof = "", 0, False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        data = self.f.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at end of input)."""
+        while True:
+            n = len(self.buf)
+            while self.pos < n and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < n or not self.fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError(f"malformed JSON: expected one of {chars!r}, got {c!r}")
+        self.pos += 1
+        return c
+
+    def value(self, decoder: json.JSONDecoder):
+        self.peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number may be cut at the buffer end ("12" of "123", "2.5" of
+            # "2.5e3"): accept a scalar only once a delimiter follows it
+            if (not isinstance(obj, (dict, list, str)) and not self.eof
+                    and (end == len(self.buf) or self.buf[end] not in _DELIMS)):
+                if self.fill():
+                    continue
+            self.pos = end
+            return obj
+
+
+def _open_array(s: _Stream, dec: json.JSONDecoder, key: str | None) -> None:
+    """Advance past the "[" of the top-level array, or of the array under key."""
+    if key is not None:
+        s.expect("{")
+        while True:
+            if s.peek() == "}":
+                raise KeyError(f"top-level key {key!r} not found")
+            name = s.value(dec)
+            s.expect(":")
+            if name == key:
+                break
+            s.value(dec)
+            if s.expect(",}") == "}":
+                raise KeyError(f"top-level key {key!r} not found")
+    s.expect("[")
+
+
+def _open(source):
+    return open(source, encoding="utf-8") if not isinstance(source, io.IOBase) else source
+
+
+def iter_json_array(source, key: str | None = "data", chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """
+    Yield the elements of a JSON array one at a time: the top-level document
+    when key is None, else the array under that top-level key.  Sibling
+    values before the key are decoded and discarded.
+    """
+    f = _open(source)
+    try:
+        s, dec = _Stream(f, chunk_size), json.JSONDecoder()
+        _open_array(s, dec, key)
+        if s.peek() == "]":
+            return
+        while True:
+            yield s.value(dec)
+            if s.expect(",]") == "]":
+                return
+    finally:
+        if f is not source:
+            f.close()
+
+
+_SPAN_END = re.compile(r"\}\s*([,\]])")
+
+
+def _json_spans(source, key: str | None, chunk_size: int) -> Iterator[str | dict]:
+    """
+    The array's elements as text spans of whole flat objects ("{...},{...}",
+    cut after the last "}," in the buffer), or one decoded element at a time
+    where no clean cut exists (nested values, braces inside strings).
+    """
+    f = _open(source)
+    try:
+        s, dec = _Stream(f, chunk_size), json.JSONDecoder()
+        _open_array(s, dec, key)
+        if s.peek() == "]":
+            return
+        while True:
+            s.peek()
+            buf, start = s.buf, s.pos
+            idx = buf.rfind("}", start)
+            while idx >= start and not (m := _SPAN_END.match(buf, idx)):
+                idx = buf.rfind("}", start, idx)
+            if idx >= start:
+                span = buf[start:idx + 1]
+                if "[" not in span and span.count("{") == span.count("}"):
+                    s.pos = m.end()
+                    yield span
+                    if m[1] == "]":
+                        return
+                    continue
+            elif s.fill():
+                continue
+            yield s.value(dec)
+            if s.expect(",]") == "]":
+                return
+    finally:
+        if f is not source:
+            f.close()
+
+
+def _is_number(v) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _rows_block(rows: list[dict], names: list[str], numbers_only: bool) -> np.ndarray:
+    try:
+        # Every row carries every field as a number / null: one 2-D conversion
+        block = np.array(list(map(itemgetter(*names), rows)), dtype=np.float64)
+        return block.reshape(len(rows), len(names))
+    except (KeyError, TypeError, ValueError):
+        pass
+    out = np.zeros((len(rows), len(names)))
+    for j, name in enumerate(names):
+        vals = [r.get(name) for r in rows]
+        out[:, j] = floats([v if _is_number(v) else None for v in vals] if numbers_only else vals)
+    return out
+
+
+def json_columns(source, key: str | None = "data", date_field: str = "date",
+                 fields: list[str] | None = None, chunk_size: int = CHUNK_SIZE
+                 ) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """
+    (days, {field: float64 values}) from an array of flat objects with a
+    date field.  fields=None keeps every field holding a number in any row
+    (rows before a field first appears get NaN).
+
+    Rows are decoded a buffer-sized span at a time by json.loads and each
+    span becomes one 2-D float block, so memory follows chunk_size rather
+    than the size of the document.
+    """
+    days: list[np.ndarray] = []
+    cols: dict[str, list[np.ndarray]] = {f: [] for f in fields or ()}
+    n = 0
+    for part in _json_spans(source, key, chunk_size):
+        rows = [part] if isinstance(part, dict) else json.loads(f"[{part}]")
+        if fields is None:
+            for name in sorted(set().union(*rows) - cols.keys() - {date_field}):
+                if any(_is_number(r.get(name)) for r in rows):
+                    cols[name] = [np.full(n, np.nan)]
+        names = list(cols)
+        block = _rows_block(rows, names, fields is None)
+        days.append(day_numbers([r[date_field] for r in rows]))
+        for j, name in enumerate(names):
+            cols[name].append(block[:, j])
+        n += len(rows)
+    return (np.concatenate(days) if days else np.zeros(0, dtype=np.int32),
+            {name: np.concatenate(parts) if parts else np.zeros(0)
+             for name, parts in sorted(cols.items())})
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+ledger_replay.py
+
+Offline bulk replay of the balances_daily roll in ef_post_ledger_and_balances
+(step 3, "Roll balances_daily for all customers with activity").
+
+The edge function walks the activity dates one at a time and, for every
+(customer, date), queries the BTC price, the USDPC price, the previous
+balance, the day's ledger lines and the anchor window.  This script loads
+ledger_lines, balance_anchors, balances_daily, the band btc_price and
+usdpc_prices_daily once and computes every cell with grouped cumulative sums:
+
+  cells        (customer, trade_date) with a non-fee ledger line in [from, to]
+  day sums     Σ amount_* and Σ fee_* over all of the day's ledger lines;
+               contrib = +amount_usdt on topup/deposit, −|amount_usdt| on
+               withdrawal/withdraw
+  anchored     anchor + Σ day sums over (anchor_date, date]      (date ≥ anchor_date)
+               cost_basis_usd = max(0, anchor cost basis + Σ contrib)
+  incremental  previous balances_daily row (< date) + the day's sums, as stored
+               (fn_round_financial) — no anchor yet, or before the anchor date
+  nav_usd      btc · btc_price + usdt + usdpc · usdpc_price
+               (last band btc_price ≤ date, else 0; last USDPC price ≤ date, else 1)
+
+Customers without a balance_anchors row are seeded the way
+computeAnchoredBalance (_shared/balance_anchor.ts) does it — latest
+balances_daily row before their first cell, else their earliest row, else
+their first replayed cell — and the seeded anchors are written back too.
+
+Usage (PowerShell):
+  $env:SUPABASE_URL            = "https://wqnmxpooabmedvtackji.supabase.co"
+  $env:SUPABASE_SERVICE_ROLE_KEY = "<key>"
+  python docs/ledger_replay.py                    # whole book
+
+Optional flags:
+  --from YYYY-MM-DD    First activity date to rebuild (default: first ledger date)
+  --to   YYYY-MM-DD    Last  activity date to rebuild (default: today)
+  --customers 31,48    Only these customers (default: every customer with activity)
+  --band-source rb|ci  Band table the btc_price comes from (default: rb, as the EF)
+  --dry-run            Compute and compare with the stored rows; write nothing
+  --no-benchmarks      Skip recompute_hodl_balances / recompute_std_dca_balances
+  --concurrency N      Upsert batches in flight (default: 4)
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+from operator import itemgetter
+from typing import NamedTuple
+
+import numpy as np
+import requests
+
+from day_calendar import from_day, to_day
+
+# ── Configuration ─────────────────────────────────────────────────────────────
+SB_URL   = os.getenv("SUPABASE_URL", "")
+SB_KEY   = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
+ORG_ID   = "b0a77009-03b9-44a1-ae1d-34f157d44a8b"
+
+BATCH_SIZE  = 500
+CONCURRENCY = 4      # upsert batches in flight
+PAGE_SIZE   = 1000   # rows per page when loading tables
+SCHEMA      = "lth_pvr"
+
+KEY_SPAN = 1 << 20   # (customer, day) → customer * KEY_SPAN + days since 1970-01-01
+
+# Day-sum columns (ledger order) and balance columns (balances_daily order)
+SUM_COLS = ("amount_btc", "fee_btc", "amount_usdt", "fee_usdt",
+            "amount_usdpc", "fee_usdpc", "amount_zar", "contrib")
+BAL_COLS = ("btc_balance", "usdt_balance", "usdpc_balance", "zar_balance", "cost_basis_usd")
+
+# fn_round_financial / column scales applied when a balance is stored
+STORED_DP = (8, 2, 8, None, None)
+
+
+class Ledger(NamedTuple):
+    key: np.ndarray        # customer * KEY_SPAN + day, sorted
+    sums: np.ndarray       # (keys × SUM_COLS) day sums
+    active: np.ndarray     # bool per key: a non-fee line exists that day
+
+
+class Anchor(NamedTuple):
+    day: int
+    values: tuple[float, ...]   # BAL_COLS
+
+
+class Prices(NamedTuple):
+    day: np.ndarray        # sorted days
+    value: np.ndarray
+
+
+class Replay(NamedTuple):
+    customer: np.ndarray
+    day: np.ndarray
+    balances: np.ndarray   # (cells × BAL_COLS)
+    btc_price: np.ndarray
+    usdpc_price: np.ndarray
+    nav: np.ndarray
+    seeded: dict[int, Anchor]
+
+
+# ── Bulk construction ─────────────────────────────────────────────────────────
+def ledger_from_rows(rows: list[dict]) -> Ledger:
+    """Day sums per (customer, trade_date) from raw ledger_lines rows."""
+    n = len(rows)
+    cust = np.fromiter((int(r["customer_id"]) for r in rows), dtype=np.int64, count=n)
+    days = np.array([r["trade_date"][:10] for r in rows], dtype="datetime64[D]").astype(np.int64)
+    key = cust * KEY_SPAN + days
+    vals = np.zeros((n, len(SUM_COLS)))
+    if n:
+        get = itemgetter(*SUM_COLS[:-1])
+        vals[:, :-1] = np.nan_to_num(np.array([get(r) for r in rows], dtype=np.float64))  # NULL → 0
+    kind = np.char.lower(np.array([str(r.get("kind") or "") for r in rows], dtype=str))
+    usdt = vals[:, 2]
+    vals[:, 7] = np.where(np.isin(kind, ("topup", "deposit")), usdt,
+                          np.where(np.isin(kind, ("withdrawal", "withdraw")), -np.abs(usdt), 0.0))
+    active = kind != "fee"
+
+    order = np.argsort(key, kind="stable")
+    key, vals, active = key[order], vals[order], active[order]
+    uniq, starts = np.unique(key, return_index=True)
+    if not n:
+        return Ledger(uniq, np.zeros((0, len(SUM_COLS))), np.zeros(0, dtype=bool))
+    return Ledger(uniq, np.add.reduceat(vals, starts, axis=0),
+                  np.logical_or.reduceat(active, starts))
+
+
+def asof(prices: Prices, days: np.ndarray, default: float) -> np.ndarray:
+    """Last price on or before each day (default before the first one)."""
+    if not len(prices.day):
+        return np.full(len(days), default)
+    pos = np.searchsorted(prices.day, days, side="right") - 1
+    return np.where(pos >= 0, prices.value[np.maximum(pos, 0)], default)
+
+
+def stored(values) -> tuple[float, ...]:
+    """A balance as balances_daily keeps it (what the EF reads back as prev / seed)."""
+    return tuple(v if dp is None else round(v, dp) for v, dp in zip(values, STORED_DP))
+
+
+def _add(base: np.ndarray, s: np.ndarray) -> np.ndarray:
+    """Balance(s) + window day sums, in the EF's operation order (rows or one row)."""
+    return np.stack([
+        base[..., 0] + s[..., 0] - s[..., 1],
+        base[..., 1] + s[..., 2] - s[..., 3],
+        base[..., 2] + s[..., 4] - s[..., 5],
+        base[..., 3] + s[..., 6],
+        np.maximum(0.0, base[..., 4] + s[..., 7]),
+    ], axis=-1)
+
+
+# ── Replay ────────────────────────────────────────────────────────────────────
+def replay(
+    ledger: Ledger,
+    anchors: dict[int, Anchor],
+    balances: dict[int, tuple[np.ndarray, np.ndarray]],
+    btc_prices: Prices,
+    usdpc_prices: Prices,
+    first_day: int,
+    last_day: int,
+    customers: set[int] | None = None,
+) -> Replay:
+    """
+    Every balances_daily row ef_post_ledger_and_balances would write for
+    activity in [first_day, last_day] (days since 1970-01-01).
+
+    balances : {customer: (sorted days, rows × BAL_COLS)} stored before the run
+    """
+    cust_of = ledger.key // KEY_SPAN
+    day_of = ledger.key % KEY_SPAN
+    is_cell = ledger.active & (day_of >= first_day) & (day_of <= last_day)
+    if customers is not None:
+        is_cell &= np.isin(cust_of, list(customers))
+    cells = np.flatnonzero(is_cell)
+    cell_cust, cell_day = cust_of[cells], day_of[cells]
+    out = np.zeros((len(cells), len(BAL_COLS)))
+    seeded: dict[int, Anchor] = {}
+    no_rows = (np.zeros(0, np.int64), np.zeros((0, len(BAL_COLS))))
+
+    bounds = np.flatnonzero(np.diff(cell_cust)) + 1
+    for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(cells)]):
+        if lo == hi:
+            continue
+        c = int(cell_cust[lo])
+        days = cell_day[lo:hi]
+        e_days, e_vals = balances.get(c, no_rows)
+
+        anchor = anchors.get(c)
+        if anchor is None and len(e_days):
+            i = max(int(np.searchsorted(e_days, days[0])) - 1, 0)
+            anchor = seeded[c] = Anchor(int(e_days[i]), tuple(e_vals[i].tolist()))
+
+        # Incremental prefix (cells before the anchor date): sequential, as
+        # each one reads back the previous stored row
+        written: dict[int, tuple[float, ...]] = {}
+        k = 0
+        for d in days.tolist():
+            if anchor is not None and d >= anchor.day:
+                break
+            prev_w = max((w for w in written if w < d), default=None)
+            j = int(np.searchsorted(e_days, d)) - 1
+            while j >= 0 and int(e_days[j]) in written:
+                j -= 1
+            if prev_w is not None and (j < 0 or prev_w > e_days[j]):
+                prev = np.array(written[prev_w])
+            elif j >= 0:
+                prev = e_vals[j]
+            else:
+                prev = np.zeros(len(BAL_COLS))
+            out[lo + k] = _add(prev, ledger.sums[cells[lo + k]])
+            written[d] = stored(out[lo + k])
+            if anchor is None:
+                # computeAnchoredBalance seeds from this freshly written row next time
+                anchor = seeded[c] = Anchor(d, written[d])
+            k += 1
+
+        # Anchored cells: anchor + Σ day sums over (anchor_date, day], one
+        # cumulative sum over the customer's ledger days after the anchor
+        if k < hi - lo:
+            a0, a1 = np.searchsorted(ledger.key, [c * KEY_SPAN + anchor.day + 1, (c + 1) * KEY_SPAN])
+            cum = np.vstack([np.zeros(len(SUM_COLS)), np.cumsum(ledger.sums[a0:a1], axis=0)])
+            window = cum[cells[lo + k:hi] - a0 + 1]   # a cell on the anchor date → 0
+            out[lo + k:hi] = _add(np.asarray(anchor.values), window)
+
+    px = asof(btc_prices, cell_day, 0.0)
+    upx = asof(usdpc_prices, cell_day, 1.0)
+    upx = np.where(upx == 0, 1.0, upx)
+    nav = out[:, 0] * px + out[:, 1] + out[:, 2] * upx
+    return Replay(cell_cust, cell_day, out, px, upx, nav, seeded)
+
+
+def balance_rows(r: Replay) -> list[dict]:
+    return [
+        {
+            "org_id":          ORG_ID,
+            "customer_id":     int(c),
+            "date":            from_day(d),
+            **dict(zip(BAL_COLS, vals)),
+            "usdpc_price_usd": upx,
+            "nav_usd":         nav,
+        }
+        for c, d, vals, upx, nav in zip(r.customer.tolist(), r.day.tolist(), r.balances.tolist(),
+                                        r.usdpc_price.tolist(), r.nav.tolist())
+    ]
+
+
+def compare(r: Replay, balances: dict[int, tuple[np.ndarray, np.ndarray]],
+            stored_nav: dict[tuple[int, int], float]) -> dict[str, tuple[int, float]]:
+    """{column: (cells differing beyond storage rounding, max abs diff)} vs stored rows."""
+    tol = [0.5e-8, 0.005, 0.5e-8, 1e-6, 1e-6]
+    report = {col: [0, 0.0] for col in (*BAL_COLS, "nav_usd")}
+    for i, (c, d) in enumerate(zip(r.customer.tolist(), r.day.tolist())):
+        e_days, e_vals = balances.get(c, (np.zeros(0, np.int64), None))
+        j = np.searchsorted(e_days, d)
+        if j >= len(e_days) or e_days[j] != d:
+            continue
+        for k, col in enumerate(BAL_COLS):
+            diff = abs(r.balances[i, k] - e_vals[j, k])
+            report[col][1] = max(report[col][1], diff)
+            report[col][0] += diff > tol[k] + 1e-9
+        diff = abs(r.nav[i] - stored_nav.get((c, d), r.nav[i]))
+        report["nav_usd"][1] = max(report["nav_usd"][1], diff)
+        report["nav_usd"][0] += diff > 0.005 + 1e-9
+    return {k: (n, m) for k, (n, m) in report.items()}
+
+
+# ── Supabase REST helpers ─────────────────────────────────────────────────────
+def _sb_headers(schema: str = SCHEMA) -> dict[str, str]:
+    return {
+        "apikey":          SB_KEY,
+        "Authorization":   f"Bearer {SB_KEY}",
+        "Content-Type":    "application/json",
+        "Accept-Profile":  schema,
+        "Content-Profile": schema,
+    }
+
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    """One keep-alive session per thread (upsert batches run concurrently)."""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def sb_select(table: str, params: dict, schema: str = SCHEMA) -> list[dict]:
+    """Every row of a paged PostgREST select (params must include a stable order)."""
+    out: list[dict] = []
+    offset = 0
+    while True:
+        resp = _session().get(
+            f"{SB_URL}/rest/v1/{table}",
+            headers=_sb_headers(schema),
+            params={**params, "limit": PAGE_SIZE, "offset": offset},
+            timeout=60,
+        )
+        if resp.status_code != 200:
+            raise RuntimeError(f"{table} read HTTP {resp.status_code}: {resp.text[:400]}")
+        page = resp.json()
+        out.extend(page)
+        if len(page) < PAGE_SIZE:
+            return out
+        offset += PAGE_SIZE
+
+
+def sb_upsert(table: str, rows: list[dict], on_conflict: str) -> None:
+    """Upsert rows into an lth_pvr table via Supabase PostgREST."""
+    headers = {**_sb_headers(), "Prefer": "resolution=merge-duplicates,return=minimal"}
+    resp = _session().post(
+        f"{SB_URL}/rest/v1/{table}", headers=headers,
+        params={"on_conflict": on_conflict},
+        data=json.dumps(rows, separators=(",", ":")),
+        timeout=60,
+    )
+    if resp.status_code not in (200, 201, 204):
+        raise RuntimeError(f"Upsert HTTP {resp.status_code}: {resp.text[:400]}")
+
+
+def sb_rpc(fn: str, args: dict) -> None:
+    resp = _session().post(f"{SB_URL}/rest/v1/rpc/{fn}", headers=_sb_headers(),
+                           data=json.dumps(args), timeout=120)
+    if resp.status_code not in (200, 201, 204):
+        raise RuntimeError(f"{fn} HTTP {resp.status_code}: {resp.text[:400]}")
+
+
+def _customer_filter(customers: set[int] | None) -> dict:
+    return {"customer_id": f"in.({','.join(map(str, sorted(customers)))})"} if customers else {}
+
+
+def load_inputs(customers: set[int] | None, bands_table: str):
+    """ledger, anchors, stored balances (+ nav), btc and USDPC prices in bulk."""
+    org = {"org_id": f"eq.{ORG_ID}", **_customer_filter(customers)}
+    ledger_rows = sb_select("ledger_lines", {
+        "select": "customer_id,trade_date,kind," + ",".join(SUM_COLS[:-1]),
+        "order": "ledger_id.asc", **org,
+    })
+    anchor_rows = sb_select("balance_anchors", {
+        "select": "customer_id,anchor_date," + ",".join(BAL_COLS),
+        "order": "customer_id.asc", **org,
+    })
+    balance_rows_ = sb_select("balances_daily", {
+        "select": "customer_id,date,nav_usd," + ",".join(BAL_COLS),
+        "order": "customer_id.asc,date.asc", **org,
+    })
+    band_rows = sb_select(bands_table, {"select": "date,btc_price", "order": "date.asc"})
+    usdpc_rows = sb_select("usdpc_prices_daily", {"select": "date,price_usd", "order": "date.asc"})
+
+    anchors = {
+        int(r["customer_id"]): Anchor(to_day(r["anchor_date"]),
+                                      tuple(float(r.get(c) or 0) for c in BAL_COLS))
+        for r in anchor_rows
+    }
+    balances: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+    stored_nav: dict[tuple[int, int], float] = {}
+    by_cust: dict[int, list[dict]] = {}
+    for r in balance_rows_:
+        by_cust.setdefault(int(r["customer_id"]), []).append(r)
+        stored_nav[(int(r["customer_id"]), to_day(r["date"]))] = float(r.get("nav_usd") or 0)
+    for c, rows in by_cust.items():
+        balances[c] = (np.array([to_day(r["date"]) for r in rows], dtype=np.int64),
+                       np.array([[float(r.get(col) or 0) for col in BAL_COLS] for r in rows]))
+
+    def prices(rows, col) -> Prices:
+        # last row per date wins, as .order(date desc).limit(1) picks any of them
+        last = {to_day(r["date"]): float(r[col]) for r in rows if r.get(col) is not None}
+        days = np.array(sorted(last), dtype=np.int64)
+        return Prices(days, np.array([last[d] for d in days.tolist()]))
+
+    return (ledger_from_rows(ledger_rows), len(ledger_rows), anchors, balances, stored_nav,
+            prices(band_rows, "btc_price"), prices(usdpc_rows, "price_usd"))
+
+
+# ── Main ──────────────────────────────────────────────────────────────────────
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--from", dest="from_dt", default=None,
+                        help="First activity date to rebuild (default: first ledger date)")
+    parser.add_argument("--to", dest="to_dt", default=date.today().isoformat(),
+                        help="Last activity date to rebuild (default: today)")
+    parser.add_argument("--customers", default=None,
+                        help="Comma-separated customer ids (default: all with activity)")
+    parser.add_argument("--band-source", choices=("rb", "ci"), default="rb",
+                        help="Band table for btc_price (default: rb)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Compute and compare with stored balances but do NOT write")
+    parser.add_argument("--no-benchmarks", action="store_true",
+                        help="Do not call recompute_hodl_balances / recompute_std_dca_balances")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help=f"Upsert batches sent in parallel (default: {CONCURRENCY})")
+    args = parser.parse_args()
+
+    for val, name in [(SB_URL, "SUPABASE_URL"), (SB_KEY, "SUPABASE_SERVICE_ROLE_KEY")]:
+        if not val:
+            sys.exit(f"Error: {name} environment variable is not set")
+
+    customers = {int(c) for c in args.customers.split(",")} if args.customers else None
+    bands_table = "rb_bands_daily" if args.band_source == "rb" else "ci_bands_daily"
+
+    print("=" * 65)
+    print("  Ledger replay → balances_daily")
+    print(f"  Customers     : {', '.join(map(str, sorted(customers))) if customers else 'all'}")
+    print(f"  Activity from : {args.from_dt or 'first ledger date'} → {args.to_dt}")
+    print(f"  Band table    : {bands_table}")
+    print(f"  Dry run       : {args.dry_run}")
+    print("=" * 65)
+
+    print("\nStep 1: Loading ledger, anchors, balances and prices")
+    t0 = time.perf_counter()
+    ledger, n_lines, anchors, balances, stored_nav, btc_px, usdpc_px = load_inputs(
+        customers, bands_table)
+    t1 = time.perf_counter()
+    print(f"  Ledger lines  : {n_lines:,} ({len(ledger.key):,} customer-days)")
+    print(f"  Anchors       : {len(anchors):,}   stored balance rows: "
+          f"{sum(len(d) for d, _ in balances.values()):,}")
+    print(f"  Loaded in     : {t1 - t0:.2f}s")
+
+    print("\nStep 2: Replaying")
+    first_day = to_day(args.from_dt) if args.from_dt else 0
+    result = replay(ledger, anchors, balances, btc_px, usdpc_px,
+                    first_day, to_day(args.to_dt), customers)
+    t2 = time.perf_counter()
+    print(f"  Cells         : {len(result.day):,} across "
+          f"{len(np.unique(result.customer)):,} customers in {t2 - t1:.3f}s")
+    if result.seeded:
+        print(f"  Seeded anchors: {', '.join(str(c) for c in sorted(result.seeded))}")
+    print("  vs stored rows (cells outside storage rounding / max abs diff):")
+    for col, (n, m) in compare(result, balances, stored_nav).items():
+        print(f"    {col:<16} {n:>6}   {m:.8g}")
+
+    if args.dry_run:
+        print("\nDry run — no data written to the database.")
+        return
+
+    rows = balance_rows(result)
+    print(f"\nStep 3: Upserting {len(rows):,} balances_daily rows")
+    batches = [rows[i : i + BATCH_SIZE] for i in range(0, len(rows), BATCH_SIZE)]
+    written = 0
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = {pool.submit(sb_upsert, "balances_daily", b, "org_id,customer_id,date"): len(b)
+                   for b in batches}
+        for fut in as_completed(futures):
+            fut.result()
+            written += futures[fut]
+            print(f"  {written:>7} / {len(rows)} rows written", end="\r", flush=True)
+    print(f"  {written:>7} / {len(rows)} rows written ✓")
+    if result.seeded:
+        sb_upsert("balance_anchors", [
+            {"org_id": ORG_ID, "customer_id": c, "anchor_date": from_day(a.day),
+             **dict(zip(BAL_COLS, a.values))}
+            for c, a in sorted(result.seeded.items())
+        ], "org_id,customer_id")
+        print(f"  {len(result.seeded)} balance_anchors seeded ✓")
+
+    if not args.no_benchmarks:
+        # Both are idempotent full-series rebuilds: once per customer is enough
+        touched = sorted(set(result.customer.tolist()))
+        print(f"\nStep 4: Recomputing HODL / Std DCA benchmarks for {len(touched)} customers")
+        for c in touched:
+            for fn in ("recompute_hodl_balances", "recompute_std_dca_balances"):
+                try:
+                    sb_rpc(fn, {"p_customer_id": c, "p_org_id": ORG_ID})
+                except RuntimeError as e:
+                    print(f"  customer {c}: {e}")
+    print(f"\nDone in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -383,16 +383,18 @@ def build_ledger(
 
     rows = []
 
-    for i, r in out.iterrows():
+    # Month boundaries for the whole frame at once (dates stay strings for output)
+    month_start = (pd.to_datetime(out["date"], format="%Y-%m-%d").dt.day == 1).to_numpy()
+
+    for k, (i, r) in enumerate(out.iterrows()):
         px = float(r[price_col]) if isfinite(r[price_col]) else 0.0
-        d = dt.datetime.strptime(r["date"], "%Y-%m-%d").date()
 
         # ---------------- Contributions ----------------
         contrib_gross = 0.0
         if i == 0:
             contrib_gross = float(start_contrib or 0.0)
         if monthly_only:
-            if d.day == 1:
+            if month_start[k]:
                 if i != 0:
                     contrib_gross += float(monthly_contrib or 0.0)
                 elif i == 0 and contrib_gross == 0.0:  # start_contrib=0 but month start
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+perf_fee_scenarios.py
+
+Batch replay of high-water-mark crystallisation (ef_calculate_performance_fees)
+across every LTH_PVR customer and month, for many fee-rate / schedule scenarios
+in one run — e.g. to size the impact of a fee-rate change before it ships.
+
+The edge function runs per customer on the 1st of each month and queries
+customer_state_daily, balances_daily and ledger_lines one customer at a time.
+This script loads customer_strategies, balances_daily and the topup /
+withdrawal / performance_fee ledger lines once and replays the state for all
+customers × scenarios together:
+
+  month-end     last balances_daily row on or before the month's last day
+  btc price     nav_usd / btc_balance at month end (50 000 if no BTC), as the EF
+  contributions Σ amount_usdt + Σ amount_btc · btc price over topup / withdrawal
+                lines, valued at each month's price; hwm_contrib_net_cum is their
+                running sum (per-customer cumulative sums, shared by all scenarios)
+  first month   initialise: high_water_mark_usd = max(0, NAV − contributions), no fee
+  later months  threshold = high_water_mark_usd + hwm_contrib_net_cum; on a
+                crystallisation month with NAV > threshold:
+                    fee = rate · (NAV − threshold)
+                    high_water_mark_usd = NAV − fee − hwm_contrib_net_cum
+  schedules     monthly every month; quarterly Mar / Jun / Sep / Dec; annual the
+                month before the effective_from anniversary (December if unset).
+                Contributions accrue monthly under every schedule.
+
+NAV is the stored month-end NAV with the performance fees actually charged
+since the first month added back, less the scenario's own earlier fees.
+With r > 0 the fee-adjusted HWM is not a running max, so the recursion steps
+month by month — each step vectorised over every (scenario, customer) cell.
+
+The "current" scenario is the baseline the others are compared against and
+reproduces what is charged today: each customer's own performance_fee_rate
+(a customer at 0 %, whom the EF skips, is charged nothing) and every
+non-annual schedule crystallised at each month end, since
+ef_calculate_performance_fees does not check quarter ends: a "quarterly"
+customer is charged monthly.  Annual customers (ef_collect_annual_fees)
+crystallise on their anniversary month.  True quarter-end crystallisation is
+only modelled by an explicit "quarterly" entry in --schedules.  Customers at
+0 % are loaded too, so --rates also sizes charging them.
+
+Usage (PowerShell):
+  $env:SUPABASE_URL            = "https://wqnmxpooabmedvtackji.supabase.co"
+  $env:SUPABASE_SERVICE_ROLE_KEY = "<key>"
+  python docs/perf_fee_scenarios.py --rates 0.05,0.10,0.15,0.20 --schedules monthly,quarterly
+
+Optional flags:
+  --rates 0.1,0.15         Fee rates to evaluate (default: current only)
+  --schedules monthly,...  Schedules to combine with every rate (default: monthly)
+  --from YYYY-MM           First month (default: each customer's first balance month)
+  --to   YYYY-MM           Last month (default: last complete month)
+  --customers 31,48        Only these customers
+  --all-strategies         Include inactive / not-live LTH_PVR strategies
+  --report FILE.json       Per-scenario and per-customer totals
+  --csv FILE.csv           One row per scenario × customer × month
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+from datetime import date
+from typing import NamedTuple
+
+import numpy as np
+
+from ledger_replay import KEY_SPAN, ORG_ID, SB_KEY, SB_URL, sb_select
+
+# ── Configuration ─────────────────────────────────────────────────────────────
+SCHEDULES = ("monthly", "quarterly", "annual")
+QUARTER_ENDS = (2, 5, 8, 11)       # month-of-year, 0 = January
+FALLBACK_BTC_PRICE = 50000.0       # the EF's price when a customer holds no BTC
+CONTRIB_KINDS = ("topup", "withdrawal")
+
+
+class Scenario(NamedTuple):
+    name: str
+    rate: float | None        # None → each customer's performance_fee_rate
+    schedule: str | None      # None → each customer's performance_fee_schedule
+
+
+class Book(NamedTuple):
+    customers: np.ndarray     # (C,) customer ids
+    months: np.ndarray        # (M,) months since 1970-01
+    nav: np.ndarray           # (C, M) month-end nav_usd, NaN before the first balance
+    btc_price: np.ndarray     # (C, M) nav / btc at month end
+    contrib_usdt: np.ndarray  # (C, M) Σ amount_usdt of the month's topups / withdrawals
+    contrib_btc: np.ndarray   # (C, M) Σ amount_btc of the same lines
+    actual_fee: np.ndarray    # (C, M) performance fees charged that month
+    rate: np.ndarray          # (C,) current performance_fee_rate
+    schedule: np.ndarray      # (C,) current schedule index into SCHEDULES
+    anniversary: np.ndarray   # (C,) month-of-year of effective_from (0 if unset → December)
+
+
+class FeeRun(NamedTuple):
+    scenarios: list[Scenario]
+    customers: np.ndarray
+    months: np.ndarray
+    first: np.ndarray         # (C,) index of the initialising month (M = never)
+    contrib_cum: np.ndarray   # (C, M) hwm_contrib_net_cum, NaN before first
+    nav: np.ndarray           # (S, C, M) pre-fee NAV under each scenario
+    hwm: np.ndarray           # (S, C, M) high_water_mark_usd after the month
+    fee: np.ndarray           # (S, C, M)
+
+
+def to_month(d: str) -> int:
+    return int(np.datetime64(d[:7], "M").astype(np.int64))
+
+
+def month_str(m: int) -> str:
+    return str(np.datetime64(int(m), "M"))
+
+
+def month_end_days(months: np.ndarray) -> np.ndarray:
+    """Days since 1970-01-01 of each month's last day."""
+    return (months + 1).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) - 1
+
+
+def schedule_index(s: str | None) -> int:
+    return SCHEDULES.index(s) if s in SCHEDULES else 0   # NULL → monthly, as fee_schedule_rank
+
+
+def charged_schedule(schedule: np.ndarray) -> np.ndarray:
+    """Schedule indices as charged today: the monthly EF runs every non-annual schedule monthly."""
+    return np.where(schedule == SCHEDULES.index("annual"), schedule, 0)
+
+
+# ── Bulk construction ─────────────────────────────────────────────────────────
+def book_from_rows(strategies: list[dict], balance_rows: list[dict], ledger_rows: list[dict],
+                   first_month: int | None, last_month: int) -> Book:
+    """Month-end NAV / price and monthly flows per (customer, month) from raw rows."""
+    customers = np.array(sorted({int(r["customer_id"]) for r in strategies}), dtype=np.int64)
+    by_id = {int(r["customer_id"]): r for r in strategies}
+    rate = np.array([float(by_id[c].get("performance_fee_rate") or 0) for c in customers.tolist()])
+    schedule = np.array([schedule_index(by_id[c].get("performance_fee_schedule"))
+                         for c in customers.tolist()], dtype=np.int64)
+    anniversary = np.array([to_month(ef) % 12 if (ef := by_id[c].get("effective_from")) else 0
+                            for c in customers.tolist()], dtype=np.int64)
+
+    def cust_index(rows) -> tuple[np.ndarray, np.ndarray]:
+        ids = np.fromiter((int(r["customer_id"]) for r in rows), dtype=np.int64, count=len(rows))
+        pos = np.searchsorted(customers, ids)
+        ok = (pos < len(customers)) & (customers[np.minimum(pos, len(customers) - 1)] == ids)
+        return np.minimum(pos, len(customers) - 1), ok
+
+    # Balances as one sorted key array: customer index * KEY_SPAN + day
+    ci, ok = cust_index(balance_rows)
+    b_day = np.array([r["date"][:10] for r in balance_rows],
+                     dtype="datetime64[D]").astype(np.int64)
+    b_nav = np.array([float(r.get("nav_usd") or 0) for r in balance_rows])
+    b_btc = np.array([float(r.get("btc_balance") or 0) for r in balance_rows])
+    key = ci[ok] * KEY_SPAN + b_day[ok]
+    order = np.argsort(key, kind="stable")
+    key, b_nav, b_btc = key[order], b_nav[ok][order], b_btc[ok][order]
+
+    if first_month is None:
+        first_month = int(b_day[ok].astype("datetime64[D]").astype("datetime64[M]")
+                          .astype(np.int64).min()) if len(key) else last_month
+    months = np.arange(first_month, last_month + 1, dtype=np.int64)
+    C, M = len(customers), len(months)
+
+    # As-of month end: last row of the same customer with day ≤ month end
+    q = (np.arange(C)[:, None] * KEY_SPAN + month_end_days(months)[None, :]).ravel()
+    nav = btc = np.full((C, M), np.nan)
+    if len(key):
+        pos = np.searchsorted(key, q, side="right") - 1
+        hit = (pos >= 0) & (key[np.maximum(pos, 0)] // KEY_SPAN == q // KEY_SPAN)
+        nav = np.where(hit, b_nav[np.maximum(pos, 0)], np.nan).reshape(C, M)
+        btc = np.where(hit, b_btc[np.maximum(pos, 0)], np.nan).reshape(C, M)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        btc_price = np.where(btc > 0, nav / btc, FALLBACK_BTC_PRICE)
+
+    # Monthly flows; lines before the first month fold into it (the EF values
+    # everything up to the initialising month at that month's price)
+    ci, ok = cust_index(ledger_rows)
+    mon = np.array([r["trade_date"][:7] for r in ledger_rows],
+                   dtype="datetime64[M]").astype(np.int64) - first_month
+    ok &= mon < M
+    mon = np.maximum(mon, 0)
+    kind = np.array([str(r.get("kind") or "") for r in ledger_rows], dtype=str)
+    usdt = np.nan_to_num(np.array([r.get("amount_usdt") for r in ledger_rows], dtype=np.float64))
+    btc_amt = np.nan_to_num(np.array([r.get("amount_btc") for r in ledger_rows], dtype=np.float64))
+    fee = np.array([r.get("performance_fee_usdt") for r in ledger_rows], dtype=np.float64)
+    fee = np.where(np.isnan(fee), -usdt, fee)
+
+    contrib_usdt, contrib_btc, actual_fee = (np.zeros((C, M)) for _ in range(3))
+    is_contrib = ok & np.isin(kind, CONTRIB_KINDS)
+    np.add.at(contrib_usdt, (ci[is_contrib], mon[is_contrib]), usdt[is_contrib])
+    np.add.at(contrib_btc, (ci[is_contrib], mon[is_contrib]), btc_amt[is_contrib])
+    is_fee = ok & (kind == "performance_fee")
+    np.add.at(actual_fee, (ci[is_fee], mon[is_fee]), fee[is_fee])
+
+    return Book(customers, months, nav, btc_price, contrib_usdt, contrib_btc, actual_fee,
+                rate, schedule, anniversary)
+
+
+def crystallises(schedule: np.ndarray, anniversary: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """(S, C, M) bool: does the month close a fee period for that schedule index."""
+    moy = (months % 12)[None, None, :]
+    sch = schedule[..., None]
+    return ((sch == 0)
+            | ((sch == 1) & np.isin(moy, QUARTER_ENDS))
+            | ((sch == 2) & (moy == ((anniversary - 1) % 12)[None, :, None])))
+
+
+# ── Replay ────────────────────────────────────────────────────────────────────
+def run_scenarios(book: Book, scenarios: list[Scenario]) -> FeeRun:
+    C, M, S = len(book.customers), len(book.months), len(scenarios)
+    started = ~np.isnan(book.nav)
+    first = np.where(started.any(axis=1), started.argmax(axis=1), M)
+    col = np.arange(M)
+    at_first = col[None, :] == first[:, None]
+    after_first = col[None, :] > first[:, None]
+
+    # hwm_contrib_net_cum: all flows up to the first month at its price, then
+    # each later month's flows at that month's price
+    px = np.nan_to_num(book.btc_price, nan=FALLBACK_BTC_PRICE)
+    flow = np.where(after_first, book.contrib_usdt + book.contrib_btc * px, 0.0)
+    rows = np.minimum(first, M - 1)[:, None]
+    init = (np.take_along_axis(np.cumsum(book.contrib_usdt, axis=1), rows, axis=1)
+            + np.take_along_axis(np.cumsum(book.contrib_btc, axis=1), rows, axis=1)
+            * np.take_along_axis(px, rows, axis=1))
+    contrib_cum = np.where(started, init + np.cumsum(flow, axis=1), np.nan)
+
+    # NAV before any performance fee charged after the first month
+    gross = book.nav + np.cumsum(np.where(after_first, book.actual_fee, 0.0), axis=1)
+
+    rate = np.array([np.full(C, s.rate) if s.rate is not None else book.rate
+                     for s in scenarios]).reshape(S, C)
+    schedule = np.array([np.full(C, schedule_index(s.schedule)) if s.schedule is not None
+                         else charged_schedule(book.schedule) for s in scenarios]).reshape(S, C)
+    due = crystallises(schedule, book.anniversary, book.months) & after_first[None]
+
+    nav, hwm, fee = (np.zeros((S, C, M)) for _ in range(3))
+    h = np.zeros((S, C))
+    paid = np.zeros((S, C))
+    for j in range(M):
+        nav_j = gross[:, j] - paid
+        cum_j = contrib_cum[:, j]
+        h = np.where(at_first[:, j], np.maximum(0.0, nav_j - cum_j), h)
+        f = np.where(due[:, :, j], rate * np.maximum(0.0, nav_j - (h + cum_j)), 0.0)
+        h = np.where(f > 0, nav_j - f - cum_j, h)
+        paid += f
+        nav[:, :, j], hwm[:, :, j], fee[:, :, j] = nav_j, h, f
+
+    nan = ~started[None]
+    nav[np.broadcast_to(nan, nav.shape)] = np.nan
+    hwm[np.broadcast_to(nan, hwm.shape)] = np.nan
+    return FeeRun(scenarios, book.customers, book.months, first, contrib_cum, nav, hwm, fee)
+
+
+def parse_scenarios(rates: str | None, schedules: str) -> list[Scenario]:
+    out = [Scenario("current", None, None)]
+    sched = [s.strip() for s in schedules.split(",") if s.strip()]
+    for s in sched:
+        if s not in SCHEDULES:
+            sys.exit(f"Error: unknown schedule {s!r} (expected one of {', '.join(SCHEDULES)})")
+    if rates:
+        for r, s in itertools.product([float(x) for x in rates.split(",")], sched):
+            out.append(Scenario(f"{r * 100:g}% {s}", r, s))
+    return out
+
+
+def summarise(run: FeeRun, book: Book) -> list[dict]:
+    actual = float(book.actual_fee.sum())
+    base = float(run.fee[0].sum())
+    return [
+        {
+            "scenario":         s.name,
+            "rate":             s.rate,
+            "schedule":         s.schedule,
+            "customers_charged": int((run.fee[i].sum(axis=1) > 0).sum()),
+            "fee_events":       int((run.fee[i] > 0).sum()),
+            "total_fees_usd":   round(float(run.fee[i].sum()), 2),
+            "vs_current_usd":   round(float(run.fee[i].sum()) - base, 2),
+            "actual_fees_usd":  round(actual, 2),
+        }
+        for i, s in enumerate(run.scenarios)
+    ]
+
+
+def write_csv(path: str, run: FeeRun) -> int:
+    n = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["scenario", "customer_id", "month", "nav_usd", "hwm_contrib_net_cum",
+                    "high_water_mark_usd", "performance_fee_usd"])
+        months = [month_str(m) for m in run.months.tolist()]
+        for i, s in enumerate(run.scenarios):
+            for c, cust in enumerate(run.customers.tolist()):
+                for j in range(int(run.first[c]), len(months)):
+                    w.writerow([s.name, cust, months[j], f"{run.nav[i, c, j]:.2f}",
+                                f"{run.contrib_cum[c, j]:.2f}", f"{run.hwm[i, c, j]:.2f}",
+                                f"{run.fee[i, c, j]:.2f}"])
+                    n += 1
+    return n
+
+
+# ── Loading ───────────────────────────────────────────────────────────────────
+def load_inputs(customers: set[int] | None, all_strategies: bool):
+    cust = {"customer_id": f"in.({','.join(map(str, sorted(customers)))})"} if customers else {}
+    live = {} if all_strategies else {"status": "eq.active", "live_enabled": "is.true"}
+    strategies = sb_select("customer_strategies", {
+        "select": "customer_id,performance_fee_rate,performance_fee_schedule,effective_from",
+        "org_id": f"eq.{ORG_ID}", "strategy_code": "eq.LTH_PVR",
+        "order": "customer_id.asc", **live, **cust,
+    }, schema="public")
+    ids = {int(r["customer_id"]) for r in strategies}
+    if not ids:
+        return strategies, [], []
+    cust = {"customer_id": f"in.({','.join(map(str, sorted(ids)))})"}
+    balances = sb_select("balances_daily", {
+        "select": "customer_id,date,btc_balance,nav_usd",
+        "org_id": f"eq.{ORG_ID}", "order": "customer_id.asc,date.asc", **cust,
+    })
+    ledger = sb_select("ledger_lines", {
+        "select": "customer_id,trade_date,kind,amount_usdt,amount_btc,performance_fee_usdt",
+        "org_id": f"eq.{ORG_ID}", "kind": f"in.({','.join((*CONTRIB_KINDS, 'performance_fee'))})",
+        "order": "ledger_id.asc", **cust,
+    })
+    return strategies, balances, ledger
+
+
+# ── Main ──────────────────────────────────────────────────────────────────────
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    today = np.datetime64(date.today(), "M").astype(np.int64)
+    parser.add_argument("--rates", default=None,
+                        help="Comma-separated fee rates, e.g. 0.05,0.10 (default: current only)")
+    parser.add_argument("--schedules", default="monthly",
+                        help="Comma-separated schedules combined with every rate (default: monthly)")
+    parser.add_argument("--from", dest="from_m", default=None,
+                        help="First month YYYY-MM (default: first balance month)")
+    parser.add_argument("--to", dest="to_m", default=month_str(today - 1),
+                        help="Last month YYYY-MM (default: last complete month)")
+    parser.add_argument("--customers", default=None,
+                        help="Comma-separated customer ids (default: all LTH_PVR customers)")
+    parser.add_argument("--all-strategies", action="store_true",
+                        help="Include inactive / not-live LTH_PVR strategies")
+    parser.add_argument("--report", default=None, help="Write per-scenario / per-customer JSON")
+    parser.add_argument("--csv", default=None, help="Write one row per scenario × customer × month")
+    args = parser.parse_args()
+
+    for val, name in [(SB_URL, "SUPABASE_URL"), (SB_KEY, "SUPABASE_SERVICE_ROLE_KEY")]:
+        if not val:
+            sys.exit(f"Error: {name} environment variable is not set")
+
+    customers = {int(c) for c in args.customers.split(",")} if args.customers else None
+    scenarios = parse_scenarios(args.rates, args.schedules)
+
+    print("=" * 65)
+    print("  Performance-fee / HWM scenario replay")
+    print(f"  Customers     : {', '.join(map(str, sorted(customers))) if customers else 'all'}")
+    print(f"  Months        : {args.from_m or 'first balance'} → {args.to_m}")
+    print(f"  Scenarios     : {len(scenarios)}")
+    print("=" * 65)
+
+    print("\nStep 1: Loading strategies, balances and contributions")
+    t0 = time.perf_counter()
+    strategies, balances, ledger = load_inputs(customers, args.all_strategies)
+    if not strategies:
+        sys.exit("No LTH_PVR customers match")
+    book = book_from_rows(strategies, balances, ledger,
+                          to_month(args.from_m) if args.from_m else None, to_month(args.to_m))
+    t1 = time.perf_counter()
+    print(f"  Customers     : {len(book.customers):,}   months: {len(book.months)}")
+    print(f"  Balance rows  : {len(balances):,}   ledger lines: {len(ledger):,}")
+    print(f"  Loaded in     : {t1 - t0:.2f}s")
+
+    print("\nStep 2: Replaying")
+    run = run_scenarios(book, scenarios)
+    t2 = time.perf_counter()
+    print(f"  {len(scenarios)} scenarios × {len(book.customers)} customers × "
+          f"{len(book.months)} months in {t2 - t1:.3f}s")
+
+    summary = summarise(run, book)
+    print(f"\n  {'scenario':<20} {'charged':>8} {'events':>7} {'total USD':>14} {'vs current':>13}")
+    for s in summary:
+        print(f"  {s['scenario']:<20} {s['customers_charged']:>8} {s['fee_events']:>7} "
+              f"{s['total_fees_usd']:>14,.2f} {s['vs_current_usd']:>+13,.2f}")
+    print(f"  {'(charged in ledger)':<20} {'':>8} {'':>7} {summary[0]['actual_fees_usd']:>14,.2f}")
+
+    if args.report:
+        per_customer = {
+            str(c): {s.name: round(float(run.fee[i, k].sum()), 2) for i, s in enumerate(scenarios)}
+            for k, c in enumerate(run.customers.tolist()) if run.first[k] < len(run.months)
+        }
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"months": [month_str(run.months[0]), month_str(run.months[-1])],
+                       "scenarios": summary, "customers": per_customer}, f, indent=2)
+        print(f"\n  Report        : {args.report}")
+    if args.csv:
+        print(f"  CSV           : {args.csv} ({write_csv(args.csv, run):,} rows)")
+    print(f"\nDone in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
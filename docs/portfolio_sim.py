@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+portfolio_sim.py
+
+Multi-customer LTH PVR portfolio simulator: thousands of customers with their
+own start dates, contribution amounts, top-ups / withdrawals and fee plans,
+run together over one shared decision tape — e.g. to forecast AUM and fee
+income for the whole book rather than one investor.
+
+runSimulation (_shared/lth_pvr_simulator.ts) models a single investor with
+one upfront and one monthly contribution.  The strategy's daily decision
+(action + amount_pct) depends only on price and bands, never on a balance,
+so every customer follows the same tape and the state is a (customers,)
+vector per balance, stepped day by day:
+
+  tape          close_date, price_usd, action, amount_pct per day — the
+                bt_results_daily rows of any ef_bt_execute run, or a CSV
+  contributions upfront + monthly on the customer's first tape day, monthly
+                on the first tape day of each later month (until end_date);
+                extra flows (customer_id, date, amount_usd) on their day
+  contribution  gross − 18 bps exchange fee − platform fee (platform plan
+                only: rate × the amount after the exchange fee) → USDT
+  withdrawal    taken from USDT, BTC sold (net of the trade fee) for any
+                shortfall, capped at NAV; reduces the net contributions the
+                high-water mark is measured against, so gains withdrawn before
+                a crystallisation are still charged (up to the NAV left)
+  BUY / SELL    amount_pct of USDT / BTC, 8 bps trade fee in BTC, as the TS
+  month start   for each customer past their first month, in TS order:
+                  performance fee on NAV − contributions since the HWM above
+                  the HWM (fee-adjusted HWM, contributions reset), then the
+                  management fee NAV × rate / 12 (management plan only);
+                  a USDT shortfall either fee causes is covered by selling BTC
+  first day     HWM = NAV after the day's contribution and trade
+
+With every schedule "monthly" this reproduces runSimulation (without USDPC)
+per customer.  Non-monthly schedules follow the fee_plan columns:
+performance fees crystallise only at quarter / year end, and management fees
+accrue monthly and are deducted at quarter / year end.  A fee never takes
+more than the customer could raise (USDT + BTC net of the trade fee); any
+management fee left over stays accrued.
+
+Results are per-customer month-end series and totals plus aggregate daily
+series; keep_daily=True also keeps every customer's daily NAV (C × D).
+
+Usage (PowerShell):
+  $env:SUPABASE_URL            = "https://wqnmxpooabmedvtackji.supabase.co"
+  $env:SUPABASE_SERVICE_ROLE_KEY = "<key>"
+  python docs/portfolio_sim.py --bt-run <bt_run_id> --book book.csv --report aum.json
+
+book.csv columns (only customer_id and start_date are required):
+  customer_id, start_date, end_date, upfront_usd, monthly_usd, fee_plan,
+  platform_fee_rate, management_fee_rate, performance_fee_rate,
+  management_fee_schedule, performance_fee_schedule
+
+Optional flags:
+  --bt-run UUID        Decision tape from lth_pvr_bt.bt_results_daily
+  --tape FILE.csv      Decision tape from a CSV (close_date, price_usd, action, amount_pct)
+  --flows FILE.csv     Extra top-ups (+) / withdrawals (−): customer_id, date, amount_usd
+  --from / --to        Restrict the tape to [from, to] (YYYY-MM-DD)
+  --report FILE.json   Totals and per-customer results
+  --csv FILE.csv       Aggregate daily series
+  --monthly-csv FILE   One row per customer × month end
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from day_calendar import day_numbers, day_range, iso_dates
+from ingest import read_csv_columns
+from ledger_replay import SB_KEY, SB_URL, sb_select
+
+# ── Configuration ─────────────────────────────────────────────────────────────
+BT_SCHEMA = "lth_pvr_bt"
+
+# runSimulation defaults
+CONTRIB_FEE_RATE     = 0.0018    # VALR USDT/ZAR conversion (18 bps)
+TRADE_FEE_RATE       = 0.0008    # VALR BTC/USDT, charged in BTC (8 bps)
+PLATFORM_FEE_RATE    = 0.0075    # on contributions, platform plan
+MANAGEMENT_FEE_RATE  = 0.01      # p.a. on NAV, management plan
+PERFORMANCE_FEE_RATE = 0.10      # on NAV above the high-water mark
+
+FEE_PLANS = ("platform", "management")
+SCHEDULES = ("monthly", "quarterly", "annual")
+ACTIONS   = {"BUY": 1, "SELL": -1}
+NEVER     = np.iinfo(np.int32).max
+
+
+class Tape(NamedTuple):
+    days: np.ndarray          # (D,) int32 day numbers, ascending
+    price: np.ndarray         # (D,) BTC price in USD
+    action: np.ndarray        # (D,) +1 BUY, −1 SELL, 0 otherwise
+    pct: np.ndarray           # (D,) amount_pct
+
+
+class Book(NamedTuple):
+    customers: np.ndarray     # (C,) customer ids
+    start: np.ndarray         # (C,) first day (int32 day numbers)
+    end: np.ndarray           # (C,) last day with a monthly contribution (NEVER if open)
+    upfront: np.ndarray       # (C,) USD on the first day
+    monthly: np.ndarray       # (C,) USD per month
+    management: np.ndarray    # (C,) bool: management plan (else platform)
+    platform_rate: np.ndarray
+    management_rate: np.ndarray
+    performance_rate: np.ndarray
+    management_schedule: np.ndarray   # (C,) index into SCHEDULES
+    performance_schedule: np.ndarray
+    flow_customer: np.ndarray  # (F,) index into customers
+    flow_day: np.ndarray       # (F,) day numbers
+    flow_amount: np.ndarray    # (F,) USD, + top-up / − withdrawal
+
+
+class SimRun(NamedTuple):
+    customers: np.ndarray
+    days: np.ndarray          # (D,) tape days
+    month_ends: np.ndarray    # (M,) index of each month's last tape day
+    nav_monthly: np.ndarray   # (C, M) NAV at each month end (NaN before the start)
+    totals: dict              # name → (C,) per-customer totals / final values
+    daily: dict               # name → (D,) aggregate over all customers
+    nav_daily: np.ndarray | None   # (C, D) when keep_daily
+
+
+# ── Construction ──────────────────────────────────────────────────────────────
+def _schedule_index(values) -> np.ndarray:
+    return np.array([SCHEDULES.index(s) if s in SCHEDULES else 0 for s in values], dtype=np.int8)
+
+
+def make_book(customers, start, upfront=0.0, monthly=0.0, fee_plan="platform", *,
+              end=None, platform_rate=PLATFORM_FEE_RATE, management_rate=MANAGEMENT_FEE_RATE,
+              performance_rate=PERFORMANCE_FEE_RATE, management_schedule="monthly",
+              performance_schedule="monthly", flows=()) -> Book:
+    """
+    Book from per-customer values (scalars broadcast).  start / end are day
+    numbers or YYYY-MM-DD strings; flows is an iterable of (customer_id,
+    date, amount_usd).
+    """
+    customers = np.asarray(customers, dtype=np.int64)
+    C = len(customers)
+
+    def col(v, dtype=np.float64):
+        return np.broadcast_to(np.asarray(v, dtype=dtype), (C,)).copy()
+
+    def days(v):
+        a = np.asarray(v)
+        return col(a if a.dtype.kind in "iu" else day_numbers(np.broadcast_to(a, (C,))), np.int32)
+
+    plans = np.broadcast_to(np.asarray(fee_plan, dtype=str), (C,))
+    if bad := set(plans.tolist()) - set(FEE_PLANS):
+        raise ValueError(f"unknown fee_plan {sorted(bad)}")
+    flows = list(flows)
+    index = {c: k for k, c in enumerate(customers.tolist())}
+    unknown = {int(f[0]) for f in flows} - index.keys()
+    if unknown:
+        raise ValueError(f"flows for unknown customer(s) {sorted(unknown)[:5]}")
+    return Book(
+        customers, days(start), days(NEVER if end is None else end),
+        col(upfront), col(monthly), plans == "management",
+        col(platform_rate), col(management_rate), col(performance_rate),
+        _schedule_index(np.broadcast_to(np.asarray(management_schedule, dtype=str), (C,))),
+        _schedule_index(np.broadcast_to(np.asarray(performance_schedule, dtype=str), (C,))),
+        np.array([index[int(f[0])] for f in flows], dtype=np.int64),
+        day_numbers([f[1] for f in flows]) if flows and isinstance(flows[0][1], str)
+        else np.array([f[1] for f in flows], dtype=np.int32),
+        np.array([float(f[2]) for f in flows]),
+    )
+
+
+def make_tape(days, price, action, pct) -> Tape:
+    """Tape from parallel columns; action may be "BUY" / "SELL" / ... strings or ±1."""
+    days = np.asarray(days)
+    days = days.astype(np.int32) if days.dtype.kind in "iu" else day_numbers(days)
+    action = np.asarray(action)
+    if action.dtype.kind in "US":
+        action = np.array([ACTIONS.get(a.upper(), 0) for a in action.tolist()], dtype=np.int8)
+    order = np.argsort(days, kind="stable")
+    if len(days) > 1 and (np.diff(days[order]) == 0).any():
+        raise ValueError("tape has duplicate days")
+    return Tape(days[order], np.nan_to_num(np.asarray(price, dtype=np.float64))[order],
+                action.astype(np.int8)[order],
+                np.nan_to_num(np.asarray(pct, dtype=np.float64))[order])
+
+
+# ── Simulation ────────────────────────────────────────────────────────────────
+def _cover_shortfall(usdt, btc, px, trade_fee, mask) -> np.ndarray:
+    """Sell BTC (net of the trade fee) where USDT went negative; returns the BTC fee."""
+    need = mask & (usdt < 0) & (btc > 0)
+    if px <= 0 or not need.any():
+        return np.zeros_like(usdt)
+    sold = np.where(need, np.minimum(btc, -usdt / (px * (1 - trade_fee))), 0.0)
+    fee = sold * trade_fee
+    btc -= sold
+    usdt += (sold - fee) * px
+    return fee
+
+
+def _liquid(usdt, btc, px, trade_fee) -> np.ndarray:
+    """USDT a customer could raise: the most a fee can take."""
+    return np.maximum(usdt + np.maximum(btc, 0.0) * px * (1 - trade_fee), 0.0)
+
+
+def simulate(tape: Tape, book: Book, contrib_fee: float = CONTRIB_FEE_RATE,
+             trade_fee: float = TRADE_FEE_RATE, keep_daily: bool = False) -> SimRun:
+    D, C = len(tape.days), len(book.customers)
+    months = tape.days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    new_month = np.ones(D, dtype=bool)
+    new_month[1:] = months[1:] != months[:-1]
+    moy = months % 12      # month of the day; a boundary closes the month before it
+    perf_due = np.stack([np.ones(D, bool), np.isin(moy, (0, 3, 6, 9)), moy == 0])
+    month_ends = np.flatnonzero(np.append(new_month[1:], True))
+
+    first = np.searchsorted(tape.days, book.start).astype(np.int64)        # D = never
+    last_monthly = np.searchsorted(tape.days, book.end, side="right") - 1
+    mgmt_rate = np.where(book.management, book.management_rate, 0.0)
+    plat_rate = np.where(book.management, 0.0, book.platform_rate)
+
+    # Flows grouped by tape day (flows between tape days land on the next one)
+    f_idx = np.searchsorted(tape.days, book.flow_day)
+    keep = f_idx < D
+    f_order = np.argsort(f_idx[keep], kind="stable")
+    f_idx, f_cust, f_amt = (f_idx[keep][f_order], book.flow_customer[keep][f_order],
+                            book.flow_amount[keep][f_order])
+    f_bounds = np.searchsorted(f_idx, np.arange(D + 1))
+    starts_on = np.split(np.argsort(first, kind="stable"),
+                         np.searchsorted(np.sort(first), np.arange(1, D + 1)))[:D]
+
+    usdt, btc, hwm, hwm_contrib, accrued = (np.zeros(C) for _ in range(5))
+    t = {name: np.zeros(C) for name in (
+        "contrib_gross", "contrib_net", "withdrawn", "platform_fees", "management_fees",
+        "performance_fees", "exchange_fees_usdt", "exchange_fees_btc")}
+    active = np.zeros(C, dtype=bool)
+    daily = {name: np.zeros(D) for name in (
+        "nav_usd", "btc_balance", "usdt_balance", "contrib_gross_usdt", "withdrawn_usdt",
+        "platform_fees_usdt", "management_fees_usdt", "performance_fees_usdt",
+        "exchange_fees_usdt", "exchange_fees_btc", "customers")}
+    nav_monthly = np.full((C, len(month_ends)), np.nan)
+    nav_daily = np.full((C, D), np.nan) if keep_daily else None
+    month_col = np.cumsum(np.append(0, new_month[1:]))
+
+    for d in range(D):
+        px = tape.price[d]
+        joining = starts_on[d]
+        active[joining] = True
+        fee_btc_today = np.zeros(C)
+        plat_before = t["platform_fees"].sum()
+        mgmt_before, perf_before = t["management_fees"].sum(), t["performance_fees"].sum()
+        exch_usdt_before, withdrawn_before = t["exchange_fees_usdt"].sum(), t["withdrawn"].sum()
+
+        # Contributions: upfront + monthly on the first day, monthly at month starts
+        gross = np.zeros(C)
+        gross[joining] = book.upfront[joining] + book.monthly[joining]
+        if new_month[d] and d:
+            due = active & (first < d) & (last_monthly >= d)
+            gross[due] += book.monthly[due]
+        lo, hi = f_bounds[d], f_bounds[d + 1]
+        outflow = np.zeros(C)
+        if hi > lo:
+            amt = f_amt[lo:hi]
+            np.add.at(gross, f_cust[lo:hi][amt > 0], amt[amt > 0])
+            np.add.at(outflow, f_cust[lo:hi][amt < 0], -amt[amt < 0])
+        gross *= active
+        if gross.any():
+            exch = gross * contrib_fee
+            plat = (gross - exch) * plat_rate
+            net = gross - exch - plat
+            usdt += net
+            t["contrib_gross"] += gross
+            t["contrib_net"] += net
+            t["platform_fees"] += plat
+            t["exchange_fees_usdt"] += exch
+        if outflow.any():
+            outflow = np.minimum(outflow * active, _liquid(usdt, btc, px, trade_fee))
+            usdt -= outflow
+            fee_btc_today += _cover_shortfall(usdt, btc, px, trade_fee, outflow > 0)
+            usdt = np.where(np.abs(usdt) < 1e-9, 0.0, usdt)
+            t["contrib_net"] -= outflow
+            t["withdrawn"] += outflow
+
+        # Shared decision
+        pct = tape.pct[d]
+        if tape.action[d] == 1 and pct > 0 and px > 0:
+            spend = np.maximum(usdt * pct, 0.0)
+            bought = spend / px
+            usdt -= spend
+            btc += bought - bought * trade_fee
+            fee_btc_today += bought * trade_fee
+        elif tape.action[d] == -1 and pct > 0 and px > 0:
+            sold = np.maximum(btc * pct, 0.0)     # a 100% sell leaves −fee BTC
+            btc -= sold + sold * trade_fee
+            usdt += sold * px
+            fee_btc_today += sold * trade_fee
+
+        # Month start: performance fee, then management fee
+        if new_month[d] and d:
+            past = active & (first < d)
+            since = t["contrib_net"] - hwm_contrib
+            nav_perf = usdt + btc * px - since
+            due = past & perf_due[book.performance_schedule, d]
+            above = due & (nav_perf > hwm)
+            charge = above & (book.performance_rate > 0)
+            fee = np.where(charge, np.minimum((nav_perf - hwm) * book.performance_rate,
+                                              _liquid(usdt, btc, px, trade_fee)), 0.0)
+            usdt -= fee
+            t["performance_fees"] += fee
+            fee_btc_today += _cover_shortfall(usdt, btc, px, trade_fee, charge)
+            hwm = np.where(charge, usdt + btc * px - since, np.where(above, nav_perf, hwm))
+            hwm_contrib = np.where(above, t["contrib_net"], hwm_contrib)
+
+            accrued += np.where(past, np.maximum(0.0, (usdt + btc * px) * mgmt_rate / 12), 0.0)
+            take = past & perf_due[book.management_schedule, d] & (accrued > 0)
+            if take.any():
+                fee = np.where(take, np.minimum(accrued, _liquid(usdt, btc, px, trade_fee)), 0.0)
+                usdt -= fee
+                accrued -= fee
+                t["management_fees"] += fee
+                fee_btc_today += _cover_shortfall(usdt, btc, px, trade_fee, take)
+
+        # First day: HWM = NAV after the contribution and trade
+        hwm[joining] = usdt[joining] + btc[joining] * px
+        hwm_contrib[joining] = t["contrib_net"][joining]
+
+        t["exchange_fees_btc"] += fee_btc_today
+        nav = usdt + btc * px
+        daily["nav_usd"][d] = nav.sum()
+        daily["btc_balance"][d] = btc.sum()
+        daily["usdt_balance"][d] = usdt.sum()
+        daily["contrib_gross_usdt"][d] = gross.sum()
+        daily["withdrawn_usdt"][d] = t["withdrawn"].sum() - withdrawn_before
+        daily["platform_fees_usdt"][d] = t["platform_fees"].sum() - plat_before
+        daily["management_fees_usdt"][d] = t["management_fees"].sum() - mgmt_before
+        daily["performance_fees_usdt"][d] = t["performance_fees"].sum() - perf_before
+        daily["exchange_fees_usdt"][d] = t["exchange_fees_usdt"].sum() - exch_usdt_before
+        daily["exchange_fees_btc"][d] = fee_btc_today.sum()
+        daily["customers"][d] = active.sum()
+        if keep_daily:
+            nav_daily[active, d] = nav[active]
+        if d == month_ends[month_col[d]]:
+            nav_monthly[active, month_col[d]] = nav[active]
+
+    t.update(btc_balance=btc, usdt_balance=usdt, nav_usd=usdt + btc * tape.price[-1] if D else usdt,
+             high_water_mark_usd=hwm, management_fee_accrued=accrued)
+    return SimRun(book.customers, tape.days, month_ends, nav_monthly, t, daily, nav_daily)
+
+
+# ── Loading ───────────────────────────────────────────────────────────────────
+def load_tape_bt_run(bt_run_id: str) -> Tape:
+    rows = sb_select("bt_results_daily", {
+        "select": "close_date,price_usd,action,amount_pct",
+        "bt_run_id": f"eq.{bt_run_id}", "order": "close_date.asc",
+    }, schema=BT_SCHEMA)
+    return make_tape([r["close_date"] for r in rows], [r["price_usd"] for r in rows],
+                     [str(r.get("action") or "") for r in rows],
+                     [r.get("amount_pct") for r in rows])
+
+
+def load_tape_csv(path: str) -> Tape:
+    cols = read_csv_columns(path, {"close_date": "day", "price_usd": "float",
+                                   "action": "text", "amount_pct": "float"})
+    return make_tape(cols["close_date"], cols["price_usd"], cols["action"], cols["amount_pct"])
+
+
+def load_book_csv(path: str, flows_path: str | None = None) -> Book:
+    optional = {"end_date": "text", "upfront_usd": "float", "monthly_usd": "float",
+                "fee_plan": "text", "platform_fee_rate": "float", "management_fee_rate": "float",
+                "performance_fee_rate": "float", "management_fee_schedule": "text",
+                "performance_fee_schedule": "text"}
+    cols = read_csv_columns(path, {"customer_id": "float", "start_date": "day", **optional},
+                            optional=tuple(optional))
+
+    def rate(name, default):
+        return np.where(np.isnan(cols[name]), default, cols[name])
+
+    end = np.full(len(cols["customer_id"]), NEVER, dtype=np.int32)
+    given = cols["end_date"] != ""
+    end[given] = day_numbers(cols["end_date"][given])
+    flows = ()
+    if flows_path:
+        f = read_csv_columns(flows_path, {"customer_id": "float", "date": "day", "amount_usd": "float"})
+        flows = zip(f["customer_id"].astype(np.int64).tolist(), f["date"].tolist(),
+                    np.nan_to_num(f["amount_usd"]).tolist())
+    return make_book(
+        cols["customer_id"].astype(np.int64), cols["start_date"],
+        np.nan_to_num(cols["upfront_usd"]), np.nan_to_num(cols["monthly_usd"]),
+        np.where(np.char.lower(cols["fee_plan"]) == "management", "management", "platform"),
+        end=end,
+        platform_rate=rate("platform_fee_rate", PLATFORM_FEE_RATE),
+        management_rate=rate("management_fee_rate", MANAGEMENT_FEE_RATE),
+        performance_rate=rate("performance_fee_rate", PERFORMANCE_FEE_RATE),
+        management_schedule=np.char.lower(cols["management_fee_schedule"]),
+        performance_schedule=np.char.lower(cols["performance_fee_schedule"]),
+        flows=flows,
+    )
+
+
+# ── Output ────────────────────────────────────────────────────────────────────
+FEE_TOTALS = ("platform_fees", "management_fees", "performance_fees", "exchange_fees_usdt")
+
+
+def _usd(name: str) -> str:
+    return name.removesuffix("_usdt") + "_usd"
+
+
+def summarise(run: SimRun, book: Book) -> dict:
+    t = run.totals
+    by_plan = {
+        plan: {
+            "customers":  int(mask.sum()),
+            "nav_usd":    round(float(t["nav_usd"][mask].sum()), 2),
+            **{_usd(k): round(float(t[k][mask].sum()), 2) for k in FEE_TOTALS},
+        }
+        for plan, mask in (("platform", ~book.management), ("management", book.management))
+    }
+    return {
+        "days":             iso_dates(run.days[[0, -1]]) if len(run.days) else [],
+        "customers":        int(len(run.customers)),
+        "final_nav_usd":    round(float(t["nav_usd"].sum()), 2),
+        "contrib_gross_usd": round(float(t["contrib_gross"].sum()), 2),
+        "withdrawn_usd":    round(float(t["withdrawn"].sum()), 2),
+        **{_usd(k): round(float(t[k].sum()), 2) for k in FEE_TOTALS},
+        "exchange_fees_btc": round(float(t["exchange_fees_btc"].sum()), 8),
+        "by_fee_plan":      by_plan,
+    }
+
+
+def write_daily_csv(path: str, run: SimRun) -> int:
+    names = list(run.daily)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["date", *names])
+        for i, day in enumerate(iso_dates(run.days)):
+            w.writerow([day, *(f"{run.daily[n][i]:.8g}" for n in names)])
+    return len(run.days)
+
+
+def write_monthly_csv(path: str, run: SimRun) -> int:
+    n = 0
+    months = [d[:7] for d in iso_dates(run.days[run.month_ends])]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["customer_id", "month", "nav_usd"])
+        for k, cust in enumerate(run.customers.tolist()):
+            for j in np.flatnonzero(~np.isnan(run.nav_monthly[k])).tolist():
+                w.writerow([cust, months[j], f"{run.nav_monthly[k, j]:.2f}"])
+                n += 1
+    return n
+
+
+# ── Main ──────────────────────────────────────────────────────────────────────
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--bt-run", default=None, help="bt_run_id whose bt_results_daily is the tape")
+    src.add_argument("--tape", default=None, help="Tape CSV: close_date,price_usd,action,amount_pct")
+    parser.add_argument("--book", required=True, help="Customer book CSV (see above)")
+    parser.add_argument("--flows", default=None, help="Top-ups / withdrawals CSV")
+    parser.add_argument("--from", dest="from_dt", default=None, help="First tape day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="to_dt", default=None, help="Last tape day (YYYY-MM-DD)")
+    parser.add_argument("--report", default=None, help="Write totals + per-customer JSON")
+    parser.add_argument("--csv", default=None, help="Write the aggregate daily series")
+    parser.add_argument("--monthly-csv", default=None, help="Write customer × month-end NAV")
+    args = parser.parse_args()
+
+    if args.bt_run:
+        for val, name in [(SB_URL, "SUPABASE_URL"), (SB_KEY, "SUPABASE_SERVICE_ROLE_KEY")]:
+            if not val:
+                sys.exit(f"Error: {name} environment variable is not set")
+
+    t0 = time.perf_counter()
+    tape = load_tape_bt_run(args.bt_run) if args.bt_run else load_tape_csv(args.tape)
+    window = day_range(tape.days, args.from_dt, args.to_dt)
+    tape = Tape(*(col[window] for col in tape))
+    if not len(tape.days):
+        sys.exit("Error: the decision tape is empty for this range")
+    book = load_book_csv(args.book, args.flows)
+    t1 = time.perf_counter()
+
+    print("=" * 65)
+    print("  Multi-customer portfolio simulation")
+    print(f"  Tape          : {args.bt_run or args.tape}")
+    print(f"  Days          : {iso_dates(tape.days[[0, -1]])[0]} → {iso_dates(tape.days[[-1]])[0]}"
+          f"  ({len(tape.days):,})")
+    print(f"  Customers     : {len(book.customers):,}  ({int(book.management.sum()):,} management plan)")
+    print(f"  Flows         : {len(book.flow_amount):,}")
+    print(f"  Loaded in     : {t1 - t0:.2f}s")
+    print("=" * 65)
+
+    run = simulate(tape, book)
+    t2 = time.perf_counter()
+    s = summarise(run, book)
+    print(f"\n  Simulated {len(book.customers):,} customers × {len(tape.days):,} days in {t2 - t1:.2f}s")
+    print(f"  Final NAV         : ${s['final_nav_usd']:>16,.2f}")
+    print(f"  Contributions     : ${s['contrib_gross_usd']:>16,.2f}")
+    print(f"  Withdrawals       : ${s['withdrawn_usd']:>16,.2f}")
+    for k in FEE_TOTALS:
+        label = _usd(k).removesuffix("_usd").replace("_", " ").capitalize()
+        print(f"  {label:<18}: ${s[_usd(k)]:>16,.2f}")
+
+    if args.report:
+        t = run.totals
+        per_customer = {
+            str(c): {k: round(float(t[k][i]), 2) for k in
+                     ("nav_usd", "contrib_gross", "withdrawn", *FEE_TOTALS, "high_water_mark_usd")}
+            for i, c in enumerate(run.customers.tolist())
+        }
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({**s, "per_customer": per_customer}, f, indent=1)
+        print(f"\n  Report        : {args.report}")
+    if args.csv:
+        print(f"  Daily CSV     : {args.csv} ({write_daily_csv(args.csv, run):,} rows)")
+    if args.monthly_csv:
+        print(f"  Monthly CSV   : {args.monthly_csv} ({write_monthly_csv(args.monthly_csv, run):,} rows)")
+    print(f"\nDone in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+pvr_bands.py
+
+Shared, vectorised LTH PVR band back-solve used by rb_pvr_validation.py and
+rb_bands_backfill.py.
+
+For every row i and band multiplier m_j:
+
+    pvr_target[i, j] = pvr_mean[i] + m_j * pvr_std[i]
+    price[i, j]      = (pvr_target[i, j] * cum_std[i] + lth_rc[i]) / lth_supply[i]
+
+computed as one (n × k) broadcast instead of a Python loop per row and band.
+Rows where supply or cum_std is not positive get 0.0, matching the scripts'
+previous behaviour.  The band set is just a mapping, so any ladder works:
+
+    sigma_ladder(-1.0, 3.0, 0.25)   # m100 … mean … p300 in quarter-sigma steps
+"""
+
+import numpy as np
+
+
+def band_key(mult: float) -> str:
+    """Column suffix for a sigma multiplier: -0.75 → m075, 0 → mean, 2.5 → p250."""
+    if mult == 0:
+        return "mean"
+    return f"{'p' if mult > 0 else 'm'}{int(round(abs(mult) * 100)):03d}"
+
+
+def sigma_ladder(lo: float, hi: float, step: float) -> dict[str, float]:
+    """Evenly spaced multipliers from lo to hi inclusive, keyed like BAND_MULTIPLIERS."""
+    mults = np.round(np.arange(lo, hi + step / 2, step), 6)
+    return {band_key(float(m)): float(m) for m in mults}
+
+
+def band_price_matrix(
+    cum_std,
+    lth_realized_cap,
+    lth_supply,
+    pvr_mean,
+    pvr_std,
+    multipliers,
+) -> np.ndarray:
+    """
+    Back-solve band prices for n rows × k multipliers.
+
+    cum_std, lth_realized_cap, lth_supply : length-n arrays
+    pvr_mean, pvr_std                     : scalars (static mode) or length-n arrays
+    multipliers                           : length-k sequence, or a {key: mult} dict
+
+    Returns an (n, k) float64 array, columns in multiplier order.
+    """
+    if isinstance(multipliers, dict):
+        multipliers = list(multipliers.values())
+    cum_std = np.asarray(cum_std, dtype=np.float64)
+    rc = np.asarray(lth_realized_cap, dtype=np.float64)
+    supply = np.asarray(lth_supply, dtype=np.float64)
+    mean = np.broadcast_to(np.asarray(pvr_mean, dtype=np.float64), cum_std.shape)
+    std = np.broadcast_to(np.asarray(pvr_std, dtype=np.float64), cum_std.shape)
+    mult = np.asarray(multipliers, dtype=np.float64)
+
+    target = mean[:, None] + mult[None, :] * std[:, None]          # (n, k)
+    valid = (supply > 0) & (cum_std > 0)
+    safe_supply = np.where(valid, supply, 1.0)
+    prices = (target * cum_std[:, None] + rc[:, None]) / safe_supply[:, None]
+    return np.where(valid[:, None], prices, 0.0)
+
+
+def band_columns(matrix: np.ndarray, keys) -> dict[str, list[float]]:
+    """Output-boundary helper: {"price_at_<key>": column values} for row building."""
+    return {f"price_at_{k}": matrix[:, j].tolist() for j, k in enumerate(keys)}
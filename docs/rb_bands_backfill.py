@@ -3,8 +3,15 @@
 rb_bands_backfill.py
 
 Backfills lth_pvr.rb_bands_daily using Research Bitcoin API data.
-Computes LTH PVR bands day-by-day with a Welford running state built from
-scratch (starting from the first available RB observation ≈ 2010-07-18).
+
+By default the run is incremental: the Welford state (mc_n, mc_mean, mc_m2,
+last_date) is read from lth_pvr.rb_bands_state, only the days after
+last_date are fetched, and only those new rows are upserted before the state
+is advanced.  The state never moves past a day whose row is not written yet
+(no realised price): that day is picked up by the next run.  --full-rebuild
+instead rebuilds the state from scratch (starting from the first available RB
+observation ≈ 2010-07-18) and rewrites the whole history; it was the default
+before incremental runs, so --from / --update-state now require it.
 
 The formula is identical to ef_fetch_rb_bands:
   cum_std      = sqrt(m2 / (n-1))  [Welford variance of daily LTH_MC]
@@ -18,27 +25,46 @@ Usage (PowerShell):
   python docs/rb_bands_backfill.py
 
 Optional flags:
-  --from YYYY-MM-DD    First output date  (default: 2010-01-01)
   --to   YYYY-MM-DD    Last  output date  (default: yesterday)
-  --dry-run            Compute but do NOT write to the database
-  --update-state       After writing, patch rb_bands_state with the final
-                       Welford values so that future ef_fetch_rb_bands runs
-                       remain consistent with the backfilled history
+  --dry-run            Compute (and report what would change) but do NOT write
+                       to the database
+  --full-rebuild       Ignore rb_bands_state and replay Welford from --from
+                       (disaster recovery; the incremental default continues
+                       from the stored state).  Re-downloads the RB history
+                       instead of reusing the local series store, so revised
+                       RB data is picked up
+  --from YYYY-MM-DD    First output date for --full-rebuild (default: 2010-01-01)
+  --update-state       With --full-rebuild: after writing, patch rb_bands_state
+                       with the final Welford values so that future
+                       ef_fetch_rb_bands runs remain consistent with the
+                       backfilled history (incremental runs always advance it)
+  --concurrency N      Upsert batches in flight (default: 4).  Rows whose
+                       source_hash matches the stored one are skipped, so a
+                       re-run on unchanged data writes (almost) nothing
+  --workers N          Worker processes for the Welford pass (default: CPU
+                       count); history is split into segments whose states
+                       are merged exactly (see welford.py)
 """
 
 import argparse
-import csv
-import io
+import hashlib
 import json
 import math
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date, datetime, timedelta
 
+import numpy as np
 import requests
 
+from day_calendar import align, as_series, day_range, from_day, iso_dates, to_day
+from pvr_bands import band_columns, band_price_matrix
+from series_store import rb_series
+from welford import prefix_cum_std
+
 # ── Configuration ─────────────────────────────────────────────────────────────
-RB_BASE  = "https://api.researchbitcoin.net/v2"
 RB_TOKEN = os.getenv("RB_API_TOKEN", "")
 SB_URL   = os.getenv("SUPABASE_URL", "")
 SB_KEY   = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
@@ -54,36 +80,10 @@ BAND_MULTS: dict[str, float] = {
     "p200":  2.00, "p250":  2.50,
 }
 
-BATCH_SIZE = 500
-SCHEMA     = "lth_pvr"
-
-
-# ── ResearchBitcoin helpers ───────────────────────────────────────────────────
-def rb_fetch(endpoint: str, from_dt: str, to_dt: str) -> dict[str, float]:
-    """Download a single RB metric over a date range → {date_str: float}.
-
-    NOTE: to_dt must be strictly greater than from_dt (RB API constraint).
-    Pass to_dt = last_date + 1 day before calling.
-    """
-    url = (
-        f"{RB_BASE}/{endpoint}"
-        f"?resolution=d1&from_time={from_dt}&to_time={to_dt}"
-    )
-    label = endpoint.split("/")[-1]
-    print(f"  Fetching {label:<32s}  {from_dt} → {to_dt}", end="  ", flush=True)
-    resp = requests.get(url, headers={"X-API-Token": RB_TOKEN}, timeout=120)
-    resp.raise_for_status()
-    reader = csv.DictReader(io.StringIO(resp.text))
-    out: dict[str, float] = {}
-    for row in reader:
-        day_str = row["time"][:10]
-        val_key = next(k for k in row if k != "time")
-        try:
-            out[day_str] = float(row[val_key])
-        except (ValueError, TypeError):
-            pass  # skip rows with empty / non-numeric values
-    print(f"{len(out)} rows")
-    return out
+BATCH_SIZE  = 500
+CONCURRENCY = 4      # upsert batches in flight
+PAGE_SIZE   = 1000   # rows per page when pre-fetching existing hashes
+SCHEMA      = "lth_pvr"
 
 
 # ── Supabase REST helpers ─────────────────────────────────────────────────────
@@ -97,29 +97,96 @@ def _sb_headers() -> dict[str, str]:
     }
 
 
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    """One keep-alive session per thread (upsert batches run concurrently)."""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
 def sb_upsert(table: str, rows: list[dict]) -> None:
     """Upsert rows into an lth_pvr table via Supabase PostgREST."""
     url = f"{SB_URL}/rest/v1/{table}"
     headers = {**_sb_headers(), "Prefer": "resolution=merge-duplicates,return=minimal"}
-    resp = requests.post(
+    resp = _session().post(
         url, headers=headers,
         params={"on_conflict": "org_id,date,mode"},
-        data=json.dumps(rows),
+        data=json.dumps(rows, separators=(",", ":")),
         timeout=60,
     )
     if resp.status_code not in (200, 201, 204):
         raise RuntimeError(f"Upsert HTTP {resp.status_code}: {resp.text[:400]}")
 
 
-def sb_patch(table: str, match: dict, data: dict) -> None:
-    """PATCH matching rows in an lth_pvr table."""
+def sb_patch(table: str, match: dict, data: dict) -> int:
+    """PATCH matching rows in an lth_pvr table; returns the number of rows updated."""
     url = f"{SB_URL}/rest/v1/{table}"
-    headers = {**_sb_headers(), "Prefer": "return=minimal"}
+    headers = {**_sb_headers(), "Prefer": "return=representation"}
     params  = {k: f"eq.{v}" for k, v in match.items()}
     resp = requests.patch(url, headers=headers, params=params,
                           data=json.dumps(data), timeout=15)
     if resp.status_code not in (200, 201, 204):
         raise RuntimeError(f"Patch HTTP {resp.status_code}: {resp.text[:400]}")
+    return len(resp.json()) if resp.content else 0
+
+
+def sb_existing_hashes(from_dt: str, to_dt: str) -> dict[str, str | None]:
+    """{date: source_hash} of the org's static rb_bands_daily rows in [from_dt, to_dt]."""
+    out: dict[str, str | None] = {}
+    offset = 0
+    while True:
+        resp = _session().get(
+            f"{SB_URL}/rest/v1/rb_bands_daily",
+            headers=_sb_headers(),    # responses arrive gzip-compressed
+            params={
+                "select": "date,source_hash",
+                "org_id": f"eq.{ORG_ID}",
+                "mode":   "eq.static",
+                "and":    f"(date.gte.{from_dt},date.lte.{to_dt})",
+                "order":  "date.asc",
+                "limit":  PAGE_SIZE,
+                "offset": offset,
+            },
+            timeout=60,
+        )
+        if resp.status_code != 200:
+            raise RuntimeError(f"Hash read HTTP {resp.status_code}: {resp.text[:400]}")
+        page = resp.json()
+        out.update((r["date"][:10], r["source_hash"]) for r in page)
+        if len(page) < PAGE_SIZE:
+            return out
+        offset += PAGE_SIZE
+
+
+def row_hash(inputs: tuple[float, ...], row: dict) -> str:
+    """
+    Stable content hash of a band row: its inputs (PVR constants, supply,
+    realised cap, cum_std — to 12 significant digits, so segment-merge
+    rounding noise does not register) and the rounded prices actually stored.
+    """
+    parts = [row["date"], row["mode"]] + [f"{x:.12g}" for x in inputs]
+    parts += [f"{row['btc_price']:.2f}"] + [f"{row[f'price_at_{k}']:.2f}" for k in BAND_MULTS]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+
+
+def sb_get_state() -> dict | None:
+    """The org's rb_bands_state row (Welford state + PVR constants), or None."""
+    resp = requests.get(
+        f"{SB_URL}/rest/v1/rb_bands_state",
+        headers=_sb_headers(),
+        params={
+            "select": "pvr_mean,pvr_std,mc_n,mc_mean,mc_m2,last_date",
+            "org_id": f"eq.{ORG_ID}",
+        },
+        timeout=15,
+    )
+    if resp.status_code != 200:
+        raise RuntimeError(f"State read HTTP {resp.status_code}: {resp.text[:400]}")
+    rows = resp.json()
+    return rows[0] if rows else None
 
 
 # ── Main ──────────────────────────────────────────────────────────────────────
@@ -129,8 +196,8 @@ def main() -> None:
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
     parser.add_argument(
-        "--from", dest="from_dt", default="2010-01-01",
-        help="First date to include in output (YYYY-MM-DD, default: 2010-01-01)",
+        "--from", dest="from_dt", default=None,
+        help="With --full-rebuild: first date to include in output (YYYY-MM-DD, default: 2010-01-01)",
     )
     parser.add_argument(
         "--to", dest="to_dt",
@@ -141,14 +208,35 @@ def main() -> None:
         "--dry-run", action="store_true",
         help="Compute bands but do NOT write to the database",
     )
+    parser.add_argument(
+        "--full-rebuild", action="store_true",
+        help=(
+            "Ignore rb_bands_state and replay Welford from --from, re-downloading "
+            "the RB history (default: continue from the stored state)"
+        ),
+    )
     parser.add_argument(
         "--update-state", action="store_true",
         help=(
-            "After writing, patch rb_bands_state with the final Welford values "
-            "so future ef_fetch_rb_bands runs are consistent with this backfill"
+            "With --full-rebuild: after writing, patch rb_bands_state with the final "
+            "Welford values so future ef_fetch_rb_bands runs are consistent with this backfill"
         ),
     )
+    parser.add_argument(
+        "--concurrency", type=int, default=CONCURRENCY,
+        help=f"Upsert batches sent in parallel (default: {CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Worker processes for the segmented Welford pass (default: CPU count)",
+    )
     args = parser.parse_args()
+    # --from / --update-state belong to the old (full replay) default: refuse
+    # them without --full-rebuild rather than silently running incrementally
+    if not args.full_rebuild and (args.from_dt is not None or args.update_state):
+        parser.error("--from and --update-state need --full-rebuild "
+                     "(the default run is incremental from rb_bands_state)")
+    args.from_dt = args.from_dt or "2010-01-01"
 
     # Validate env vars
     for val, name in [
@@ -159,79 +247,144 @@ def main() -> None:
         if not val:
             sys.exit(f"Error: {name} environment variable is not set")
 
-    # RB API: to_time must be strictly > from_time; add one day to our last date
-    fetch_to = (date.fromisoformat(args.to_dt) + timedelta(days=1)).isoformat()
+    # Welford state + PVR constants to continue from (incremental) or zero (full)
+    mc_n:    float = 0.0   # using float for Welford accumulator; cast to int for DB
+    mc_mean: float = 0.0
+    mc_m2:   float = 0.0
+    pvr_mean, pvr_std = PVR_MEAN, PVR_STD
+    state_last_date: str | None = None
+
+    if args.full_rebuild:
+        out_from = to_day(args.from_dt)
+        update_state = args.update_state
+    else:
+        state = sb_get_state()
+        if not state or state.get("last_date") is None or not state.get("mc_n"):
+            sys.exit("Error: rb_bands_state has no Welford state for this org — "
+                     "run with --full-rebuild --update-state first")
+        mc_n, mc_mean, mc_m2 = float(state["mc_n"]), float(state["mc_mean"]), float(state["mc_m2"])
+        if state.get("pvr_mean") is not None and state.get("pvr_std") is not None:
+            pvr_mean, pvr_std = float(state["pvr_mean"]), float(state["pvr_std"])
+        state_last_date = str(state["last_date"])[:10]
+        out_from = to_day(state_last_date) + 1
+        update_state = True
+    out_to = to_day(args.to_dt)
 
     print("=" * 65)
     print("  RB Bands Backfill")
-    print(f"  Output range  : {args.from_dt} → {args.to_dt}")
+    print(f"  Mode          : {'full rebuild' if args.full_rebuild else 'incremental'}")
+    if state_last_date:
+        print(f"  State         : n={int(mc_n):,}, last_date={state_last_date}")
+    print(f"  Output range  : {from_day(out_from)} → {args.to_dt}")
     print(f"  Dry run       : {args.dry_run}")
-    print(f"  Update state  : {args.update_state}")
+    print(f"  Update state  : {update_state}")
     print("=" * 65)
 
-    # ── Step 1: Fetch historical data ────────────────────────────────────────
-    print("\nStep 1: Fetching historical data from Research Bitcoin API")
-    supply      = rb_fetch("supply_distribution/supply_lth",   args.from_dt, fetch_to)
-    realised    = rb_fetch("realizedprice/realized_price_lth", args.from_dt, fetch_to)
-    price_data  = rb_fetch("price/price",                      args.from_dt, fetch_to)
+    if out_from > out_to:
+        print("\nrb_bands_state is already up to date — nothing to do.")
+        return
+
+    # RB API: to_time must be strictly > from_time; add one day to our last date
+    fetch_to = from_day(out_to + 1)
+
+    # ── Step 1: Load historical data ─────────────────────────────────────────
+    print("\nStep 1: Loading historical data "
+          f"({'RB API, refreshing the series store' if args.full_rebuild else 'local series store; RB API for gaps'})")
+    try:
+        series = rb_series(
+            ["supply_distribution/supply_lth",
+             "realizedprice/realized_price_lth",
+             "price/price"],
+            from_day(out_from), fetch_to, RB_TOKEN, refresh=args.full_rebuild,
+        )
+    except RuntimeError as e:
+        sys.exit(f"Error: {e}")
+    supply_days,   supply   = as_series(series["supply_distribution/supply_lth"])
+    realised_days, realised = as_series(series["realizedprice/realized_price_lth"])
+    price_days,    price    = as_series(series["price/price"])
 
     # ── Step 2: Compute Welford running state + bands ────────────────────────
     print("\nStep 2: Computing running Welford state and bands")
 
     # Welford is updated on every date where supply_lth AND price are available.
     # This ensures the running state is complete even for dates outside the
-    # requested output range.
-    all_mc_dates = sorted(set(supply) & set(price_data))
-    if not all_mc_dates:
-        sys.exit("Error: no overlapping dates between supply_lth and price series")
+    # requested output range.  Incremental runs never re-apply a stored day.
+    mc_days, (i_s, i_p) = align(supply_days, price_days)
+    if state_last_date:
+        keep = day_range(mc_days, to_day(state_last_date) + 1)
+        mc_days, i_s, i_p = mc_days[keep], i_s[keep], i_p[keep]
+    if not len(mc_days):
+        if args.full_rebuild:
+            sys.exit("Error: no overlapping dates between supply_lth and price series")
+        print(f"\nNo RB data after {state_last_date} yet — nothing to do.")
+        return
 
-    print(f"  LTH_MC dates  : {all_mc_dates[0]} → {all_mc_dates[-1]}  ({len(all_mc_dates)} days)")
+    # The state may only advance over days whose rows are written (a day with
+    # no realised price yet is never revisited once last_date passes it):
+    # incremental runs stop at the first such day and leave it to the next
+    # run; a full rebuild stops after the last day it can write
+    writable = np.isin(mc_days, realised_days) & (mc_days <= out_to)
+    if state_last_date:
+        n_keep = len(mc_days) if writable.all() else int(np.argmin(writable))
+    else:
+        n_keep = int(np.flatnonzero(writable)[-1]) + 1 if writable.any() else 0
+    if n_keep < len(mc_days):
+        print(f"  Held back     : {len(mc_days) - n_keep} day(s) from {from_day(mc_days[n_keep])} "
+              "(no realised price yet, or after --to)")
+        mc_days, i_s, i_p = mc_days[:n_keep], i_s[:n_keep], i_p[:n_keep]
+    if not len(mc_days):
+        print("\nNo day with a realised price to write yet — nothing to do.")
+        return
 
-    mc_n:    float = 0.0   # using float for Welford accumulator; cast to int for DB
-    mc_mean: float = 0.0
-    mc_m2:   float = 0.0
+    print(f"  LTH_MC dates  : {from_day(mc_days[0])} → {from_day(mc_days[-1])}  ({len(mc_days)} days)")
 
-    rows: list[dict] = []
     fetched_at = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
 
-    for d in all_mc_dates:
-        lth_mc = supply[d] * price_data[d]
-
-        # Welford online update (always, regardless of output date range)
-        mc_n   += 1
-        delta   = lth_mc - mc_mean
-        mc_mean += delta / mc_n
-        delta2  = lth_mc - mc_mean
-        mc_m2  += delta * delta2
-
-        # Only emit output rows within the requested range
-        if d < args.from_dt or d > args.to_dt:
-            continue
-        # Need std dev (n >= 2) and realized price to compute bands
-        if mc_n < 2 or d not in realised:
-            continue
-
-        cum_std    = math.sqrt(mc_m2 / (mc_n - 1))
-        lth_supply = supply[d]
-        lth_rc     = lth_supply * realised[d]
-        btc_price  = price_data[d]
-
-        band_cols: dict[str, float] = {}
-        for band, mult in BAND_MULTS.items():
-            pvr_t = PVR_MEAN + mult * PVR_STD
-            band_cols[f"price_at_{band}"] = round(
-                (pvr_t * cum_std + lth_rc) / lth_supply, 2
-            )
-
-        rows.append({
+    # Welford online update over every LTH_MC date (regardless of output date
+    # range), split into segments on worker processes and merged exactly
+    n_start = int(mc_n)
+    lth_mc = supply[i_s] * price[i_p]
+    cum_std, (mc_n, mc_mean, mc_m2) = prefix_cum_std(
+        lth_mc, start=(n_start, mc_mean, mc_m2), max_workers=args.workers,
+    )
+
+    # Per output day: inputs to the band back-solve.  Rows are emitted within
+    # the requested range, once the std dev exists (n >= 2), on days with a
+    # realised price
+    i_r = np.minimum(np.searchsorted(realised_days, mc_days), max(len(realised_days) - 1, 0))
+    emit = ((mc_days >= out_from) & (mc_days <= out_to)
+            & (n_start + np.arange(1, len(mc_days) + 1) >= 2))
+    emit &= realised_days[i_r] == mc_days if len(realised_days) else False
+    out_dates  = iso_dates(mc_days[emit])
+    out_std    = cum_std[emit].tolist()
+    out_supply = supply[i_s[emit]].tolist()
+    out_rc     = (supply[i_s[emit]] * realised[i_r[emit]]).tolist()
+    out_price  = price[i_p[emit]].tolist()
+
+    # Rounded with the builtin round() at the output boundary: np.round scales
+    # by 100 first and differs on near-half values (2.675 → 2.68 vs 2.67),
+    # which would change stored prices and their source_hash
+    matrix = band_price_matrix(out_std, out_rc, out_supply, pvr_mean, pvr_std, BAND_MULTS)
+    band_cols = {col: [round(v, 2) for v in values]
+                 for col, values in band_columns(matrix, BAND_MULTS).items()}
+    btc_prices = [round(p, 2) for p in out_price]
+
+    rows: list[dict] = [
+        {
             "org_id":      ORG_ID,
             "date":        d,
             "mode":        "static",
-            "btc_price":   round(btc_price, 2),
-            **band_cols,
+            "btc_price":   btc_prices[i],
+            **{col: values[i] for col, values in band_cols.items()},
             "source_hash": None,
             "fetched_at":  fetched_at,
-        })
+        }
+        for i, d in enumerate(out_dates)
+    ]
+    for i, r in enumerate(rows):
+        r["source_hash"] = row_hash(
+            (pvr_mean, pvr_std, out_supply[i], out_rc[i], out_std[i]), r,
+        )
 
     print(f"  Rows computed : {len(rows)}")
     if rows:
@@ -249,32 +402,54 @@ def main() -> None:
             f"p250={r1['price_at_p250']:>10,.2f}"
         )
 
-    if args.dry_run:
-        print("\nDry run — no data written to the database.")
-        return
-
     if not rows:
         print("\nNo rows to write — nothing to do.")
         return
 
-    # ── Step 3: Batch upsert to rb_bands_daily ───────────────────────────────
-    print(f"\nStep 3: Upserting to lth_pvr.rb_bands_daily (batch size {BATCH_SIZE})")
-    written = 0
-    for i in range(0, len(rows), BATCH_SIZE):
-        batch = rows[i : i + BATCH_SIZE]
-        sb_upsert("rb_bands_daily", batch)
-        written += len(batch)
-        print(f"  {written:>5} / {len(rows)} rows written", end="\r", flush=True)
-    print(f"  {written:>5} / {len(rows)} rows written ✓")
-
-    # ── Step 4: (optional) update rb_bands_state ────────────────────────────
-    if args.update_state:
+    # ── Step 3: Change-detecting upsert to rb_bands_daily ────────────────────
+    # Only rows whose source_hash differs from the stored one are sent
+    print("\nStep 3: Comparing with stored source_hash values")
+    existing = sb_existing_hashes(rows[0]["date"], rows[-1]["date"])
+    inserts = [r for r in rows if r["date"] not in existing]
+    updates = [r for r in rows
+               if r["date"] in existing and existing[r["date"]] != r["source_hash"]]
+    changed = sorted(inserts + updates, key=lambda r: r["date"])
+    print(f"  Stored rows   : {len(existing)}")
+    print(f"  Unchanged     : {len(rows) - len(changed)} (skipped)")
+    print(f"  To insert     : {len(inserts)}")
+    print(f"  To update     : {len(updates)}")
+
+    if args.dry_run:
+        print("\nDry run — no data written to the database.")
+        return
+
+    if changed:
+        batches = [changed[i : i + BATCH_SIZE] for i in range(0, len(changed), BATCH_SIZE)]
+        print(f"  Upserting {len(changed)} rows in {len(batches)} batch(es) "
+              f"of ≤{BATCH_SIZE}, {args.concurrency} in flight")
+        written = 0
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = {pool.submit(sb_upsert, "rb_bands_daily", b): len(b) for b in batches}
+            for fut in as_completed(futures):
+                fut.result()
+                written += futures[fut]
+                print(f"  {written:>5} / {len(changed)} rows written", end="\r", flush=True)
+        print(f"  {written:>5} / {len(changed)} rows written ✓")
+    print(f"  skipped={len(rows) - len(changed)}  inserted={len(inserts)}  updated={len(updates)}")
+
+    # ── Step 4: update rb_bands_state (always when incremental) ─────────────
+    if update_state:
         print("\nStep 4: Patching rb_bands_state with final Welford values")
-        last_mc_date = all_mc_dates[-1]
+        last_mc_date = from_day(mc_days[-1])
         cum_std_final = math.sqrt(mc_m2 / (mc_n - 1)) if mc_n >= 2 else 0.0
-        sb_patch(
+        # Incremental: only advance the state we started from, so a concurrent
+        # ef_fetch_rb_bands run is never double-counted
+        match = {"org_id": ORG_ID}
+        if state_last_date:
+            match["last_date"] = state_last_date
+        updated = sb_patch(
             "rb_bands_state",
-            {"org_id": ORG_ID},
+            match,
             {
                 "mc_n":      int(mc_n),
                 "mc_mean":   round(mc_mean, 4),
@@ -282,6 +457,9 @@ def main() -> None:
                 "last_date": last_mc_date,
             },
         )
+        if not updated:
+            sys.exit("Error: rb_bands_state changed during the run (last_date is no "
+                     f"longer {state_last_date}) — state NOT advanced; re-run to catch up")
         print(f"  n={int(mc_n):,}, cum_std=${cum_std_final:,.2f}, last_date={last_mc_date}")
 
     print("\n=== Backfill complete ===")
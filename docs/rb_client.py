@@ -0,0 +1,170 @@
+"""
+rb_client.py
+
+Parallel, chunked downloader for Research Bitcoin daily series, shared by
+rb_pvr_validation.py and rb_bands_backfill.py.
+
+Each request is split into yearly windows.  Every (series × window) pair is
+fetched on a bounded thread pool, and a failed window is retried on its own
+with exponential backoff.  A failure that persists only aborts the run after
+every other window has finished, and the error names the windows that failed.
+CSV bodies are parsed line-by-line as they stream in, straight into typed
+arrays:
+
+    dates   numpy datetime64[D]
+    values  numpy float64
+
+    series = fetch_series(["supply_distribution/supply_lth", "price/price"],
+                          "2010-01-01", "2026-10-19", token)
+    dates, values = series["price/price"]
+    price = to_dict(dates, values)          # {"YYYY-MM-DD": float} if needed
+"""
+
+import array
+import codecs
+import csv
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+
+import numpy as np
+
+RB_BASE = "https://api.researchbitcoin.net/v2"
+
+MAX_WORKERS = 8     # concurrent requests across all series/windows
+RETRIES     = 4     # attempts per window
+TIMEOUT     = 60    # seconds per request
+BACKOFF     = 2.0   # seconds, doubled per retry
+
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+def yearly_windows(from_dt: str, to_dt: str) -> list[tuple[str, str]]:
+    """
+    Split [from_dt, to_dt) into calendar-year windows.  The RB API requires
+    to_time > from_time, so each window is [start, next start).
+    """
+    start = date.fromisoformat(from_dt)
+    end = date.fromisoformat(to_dt)
+    out = []
+    while start < end:
+        nxt = min(date(start.year + 1, 1, 1), end)
+        out.append((start.isoformat(), nxt.isoformat()))
+        start = nxt
+    return out
+
+
+def _parse_csv_stream(resp, field: str) -> tuple[array.array, array.array]:
+    """Stream "time,<field>" CSV rows into int32 day numbers + float64 values."""
+    days, vals = array.array("i"), array.array("d")
+    reader = csv.reader(codecs.iterdecode(resp, "utf-8"))
+    header = next(reader, None)
+    if not header:
+        return days, vals
+    t_idx = header.index("time") if "time" in header else 0
+    v_idx = header.index(field) if field in header else next(
+        i for i in range(len(header)) if i != t_idx)
+    for row in reader:
+        if len(row) <= max(t_idx, v_idx):
+            continue
+        try:
+            v = float(row[v_idx])
+            d = date.fromisoformat(row[t_idx][:10]).toordinal() - _EPOCH
+        except ValueError:
+            continue  # empty / non-numeric value
+        if v != v:
+            continue  # NaN
+        days.append(d)
+        vals.append(v)
+    return days, vals
+
+
+def _fetch_window(endpoint: str, from_dt: str, to_dt: str, token: str,
+                  retries: int, timeout: float):
+    params = urllib.parse.urlencode({
+        "resolution": "d1", "from_time": from_dt, "to_time": to_dt,
+    })
+    req = urllib.request.Request(
+        f"{RB_BASE}/{endpoint}?{params}",
+        headers={"X-API-Token": token, "Accept": "text/csv"},
+    )
+    field = endpoint.split("/")[-1]
+    for attempt in range(1, retries + 1):
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                return _parse_csv_stream(resp, field)
+        except urllib.error.HTTPError as e:
+            # 4xx other than rate limiting will not get better on retry
+            if (e.code != 429 and e.code < 500) or attempt == retries:
+                raise RuntimeError(
+                    f"HTTP {e.code} for {endpoint} {from_dt}→{to_dt}: "
+                    f"{e.read().decode(errors='replace')[:200]}") from e
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+            if attempt == retries:
+                raise RuntimeError(
+                    f"Network error for {endpoint} {from_dt}→{to_dt}: "
+                    f"{getattr(e, 'reason', e)}") from e
+        time.sleep(BACKOFF * 2 ** (attempt - 1))
+
+
+def fetch_series(
+    endpoints: list[str],
+    from_dt: str,
+    to_dt: str,
+    token: str,
+    max_workers: int = MAX_WORKERS,
+    retries: int = RETRIES,
+    timeout: float = TIMEOUT,
+    verbose: bool = True,
+) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """
+    Download every endpoint over [from_dt, to_dt) → {endpoint: (dates, values)}.
+
+    dates is sorted, de-duplicated datetime64[D]; values is the matching
+    float64 array.  Raises RuntimeError listing every window that still failed
+    after retries.
+    """
+    windows = yearly_windows(from_dt, to_dt)
+    parts: dict[str, list] = {ep: [] for ep in endpoints}
+    failed: list[str] = []
+    t0 = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_fetch_window, ep, a, b, token, retries, timeout): (ep, a)
+            for ep in endpoints for a, b in windows
+        }
+        for fut in as_completed(futures):
+            ep, a = futures[fut]
+            try:
+                parts[ep].append(fut.result())
+            except RuntimeError as e:
+                failed.append(str(e))
+
+    if failed:
+        raise RuntimeError(f"{len(failed)} RB window(s) failed:\n  " + "\n  ".join(failed))
+
+    out = {}
+    for ep in endpoints:
+        days = np.concatenate([np.frombuffer(d, dtype=np.int32) for d, _ in parts[ep]]
+                              or [np.empty(0, np.int32)])
+        vals = np.concatenate([np.frombuffer(v, dtype=np.float64) for _, v in parts[ep]]
+                              or [np.empty(0, np.float64)])
+        # Windows finish out of order and may share a boundary day
+        days, first = np.unique(days, return_index=True)
+        out[ep] = (days.astype("datetime64[D]"), vals[first])
+        if verbose:
+            label = ep.split("/")[-1]
+            print(f"  {label:<32s}  {len(days):>6} rows")
+    if verbose:
+        print(f"  {len(endpoints)} series × {len(windows)} windows in "
+              f"{time.monotonic() - t0:.1f}s")
+    return out
+
+
+def to_dict(dates: np.ndarray, values: np.ndarray) -> dict[str, float]:
+    """Typed arrays → the {YYYY-MM-DD: value} dicts the band scripts consume."""
+    return dict(zip(np.datetime_as_string(dates, unit="D").tolist(), values.tolist()))
@@ -15,6 +15,10 @@ Usage
 
     python docs/rb_pvr_validation.py
 
+    # Diff every stored day of ci_bands_daily and rb_bands_daily against the
+    # computed bands (per-band mean / p99 / max % diff, dates beyond tolerance):
+    python docs/rb_pvr_validation.py --full-diff --tolerance 0.5 --report diff.json
+
     # Or just validate the formula without DB comparison:
     $env:RB_API_TOKEN = "your-research-bitcoin-token"
     python docs/rb_pvr_validation.py
@@ -23,8 +27,7 @@ Required packages (already in .venv): numpy
 Optional for DB comparison: supabase (pip install supabase)
 """
 
-import csv
-import io
+import argparse
 import os
 import sys
 import json
@@ -36,10 +39,13 @@ from typing import Optional
 
 import numpy as np
 
+from day_calendar import align, as_series, day_numbers, from_day, iso_dates
+from pvr_bands import band_columns, band_price_matrix
+from series_store import SeriesStore, ci_raw_series, rb_key, rb_series
+
 # ---------------------------------------------------------------------------
 # Config
 # ---------------------------------------------------------------------------
-RB_BASE = "https://api.researchbitcoin.net"
 RB_TOKEN = os.environ.get("RB_API_TOKEN", "")
 SB_URL = os.environ.get("SUPABASE_URL", "")
 SB_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "")
@@ -64,114 +70,14 @@ BAND_MULTIPLIERS: dict[str, float] = {
 }
 
 
-# ---------------------------------------------------------------------------
-# Research Bitcoin API helpers
-# ---------------------------------------------------------------------------
-
-def rb_fetch(category: str, data_field: str, from_time: str, to_time: str) -> list:
-    """
-    Fetch daily time-series data from one Research Bitcoin endpoint.
-    The API returns CSV with columns: time, <data_field>.
-    Returns a list of {"date": "YYYY-MM-DD", "value": float} dicts.
-    """
-    params = urllib.parse.urlencode({
-        "resolution": "d1",
-        "from_time": from_time,
-        "to_time": to_time,
-    })
-    url = f"{RB_BASE}/v2/{category}/{data_field}?{params}"
-    req = urllib.request.Request(
-        url,
-        headers={"X-API-Token": RB_TOKEN, "Accept": "text/csv"},
-    )
-    try:
-        with urllib.request.urlopen(req, timeout=60) as resp:
-            text = resp.read().decode("utf-8")
-            reader = csv.DictReader(io.StringIO(text))
-            rows = []
-            for row in reader:
-                # time column: "2025-01-01T00:00:00Z"
-                date_str = (row.get("time") or "")[:10]
-                # Try the data_field column name first, then fall back to any non-time column
-                val_str = row.get(data_field)
-                if val_str is None:
-                    for k, v in row.items():
-                        if k != "time":
-                            val_str = v
-                            break
-                if date_str and val_str:
-                    try:
-                        rows.append({"date": date_str, "value": float(val_str)})
-                    except (TypeError, ValueError):
-                        pass
-            return rows
-    except urllib.error.HTTPError as e:
-        err_body = e.read().decode()[:300]
-        print(f"  HTTP {e.code} error fetching {category}/{data_field}: {err_body}")
-        sys.exit(1)
-    except urllib.error.URLError as e:
-        print(f"  Network error fetching {category}/{data_field}: {e.reason}")
-        sys.exit(1)
-
-
-def parse_series(raw: list) -> dict[str, float]:
-    """
-    Parse the Research Bitcoin API `data` array into a {YYYY-MM-DD: value} dict.
-    Handles multiple possible formats:
-      - [{"t": timestamp_ms, "v": value}, ...]
-      - [[timestamp_ms, value], ...]
-      - [{"date": "YYYY-MM-DD", "value": float}, ...]
-    """
-    out: dict[str, float] = {}
-    for item in raw:
-        ts_ms: Optional[int] = None
-        val: Optional[float] = None
-        date_str: Optional[str] = None
-
-        if isinstance(item, (list, tuple)) and len(item) >= 2:
-            ts_ms, val = int(item[0]), item[1]
-        elif isinstance(item, dict):
-            # Try timestamp keys
-            for k in ("t", "timestamp", "time", "ts"):
-                if k in item:
-                    ts_ms = int(item[k])
-                    break
-            # Try date string keys
-            for k in ("date", "d"):
-                if k in item:
-                    date_str = str(item[k])[:10]
-                    break
-            # Try value keys
-            for k in ("v", "value", "val"):
-                if k in item:
-                    val = item[k]
-                    break
-
-        if val is None or val == "" or val != val:  # skip None / NaN
-            continue
-
-        try:
-            val = float(val)
-        except (TypeError, ValueError):
-            continue
-
-        if date_str:
-            out[date_str] = val
-        elif ts_ms is not None:
-            dt = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
-            out[dt.strftime("%Y-%m-%d")] = val
-
-    return out
-
-
 # ---------------------------------------------------------------------------
 # LTH PVR calculation (replicates Tristan's calculate.py)
 # ---------------------------------------------------------------------------
 
 def calculate_pvr_bands(
-    supply: dict[str, float],
-    realized_price: dict[str, float],
-    price: dict[str, float],
+    supply,
+    realized_price,
+    price,
     mode: str = "static",
     compare_date: Optional[str] = None,
 ) -> tuple[dict, list[dict]]:
@@ -189,12 +95,18 @@ def calculate_pvr_bands(
         Bands are rolling, using running mean and std of all PVR values
         up to each date.
 
+    Each series is a (dates, values) pair as rb_series returns it, or a
+    {YYYY-MM-DD: value} dict.
+
     Returns (bands_for_compare_date, full_row_list).
     """
-    # Align all three series to their common dates, oldest-first
-    common_dates = sorted(set(supply) & set(realized_price) & set(price))
-    if not common_dates:
+    # Align all three series to their common days, oldest-first (sorted merge)
+    (s_days, s_vals), (r_days, r_vals), (p_days, p_vals) = (
+        as_series(supply), as_series(realized_price), as_series(price))
+    common, (i_s, i_r, i_p) = align(s_days, r_days, p_days)
+    if not len(common):
         raise ValueError("No common dates across supply, realized_price, and price series")
+    common_dates = iso_dates(common)
 
     print(f"  Common date range: {common_dates[0]} → {common_dates[-1]} ({len(common_dates)} days)")
 
@@ -206,20 +118,26 @@ def calculate_pvr_bands(
     # IMPORTANT: cumulative_mc must be accumulated for ALL dates where
     # supply>0 AND price>0, even if realized_price is not yet available.
     # PVR is only computed (and a row emitted) when all three are non-zero.
+    #
+    # The cumulative std dev is a Welford running variance (ddof=1), so each
+    # date costs O(1) instead of re-scanning the whole history.
     rows: list[dict] = []
-    cumulative_mc: list[float] = []
+    mc_n = 0
+    mc_mean = 0.0
+    mc_m2 = 0.0
 
-    for d in common_dates:
-        lth_s = supply[d]
-        lth_rp = realized_price[d]
-        btc_p = price[d]
+    for d, lth_s, lth_rp, btc_p in zip(common_dates, s_vals[i_s].tolist(),
+                                       r_vals[i_r].tolist(), p_vals[i_p].tolist()):
 
         if lth_s <= 0 or btc_p <= 0:
             continue  # can't compute lth_mc at all
 
         lth_mc = lth_s * btc_p
-        cumulative_mc.append(lth_mc)
-        pvr_denominator = float(np.std(cumulative_mc, ddof=1)) if len(cumulative_mc) > 1 else 0.0
+        mc_n += 1
+        delta = lth_mc - mc_mean
+        mc_mean += delta / mc_n
+        mc_m2 += delta * (lth_mc - mc_mean)
+        pvr_denominator = float(np.sqrt(mc_m2 / (mc_n - 1))) if mc_n > 1 else 0.0
 
         if lth_rp <= 0:
             continue  # no realized_price yet — lth_mc accumulated but no row emitted
@@ -254,28 +172,33 @@ def calculate_pvr_bands(
             r["pvr_mean"] = pvr_mean_val
             r["pvr_std"] = pvr_std_val
     else:
-        # Cumulative rolling mean + std of PVR values
-        pvr_arr = np.array([r["pvr_value"] for r in rows])
-        for i, r in enumerate(rows):
-            slice_ = pvr_arr[:i + 1][pvr_arr[:i + 1] != 0]
-            r["pvr_mean"] = float(np.mean(slice_)) if len(slice_) > 1 else 0.0
-            r["pvr_std"] = float(np.std(slice_, ddof=1)) if len(slice_) > 1 else 0.0
+        # Cumulative rolling mean + std of non-zero PVR values (Welford)
+        n = 0
+        mean = 0.0
+        m2 = 0.0
+        for r in rows:
+            v = r["pvr_value"]
+            if v != 0:
+                n += 1
+                delta = v - mean
+                mean += delta / n
+                m2 += delta * (v - mean)
+            r["pvr_mean"] = mean if n > 1 else 0.0
+            r["pvr_std"] = float(np.sqrt(m2 / (n - 1))) if n > 1 else 0.0
 
     # --- Pass 3: back-solve band price levels for all rows ------------------
-    for r in rows:
-        cum_std = r["cumulative_std_dev"]
-        lth_rc = r["lth_realized_cap"]
-        lth_s = r["lth_supply"]
-        pvr_mean = r["pvr_mean"]
-        pvr_std = r["pvr_std"]
-
-        for band_key, mult in BAND_MULTIPLIERS.items():
-            pvr_target = pvr_mean + mult * pvr_std
-            if lth_s > 0 and cum_std > 0:
-                band_price = (pvr_target * cum_std + lth_rc) / lth_s
-            else:
-                band_price = 0.0
-            r[f"price_at_{band_key}"] = band_price
+    # One (n × bands) broadcast; per-row dicts are only filled at the end.
+    matrix = band_price_matrix(
+        [r["cumulative_std_dev"] for r in rows],
+        [r["lth_realized_cap"] for r in rows],
+        [r["lth_supply"] for r in rows],
+        [r["pvr_mean"] for r in rows],
+        [r["pvr_std"] for r in rows],
+        BAND_MULTIPLIERS,
+    )
+    for col, values in band_columns(matrix, BAND_MULTIPLIERS).items():
+        for r, v in zip(rows, values):
+            r[col] = v
 
     # --- Select the row to return -------------------------------------------
     if compare_date:
@@ -319,12 +242,170 @@ def fetch_ci_bands_daily(target_date: str, mode: str = "static") -> Optional[dic
         return None
 
 
+# ---------------------------------------------------------------------------
+# Full-history diff
+# ---------------------------------------------------------------------------
+
+def fetch_bands_history(table: str, mode: str = "static",
+                        page_size: int = 1000) -> list[dict]:
+    """Every row of an lth_pvr *_bands_daily table for `mode`, oldest first."""
+    cols = ",".join(["date"] + [f"price_at_{k}" for k in BAND_MULTIPLIERS])
+    rows: list[dict] = []
+    offset = 0
+    while True:
+        params = urllib.parse.urlencode({
+            "select": cols,
+            "mode":   f"eq.{mode}",
+            "order":  "date.asc",
+            "limit":  page_size,
+            "offset": offset,
+        })
+        req = urllib.request.Request(
+            f"{SB_URL}/rest/v1/{table}?{params}",
+            headers={
+                "apikey": SB_KEY,
+                "Authorization": f"Bearer {SB_KEY}",
+                "Accept-Profile": "lth_pvr",
+            },
+        )
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            page = json.loads(resp.read())
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        offset += page_size
+
+
+def _band_matrix(rows: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+    """Rows → (datetime64[D] dates, n × bands matrix); missing / non-positive → NaN."""
+    dates = np.array([r["date"][:10] for r in rows], dtype="datetime64[D]")
+    m = np.array([[r.get(f"price_at_{k}") for k in BAND_MULTIPLIERS] for r in rows],
+                 dtype=np.float64).reshape(len(rows), len(BAND_MULTIPLIERS))
+    m[~(m > 0)] = np.nan
+    return dates, m
+
+
+def band_diff_stats(computed_rows: list[dict], ref_rows: list[dict],
+                    tolerance_pct: float) -> dict:
+    """
+    Align reference rows with the locally computed bands by date and compute
+    per-band |% diff| statistics across all common dates in one pass.
+    """
+    c_dates, c_m = _band_matrix(computed_rows)
+    r_dates, r_m = _band_matrix(ref_rows)
+    common, ci_idx, ri_idx = np.intersect1d(c_dates, r_dates, return_indices=True)
+    pct = np.abs(c_m[ci_idx] - r_m[ri_idx]) / r_m[ri_idx] * 100     # (days, bands)
+
+    bands = {}
+    for j, key in enumerate(BAND_MULTIPLIERS):
+        col = pct[:, j]
+        valid = ~np.isnan(col)
+        if not valid.any():
+            bands[key] = {"n": 0}
+            continue
+        v = col[valid]
+        worst = int(np.flatnonzero(valid)[np.argmax(v)])
+        bands[key] = {
+            "n":        int(v.size),
+            "mean_pct": round(float(v.mean()), 6),
+            "p99_pct":  round(float(np.percentile(v, 99)), 6),
+            "max_pct":  round(float(v.max()), 6),
+            "max_date": str(common[worst]),
+            "breaches": int((v > tolerance_pct).sum()),
+        }
+
+    breach_mask = np.nan_to_num(pct, nan=0.0) > tolerance_pct
+    breach_days = np.flatnonzero(breach_mask.any(axis=1))
+    return {
+        "computed_rows": len(computed_rows),
+        "table_rows":    len(ref_rows),
+        "aligned_dates": int(common.size),
+        "first_date":    str(common[0]) if common.size else None,
+        "last_date":     str(common[-1]) if common.size else None,
+        "bands":         bands,
+        "breach_dates":  len(breach_days),
+        # Compact: first 100 offending dates with the bands that broke tolerance
+        "breach_sample": [
+            {"date": str(common[i]),
+             "bands": {k: round(float(pct[i, j]), 4)
+                       for j, k in enumerate(BAND_MULTIPLIERS) if breach_mask[i, j]}}
+            for i in breach_days[:100]
+        ],
+    }
+
+
+def full_history_diff(all_rows: list[dict], tolerance_pct: float, report_file: str) -> None:
+    """Diff the computed history against ci_bands_daily and rb_bands_daily."""
+    if not SB_URL or not SB_KEY:
+        print("ERROR: --full-diff needs SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY.")
+        sys.exit(1)
+
+    report = {
+        "generated_at":  datetime.now(timezone.utc).isoformat(),
+        "mode":          "static",
+        "tolerance_pct": tolerance_pct,
+        "tables":        {},
+    }
+    for table in ("ci_bands_daily", "rb_bands_daily"):
+        print()
+        print(f"  Reading lth_pvr.{table} (paged)...")
+        try:
+            ref_rows = fetch_bands_history(table)
+        except Exception as e:
+            print(f"  WARNING: Could not read {table}: {e}")
+            continue
+        stats = band_diff_stats(all_rows, ref_rows, tolerance_pct)
+        report["tables"][table] = stats
+
+        print(f"  {table}: {stats['aligned_dates']} aligned dates "
+              f"({stats['first_date']} → {stats['last_date']}), "
+              f"{stats['breach_dates']} dates beyond {tolerance_pct}%")
+        print(f"  {'Band':<8} {'n':>6} {'mean %':>9} {'p99 %':>9} {'max %':>9}  {'max date':<10} {'>tol':>6}")
+        for key, b in stats["bands"].items():
+            if not b["n"]:
+                print(f"  {key:<8} {0:>6}")
+                continue
+            print(f"  {key:<8} {b['n']:>6} {b['mean_pct']:>9.4f} {b['p99_pct']:>9.4f}"
+                  f" {b['max_pct']:>9.4f}  {b['max_date']:<10} {b['breaches']:>6}")
+
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print()
+    print(f"  Diff report written to: {report_file}")
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
 
+RB_ENDPOINTS = [
+    "supply_distribution/supply_lth",
+    "realizedprice/realized_price_lth",
+    "price/price",
+]
+
+
 def main() -> None:
-    if not RB_TOKEN:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--full-diff", action="store_true",
+        help="Diff the full computed history against ci_bands_daily and rb_bands_daily",
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=1.0,
+        help="Per-band %% difference that counts as a breach (default: 1.0)",
+    )
+    parser.add_argument(
+        "--report", default="rb_pvr_band_diff_report.json",
+        help="Where --full-diff writes its report",
+    )
+    args = parser.parse_args()
+
+    store = SeriesStore()
+    if not RB_TOKEN and not all(store.meta(rb_key(ep)) for ep in RB_ENDPOINTS):
         print("ERROR: RB_API_TOKEN environment variable is not set.")
         print()
         print("  PowerShell:  $env:RB_API_TOKEN = 'your-token-here'")
@@ -340,25 +421,19 @@ def main() -> None:
     print("  LTH PVR Band Validation — Research Bitcoin API")
     print("=" * 60)
     print()
-    print(f"Fetching full history ({FETCH_FROM} → {to_time})...")
+    print(f"Loading full history ({FETCH_FROM} → {to_time}, local series store)...")
     print()
 
-    print("  [1/3] LTH supply (supply_distribution/supply_lth)...")
-    raw_supply = rb_fetch("supply_distribution", "supply_lth", FETCH_FROM, to_time)
-    supply = parse_series(raw_supply)
-    print(f"        {len(supply)} data points")
-
-    print("  [2/3] LTH realized price (realizedprice/realized_price_lth)...")
-    raw_rp = rb_fetch("realizedprice", "realized_price_lth", FETCH_FROM, to_time)
-    rp = parse_series(raw_rp)
-    print(f"        {len(rp)} data points")
-
-    print("  [3/3] BTC daily price (price/price)...")
-    raw_price = rb_fetch("price", "price", FETCH_FROM, to_time)
-    price_data = parse_series(raw_price)
-    print(f"        {len(price_data)} data points")
+    try:
+        series = rb_series(RB_ENDPOINTS, FETCH_FROM, to_time, RB_TOKEN, store=store)
+    except RuntimeError as e:
+        print(f"  ERROR: {e}")
+        sys.exit(1)
+    supply = as_series(series["supply_distribution/supply_lth"])
+    rp = as_series(series["realizedprice/realized_price_lth"])
+    price_data = as_series(series["price/price"])
 
-    if not supply or not rp or not price_data:
+    if not len(supply[0]) or not len(rp[0]) or not len(price_data[0]):
         print()
         print("ERROR: One or more series returned no data. Check your RB_API_TOKEN.")
         sys.exit(1)
@@ -445,6 +520,14 @@ def main() -> None:
         )
     print(f"  Full output written to: {out_file}")
 
+    # ---- Full-history diff (optional) --------------------------------------
+    if args.full_diff:
+        print()
+        print("=" * 60)
+        print(f"  FULL-HISTORY BAND DIFF (tolerance {args.tolerance}%)")
+        print("=" * 60)
+        full_history_diff(all_rows, args.tolerance, args.report)
+
     # ========================================================================
     # PRODUCTION HYBRID VALIDATION
     # CI's cumulative_std was seeded with internal data before 2010-07-17 that
@@ -455,8 +538,11 @@ def main() -> None:
     # Here we validate the accuracy of that approach using the CI response
     # captured in ci_bands_raw_response.json.
     # ========================================================================
-    ci_raw_file = "ci_bands_raw_response.json"
-    if os.path.exists(ci_raw_file):
+    try:
+        ci_cols = ci_raw_series(store=store)   # parsed once into the local series store
+    except FileNotFoundError:
+        ci_cols = None
+    if ci_cols:
         print()
         print("=" * 60)
         print("  PRODUCTION HYBRID VALIDATION")
@@ -467,16 +553,17 @@ def main() -> None:
         print("  RB's current lth_supply and lth_realized_price.")
         print()
 
-        with open(ci_raw_file, encoding="utf-8") as f:
-            ci_raw = json.load(f)
-        ci_all_rows = ci_raw["data"]
+        ci_days = day_numbers(next(iter(ci_cols.values()))[0])
+
+        def ci_row(i: int) -> dict:
+            return {"date": from_day(ci_days[i]), **{f: float(v[i]) for f, (_, v) in ci_cols.items()}}
 
         # Extract CI's static constants from the most recent row
-        ci_latest = ci_all_rows[-1]
+        ci_latest = ci_row(-1)
         ci_pvr_mean = ci_latest["pvr_mean"]
         ci_pvr_std = ci_latest["pvr_plus_1sigma"] - ci_pvr_mean
         ci_cum_std = ci_latest["cumulative_std_dev"]
-        ci_row_count = len(ci_all_rows)
+        ci_row_count = len(ci_days)
 
         print(f"  CI constants (from {ci_latest['date']}, {ci_row_count} historical rows):")
         print(f"    pvr_mean          = {ci_pvr_mean:.8f}")
@@ -486,11 +573,14 @@ def main() -> None:
 
         # ---- Obtain RB's current metrics -----------------------------------
         # Use the most recent date available from our already-fetched series
-        rb_latest_date = max(d for d in set(supply) & set(rp) & set(price_data)
-                            if supply[d] > 0 and rp[d] > 0 and price_data[d] > 0)
-        rb_s = supply[rb_latest_date]
-        rb_rp = rp[rb_latest_date]
-        rb_p = price_data[rb_latest_date]
+        common, (i_s, i_r, i_p) = align(supply[0], rp[0], price_data[0])
+        valid = np.flatnonzero((supply[1][i_s] > 0) & (rp[1][i_r] > 0) & (price_data[1][i_p] > 0))
+        k = valid[-1]
+        rb_latest_day = int(common[k])
+        rb_latest_date = from_day(rb_latest_day)
+        rb_s = float(supply[1][i_s[k]])
+        rb_rp = float(rp[1][i_r[k]])
+        rb_p = float(price_data[1][i_p[k]])
 
         print(f"  RB source data for {rb_latest_date}:")
         print(f"    lth_supply        = {rb_s:>20,.3f} BTC")
@@ -500,8 +590,7 @@ def main() -> None:
         # ---- Update cumulative_std for today (Welford one-step) ------------
         rb_lth_mc = rb_s * rb_p
         # Find the CI row for the day before our RB date to get count + mean
-        ci_prev = next((r for r in reversed(ci_all_rows) if r["date"] < rb_latest_date), ci_latest)
-        n_prev = ci_all_rows.index(ci_prev) + 1   # 1-based count up to that row
+        n_prev = int(np.searchsorted(ci_days, rb_latest_day)) or ci_row_count  # rows up to ci_prev
 
         # Welford update: add rb_lth_mc as the new (n_prev+1)th observation
         # We derive mean_prev from ci_prev: cum_std and count aren't directly stored
@@ -519,7 +608,8 @@ def main() -> None:
         print(f"  {'-'*26} {'-'*16}  {'-'*16}  {'-'*9}")
 
         # Find CI row for same date
-        ci_compare = next((r for r in ci_all_rows if r["date"] == rb_latest_date), None)
+        i_cmp = int(np.searchsorted(ci_days, rb_latest_day))
+        ci_compare = ci_row(i_cmp) if i_cmp < ci_row_count and ci_days[i_cmp] == rb_latest_day else None
 
         all_match = True
         for band_key, mult in BAND_MULTIPLIERS.items():
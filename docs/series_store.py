@@ -0,0 +1,228 @@
+"""
+series_store.py
+
+Local on-disk store for the on-chain inputs behind the band scripts and
+diagnostics, so repeat runs slice local files instead of calling the
+Research Bitcoin API or re-parsing ci_bands_raw_response.json.
+
+Series are keyed by (provider, category, field, resolution) and stored as two
+flat binary columns plus a metadata file:
+
+    <root>/<provider>/<category>/<field>/<resolution>/days.i32    int32 days since 1970-01-01
+                                                      values.f64  float64
+                                                      meta.json   coverage + freshness
+
+Reads memory-map both columns and binary-search the date range, so only the
+requested slice is touched.  New rows past the last stored day are appended
+in place; overlapping rows trigger an atomic merge-and-rewrite.
+
+    rb = rb_series(["price/price"], "2010-01-01", "2026-10-19")   # fetch once, then local
+    ci = ci_raw_series(["lth_market_cap", "cumulative_std_dev"])  # JSON parsed once
+
+Store root: $SERIES_STORE_DIR (default: docs/.series_store).
+RB series younger than $SERIES_STORE_MAX_AGE_HOURS (default 12) are not
+re-checked for new days.
+"""
+
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from day_calendar import from_day, to_day
+from ingest import json_columns
+
+STORE_DIR     = os.getenv("SERIES_STORE_DIR",
+                          os.path.join(os.path.dirname(os.path.abspath(__file__)), ".series_store"))
+MAX_AGE_HOURS = float(os.getenv("SERIES_STORE_MAX_AGE_HOURS", "12"))
+CI_RAW_FILE   = "ci_bands_raw_response.json"
+
+def _utcnow() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class SeriesStore:
+    """Append-friendly daily series on disk, keyed by (provider, category, field, resolution)."""
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+
+    def _dir(self, key: tuple) -> str:
+        return os.path.join(self.root, *key)
+
+    def meta(self, key: tuple) -> dict | None:
+        path = os.path.join(self._dir(key), "meta.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_meta(self, key: tuple, days: np.ndarray, **extra) -> None:
+        meta = {**(self.meta(key) or {}), **extra}
+        meta.update({
+            "rows":       int(len(days)),
+            "first":      from_day(days[0]) if len(days) else None,
+            "last":       from_day(days[-1]) if len(days) else None,
+            "updated_at": _utcnow(),
+        })
+        path = os.path.join(self._dir(key), "meta.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def _columns(self, key: tuple) -> tuple[np.ndarray, np.ndarray]:
+        d = self._dir(key)
+        dp, vp = os.path.join(d, "days.i32"), os.path.join(d, "values.f64")
+        if not os.path.exists(dp) or os.path.getsize(dp) == 0:
+            return np.empty(0, np.int32), np.empty(0, np.float64)
+        return (np.memmap(dp, dtype=np.int32, mode="r"),
+                np.memmap(vp, dtype=np.float64, mode="r"))
+
+    def read(self, key: tuple, from_dt: str | None = None,
+             to_dt: str | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Rows with from_dt <= date <= to_dt → (datetime64[D] dates, float64 values)."""
+        days, values = self._columns(key)
+        lo = np.searchsorted(days, to_day(from_dt), "left") if from_dt else 0
+        hi = np.searchsorted(days, to_day(to_dt), "right") if to_dt else len(days)
+        return (np.array(days[lo:hi], dtype=np.int64).astype("datetime64[D]"),
+                np.array(values[lo:hi]))
+
+    def write(self, key: tuple, days, values, **meta) -> None:
+        """Replace a series (sorted, de-duplicated on day; later rows win)."""
+        days = np.asarray(days, dtype=np.int32)
+        values = np.asarray(values, dtype=np.float64)
+        rev_days, rev_idx = np.unique(days[::-1], return_index=True)
+        values = values[::-1][rev_idx]
+        d = self._dir(key)
+        os.makedirs(d, exist_ok=True)
+        for name, arr in (("days.i32", rev_days), ("values.f64", values)):
+            path = os.path.join(d, name)
+            arr.tofile(path + ".tmp")
+            os.replace(path + ".tmp", path)
+        self._write_meta(key, rev_days, **meta)
+
+    def append(self, key: tuple, days, values, **meta) -> None:
+        """Add rows; pure tail appends are written in place, overlaps merge."""
+        days = np.asarray(days, dtype=np.int32)
+        values = np.asarray(values, dtype=np.float64)
+        old_days, old_values = self._columns(key)
+        if len(days) == 0:
+            self._write_meta(key, old_days, **meta)
+            return
+        if len(old_days) and days.min() <= old_days[-1]:
+            merged_days = np.concatenate([np.array(old_days), days])
+            merged_values = np.concatenate([np.array(old_values), values])
+            del old_days, old_values   # release the maps before rewriting
+            self.write(key, merged_days, merged_values, **meta)
+            return
+        order = np.argsort(days, kind="stable")
+        d = self._dir(key)
+        os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, "days.i32"), "ab") as f:
+            days[order].tofile(f)
+        with open(os.path.join(d, "values.f64"), "ab") as f:
+            values[order].tofile(f)
+        all_days, _ = self._columns(key)
+        self._write_meta(key, all_days, **meta)
+
+    def is_fresh(self, key: tuple, max_age_hours: float = MAX_AGE_HOURS) -> bool:
+        meta = self.meta(key)
+        if not meta or not meta.get("fetched_at"):
+            return False
+        fetched = datetime.strptime(meta["fetched_at"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - fetched < timedelta(hours=max_age_hours)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Providers
+# ─────────────────────────────────────────────────────────────────────────────
+
+def rb_key(endpoint: str, resolution: str = "d1") -> tuple:
+    category, field = endpoint.split("/")
+    return ("rb", category, field, resolution)
+
+
+def rb_series(
+    endpoints: list[str],
+    from_dt: str,
+    to_dt: str,
+    token: str | None = None,
+    store: SeriesStore | None = None,
+    max_age_hours: float = MAX_AGE_HOURS,
+    refresh: bool = False,
+) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """
+    Research Bitcoin series over [from_dt, to_dt), served from the store.
+
+    Only the missing head (earlier than anything fetched before) or tail (after
+    the last stored day, once the series is older than max_age_hours) is
+    downloaded, via rb_client.fetch_series.  refresh=True re-downloads the range.
+    """
+    store = store or SeriesStore()
+    token = token if token is not None else os.getenv("RB_API_TOKEN", "")
+    last_day = (date.fromisoformat(to_dt) - timedelta(days=1)).isoformat()
+
+    # Group endpoints by the window they still need so each gap is one parallel fetch
+    gaps: dict[tuple[str, str], list[str]] = {}
+    for ep in endpoints:
+        meta = store.meta(rb_key(ep))
+        if refresh or not meta:
+            gaps.setdefault((from_dt, to_dt), []).append(ep)
+            continue
+        if from_dt < meta["covered_from"]:
+            gaps.setdefault((from_dt, meta["covered_from"]), []).append(ep)
+        tail_from = (date.fromisoformat(meta["last"]) + timedelta(days=1)).isoformat() \
+            if meta.get("last") else meta["covered_from"]
+        if tail_from < to_dt and last_day > meta["covered_to"] \
+                and not store.is_fresh(rb_key(ep), max_age_hours):
+            gaps.setdefault((tail_from, to_dt), []).append(ep)
+
+    if gaps:
+        from rb_client import fetch_series   # network path only
+        for (a, b), eps in gaps.items():
+            fetched = fetch_series(eps, a, b, token)
+            for ep in eps:
+                dates, values = fetched[ep]
+                meta = store.meta(rb_key(ep)) or {}
+                covered_from = min(a, meta.get("covered_from", a))
+                covered_to = max(last_day, meta.get("covered_to", last_day))
+                save = store.write if refresh or not meta else store.append
+                save(rb_key(ep), dates.astype(np.int64), values,
+                     source=f"researchbitcoin:{ep}", fetched_at=_utcnow(),
+                     covered_from=covered_from, covered_to=covered_to)
+
+    return {ep: store.read(rb_key(ep), from_dt, last_day) for ep in endpoints}
+
+
+def ci_key(field: str) -> tuple:
+    return ("ci", "bands_raw", field, "d1")
+
+
+def ci_raw_series(
+    fields: list[str] | None = None,
+    json_path: str = CI_RAW_FILE,
+    store: SeriesStore | None = None,
+) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """
+    Columns of the captured ChartInspect response as (dates, values) arrays.
+    The JSON is streamed into the store once (ingest.json_columns) and
+    re-imported only when the file changes; fields=None returns every numeric
+    column.
+    """
+    store = store or SeriesStore()
+    index = ("ci", "bands_raw", "_index", "d1")
+    meta = store.meta(index)
+    mtime = os.path.getmtime(json_path) if os.path.exists(json_path) else None
+    if mtime is not None and (not meta or meta.get("source_mtime") != mtime):
+        days, columns = json_columns(json_path, "data", "date")
+        numeric = sorted(columns)
+        for name, vals in columns.items():
+            store.write(ci_key(name), days, vals, source=os.path.abspath(json_path),
+                        source_mtime=mtime, fetched_at=_utcnow())
+        store.write(index, days, np.zeros(len(days)), source=os.path.abspath(json_path),
+                    source_mtime=mtime, fields=numeric, fetched_at=_utcnow())
+        meta = store.meta(index)
+    if not meta:
+        raise FileNotFoundError(f"{json_path} not found and no stored copy in {store.root}")
+    return {f: store.read(ci_key(f)) for f in (fields or meta["fields"])}
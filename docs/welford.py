@@ -0,0 +1,156 @@
+"""
+welford.py
+
+Segment-parallel running (Welford) statistics for the cumulative LTH market
+cap std dev behind the band scripts.
+
+A series is split into contiguous segments, each processed in a worker
+process into its own local running state (n, mean, M2) per row.  The segment
+totals are then chained with Chan's pairwise merge
+
+    n     = n_a + n_b
+    delta = mean_b - mean_a
+    mean  = mean_a + delta * n_b / n
+    M2    = M2_a + M2_b + delta² * n_a * n_b / n
+
+to give the exact state at the start of every segment, and that start state is
+merged (vectorised) into each local prefix, giving the global cum_std for
+every row.  The result matches the sequential loop to floating-point rounding.
+
+    cum_std, state = prefix_cum_std(lth_mc)                       # from scratch
+    cum_std, state = prefix_cum_std(new_mc, start=(n, mean, m2))  # continue a stored state
+
+    # Many variants (alternative seeds / series starts) share one process pool:
+    out = prefix_cum_std_many({"2010-07-17": mc[i0:], "2011-01-01": mc[i1:]})
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+MIN_SEGMENT = 2048   # rows; shorter series / segments are not worth a process
+
+State = tuple[int, float, float]   # (n, mean, M2)
+EMPTY: State = (0, 0.0, 0.0)
+
+
+def chan_merge(a: State, b: State) -> State:
+    """Exact combination of two disjoint samples' (n, mean, M2)."""
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    if n == 0:
+        return EMPTY
+    delta = mean_b - mean_a
+    return n, mean_a + delta * n_b / n, m2_a + m2_b + delta * delta * n_a * n_b / n
+
+
+def _segment_prefix(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Local running mean and M2 after each row of one segment (worker)."""
+    means = np.empty(len(values))
+    m2s = np.empty(len(values))
+    n, mean, m2 = 0, 0.0, 0.0
+    for i, x in enumerate(values.tolist()):
+        n += 1
+        delta = x - mean
+        mean += delta / n
+        m2 += delta * (x - mean)
+        means[i] = mean
+        m2s[i] = m2
+    return means, m2s
+
+
+def _split(n: int, segments: int) -> list[tuple[int, int]]:
+    bounds = np.linspace(0, n, segments + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def prefix_stats_many(
+    series: dict[str, np.ndarray],
+    starts: dict[str, State] | None = None,
+    max_workers: int | None = None,
+    min_segment: int = MIN_SEGMENT,
+) -> dict[str, tuple[np.ndarray, np.ndarray, State]]:
+    """
+    Running mean and std dev (ddof=1) for several independent series at once.
+
+    series : {name: float64 values in date order}
+    starts : optional {name: (n, mean, M2)} state to continue from (default empty)
+
+    Returns {name: (mean per row, std per row, final state)}; std is 0.0 below
+    two observations.  Every (series × segment)
+    job runs on one shared process pool; with one worker, a single job, or
+    fewer than min_segment rows in total, everything runs inline.
+    """
+    starts = starts or {}
+    workers = max_workers or os.cpu_count() or 1
+    series = {k: np.asarray(v, dtype=np.float64) for k, v in series.items()}
+
+    jobs: list[tuple[str, int, int]] = []
+    for name, values in series.items():
+        segments = max(1, min(workers, len(values) // min_segment))
+        jobs.extend((name, a, b) for a, b in _split(len(values), segments))
+
+    chunks = [series[name][a:b] for name, a, b in jobs]
+    if workers == 1 or len(jobs) == 1 or sum(map(len, chunks)) < min_segment:
+        results = [_segment_prefix(c) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_segment_prefix, chunks))
+
+    out: dict[str, tuple[np.ndarray, np.ndarray, State]] = {}
+    mean_parts: dict[str, list[np.ndarray]] = {name: [] for name in series}
+    std_parts: dict[str, list[np.ndarray]] = {name: [] for name in series}
+    state = {name: starts.get(name, EMPTY) for name in series}
+    for (name, a, b), (means, m2s) in zip(jobs, results):
+        n_a, mean_a, m2_a = state[name]
+        n_b = np.arange(1, b - a + 1, dtype=np.float64)
+        n = n_a + n_b
+        delta = means - mean_a
+        m2 = m2_a + m2s + delta * delta * n_a * n_b / n
+        mean_parts[name].append(mean_a + delta * n_b / n)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            std_parts[name].append(np.where(n >= 2, np.sqrt(m2 / (n - 1)), 0.0))
+        state[name] = chan_merge(state[name], (b - a, float(means[-1]), float(m2s[-1])))
+
+    for name in series:
+        mean = np.concatenate(mean_parts[name]) if mean_parts[name] else np.empty(0)
+        std = np.concatenate(std_parts[name]) if std_parts[name] else np.empty(0)
+        out[name] = (mean, std, state[name])
+    return out
+
+
+def prefix_cum_std_many(
+    series: dict[str, np.ndarray],
+    starts: dict[str, State] | None = None,
+    max_workers: int | None = None,
+    min_segment: int = MIN_SEGMENT,
+) -> dict[str, tuple[np.ndarray, State]]:
+    """Running cum_std for several series → {name: (cum_std per row, final state)}."""
+    stats = prefix_stats_many(series, starts, max_workers, min_segment)
+    return {name: (std, state) for name, (_, std, state) in stats.items()}
+
+
+def prefix_stats(
+    values,
+    start: State = EMPTY,
+    max_workers: int | None = None,
+    min_segment: int = MIN_SEGMENT,
+) -> tuple[np.ndarray, np.ndarray, State]:
+    """Running mean and std dev of one series (optionally continuing `start`)."""
+    return prefix_stats_many(
+        {"_": values}, {"_": start}, max_workers=max_workers, min_segment=min_segment,
+    )["_"]
+
+
+def prefix_cum_std(
+    values,
+    start: State = EMPTY,
+    max_workers: int | None = None,
+    min_segment: int = MIN_SEGMENT,
+) -> tuple[np.ndarray, State]:
+    """Running cum_std of one series (optionally continuing `start`) + final state."""
+    return prefix_cum_std_many(
+        {"_": values}, {"_": start}, max_workers=max_workers, min_segment=min_segment,
+    )["_"]
@@ -0,0 +1,622 @@
+#!/usr/bin/env python3
+"""
+Offline Replay Harness — Walk-Forward Testing Orchestrator
+===========================================================
+
+A local stand-in for the Supabase project used by run_walk_forward.py, so the
+orchestrator can be benchmarked and regression-tested on a laptop with no
+network access.  It is a small threaded HTTP server that implements just the
+PostgREST and edge-function surface the orchestrator touches:
+
+  REST  /rest/v1/bt_runs, bt_params, bt_results_daily, bt_std_dca_balances,
+                 wft_runs, wft_folds, wft_fold_daily, wft_fold_cache,
+                 strategy_variation_templates,
+                 v_backtest_prices, v_backtest_prices_rb
+        /rest/v1/rpc/wft_finish_fold
+  EF    /functions/v1/ef_bt_execute
+        /functions/v1/ef_optimize_lth_pvr_strategy
+
+Responses come from a fixtures JSON file (see --record), with anything
+missing synthesised deterministically: band rows are generated for the whole
+WFT history, and ef_bt_execute produces a seeded NAV path keyed on the
+bt_params payload, so identical params always give identical results.
+Recorded simulation results are keyed by the full run identity (start, end
+and a hash of the bt_params payload); once any are recorded, a simulation
+with no recording is an error rather than a synthetic or foreign result.
+
+Latency and failures are injectable so orchestrator overhead, concurrency and
+retry behaviour can be measured without touching production.
+
+Usage:
+  # 1. (optional, needs network) record fixtures from a completed WFT run
+  python docs/wft/replay_server.py --record docs/wft/replay_fixtures.json \\
+      --wft-run-id <existing-wft-run-id>
+
+  # 2. serve
+  python docs/wft/replay_server.py --fixtures docs/wft/replay_fixtures.json \\
+      --port 54321 --latency-ms 25 --ef-latency-ms 1500 --fail-rate 0.02
+
+  # 3. point the orchestrator at it (PowerShell)
+  $env:SUPABASE_URL              = "http://127.0.0.1:54321"
+  $env:SUPABASE_SERVICE_ROLE_KEY = "replay"
+  $env:ORG_ID                    = "b0a77009-03b9-44a1-ae1d-34f157d44a8b"
+  python docs/wft/run_walk_forward.py
+
+Request counts and per-route latency are printed on Ctrl-C and are also
+available at GET /__stats.  POST /__reset clears all written rows.
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import signal
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ORG_ID = "b0a77009-03b9-44a1-ae1d-34f157d44a8b"
+
+# Primary keys used to resolve `Prefer: resolution=merge-duplicates` upserts.
+PRIMARY_KEYS = {
+    "bt_runs":        ("bt_run_id",),
+    "bt_params":      ("bt_run_id",),
+    "wft_runs":       ("wft_run_id",),
+    "wft_folds":      ("wft_fold_id",),
+    "wft_fold_cache": ("cache_key",),
+}
+
+BAND_VIEWS = {"v_backtest_prices": "ci", "v_backtest_prices_rb": "rb"}
+
+# bt_params columns that identify a simulation (run_walk_forward.bt_params_payload)
+PARAM_COLS = (
+    "start_date", "end_date", "upfront_contrib_usdt", "monthly_contrib_usdt",
+    "maker_bps_trade", "maker_bps_contrib", "platform_fee_pct", "performance_fee_pct",
+    "b1", "b2", "b3", "b4", "b5", "b6", "b7", "b8", "b9", "b10", "b11",
+    "bear_pause_enter_sigma", "bear_pause_exit_sigma",
+    "momo_len", "momo_thr", "enable_retrace", "retrace_base",
+)
+
+# Production "Progressive" variation — used when the fixtures omit one.
+DEFAULT_VARIATION = {
+    "id": "00000000-0000-0000-0000-000000000001",
+    "variation_name": "progressive",
+    "display_name": "Progressive (replay)",
+    "is_production": True,
+    "b1": 0.22796, "b2": 0.21397, "b3": 0.19943, "b4": 0.18088, "b5": 0.12229,
+    "b6": 0.00157, "b7": 0.00200, "b8": 0.00441, "b9": 0.01287, "b10": 0.03300,
+    "b11": 0.09572,
+    "bear_pause_enter_sigma": 2.0, "bear_pause_exit_sigma": -1.0,
+    "momentum_length": 5, "momentum_threshold": 0.0,
+    "enable_retrace": True, "retrace_base": 3,
+}
+
+SYNTHETIC_BANDS_FROM = "2013-01-01"
+SYNTHETIC_BANDS_TO   = "2025-12-31"
+SYNTHETIC_LADDER = {
+    "m100": -1.00, "m075": -0.75, "m050": -0.50, "m025": -0.25, "mean": 0.00,
+    "p050":  0.50, "p100":  1.00, "p150":  1.50, "p200":  2.00, "p250": 2.50,
+}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Fixtures / synthetic data
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _daterange(start: str, end: str):
+    d = datetime.date.fromisoformat(start)
+    last = datetime.date.fromisoformat(end)
+    while d <= last:
+        yield d.isoformat()
+        d += datetime.timedelta(days=1)
+
+
+def synthetic_bands(org_id: str, source: str) -> list:
+    """
+    Deterministic band/price rows shaped like v_backtest_prices[_rb]: a random
+    walk for price, a slow EMA of it as the mean, and a log-symmetric ladder.
+    """
+    rng = random.Random(f"bands:{source}")
+    rows = []
+    px = mean = 13.5
+    for d in _daterange(SYNTHETIC_BANDS_FROM, SYNTHETIC_BANDS_TO):
+        px *= math.exp(rng.gauss(0.0012, 0.035))
+        mean += (px - mean) / 365
+        row = {"org_id": org_id, "close_date": d, "btc_price_usd": round(px, 2)}
+        for band, sigma in SYNTHETIC_LADDER.items():
+            row[f"price_at_{band}"] = round(mean * math.exp(0.6 * sigma), 2)
+        rows.append(row)
+    return rows
+
+
+def synthetic_results(bt_run_id: str, params: dict) -> tuple:
+    """
+    Seeded (bt_results_daily, bt_std_dca_balances) rows for one simulation.
+    The seed is the params payload, so reruns with identical inputs agree.
+    """
+    seed_src = json.dumps({k: v for k, v in params.items() if k != "bt_run_id"},
+                          sort_keys=True, default=str)
+    rng = random.Random(hashlib.sha256(seed_src.encode()).hexdigest())
+    upfront = float(params.get("upfront_contrib_usdt") or 0)
+    monthly = float(params.get("monthly_contrib_usdt") or 0)
+    lth_rows, std_rows = [], []
+    lth_nav = std_nav = contrib = 0.0
+    dates = list(_daterange(params["start_date"], params["end_date"]))
+    for i, d in enumerate(dates):
+        add = (upfront if i == 0 else 0.0) + (monthly if d.endswith("-01") else 0.0)
+        contrib += add
+        mkt = rng.gauss(0.001, 0.03)
+        lth_nav = (lth_nav + add) * (1 + mkt * 0.7 + rng.gauss(0.0002, 0.004))
+        std_nav = (std_nav + add) * (1 + mkt)
+        years = max((i + 1) / 365.25, 1 / 365.25)
+        cagr = ((lth_nav / contrib) ** (1 / years) - 1) * 100 if contrib > 0 else 0.0
+        lth_rows.append({
+            "bt_run_id": bt_run_id, "close_date": d, "nav_usd": round(lth_nav, 2),
+            "btc_balance": round(lth_nav * 0.6 / 30000, 8),
+            "usdt_balance": round(lth_nav * 0.4, 2),
+            "cagr_percent": round(cagr, 4),
+        })
+        std_rows.append({
+            "bt_run_id": bt_run_id, "trade_date": d, "nav_usd": round(std_nav, 2),
+            "btc_balance": round(std_nav / 30000, 8), "usdt_balance": 0.0,
+        })
+    return lth_rows, std_rows
+
+
+def run_key(params: dict) -> str:
+    """
+    "start:end:hash" identity of one simulation.  Numbers are compared as
+    floats, so a payload and the same row read back from Postgres agree.
+    """
+    def norm(v):
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            return float(v)
+        return str(v)[:10] if isinstance(v, str) and re.match(r"\d{4}-\d{2}-\d{2}", v) else v
+    ident = json.dumps({c: norm(params.get(c)) for c in PARAM_COLS}, sort_keys=True, default=str)
+    digest = hashlib.sha256(ident.encode()).hexdigest()[:16]
+    return f"{str(params['start_date'])[:10]}:{str(params['end_date'])[:10]}:{digest}"
+
+
+def load_fixtures(path: str, org_id: str) -> dict:
+    fx: dict = {}
+    if path:
+        with open(path, encoding="utf-8") as f:
+            fx = json.load(f)
+    fx.setdefault("strategy_variation_templates", [DEFAULT_VARIATION])
+    bands = fx.setdefault("bands", {})
+    for source in ("rb", "ci"):
+        if not bands.get(source):
+            bands[source] = synthetic_bands(org_id, source)
+    fx.setdefault("bt_results", {})   # run_key(params) → {"lth": [...], "std": [...]}
+    stale = [k for k in fx["bt_results"] if k.count(":") != 2]
+    if stale:
+        sys.exit(f"Error: {path} keys bt_results by start date only ({stale[0]!r}); "
+                 "re-record it with --record")
+    fx.setdefault("optimizer", {})    # train end_date → StrategyConfig
+    return fx
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# In-memory PostgREST subset
+# ─────────────────────────────────────────────────────────────────────────────
+
+_OPS = {
+    "eq":  lambda a, b: str(a) == b if not isinstance(a, bool) else str(a).lower() == b,
+    "neq": lambda a, b: str(a) != b,
+    "gt":  lambda a, b: a is not None and _cmp(a) > _cmp(b),
+    "gte": lambda a, b: a is not None and _cmp(a) >= _cmp(b),
+    "lt":  lambda a, b: a is not None and _cmp(a) < _cmp(b),
+    "lte": lambda a, b: a is not None and _cmp(a) <= _cmp(b),
+}
+
+
+def _cmp(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return str(v)
+
+
+def parse_filters(query: dict) -> list:
+    """Translate PostgREST query params into (column, op, value) triples."""
+    filters = []
+    for key, values in query.items():
+        if key in ("select", "order", "limit", "offset", "on_conflict"):
+            continue
+        for raw in values:
+            if key == "and":
+                for part in raw.strip("()").split(","):
+                    col, op, val = part.split(".", 2)
+                    filters.append((col, op, val))
+            else:
+                op, _, val = raw.partition(".")
+                filters.append((key, op, val))
+    return filters
+
+
+class Store:
+    def __init__(self, fixtures: dict):
+        self.lock = threading.Lock()
+        self.fixtures = fixtures
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.tables = {name: [] for name in (
+                "bt_runs", "bt_params", "bt_results_daily", "bt_std_dca_balances",
+                "wft_runs", "wft_folds", "wft_fold_daily", "wft_fold_cache",
+            )}
+            self.tables["strategy_variation_templates"] = \
+                list(self.fixtures["strategy_variation_templates"])
+            for view, source in BAND_VIEWS.items():
+                self.tables[view] = self.fixtures["bands"][source]
+
+    def select(self, table: str, query: dict) -> list:
+        with self.lock:
+            rows = [r for r in self.tables.get(table, [])
+                    if all(_OPS[op](r.get(col), val)
+                           for col, op, val in parse_filters(query))]
+        for spec in reversed((query.get("order") or [""])[0].split(",")):
+            if spec:
+                col, _, direction = spec.partition(".")
+                rows.sort(key=lambda r: _cmp(r.get(col)), reverse=direction == "desc")
+        offset = int((query.get("offset") or ["0"])[0])
+        limit = int((query.get("limit") or ["1000"])[0])
+        rows = rows[offset:offset + limit]
+        cols = (query.get("select") or ["*"])[0]
+        if cols != "*":
+            keep = cols.split(",")
+            rows = [{c: r.get(c) for c in keep} for r in rows]
+        return rows
+
+    def insert(self, table: str, rows, upsert: bool) -> None:
+        rows = rows if isinstance(rows, list) else [rows]
+        pk = PRIMARY_KEYS.get(table)
+        with self.lock:
+            target = self.tables.setdefault(table, [])
+            for row in rows:
+                if pk:
+                    key = tuple(row.get(c) for c in pk)
+                    existing = next((r for r in target
+                                     if tuple(r.get(c) for c in pk) == key), None)
+                    if existing is not None:
+                        if not upsert:
+                            raise ValueError(f"duplicate key {key} in {table}")
+                        existing.update(row)
+                        continue
+                target.append(dict(row))
+
+    def update(self, table: str, query: dict, data: dict) -> int:
+        filters = parse_filters(query)
+        n = 0
+        with self.lock:
+            for r in self.tables.get(table, []):
+                if all(_OPS[op](r.get(col), val) for col, op, val in filters):
+                    r.update(data)
+                    n += 1
+        return n
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Routes
+# ─────────────────────────────────────────────────────────────────────────────
+
+def rpc_wft_finish_fold(store: Store, args: dict) -> None:
+    fold_id = args["p_wft_fold_id"]
+    if not store.update("wft_folds", {"wft_fold_id": [f"eq.{fold_id}"]},
+                        args.get("p_fold") or {}):
+        raise ValueError(f"wft_fold_id {fold_id} not found")
+    cols = zip(args["p_result_date"], args["p_track"], args["p_nav_usd"],
+               args["p_btc_balance"], args["p_usdt_balance"])
+    store.insert("wft_fold_daily", [
+        {"wft_fold_id": fold_id, "result_date": d, "track": t,
+         "nav_usd": nav, "btc_balance": btc, "usdt_balance": usdt}
+        for d, t, nav, btc, usdt in cols
+    ], upsert=False)
+    fold = store.select("wft_folds", {"wft_fold_id": [f"eq.{fold_id}"]})[0]
+    store.update("wft_runs", {"wft_run_id": [f"eq.{fold['wft_run_id']}"]},
+                 {"folds_completed": args["p_folds_completed"]})
+
+
+def ef_bt_execute(store: Store, body: dict) -> dict:
+    run_id = body["bt_run_id"]
+    params = store.select("bt_params", {"bt_run_id": [f"eq.{run_id}"]})
+    if not params:
+        raise ValueError(f"bt_params missing for bt_run_id {run_id}")
+    params = params[0]
+    recordings = store.fixtures["bt_results"]
+    if recordings:
+        key = run_key(params)
+        if key not in recordings:
+            raise LookupError(f"no recorded bt_results for run {key} "
+                              f"({params['start_date']} → {params['end_date']}); the fixtures "
+                              "hold other runs — re-record, or serve without recorded results")
+        lth = [{**r, "bt_run_id": run_id} for r in recordings[key]["lth"]]
+        std = [{**r, "bt_run_id": run_id} for r in recordings[key]["std"]]
+    else:
+        lth, std = synthetic_results(run_id, params)
+    store.insert("bt_results_daily", lth, upsert=False)
+    store.insert("bt_std_dca_balances", std, upsert=False)
+    store.update("bt_runs", {"bt_run_id": [f"eq.{run_id}"]}, {
+        "status": "ok",
+        "finished_at": datetime.datetime.utcnow().isoformat() + "Z",
+        "band_source": body.get("band_source", "rb"),
+    })
+    return {"status": "ok", "bt_run_id": run_id}
+
+
+def ef_optimize(store: Store, body: dict) -> dict:
+    cfg = store.fixtures["optimizer"].get(body.get("end_date", ""))
+    if cfg is None:
+        var = store.tables["strategy_variation_templates"][0]
+        momo = body.get("momo_length_range") or {}
+        cfg = {
+            "B": {f"B{i}": float(var[f"b{i}"]) for i in range(1, 12)},
+            "bearPauseEnterSigma": float(var["bear_pause_enter_sigma"]),
+            "bearPauseExitSigma":  float(var["bear_pause_exit_sigma"]),
+            "momentumLength":      int(momo.get("min", var["momentum_length"])),
+            "momentumThreshold":   float(var["momentum_threshold"]),
+            "enableRetrace":       bool(var["enable_retrace"]),
+            "retraceBase":         int(var["retrace_base"]),
+        }
+    return {"best": {"config": cfg}}
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    server_version = "WFTReplay/1.0"
+    store: Store
+    opts: argparse.Namespace
+    rng: random.Random
+    stats: dict
+    stats_lock = threading.Lock()
+
+    def log_message(self, fmt, *args):   # keep the console quiet
+        if self.opts.verbose:
+            super().log_message(fmt, *args)
+
+    # ── plumbing ────────────────────────────────────────────────────────────
+    def _send(self, status: int, payload=None) -> None:
+        body = b"" if payload is None else json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(n)) if n else None
+
+    def _route(self) -> tuple:
+        url = urllib.parse.urlsplit(self.path)
+        return url.path, urllib.parse.parse_qs(url.query)
+
+    def _handle(self, method: str) -> None:
+        path, query = self._route()
+        route = re.sub(r"^/(rest|functions)/v1/", "", path)
+        t0 = time.monotonic()
+        status = 500
+        try:
+            if path.startswith("/__"):
+                status = self._admin(method, path)
+                return
+            is_ef = path.startswith("/functions/v1/")
+            delay_ms = self.opts.ef_latency_ms if is_ef else self.opts.latency_ms
+            if delay_ms:
+                time.sleep(delay_ms / 1000 * self.rng.uniform(0.8, 1.2))
+            if (self.opts.fail_rate and re.search(self.opts.fail_path, route)
+                    and self.rng.random() < self.opts.fail_rate):
+                status = 503
+                self._send(status, {"message": "injected failure"})
+                return
+            status, payload = self._dispatch(method, path, route, query)
+            self._send(status, payload)
+        except Exception as exc:
+            status = 400
+            self._send(status, {"message": str(exc)})
+        finally:
+            with self.stats_lock:
+                s = self.stats.setdefault(f"{method} {route}",
+                                          {"requests": 0, "errors": 0, "ms": 0.0})
+                s["requests"] += 1
+                s["errors"] += status >= 400
+                s["ms"] += (time.monotonic() - t0) * 1000
+
+    def _dispatch(self, method: str, path: str, route: str, query: dict) -> tuple:
+        if path.startswith("/functions/v1/"):
+            body = self._body() or {}
+            if route == "ef_bt_execute":
+                return 200, ef_bt_execute(self.store, body)
+            if route == "ef_optimize_lth_pvr_strategy":
+                return 200, ef_optimize(self.store, body)
+            return 404, {"message": f"unknown edge function {route}"}
+
+        if route.startswith("rpc/"):
+            if route == "rpc/wft_finish_fold":
+                rpc_wft_finish_fold(self.store, self._body())
+                return 204, None
+            return 404, {"message": f"unknown rpc {route}"}
+
+        if method == "GET":
+            return 200, self.store.select(route, query)
+        if method == "POST":
+            prefer = self.headers.get("Prefer", "")
+            self.store.insert(route, self._body(),
+                              upsert="merge-duplicates" in prefer)
+            return 201, None
+        if method == "PATCH":
+            self.store.update(route, query, self._body() or {})
+            return 204, None
+        return 405, {"message": f"{method} not supported"}
+
+    def _admin(self, method: str, path: str) -> int:
+        if path == "/__stats":
+            with self.stats_lock:
+                self._send(200, self.stats)
+            return 200
+        if path == "/__reset" and method == "POST":
+            self.store.reset()
+            with self.stats_lock:
+                self.stats.clear()
+            self._send(204)
+            return 204
+        self._send(404, {"message": "unknown admin route"})
+        return 404
+
+    def do_GET(self):   self._handle("GET")
+    def do_POST(self):  self._handle("POST")
+    def do_PATCH(self): self._handle("PATCH")
+
+
+def print_stats(stats: dict) -> None:
+    total = sum(s["requests"] for s in stats.values())
+    print()
+    print(f"  {'Route':<44} {'Req':>6} {'Err':>5} {'Avg ms':>9}")
+    print(f"  {'-'*44} {'-'*6} {'-'*5} {'-'*9}")
+    for route, s in sorted(stats.items(), key=lambda kv: -kv[1]["requests"]):
+        print(f"  {route:<44} {s['requests']:>6} {s['errors']:>5}"
+              f" {s['ms'] / max(s['requests'], 1):>9.1f}")
+    print(f"  {'TOTAL':<44} {total:>6}")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Fixture recording (needs network + service role key)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def record_fixtures(out_path: str, wft_run_id: str) -> None:
+    """
+    Snapshot what a replay needs from a live project: variation templates, the
+    band views, and the Track A / Track B results (keyed by run_key of their
+    bt_params) + Track B configs of an existing WFT run.
+    """
+    import httpx
+
+    url = (os.getenv("SUPABASE_URL") or os.getenv("SB_URL") or "").rstrip("/")
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
+    org_id = os.getenv("ORG_ID", DEFAULT_ORG_ID)
+    if not url or not key:
+        sys.exit("Error: SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY are required to record")
+
+    def get_all(client, table: str, params: dict, schema: str) -> list:
+        headers = {"apikey": key, "Authorization": f"Bearer {key}",
+                   "Accept-Profile": schema}
+        out, offset = [], 0
+        while True:
+            r = client.get(f"{url}/rest/v1/{table}", headers=headers,
+                           params={**params, "limit": "1000", "offset": str(offset)})
+            r.raise_for_status()
+            page = r.json()
+            out.extend(page)
+            if len(page) < 1000:
+                return out
+            offset += 1000
+
+    fx: dict = {"org_id": org_id, "bands": {}, "bt_results": {}, "optimizer": {}}
+    with httpx.Client(timeout=60.0) as client:
+        print("Recording strategy_variation_templates …")
+        fx["strategy_variation_templates"] = get_all(
+            client, "strategy_variation_templates", {"select": "*"}, "lth_pvr")
+        for view, source in BAND_VIEWS.items():
+            print(f"Recording {view} …")
+            fx["bands"][source] = get_all(client, view, {
+                "select": "*", "org_id": f"eq.{org_id}", "order": "close_date.asc",
+            }, "lth_pvr_bt")
+        folds = get_all(client, "wft_folds", {
+            "select": "*", "wft_run_id": f"eq.{wft_run_id}", "order": "fold_number.asc",
+        }, "lth_pvr_bt")
+        for fold in folds:
+            print(f"Recording fold {fold['fold_number']} …")
+            if fold.get("track_b_best_config"):
+                fx["optimizer"][fold["train_end"]] = fold["track_b_best_config"]
+            for track in ("a", "b"):
+                run_id = fold.get(f"track_{track}_bt_run_id")
+                if not run_id:
+                    continue
+                params = get_all(client, "bt_params", {
+                    "select": "*", "bt_run_id": f"eq.{run_id}",
+                }, "lth_pvr_bt")
+                if not params:
+                    sys.exit(f"Error: bt_params missing for Track {track.upper()} "
+                             f"run {run_id} (fold {fold['fold_number']})")
+                fx["bt_results"][run_key(params[0])] = {
+                    "lth": get_all(client, "bt_results_daily", {
+                        "select": "*", "bt_run_id": f"eq.{run_id}", "order": "close_date.asc",
+                    }, "lth_pvr_bt"),
+                    "std": get_all(client, "bt_std_dca_balances", {
+                        "select": "*", "bt_run_id": f"eq.{run_id}", "order": "trade_date.asc",
+                    }, "lth_pvr_bt"),
+                }
+
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(fx, f)
+    print(f"Fixtures written to {out_path}")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Main
+# ─────────────────────────────────────────────────────────────────────────────
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--fixtures", default="",
+                        help="Fixtures JSON (default: fully synthetic data)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="Added latency per REST request (±20%% jitter)")
+    parser.add_argument("--ef-latency-ms", type=float, default=0.0,
+                        help="Added latency per edge-function call (±20%% jitter)")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="Probability (0-1) of answering 503 instead")
+    parser.add_argument("--fail-path", default=".*",
+                        help="Only inject failures on routes matching this regex")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="RNG seed for latency jitter and failure injection")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    parser.add_argument("--record", metavar="OUT",
+                        help="Record fixtures from SUPABASE_URL into OUT and exit")
+    parser.add_argument("--wft-run-id", default="",
+                        help="WFT run whose fold results are recorded (with --record)")
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.wft_run_id:
+            sys.exit("Error: --record requires --wft-run-id")
+        record_fixtures(args.record, args.wft_run_id)
+        return
+
+    org_id = os.getenv("ORG_ID", DEFAULT_ORG_ID)
+    fixtures = load_fixtures(args.fixtures, org_id)
+
+    ReplayHandler.store = Store(fixtures)
+    ReplayHandler.opts = args
+    ReplayHandler.rng = random.Random(args.seed)
+    ReplayHandler.stats = {}
+
+    server = ThreadingHTTPServer((args.host, args.port), ReplayHandler)
+    # Treat SIGTERM like Ctrl-C so backgrounded servers still print their stats
+    signal.signal(signal.SIGTERM, lambda *_: (_ for _ in ()).throw(KeyboardInterrupt))
+    print(f"WFT replay server on http://{args.host}:{args.port}"
+          f"  (latency {args.latency_ms:.0f} ms, EF {args.ef_latency_ms:.0f} ms,"
+          f" fail-rate {args.fail_rate:.1%})")
+    print(f"  $env:SUPABASE_URL = 'http://{args.host}:{args.port}'")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print_stats(ReplayHandler.stats)
+
+
+if __name__ == "__main__":
+    main()
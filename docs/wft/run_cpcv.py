@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Combinatorially Purged Cross-Validation — LTH PVR Strategy
+===========================================================
+
+A third validation mode alongside the walk-forward Track A / Track B runs in
+run_walk_forward.py.  Nine sequential folds give nine pass/fail verdicts; CPCV
+instead splits the whole history into N contiguous groups and tests on every
+combination of k groups, training on the remaining N-k:
+
+  - Training groups adjacent to a test group are purged (the last
+    WFT_CPCV_PURGE_DAYS rows before a test group) and embargoed (the first
+    WFT_CPCV_EMBARGO_DAYS rows after one) so no training window overlaps the
+    HWM/momentum state of the test window.
+  - "Selected" (Track B analogue): the candidate config with the best mean
+    training excess is applied to the test groups.
+  - "Frozen"   (Track A analogue): the variation's own params.
+
+Each group is simulated independently from a fresh portfolio (upfront +
+monthly contributions, 2-year bear-pause warmup) — the same shape as a WFT
+fold.  Simulation runs locally on arrays loaded once from the band view, with
+the day loop ported from _shared/lth_pvr_simulator.ts (platform fee plan, no
+USDPC).  Because a group's result depends only on (candidate, group, trims),
+every unique simulation is computed once and fanned out over a process pool.
+
+Output is the distribution of OOS excess NAV over Std DCA, in percent of the
+Std DCA NAV, across every (combination, test group) pair, plus the
+C(N-1, k-1) reconstructed backtest paths.  Nothing is written to the database.
+
+Required environment variables:
+  SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, ORG_ID   (as run_walk_forward.py)
+
+Optional environment variables:
+  WFT_VARIATION_ID, WFT_UPFRONT_USDT, WFT_MONTHLY_USDT, WFT_BAND_SOURCE
+                         (as run_walk_forward.py)
+  WFT_CPCV_GROUPS        N contiguous groups (default: 10)
+  WFT_CPCV_TEST_GROUPS   k test groups per combination (default: 2)
+  WFT_CPCV_PURGE_DAYS    Rows purged before each test group (default: 30)
+  WFT_CPCV_EMBARGO_DAYS  Rows embargoed after each test group (default: 30)
+  WFT_CPCV_WORKERS       Worker processes (default: CPU count)
+  WFT_CPCV_OUT           Write the full result set to this JSON file
+
+Usage:
+  pip install httpx numpy
+  python docs/wft/run_cpcv.py
+"""
+
+import datetime
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from run_walk_forward import (
+    BAND_SOURCE, BT_SCHEMA, BT_WARMUP_YEARS, FOLDS, MAKER_BPS_CONTRIB,
+    MAKER_BPS_TRADE, MONTHLY_USDT, ORG_ID, PERF_FEE_PCT, PLATFORM_FEE_PCT,
+    TRAIN_START, UPFRONT_USDT, VARIATION_ID, HTTP_STATS, _count_request,
+    _count_response, _years_before, fetch_variation, httpx, rest_get,
+    validate_env, variation_to_bt_params,
+)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Configuration
+# ─────────────────────────────────────────────────────────────────────────────
+
+N_GROUPS     = int(os.getenv("WFT_CPCV_GROUPS", "10"))
+K_TEST       = int(os.getenv("WFT_CPCV_TEST_GROUPS", "2"))
+PURGE_DAYS   = int(os.getenv("WFT_CPCV_PURGE_DAYS", "30"))
+EMBARGO_DAYS = int(os.getenv("WFT_CPCV_EMBARGO_DAYS", "30"))
+WORKERS      = int(os.getenv("WFT_CPCV_WORKERS", "0")) or os.cpu_count() or 1
+OUT_PATH     = os.getenv("WFT_CPCV_OUT", "")
+
+EVAL_END = FOLDS[-1][3]   # last OOS end date
+
+# Candidate grid for the "selected" track — perturbs the variation's pause
+# exit, momentum length and retrace switch; B1-B11 stay at the variation values.
+GRID = {
+    "bear_pause_exit_sigma": [-1.0, -0.75, -0.5, 0.0],
+    "momo_len":              [3, 5, 7, 10],
+    "enable_retrace":        [True, False],
+}
+
+BAND_COLS = (
+    "price_at_mean", "price_at_m025", "price_at_m050", "price_at_m075",
+    "price_at_m100", "price_at_p050", "price_at_p100", "price_at_p150",
+    "price_at_p200", "price_at_p250",
+)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Band data
+# ─────────────────────────────────────────────────────────────────────────────
+
+def sigma_column(sigma: float, enter: bool) -> str:
+    """Band column for a pause threshold — same naming as decideTrade()."""
+    if not enter and sigma == 0:
+        return "price_at_mean"
+    side = "p" if enter or sigma > 0 else "m"
+    return f"price_at_{side}{int(round(abs(sigma) * 100)):03d}"
+
+
+def load_bands(client: httpx.Client, extra_cols: set) -> dict:
+    """Read the band view once, warmup included, into column arrays."""
+    view = "v_backtest_prices_rb" if BAND_SOURCE == "rb" else "v_backtest_prices"
+    start = _years_before(TRAIN_START, BT_WARMUP_YEARS)
+    rows, offset, page_size = [], 0, 1000
+    while True:
+        page = rest_get(client, view, params={
+            "org_id": f"eq.{ORG_ID}",
+            "and":    f"(close_date.gte.{start},close_date.lte.{EVAL_END})",
+            "select": "*",
+            "order":  "close_date.asc",
+            "limit":  str(page_size),
+            "offset": str(offset),
+        }, schema=BT_SCHEMA)
+        rows.extend(page)
+        if len(page) < page_size:
+            break
+        offset += page_size
+
+    def col(name: str) -> np.ndarray:
+        return np.array([np.nan if r.get(name) is None else float(r[name])
+                         for r in rows], dtype=np.float64)
+
+    dates = [r["close_date"][:10] for r in rows]
+    return {
+        "dates": dates,
+        "month": np.array([int(d[:4]) * 12 + int(d[5:7]) for d in dates], dtype=np.int32),
+        "px":    np.nan_to_num(col("btc_price_usd")),
+        "bands": {c: col(c) for c in sorted(set(BAND_COLS) | extra_cols)},
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Local simulator (worker side)
+# ─────────────────────────────────────────────────────────────────────────────
+
+_DATA: dict = {}
+
+
+def _init_worker(data: dict) -> None:
+    # Lists index faster than ndarrays inside the scalar day loop
+    _DATA["dates"] = data["dates"]
+    _DATA["month"] = data["month"].tolist()
+    _DATA["px"]    = data["px"].tolist()
+    _DATA["bands"] = {k: v.tolist() for k, v in data["bands"].items()}
+
+
+def simulate_segment(cfg: dict, start: int, end: int) -> tuple:
+    """
+    Simulate rows [start, end] from a fresh portfolio; returns
+    (lth_nav, std_dca_nav).  Mirrors runSimulation() + decideTrade().
+    """
+    dates, month, px, bands = _DATA["dates"], _DATA["month"], _DATA["px"], _DATA["bands"]
+    mean, m025, m050 = bands["price_at_mean"], bands["price_at_m025"], bands["price_at_m050"]
+    m075, m100 = bands["price_at_m075"], bands["price_at_m100"]
+    p050, p100, p150 = bands["price_at_p050"], bands["price_at_p100"], bands["price_at_p150"]
+    p200, p250 = bands["price_at_p200"], bands["price_at_p250"]
+    enter_col = bands.get(sigma_column(cfg["bear_pause_enter_sigma"], True), p200)
+    exit_col = bands.get(sigma_column(cfg["bear_pause_exit_sigma"], False))
+
+    B = [0.0] + [cfg[f"b{i}"] for i in range(1, 12)]
+    retrace = cfg["enable_retrace"]
+    retrace_pct = B[cfg["retrace_base"]]
+    momo_len, momo_thr = cfg["momo_len"], cfg["momo_thr"]
+
+    trade_fee   = MAKER_BPS_TRADE / 10_000
+    contrib_fee = MAKER_BPS_CONTRIB / 10_000
+
+    # Warmup start: same calendar date BT_WARMUP_YEARS earlier, as ef_bt_execute
+    warm_from = _years_before(dates[start], BT_WARMUP_YEARS)
+    w = start
+    while w > 0 and dates[w - 1] >= warm_from:
+        w -= 1
+
+    pause = above1 = above15 = False
+
+    def decide(j: int, roc: float) -> float:
+        """+pct = buy fraction of USDT, -pct = sell fraction of BTC, 0 = hold."""
+        nonlocal pause, above1, above15
+        p = px[j]
+        enter = enter_col[j]
+        if enter != enter:           # NaN → fall back to +2.0σ
+            enter = p200[j]
+        if p > enter:
+            pause = True
+        exiting = exit_col is not None and p < exit_col[j]
+        if exiting:
+            pause = above1 = above15 = False
+        if pause:
+            above1 = above15 = False
+        if retrace and not pause:
+            if p100[j] <= p < p150[j]:
+                above1 = True
+            if p150[j] <= p < p200[j]:
+                above15 = True
+        blocked = pause and not exiting
+        if retrace and not blocked:
+            if above15 and p050[j] <= p < p100[j]:
+                return retrace_pct
+            if above1 and mean[j] <= p < p050[j]:
+                return retrace_pct
+        if p < mean[j]:
+            if blocked:
+                return 0.0
+            if p < m100[j]: return B[1]
+            if p < m075[j]: return B[2]
+            if p < m050[j]: return B[3]
+            if p < m025[j]: return B[4]
+            return B[5]
+        mom_ok = pause or roc > momo_thr
+        if p < p050[j]: return -B[6]
+        if p < p100[j]: return -B[7] if mom_ok else 0.0
+        if p < p150[j]: return -B[8] if mom_ok else 0.0
+        if p < p200[j]: return -B[9] if mom_ok else 0.0
+        if p < p250[j]: return -B[10]
+        return -B[11]
+
+    for j in range(w, start):
+        if px[j] > 0:
+            decide(j, 0.0)   # momentum not tracked during warmup
+
+    btc = usdt = contrib_net = hwm = hwm_contrib = std_btc = 0.0
+    last_month = last_perf_month = None
+    for i, j in enumerate(range(start, end + 1)):
+        p, mk = px[j], month[j]
+
+        gross = (UPFRONT_USDT if i == 0 else 0.0) + (MONTHLY_USDT if mk != last_month else 0.0)
+        last_month = mk
+        if gross > 0:
+            after = gross * (1 - contrib_fee)
+            if p > 0:
+                std_btc += after / p * (1 - trade_fee)
+            net = after * (1 - PLATFORM_FEE_PCT)
+            usdt += net
+            contrib_net += net
+
+        roc = 0.0
+        if j - momo_len >= w and p > 0 and px[j - momo_len] > 0:
+            roc = p / px[j - momo_len] - 1
+        pct = decide(j, roc)
+        if pct > 0 and p > 0:
+            trade = usdt * pct
+            btc += trade / p * (1 - trade_fee)
+            usdt -= trade
+        elif pct < 0 and p > 0:
+            sold = btc * -pct
+            btc -= sold * (1 + trade_fee)
+            usdt += sold * p
+
+        # Monthly performance fee on profit above the high-water mark
+        if last_perf_month is not None and mk != last_perf_month:
+            since = contrib_net - hwm_contrib
+            nav_pf = usdt + btc * p - since
+            if nav_pf > hwm and PERF_FEE_PCT > 0:
+                usdt -= (nav_pf - hwm) * PERF_FEE_PCT
+                if usdt < 0 and btc > 0 and p > 0:
+                    btc_sold = min(btc, -usdt / (p * (1 - trade_fee)))
+                    usdt += btc_sold * (1 - trade_fee) * p
+                    btc -= btc_sold
+                hwm = usdt + btc * p - since
+                hwm_contrib = contrib_net
+            elif nav_pf > hwm:
+                hwm = nav_pf
+                hwm_contrib = contrib_net
+        last_perf_month = mk
+        if i == 0:
+            hwm = usdt + btc * p
+            hwm_contrib = contrib_net
+
+    return usdt + btc * px[end], std_btc * px[end]
+
+
+def run_candidate(task: tuple) -> tuple:
+    """Worker entry point: every segment one candidate needs."""
+    cand_idx, cfg, segments = task
+    out = {}
+    for key, (start, end) in segments.items():
+        lth, std = simulate_segment(cfg, start, end)
+        out[key] = (lth, std, (lth / std - 1) * 100 if std > 0 else 0.0)
+    return cand_idx, out
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CPCV layout
+# ─────────────────────────────────────────────────────────────────────────────
+
+def split_groups(dates: list) -> list:
+    """N contiguous, near-equal (start, end) row ranges over TRAIN_START → EVAL_END."""
+    first = next(i for i, d in enumerate(dates) if d >= TRAIN_START)
+    idx = np.arange(first, len(dates))
+    return [(int(g[0]), int(g[-1])) for g in np.array_split(idx, N_GROUPS)]
+
+
+def segment_table(groups: list) -> dict:
+    """(group, embargoed head, purged tail) → row range, for every trim variant."""
+    table = {}
+    for g, (start, end) in enumerate(groups):
+        for head in (False, True):
+            for tail in (False, True):
+                s = start + (EMBARGO_DAYS if head else 0)
+                e = end - (PURGE_DAYS if tail else 0)
+                if e - s >= 31:   # need at least a month to mean anything
+                    table[(g, head, tail)] = (s, e)
+    return table
+
+
+def training_keys(test: tuple) -> list:
+    keys = []
+    for g in range(N_GROUPS):
+        if g in test:
+            continue
+        keys.append((g, g - 1 in test, g + 1 in test))
+    return keys
+
+
+def build_candidates(base: dict) -> list:
+    """The variation itself first (ties go to it), then the grid."""
+    cands = [base]
+    names = list(GRID)
+    for values in itertools.product(*(GRID[n] for n in names)):
+        cfg = {**base, **dict(zip(names, values))}
+        if cfg != base:
+            cands.append(cfg)
+    return cands
+
+
+def summarise(values: list) -> dict:
+    a = np.asarray(values, dtype=np.float64)
+    if a.size == 0:
+        return {"n": 0}
+    return {
+        "n":      int(a.size),
+        "mean":   float(a.mean()),
+        "median": float(np.median(a)),
+        "p05":    float(np.percentile(a, 5)),
+        "p95":    float(np.percentile(a, 95)),
+        "pass":   float((a > 0).mean() * 100),
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Main
+# ─────────────────────────────────────────────────────────────────────────────
+
+def main() -> None:
+    validate_env()
+    if not 1 <= K_TEST < N_GROUPS:
+        sys.exit(f"ERROR: need 1 <= WFT_CPCV_TEST_GROUPS < WFT_CPCV_GROUPS (got k={K_TEST}, N={N_GROUPS})")
+
+    combos = list(itertools.combinations(range(N_GROUPS), K_TEST))
+    n_paths = math.comb(N_GROUPS - 1, K_TEST - 1)
+
+    print("=" * 70)
+    print("LTH PVR Combinatorially Purged Cross-Validation")
+    print(f"  Groups (N)     : {N_GROUPS}")
+    print(f"  Test groups (k): {K_TEST}  →  {len(combos)} combinations, {n_paths} paths")
+    print(f"  Purge/embargo  : {PURGE_DAYS} / {EMBARGO_DAYS} rows")
+    print(f"  Band source    : {BAND_SOURCE}")
+    print(f"  Workers        : {WORKERS}")
+    print("=" * 70)
+
+    with httpx.Client(timeout=30.0, event_hooks={"request":  [_count_request],
+                                                  "response": [_count_response]}) as client:
+        var = fetch_variation(client, VARIATION_ID)
+        print(f"Variation: {var.get('display_name', var.get('variation_name'))}")
+        base = variation_to_bt_params(var)
+        cands = build_candidates(base)
+        extra = {sigma_column(c["bear_pause_enter_sigma"], True) for c in cands} \
+              | {sigma_column(c["bear_pause_exit_sigma"], False) for c in cands}
+        t0 = time.monotonic()
+        data = load_bands(client, extra)
+    print(f"Loaded {len(data['dates'])} band rows in {time.monotonic() - t0:.1f}s "
+          f"({HTTP_STATS['requests']} requests)")
+
+    groups = split_groups(data["dates"])
+    print(f"\n  {'Group':<6} {'Start':<12} {'End':<12} {'Rows':>5}")
+    for g, (s, e) in enumerate(groups):
+        print(f"  {g + 1:<6} {data['dates'][s]:<12} {data['dates'][e]:<12} {e - s + 1:>5}")
+
+    segments = segment_table(groups)
+    print(f"\nSimulating {len(cands)} candidates × {len(segments)} segments "
+          f"= {len(cands) * len(segments)} runs …")
+    t0 = time.monotonic()
+    results = [None] * len(cands)
+    tasks = [(i, c, segments) for i, c in enumerate(cands)]
+    with ProcessPoolExecutor(max_workers=WORKERS, initializer=_init_worker,
+                             initargs=(data,)) as pool:
+        for idx, out in pool.map(run_candidate, tasks):
+            results[idx] = out
+    print(f"  done in {time.monotonic() - t0:.1f}s")
+
+    # ── Evaluate every combination ────────────────────────────────────────
+    frozen_tests, selected_tests, beats = [], [], 0
+    paths = [[None] * N_GROUPS for _ in range(n_paths)]
+    next_path = [0] * N_GROUPS
+    combo_rows = []
+    for test in combos:
+        train = [k for k in training_keys(test) if k in segments]
+        scores = [np.mean([results[c][k][2] for k in train]) if train else 0.0
+                  for c in range(len(cands))]
+        best = int(np.argmax(scores))
+        for g in test:
+            frozen = results[0][(g, False, False)][2]
+            chosen = results[best][(g, False, False)][2]
+            frozen_tests.append(frozen)
+            selected_tests.append(chosen)
+            beats += chosen > frozen
+            paths[next_path[g]][g] = chosen
+            next_path[g] += 1
+        combo_rows.append({
+            "test_groups": [g + 1 for g in test],
+            "selected":    {k: cands[best][k] for k in GRID},
+            "train_excess_pct": float(scores[best]),
+            "test_excess_pct":  [results[best][(g, False, False)][2] for g in test],
+            "frozen_excess_pct": [results[0][(g, False, False)][2] for g in test],
+        })
+
+    frozen_by_group = [results[0][(g, False, False)][2] for g in range(N_GROUPS)]
+    path_means = [float(np.mean(p)) for p in paths]
+    path_passes = [sum(x > 0 for x in p) for p in paths]
+
+    print(f"\n  {'OOS excess vs Std DCA (%)':<28} {'n':>4} {'mean':>8} {'median':>8}"
+          f" {'p5':>8} {'p95':>8} {'pass%':>6}")
+    for label, vals in (("Frozen (Track A analogue)", frozen_tests),
+                        ("Selected (Track B analogue)", selected_tests),
+                        ("Selected, per path (mean)", path_means)):
+        s = summarise(vals)
+        print(f"  {label:<28} {s['n']:>4} {s['mean']:>8.2f} {s['median']:>8.2f}"
+              f" {s['p05']:>8.2f} {s['p95']:>8.2f} {s['pass']:>5.0f}%")
+
+    print("\n  Frozen per group : " + "  ".join(f"{x:+.1f}" for x in frozen_by_group))
+    print("  Path passes      : " + "  ".join(f"{p}/{N_GROUPS}" for p in path_passes))
+    print(f"  Selected > frozen: {beats}/{len(selected_tests)} test evaluations")
+
+    if OUT_PATH:
+        with open(OUT_PATH, "w", encoding="utf-8") as f:
+            json.dump({
+                "generated_at": datetime.datetime.utcnow().isoformat() + "Z",
+                "n_groups": N_GROUPS, "k_test": K_TEST,
+                "purge_days": PURGE_DAYS, "embargo_days": EMBARGO_DAYS,
+                "band_source": BAND_SOURCE, "base_params": base,
+                "groups": [{"group": g + 1, "start": data["dates"][s], "end": data["dates"][e]}
+                           for g, (s, e) in enumerate(groups)],
+                "frozen_by_group": frozen_by_group,
+                "combinations": combo_rows,
+                "paths": [{"path": i + 1, "excess_pct": p, "mean": m, "passes": n}
+                          for i, (p, m, n) in enumerate(zip(paths, path_means, path_passes))],
+                "summary": {
+                    "frozen": summarise(frozen_tests),
+                    "selected": summarise(selected_tests),
+                    "paths": summarise(path_means),
+                },
+            }, f, indent=2)
+        print(f"\nFull results written to {OUT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
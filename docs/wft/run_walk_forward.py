@@ -35,13 +35,18 @@ Optional environment variables:
   WFT_SKIP_TRACK_B    Set to 1 to skip optimisation and run Track A only (faster)
   WFT_START_FOLD      Resume from this fold number 1-9 (default: 1)
   WFT_RUN_ID          Resume an existing wft_run_id instead of creating a new one
+  WFT_NO_CACHE        Set to 1 to ignore wft_fold_cache and re-simulate every fold
 
 Usage:
   pip install httpx
   python docs/wft/run_walk_forward.py
 """
 
+import bisect
+import contextlib
 import datetime
+import hashlib
+import json
 import os
 import sys
 import time
@@ -68,6 +73,7 @@ BAND_SOURCE   = os.getenv("WFT_BAND_SOURCE", "rb")
 SKIP_TRACK_B  = os.getenv("WFT_SKIP_TRACK_B", "0") == "1"
 START_FOLD    = int(os.getenv("WFT_START_FOLD", "1"))
 RESUME_RUN_ID = os.getenv("WFT_RUN_ID", "")
+NO_CACHE      = os.getenv("WFT_NO_CACHE", "0") == "1"
 
 # Standard fee parameters — match the public back-tester defaults
 MAKER_BPS_TRADE   = 8.0      # 0.08% VALR BTC/USDT exchange fee (charged in BTC)
@@ -96,11 +102,60 @@ BT_SCHEMA  = "lth_pvr_bt"
 POLL_INTERVAL = 10   # seconds between bt_runs status checks
 POLL_TIMEOUT  = 600  # seconds max wait per simulation run (10 minutes)
 
+# ef_bt_execute loads this many years of bands before start_date as a warmup
+# pass, so the band fingerprint for a fold must cover the warmup as well.
+BT_WARMUP_YEARS = 2
+
+# Band view columns that change on every refresh without changing the data.
+FINGERPRINT_IGNORE = {"fetched_at", "created_at", "updated_at"}
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # HTTP helpers
 # ─────────────────────────────────────────────────────────────────────────────
 
+# Every request issued through the shared client is counted here (via httpx
+# event hooks) so the run summary can report total round trips, and timed()
+# can attribute request counts and bytes to each stage.
+HTTP_STATS = {"requests": 0, "bytes_sent": 0, "bytes_received": 0}
+
+RUN_T0 = time.monotonic()   # stage start offsets are seconds since launch
+
+
+def _count_request(request: httpx.Request) -> None:
+    HTTP_STATS["requests"] += 1
+    HTTP_STATS["bytes_sent"] += len(request.content)
+
+
+def _count_response(response: httpx.Response) -> None:
+    response.read()
+    HTTP_STATS["bytes_received"] += len(response.content)
+
+
+@contextlib.contextmanager
+def timed(timings: dict | None, stage: str):
+    """
+    Accumulate wall time (monotonic), request count and bytes in/out for a
+    stage into timings[stage].  'start' records when the stage first began,
+    in seconds since launch.  A None timings dict disables instrumentation.
+    """
+    if timings is None:
+        yield
+        return
+    t0 = time.monotonic()
+    before = dict(HTTP_STATS)
+    try:
+        yield
+    finally:
+        entry = timings.setdefault(stage, {"start": round(t0 - RUN_T0, 3),
+                                           "s": 0.0, "requests": 0,
+                                           "bytes_out": 0, "bytes_in": 0})
+        entry["s"] = round(entry["s"] + time.monotonic() - t0, 3)
+        entry["requests"]  += HTTP_STATS["requests"] - before["requests"]
+        entry["bytes_out"] += HTTP_STATS["bytes_sent"] - before["bytes_sent"]
+        entry["bytes_in"]  += HTTP_STATS["bytes_received"] - before["bytes_received"]
+
+
 def rest_headers(prefer: str = "", schema: str = "") -> dict:
     h = {
         "Authorization": f"Bearer {SERVICE_KEY}",
@@ -130,9 +185,10 @@ def rest_get(client: httpx.Client, path: str, params: dict = None,
     return r.json()
 
 
-def rest_post(client: httpx.Client, path: str, data, schema: str = "") -> None:
+def rest_post(client: httpx.Client, path: str, data, schema: str = "",
+              prefer: str = "return=minimal") -> None:
     r = client.post(f"{REST}/{path}", json=data,
-                    headers=rest_headers("return=minimal", schema=schema))
+                    headers=rest_headers(prefer, schema=schema))
     r.raise_for_status()
 
 
@@ -143,6 +199,14 @@ def rest_patch(client: httpx.Client, path: str, params: dict,
     r.raise_for_status()
 
 
+def rest_rpc(client: httpx.Client, function_name: str, args: dict,
+             schema: str = ""):
+    r = client.post(f"{REST}/rpc/{function_name}", json=args,
+                    headers=rest_headers(schema=schema))
+    r.raise_for_status()
+    return r.json() if r.content else None
+
+
 def ef_post(client: httpx.Client, function_name: str,
             data: dict, timeout: float = 90.0) -> dict:
     r = client.post(f"{EF}/{function_name}", json=data,
@@ -240,25 +304,12 @@ def config_to_bt_params(cfg: dict) -> dict:
 # Back-test execution helpers
 # ─────────────────────────────────────────────────────────────────────────────
 
-def create_bt_run(client: httpx.Client, oos_start: str, oos_end: str,
-                  params_override: dict) -> str:
+def bt_params_payload(oos_start: str, oos_end: str, params_override: dict) -> dict:
     """
-    Create a bt_runs + bt_params row pair and return the bt_run_id.
+    Build the bt_params row (minus bt_run_id) for an OOS simulation.
     params_override must contain B1-B11, momo_len, momo_thr, enable_retrace, etc.
     """
-    run_id = str(uuid.uuid4())
-
-    # Insert bt_runs row
-    rest_post(client, "bt_runs", {
-        "bt_run_id":   run_id,
-        "org_id":      ORG_ID,
-        "status":      "running",
-        "band_source": BAND_SOURCE,
-    }, schema=BT_SCHEMA)
-
-    # Insert bt_params row
-    rest_post(client, "bt_params", {
-        "bt_run_id":            run_id,
+    return {
         "start_date":           oos_start,
         "end_date":             oos_end,
         "upfront_contrib_usdt": UPFRONT_USDT,
@@ -268,62 +319,93 @@ def create_bt_run(client: httpx.Client, oos_start: str, oos_end: str,
         "platform_fee_pct":     PLATFORM_FEE_PCT,
         "performance_fee_pct":  PERF_FEE_PCT,
         **params_override,
-    }, schema=BT_SCHEMA)
+    }
+
+
+def create_bt_run(client: httpx.Client, oos_start: str, oos_end: str,
+                  params_override: dict, timings: dict | None = None) -> str:
+    """
+    Create a bt_runs + bt_params row pair and return the bt_run_id.
+    params_override must contain B1-B11, momo_len, momo_thr, enable_retrace, etc.
+    """
+    run_id = str(uuid.uuid4())
+
+    with timed(timings, "bt_create"):
+        # Insert bt_runs row
+        rest_post(client, "bt_runs", {
+            "bt_run_id":   run_id,
+            "org_id":      ORG_ID,
+            "status":      "running",
+            "band_source": BAND_SOURCE,
+        }, schema=BT_SCHEMA)
+
+        # Insert bt_params row
+        rest_post(client, "bt_params", {
+            "bt_run_id": run_id,
+            **bt_params_payload(oos_start, oos_end, params_override),
+        }, schema=BT_SCHEMA)
 
     return run_id
 
 
-def run_and_poll_bt(client: httpx.Client, run_id: str) -> None:
+def run_and_poll_bt(client: httpx.Client, run_id: str,
+                    timings: dict | None = None) -> None:
     """
     Trigger ef_bt_execute for the given run_id and poll until completion.
     Raises TimeoutError after POLL_TIMEOUT seconds.
+
+    Timed as 'bt_execute' (the EF request, i.e. server-side run time) and
+    'bt_poll' (time spent waiting on bt_runs.status after the EF returned).
     """
-    ef_post(client, "ef_bt_execute",
-            {"bt_run_id": run_id, "band_source": BAND_SOURCE},
-            timeout=120.0)
-
-    deadline = time.time() + POLL_TIMEOUT
-    while time.time() < deadline:
-        rows = rest_get(client, "bt_runs",
-                        params={"bt_run_id": f"eq.{run_id}",
-                                "select": "status,error"},
-                        schema=BT_SCHEMA)
-        if not rows:
-            raise RuntimeError(f"bt_run {run_id} disappeared")
-        status = rows[0]["status"]
-        if status == "ok":
-            return
-        if status == "error":
-            raise RuntimeError(f"ef_bt_execute failed: {rows[0].get('error', '?')}")
-        time.sleep(POLL_INTERVAL)
+    with timed(timings, "bt_execute"):
+        ef_post(client, "ef_bt_execute",
+                {"bt_run_id": run_id, "band_source": BAND_SOURCE},
+                timeout=120.0)
+
+    with timed(timings, "bt_poll"):
+        deadline = time.time() + POLL_TIMEOUT
+        while time.time() < deadline:
+            rows = rest_get(client, "bt_runs",
+                            params={"bt_run_id": f"eq.{run_id}",
+                                    "select": "status,error"},
+                            schema=BT_SCHEMA)
+            if not rows:
+                raise RuntimeError(f"bt_run {run_id} disappeared")
+            status = rows[0]["status"]
+            if status == "ok":
+                return
+            if status == "error":
+                raise RuntimeError(f"ef_bt_execute failed: {rows[0].get('error', '?')}")
+            time.sleep(POLL_INTERVAL)
 
     raise TimeoutError(f"ef_bt_execute timed out after {POLL_TIMEOUT}s for run {run_id}")
 
 
-def read_bt_results(client: httpx.Client, run_id: str, oos_start: str
-                    ) -> tuple:
+def read_bt_results(client: httpx.Client, run_id: str, oos_start: str,
+                    timings: dict | None = None) -> tuple:
     """
     Read OOS simulation results from bt_results_daily and bt_std_dca_balances.
     Returns (lth_final_nav, std_dca_final_nav, cagr_pct, lth_daily, std_daily)
     where *_daily = list of {date, nav_usd, btc_balance, usdt_balance}.
     """
-    # LTH PVR daily results
-    lth_rows = rest_get(client, "bt_results_daily", params={
-        "bt_run_id":  f"eq.{run_id}",
-        "close_date": f"gte.{oos_start}",
-        "select":     "close_date,nav_usd,btc_balance,usdt_balance,cagr_percent",
-        "order":      "close_date.asc",
-        "limit":      "2000",
-    }, schema=BT_SCHEMA)
-
-    # Std DCA daily results
-    std_rows = rest_get(client, "bt_std_dca_balances", params={
-        "bt_run_id":  f"eq.{run_id}",
-        "trade_date": f"gte.{oos_start}",
-        "select":     "trade_date,nav_usd,btc_balance,usdt_balance",
-        "order":      "trade_date.asc",
-        "limit":      "2000",
-    }, schema=BT_SCHEMA)
+    with timed(timings, "read_results"):
+        # LTH PVR daily results
+        lth_rows = rest_get(client, "bt_results_daily", params={
+            "bt_run_id":  f"eq.{run_id}",
+            "close_date": f"gte.{oos_start}",
+            "select":     "close_date,nav_usd,btc_balance,usdt_balance,cagr_percent",
+            "order":      "close_date.asc",
+            "limit":      "2000",
+        }, schema=BT_SCHEMA)
+
+        # Std DCA daily results
+        std_rows = rest_get(client, "bt_std_dca_balances", params={
+            "bt_run_id":  f"eq.{run_id}",
+            "trade_date": f"gte.{oos_start}",
+            "select":     "trade_date,nav_usd,btc_balance,usdt_balance",
+            "order":      "trade_date.asc",
+            "limit":      "2000",
+        }, schema=BT_SCHEMA)
 
     if not lth_rows:
         raise ValueError(f"No bt_results_daily rows for bt_run_id {run_id}")
@@ -348,6 +430,133 @@ def read_bt_results(client: httpx.Client, run_id: str, oos_start: str
     return lth_final, std_final, cagr, lth_daily, std_daily
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# Fold result cache
+# ─────────────────────────────────────────────────────────────────────────────
+#
+# An OOS simulation is fully determined by its bt_params payload, the band
+# source and the band rows ef_bt_execute reads (OOS window + warmup).  Results
+# are stored in lth_pvr_bt.wft_fold_cache under a sha256 of those inputs, so a
+# rerun only simulates folds whose params, contributions or bands changed.
+# Cache hits reuse the original bt_run_id rather than creating a new run.
+
+def _years_before(iso_date: str, years: int) -> str:
+    """Same calendar date `years` earlier (Feb 29 rolls to Mar 1, like JS Date)."""
+    d = datetime.date.fromisoformat(iso_date)
+    try:
+        return d.replace(year=d.year - years).isoformat()
+    except ValueError:
+        return datetime.date(d.year - years, 3, 1).isoformat()
+
+
+def load_band_rows(client: httpx.Client, start: str, end: str) -> list:
+    """
+    Every band/price row in [start, end] as (close_date, canonical JSON bytes),
+    in date order.  Loaded once per WFT run for the union of the fold windows;
+    band_fingerprint() then hashes each fold's slice without another download.
+    """
+    view = "v_backtest_prices_rb" if BAND_SOURCE == "rb" else "v_backtest_prices"
+    out = []
+    page_size = 1000
+    offset = 0
+    while True:
+        rows = rest_get(client, view, params={
+            "org_id": f"eq.{ORG_ID}",
+            "and":    f"(close_date.gte.{start},close_date.lte.{end})",
+            "select": "*",
+            "order":  "close_date.asc",
+            "limit":  str(page_size),
+            "offset": str(offset),
+        }, schema=BT_SCHEMA)
+        for r in rows:
+            clean = {k: v for k, v in r.items() if k not in FINGERPRINT_IGNORE}
+            out.append((str(r["close_date"])[:10],
+                        json.dumps(clean, sort_keys=True, separators=(",", ":"),
+                                   default=str).encode("utf-8")))
+        if len(rows) < page_size:
+            break
+        offset += page_size
+    return out
+
+
+def band_fingerprint(band_rows: list, oos_start: str, oos_end: str) -> str:
+    """Hash every band/price row ef_bt_execute will load for this OOS window."""
+    warmup_start = _years_before(oos_start, BT_WARMUP_YEARS)
+    dates = [d for d, _ in band_rows]
+    lo = bisect.bisect_left(dates, warmup_start)
+    hi = bisect.bisect_right(dates, oos_end)
+    h = hashlib.sha256()
+    for _, blob in band_rows[lo:hi]:
+        h.update(blob)
+    return h.hexdigest()
+
+
+def fold_cache_key(bt_params: dict, band_fp: str) -> str:
+    blob = json.dumps(
+        {"bt_params": bt_params, "band_source": BAND_SOURCE, "bands": band_fp},
+        sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def get_cached_fold(client: httpx.Client, cache_key: str) -> dict | None:
+    rows = rest_get(client, "wft_fold_cache", params={
+        "cache_key": f"eq.{cache_key}",
+        "select":    "*",
+    }, schema=BT_SCHEMA)
+    return rows[0] if rows else None
+
+
+def put_cached_fold(client: httpx.Client, cache_key: str, bt_params: dict,
+                    run_id: str, results: tuple) -> None:
+    lth_final, std_final, cagr, lth_daily, std_daily = results
+    rest_post(client, "wft_fold_cache", {
+        "cache_key":         cache_key,
+        "bt_run_id":         run_id,
+        "band_source":       BAND_SOURCE,
+        "oos_start":         bt_params["start_date"],
+        "oos_end":           bt_params["end_date"],
+        "bt_params":         bt_params,
+        "final_nav":         lth_final,
+        "std_dca_final_nav": std_final,
+        "cagr_pct":          cagr,
+        "lth_daily":         lth_daily,
+        "std_daily":         std_daily,
+    }, schema=BT_SCHEMA, prefer="resolution=merge-duplicates,return=minimal")
+
+
+def run_oos_simulation(client: httpx.Client, oos_start: str, oos_end: str,
+                       params_override: dict, band_fp: str,
+                       timings: dict | None = None) -> tuple:
+    """
+    Return (bt_run_id, read_bt_results tuple, cached) for one OOS simulation,
+    reusing wft_fold_cache when the inputs are unchanged.  An empty band_fp
+    (fingerprint unavailable) bypasses the cache entirely.
+    """
+    bt_params = bt_params_payload(oos_start, oos_end, params_override)
+    cache_key = fold_cache_key(bt_params, band_fp) if band_fp else ""
+
+    if cache_key and not NO_CACHE:
+        with timed(timings, "cache_lookup"):
+            hit = get_cached_fold(client, cache_key)
+        if hit:
+            results = (float(hit["final_nav"]), float(hit["std_dca_final_nav"]),
+                       float(hit["cagr_pct"]), hit["lth_daily"], hit["std_daily"])
+            return hit["bt_run_id"], results, True
+
+    run_id = create_bt_run(client, oos_start, oos_end, params_override, timings)
+    run_and_poll_bt(client, run_id, timings)
+    results = read_bt_results(client, run_id, oos_start, timings)
+
+    if cache_key:
+        try:
+            with timed(timings, "cache_write"):
+                put_cached_fold(client, cache_key, bt_params, run_id, results)
+        except httpx.HTTPError as exc:
+            print(f"      WARNING: could not write fold cache ({exc})")
+    return run_id, results, False
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Phased optimiser helpers
 # ─────────────────────────────────────────────────────────────────────────────
@@ -358,7 +567,8 @@ def _fixed_range(value: float) -> dict:
 
 
 def run_optimizer_phases(client: httpx.Client, variation_id: str,
-                         train_end: str, prod_params: dict) -> dict:
+                         train_end: str, prod_params: dict,
+                         timings: dict | None = None) -> dict:
     """
     Run the 3-phase grid search over the training window and return the best
     StrategyConfig.  Each phase stays well within the 60 s EF timeout.
@@ -379,18 +589,19 @@ def run_optimizer_phases(client: httpx.Client, variation_id: str,
     print("      Phase 1 – momentum sweep (momo_len 3-14 × momo_thr 0.00-0.05) …",
           end="", flush=True)
     try:
-        resp1 = ef_post(client, "ef_optimize_lth_pvr_strategy", {
-            "variation_id":         variation_id,
-            "start_date":           TRAIN_START,
-            "end_date":             train_end,
-            "upfront_usd":          UPFRONT_USDT,
-            "monthly_usd":          MONTHLY_USDT,
-            "objective":            "sharpe",
-            "band_source":          BAND_SOURCE,
-            "grid_size":            1,      # keep all B values at current
-            "momo_length_range":    {"min": 3,   "max": 14,   "step": 1},
-            "momo_threshold_range": {"min": 0.0, "max": 0.05, "step": 0.01},
-        }, timeout=120.0)
+        with timed(timings, "opt_phase1"):
+            resp1 = ef_post(client, "ef_optimize_lth_pvr_strategy", {
+                "variation_id":         variation_id,
+                "start_date":           TRAIN_START,
+                "end_date":             train_end,
+                "upfront_usd":          UPFRONT_USDT,
+                "monthly_usd":          MONTHLY_USDT,
+                "objective":            "sharpe",
+                "band_source":          BAND_SOURCE,
+                "grid_size":            1,      # keep all B values at current
+                "momo_length_range":    {"min": 3,   "max": 14,   "step": 1},
+                "momo_threshold_range": {"min": 0.0, "max": 0.05, "step": 0.01},
+            }, timeout=120.0)
         best_momo_len = int(resp1["best"]["config"]["momentumLength"])
         best_momo_thr = float(resp1["best"]["config"]["momentumThreshold"])
         print(f" done. momo_len={best_momo_len}, momo_thr={best_momo_thr:.3f}")
@@ -408,18 +619,19 @@ def run_optimizer_phases(client: httpx.Client, variation_id: str,
           end="", flush=True)
     try:
         locked_sell = {f"b{i}": _fixed_range(prod_params[f"b{i}"]) for i in range(6, 12)}
-        resp2 = ef_post(client, "ef_optimize_lth_pvr_strategy", {
-            "variation_id": variation_id,
-            "start_date":   TRAIN_START,
-            "end_date":     train_end,
-            "upfront_usd":  UPFRONT_USDT,
-            "monthly_usd":  MONTHLY_USDT,
-            "objective":    "sharpe",
-            "band_source":  BAND_SOURCE,
-            "grid_size":    3,
-            "b_ranges":     locked_sell,
-            **locked_momo,
-        }, timeout=120.0)
+        with timed(timings, "opt_phase2"):
+            resp2 = ef_post(client, "ef_optimize_lth_pvr_strategy", {
+                "variation_id": variation_id,
+                "start_date":   TRAIN_START,
+                "end_date":     train_end,
+                "upfront_usd":  UPFRONT_USDT,
+                "monthly_usd":  MONTHLY_USDT,
+                "objective":    "sharpe",
+                "band_source":  BAND_SOURCE,
+                "grid_size":    3,
+                "b_ranges":     locked_sell,
+                **locked_momo,
+            }, timeout=120.0)
         best_buy_config = resp2["best"]["config"]["B"]
         print(f" done. B1={float(best_buy_config['B1']):.5f}")
     except Exception as exc:
@@ -432,18 +644,19 @@ def run_optimizer_phases(client: httpx.Client, variation_id: str,
     try:
         locked_buy = {f"b{i}": _fixed_range(float(best_buy_config[f"B{i}"]))
                       for i in range(1, 6)}
-        resp3 = ef_post(client, "ef_optimize_lth_pvr_strategy", {
-            "variation_id": variation_id,
-            "start_date":   TRAIN_START,
-            "end_date":     train_end,
-            "upfront_usd":  UPFRONT_USDT,
-            "monthly_usd":  MONTHLY_USDT,
-            "objective":    "sharpe",
-            "band_source":  BAND_SOURCE,
-            "grid_size":    3,
-            "b_ranges":     locked_buy,
-            **locked_momo,
-        }, timeout=120.0)
+        with timed(timings, "opt_phase3"):
+            resp3 = ef_post(client, "ef_optimize_lth_pvr_strategy", {
+                "variation_id": variation_id,
+                "start_date":   TRAIN_START,
+                "end_date":     train_end,
+                "upfront_usd":  UPFRONT_USDT,
+                "monthly_usd":  MONTHLY_USDT,
+                "objective":    "sharpe",
+                "band_source":  BAND_SOURCE,
+                "grid_size":    3,
+                "b_ranges":     locked_buy,
+                **locked_momo,
+            }, timeout=120.0)
         final_config = resp3["best"]["config"]
         # Patch best buy-side values back in (Phase 3 locked buy side with Phase 2 values,
         # so resp3's B config already contains the Phase 2 best B1-B5)
@@ -491,6 +704,8 @@ def create_wft_run(client: httpx.Client, variation_id: str) -> str:
 def create_wft_fold(client: httpx.Client, wft_run_id: str, fold_num: int,
                     train_start: str, train_end: str,
                     oos_start: str, oos_end: str) -> str:
+    # Created directly in 'simulating' — Track A starts immediately, so a
+    # separate pending → simulating PATCH would be a wasted round trip.
     fold_id = str(uuid.uuid4())
     rest_post(client, "wft_folds", {
         "wft_fold_id": fold_id,
@@ -500,7 +715,7 @@ def create_wft_fold(client: httpx.Client, wft_run_id: str, fold_num: int,
         "train_end":   train_end,
         "oos_start":   oos_start,
         "oos_end":     oos_end,
-        "status":      "pending",
+        "status":      "simulating",
     }, schema=BT_SCHEMA)
     return fold_id
 
@@ -517,24 +732,69 @@ def update_wft_run(client: httpx.Client, wft_run_id: str, updates: dict) -> None
                data=updates, schema=BT_SCHEMA)
 
 
-def write_wft_fold_daily(client: httpx.Client, fold_id: str,
-                         track: str, rows: list) -> None:
-    """Bulk-insert daily OOS NAV rows for one track of one fold."""
-    payload = [
-        {
-            "wft_fold_id":  fold_id,
-            "result_date":  r["date"],
-            "track":        track,
-            "nav_usd":      r["nav_usd"],
-            "btc_balance":  r.get("btc_balance"),
-            "usdt_balance": r.get("usdt_balance"),
-        }
-        for r in rows
-    ]
-    chunk_size = 500
-    for i in range(0, len(payload), chunk_size):
-        rest_post(client, "wft_fold_daily",
-                  payload[i:i + chunk_size], schema=BT_SCHEMA)
+def finish_wft_fold(client: httpx.Client, fold_id: str, fold_updates: dict,
+                    daily: dict, folds_completed: int) -> None:
+    """
+    Persist a finished (or failed) fold in one round trip via the
+    lth_pvr_bt.wft_finish_fold RPC: the wft_folds result columns, every
+    wft_fold_daily row for all tracks, and the parent run's folds_completed.
+
+    daily maps track ('a' | 'b' | 'std_dca') → list of
+    {date, nav_usd, btc_balance, usdt_balance}; rows travel as parallel arrays.
+    """
+    dates, tracks, navs, btcs, usdts = [], [], [], [], []
+    for track, rows in daily.items():
+        for r in rows:
+            dates.append(r["date"])
+            tracks.append(track)
+            navs.append(r["nav_usd"])
+            btcs.append(r.get("btc_balance"))
+            usdts.append(r.get("usdt_balance"))
+    rest_rpc(client, "wft_finish_fold", {
+        "p_wft_fold_id":     fold_id,
+        "p_fold":            fold_updates,
+        "p_result_date":     dates,
+        "p_track":           tracks,
+        "p_nav_usd":         navs,
+        "p_btc_balance":     btcs,
+        "p_usdt_balance":    usdts,
+        "p_folds_completed": folds_completed,
+    }, schema=BT_SCHEMA)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Timing report
+# ─────────────────────────────────────────────────────────────────────────────
+
+def print_timing_waterfall(all_timings: list) -> None:
+    """
+    Print a per-fold waterfall of stage timings.  all_timings is a list of
+    (fold_number, timings) where timings maps group ('fold' | 'a' | 'b') →
+    stage → {start, s, requests, bytes_out, bytes_in}.  Bars are positioned
+    by stage start within the fold's wall-clock span.
+    """
+    width = 40
+    print("Per-fold timing waterfall")
+    for fold_num, timings in all_timings:
+        stages = sorted(
+            ((f"{group}/{stage}", t)
+             for group, group_stages in timings.items()
+             for stage, t in group_stages.items()),
+            key=lambda item: item[1]["start"],
+        )
+        if not stages:
+            continue
+        fold_t0 = stages[0][1]["start"]
+        span = max(t["start"] + t["s"] for _, t in stages) - fold_t0 or 1e-9
+        print(f"  Fold {fold_num}  ({span:,.1f}s)")
+        for label, t in stages:
+            start = min(int((t["start"] - fold_t0) / span * width), width - 1)
+            length = max(1, int(t["s"] / span * width))
+            bar = " " * start + "█" * min(length, width - start)
+            kb = (t["bytes_out"] + t["bytes_in"]) / 1024
+            print(f"    {label:<18} {bar:<{width}} {t['s']:>8.1f}s"
+                  f"  {t['requests']:>4} req  {kb:>9,.1f} KB")
+    print()
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -552,11 +812,14 @@ def main() -> None:
     print(f"  Contributions : ${UPFRONT_USDT:,.0f} upfront + ${MONTHLY_USDT:,.0f}/month")
     print(f"  Skip Track B  : {SKIP_TRACK_B}")
     print(f"  Starting fold : {START_FOLD}")
+    print(f"  Fold cache    : {'refresh only (WFT_NO_CACHE=1)' if NO_CACHE else 'enabled'}")
     if RESUME_RUN_ID:
         print(f"  Resuming run  : {RESUME_RUN_ID}")
     print()
 
-    with httpx.Client(timeout=30.0) as client:
+    with httpx.Client(timeout=30.0,
+                      event_hooks={"request":  [_count_request],
+                                   "response": [_count_response]}) as client:
 
         # ── Resolve or resume WFT run ─────────────────────────────────────────
         # When launched from the Admin UI, WFT_RUN_ID is set and the run row
@@ -618,6 +881,23 @@ def main() -> None:
         track_a_passes = 0
         track_b_passes = 0
         folds_attempted = 0
+        folds_cached = 0
+        all_timings: list = []
+
+        # Band rows for every fold to run (OOS windows + warmup), loaded once
+        # and hashed per fold for the fold cache keys
+        todo = [f for f in FOLDS if f[0] >= START_FOLD]
+        band_rows = None
+        if todo:
+            print("Loading band rows for the fold cache …", end="", flush=True)
+            try:
+                band_rows = load_band_rows(
+                    client, min(_years_before(f[2], BT_WARMUP_YEARS) for f in todo),
+                    max(f[3] for f in todo))
+                print(f" {len(band_rows):,} rows.")
+            except httpx.HTTPError as exc:
+                print(f" unavailable ({exc}); fold cache bypassed.")
+            print()
 
         # ── Process each fold ─────────────────────────────────────────────────
         for fold_num, train_end, oos_start, oos_end in FOLDS:
@@ -630,28 +910,44 @@ def main() -> None:
                   f"  |  OOS: {oos_start} → {oos_end}")
             print(f"{'─' * 70}")
 
-            fold_id = create_wft_fold(
-                client, wft_run_id, fold_num,
-                TRAIN_START, train_end, oos_start, oos_end,
-            )
+            # Per-fold telemetry, persisted to wft_folds.timings.  The final
+            # finish_fold write is timed too but only appears in the printed
+            # waterfall, since its payload is serialised before it completes.
+            fold_timings: dict = {"fold": {}, "a": {}, "b": {}}
+            all_timings.append((fold_num, fold_timings))
 
-            fold_updates: dict = {}
+            with timed(fold_timings["fold"], "create_fold"):
+                fold_id = create_wft_fold(
+                    client, wft_run_id, fold_num,
+                    TRAIN_START, train_end, oos_start, oos_end,
+                )
+
+            fold_updates: dict = {"timings": fold_timings}
+            fold_daily: dict = {}
             std_daily_rows: list = []
 
+            band_fp = ""
+            if band_rows is not None:
+                with timed(fold_timings["fold"], "fingerprint"):
+                    band_fp = band_fingerprint(band_rows, oos_start, oos_end)
+
             # ── Track A: Validation ──────────────────────────────────────────
             print("  [Track A] Validation — frozen production params …")
             try:
-                update_wft_fold(client, fold_id, {"status": "simulating"})
-                run_id_a = create_bt_run(client, oos_start, oos_end, prod_params)
-                run_and_poll_bt(client, run_id_a)
-                a_nav, a_std, a_cagr, daily_a, std_daily_rows = \
-                    read_bt_results(client, run_id_a, oos_start)
+                run_id_a, results_a, cached_a = run_oos_simulation(
+                    client, oos_start, oos_end, prod_params, band_fp,
+                    fold_timings["a"],
+                )
+                a_nav, a_std, a_cagr, daily_a, std_daily_rows = results_a
                 a_passed = a_nav > a_std
                 if a_passed:
                     track_a_passes += 1
+                if cached_a:
+                    folds_cached += 1
                 verdict = "✅ PASS" if a_passed else "❌ FAIL"
                 print(f"  [Track A] LTH=${a_nav:,.0f}  StdDCA=${a_std:,.0f}"
-                      f"  CAGR={a_cagr:.1f}%  → {verdict}")
+                      f"  CAGR={a_cagr:.1f}%  → {verdict}"
+                      f"{'  (cached)' if cached_a else ''}")
 
                 fold_updates.update({
                     "track_a_bt_run_id":        run_id_a,
@@ -660,8 +956,8 @@ def main() -> None:
                     "track_a_oos_cagr_pct":      a_cagr,
                     "track_a_passed":            a_passed,
                 })
-                write_wft_fold_daily(client, fold_id, "a", daily_a)
-                write_wft_fold_daily(client, fold_id, "std_dca", std_daily_rows)
+                fold_daily["a"] = daily_a
+                fold_daily["std_dca"] = std_daily_rows
 
             except Exception as exc:
                 print(f"  [Track A] ERROR: {exc}")
@@ -669,9 +965,8 @@ def main() -> None:
                     "status":        "failed",
                     "error_message": f"Track A: {exc}",
                 })
-                update_wft_fold(client, fold_id, fold_updates)
-                update_wft_run(client, wft_run_id,
-                               {"folds_completed": fold_num})
+                with timed(fold_timings["fold"], "finish_fold"):
+                    finish_wft_fold(client, fold_id, fold_updates, {}, fold_num)
                 continue
 
             # ── Track B: Optimisation ────────────────────────────────────────
@@ -684,24 +979,29 @@ def main() -> None:
             else:
                 print(f"  [Track B] Optimising on {TRAIN_START} → {train_end} …")
                 try:
-                    update_wft_fold(client, fold_id, {"status": "optimising"})
+                    with timed(fold_timings["b"], "status"):
+                        update_wft_fold(client, fold_id, {"status": "optimising"})
                     best_config = run_optimizer_phases(
                         client, variation_id, train_end, prod_params,
+                        fold_timings["b"],
                     )
 
                     print("  [Track B] Running OOS simulation with optimised params …")
-                    update_wft_fold(client, fold_id, {"status": "simulating"})
-                    run_id_b = create_bt_run(client, oos_start, oos_end,
-                                            config_to_bt_params(best_config))
-                    run_and_poll_bt(client, run_id_b)
-                    b_nav, b_std, b_cagr, daily_b, _ = \
-                        read_bt_results(client, run_id_b, oos_start)
+                    with timed(fold_timings["b"], "status"):
+                        update_wft_fold(client, fold_id, {"status": "simulating"})
+                    run_id_b, results_b, cached_b = run_oos_simulation(
+                        client, oos_start, oos_end,
+                        config_to_bt_params(best_config), band_fp,
+                        fold_timings["b"],
+                    )
+                    b_nav, b_std, b_cagr, daily_b, _ = results_b
                     b_passed = b_nav > b_std
                     if b_passed:
                         track_b_passes += 1
                     verdict = "✅ PASS" if b_passed else "❌ FAIL"
                     print(f"  [Track B] LTH=${b_nav:,.0f}  StdDCA=${b_std:,.0f}"
-                          f"  CAGR={b_cagr:.1f}%  → {verdict}")
+                          f"  CAGR={b_cagr:.1f}%  → {verdict}"
+                          f"{'  (cached)' if cached_b else ''}")
 
                     fold_updates.update({
                         "track_b_best_config":       best_config,
@@ -713,7 +1013,7 @@ def main() -> None:
                         "status":                    "completed",
                         "completed_at":              _utcnow(),
                     })
-                    write_wft_fold_daily(client, fold_id, "b", daily_b)
+                    fold_daily["b"] = daily_b
 
                 except Exception as exc:
                     print(f"  [Track B] ERROR: {exc}")
@@ -723,8 +1023,8 @@ def main() -> None:
                         "error_message": f"Track B: {exc}",
                     })
 
-            update_wft_fold(client, fold_id, fold_updates)
-            update_wft_run(client, wft_run_id, {"folds_completed": fold_num})
+            with timed(fold_timings["fold"], "finish_fold"):
+                finish_wft_fold(client, fold_id, fold_updates, fold_daily, fold_num)
             print()
 
         # ── Finalise run ──────────────────────────────────────────────────────
@@ -733,10 +1033,14 @@ def main() -> None:
             "completed_at": _utcnow(),
         })
 
+        print_timing_waterfall(all_timings)
+
         print("=" * 70)
         print(f"Walk-Forward Test Complete")
         print(f"  wft_run_id     : {wft_run_id}")
         print(f"  Track A (Validation):   {track_a_passes}/{folds_attempted} folds passed")
+        print(f"  Track A cache hits:     {folds_cached}/{folds_attempted} folds reused")
+        print(f"  HTTP round trips:       {HTTP_STATS['requests']}")
         if not SKIP_TRACK_B:
             print(f"  Track B (Optimisation): {track_b_passes}/{folds_attempted} folds passed")
         print("=" * 70)
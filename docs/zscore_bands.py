@@ -0,0 +1,181 @@
+"""
+zscore_bands.py
+
+Generic, vectorised z-score band engine for on-chain valuation signals.
+
+A metric is defined by how its signal relates a market value (supply × price)
+to a reference and a scale:
+
+    value(t)  = supply(t) * price(t)
+    signal(t) = (value(t) - offset(t)) / scale(t)
+
+    scale = cumulative std dev of value up to t   ("cum_std"), or any column
+
+so LTH PVR, STH PVR, MVRV and MVRV-Z are all the same computation:
+
+    lth_pvr   supply=lth_supply  offset=lth_realized_cap  scale=cum_std
+    sth_pvr   supply=sth_supply  offset=sth_realized_cap  scale=cum_std
+    mvrv      supply=supply      offset=0                 scale=realized_cap
+    mvrv_z    supply=supply      offset=realized_cap      scale=cum_std
+
+Bands sit at signal_mean + m * signal_std for each multiplier m, with the
+signal statistics taken over non-zero signal values in one of three modes:
+
+    static      one mean / std over the whole history (or fixed constants)
+    cumulative  expanding mean / std up to each day
+    rolling     trailing window of the last `window` observations
+
+and are mapped back to prices with the inverse of the signal:
+
+    price = ((mean + m * std) * scale + offset) / supply     (pvr_bands.band_price_matrix)
+
+Streaming use: pass the (n, mean, M2) Welford states returned by the previous
+run as basis_state / stats_state together with only the new rows; the
+cum_std basis and the static / cumulative statistics continue exactly.
+Rolling mode needs the trailing window in its input and keeps no state.
+
+    cols = {"price": p, "lth_supply": s, "lth_realized_cap": s * rp}
+    bands = zscore_bands(METRICS["lth_pvr"], cols, sigma_ladder(-1, 2.5, 0.25))
+    bands.prices[:, bands.keys.index("p100")]
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+from pvr_bands import band_key, band_price_matrix
+from welford import EMPTY, State, prefix_cum_std, prefix_stats
+
+CUM_STD = "cum_std"
+MODES   = ("static", "cumulative", "rolling")
+
+
+class Metric(NamedTuple):
+    name: str
+    supply: str              # column: value = supply * price
+    offset: str | None       # column subtracted from value (None → 0)
+    scale: str = CUM_STD     # CUM_STD or a column dividing (value - offset)
+
+
+METRICS: dict[str, Metric] = {
+    "lth_pvr": Metric("lth_pvr", "lth_supply", "lth_realized_cap"),
+    "sth_pvr": Metric("sth_pvr", "sth_supply", "sth_realized_cap"),
+    "mvrv":    Metric("mvrv", "supply", None, "realized_cap"),
+    "mvrv_z":  Metric("mvrv_z", "supply", "realized_cap"),
+}
+
+
+class Bands(NamedTuple):
+    index: np.ndarray        # positions of the emitted rows in the input columns
+    value: np.ndarray        # supply * price
+    scale: np.ndarray        # signal denominator (cum_std or the scale column)
+    signal: np.ndarray
+    mean: np.ndarray         # signal mean used for the bands, per row
+    std: np.ndarray          # signal std used for the bands, per row
+    keys: list[str]          # band keys, column order of prices
+    prices: np.ndarray       # (rows × bands) price at each band
+    basis_state: State       # Welford state of value (CUM_STD scale)
+    stats_state: State       # Welford state of non-zero signals (static / cumulative)
+
+
+def _expanding(values: np.ndarray, nonzero: np.ndarray, start: State):
+    """Expanding mean / std of the non-zero values up to each row (0 below n=2)."""
+    mean_nz, std_nz, state = prefix_stats(values[nonzero], start=start, max_workers=1)
+    n0, mean0, m20 = start
+    first_std = np.sqrt(m20 / (n0 - 1)) if n0 > 1 else 0.0
+    mean_ext = np.concatenate([[mean0], mean_nz])
+    std_ext = np.concatenate([[first_std], std_nz])
+    count = np.cumsum(nonzero)
+    n = n0 + count
+    return (np.where(n > 1, mean_ext[count], 0.0),
+            np.where(n > 1, std_ext[count], 0.0),
+            state)
+
+
+def _rolling(values: np.ndarray, nonzero: np.ndarray, window: int):
+    """Mean / std of the last `window` non-zero values up to each row (0 below n=2)."""
+    v = values[nonzero]
+    shift = float(v.mean()) if len(v) else 0.0
+    s1 = np.concatenate([[0.0], np.cumsum(v - shift)])
+    s2 = np.concatenate([[0.0], np.cumsum((v - shift) ** 2)])
+    hi = np.cumsum(nonzero)
+    lo = np.maximum(hi - window, 0)
+    k = (hi - lo).astype(np.float64)
+    sum1, sum2 = s1[hi] - s1[lo], s2[hi] - s2[lo]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = shift + sum1 / k
+        var = np.maximum(sum2 - sum1 * sum1 / k, 0.0) / (k - 1)
+    ok = k > 1
+    return np.where(ok, mean, 0.0), np.where(ok, np.sqrt(var), 0.0)
+
+
+def zscore_bands(
+    metric: Metric,
+    cols: dict[str, np.ndarray],
+    multipliers,
+    mode: str = "static",
+    window: int | None = None,
+    constants: tuple[float, float] | None = None,
+    basis_state: State = EMPTY,
+    stats_state: State = EMPTY,
+    max_workers: int | None = None,
+) -> Bands:
+    """
+    Signal, band statistics and band prices for one metric.
+
+    cols        : {"price": ..., <metric.supply>: ..., [<offset>], [<scale>]} arrays in date order
+    multipliers : sequence of sigma multipliers, or a {key: mult} dict (e.g. sigma_ladder)
+    mode        : "static" | "cumulative" | "rolling" (window = observations)
+    constants   : fixed (mean, std) for static mode, e.g. the production PVR constants
+
+    The CUM_STD basis accumulates on every row with supply > 0 and price > 0;
+    rows are emitted where the offset (if any) and scale are also positive.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+    if mode == "rolling" and not window:
+        raise ValueError("rolling mode needs a window")
+    if not isinstance(multipliers, dict):
+        multipliers = {band_key(float(m)): float(m) for m in multipliers}
+
+    price = np.asarray(cols["price"], dtype=np.float64)
+    supply = np.asarray(cols[metric.supply], dtype=np.float64)
+    offset = (np.asarray(cols[metric.offset], dtype=np.float64)
+              if metric.offset else np.zeros_like(price))
+
+    # Basis: every row where the market value exists
+    active = np.flatnonzero((supply > 0) & (price > 0))
+    value = supply[active] * price[active]
+    if metric.scale == CUM_STD:
+        scale, basis_state = prefix_cum_std(value, start=basis_state, max_workers=max_workers)
+    else:
+        scale = np.asarray(cols[metric.scale], dtype=np.float64)[active]
+
+    # Emitted rows: reference and scale known
+    keep = scale > 0 if metric.scale != CUM_STD else np.ones(len(active), bool)
+    if metric.offset:
+        keep &= offset[active] > 0
+    index, value, scale = active[keep], value[keep], scale[keep]
+    off = offset[index]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        signal = np.where(scale > 0, (value - off) / scale, 0.0)
+    nonzero = signal != 0
+
+    if mode == "static":
+        if constants is not None:
+            mean_v, std_v = constants
+        else:
+            _, _, stats_state = prefix_stats(signal[nonzero], start=stats_state, max_workers=1)
+            n, mean_v, m2 = stats_state
+            std_v = float(np.sqrt(m2 / (n - 1))) if n > 1 else 0.0
+        mean = np.full(len(index), mean_v)
+        std = np.full(len(index), std_v)
+    elif mode == "cumulative":
+        mean, std, stats_state = _expanding(signal, nonzero, stats_state)
+    else:
+        mean, std = _rolling(signal, nonzero, window)
+
+    prices = band_price_matrix(scale, off, supply[index], mean, std, multipliers)
+    return Bands(index, value, scale, signal, mean, std, list(multipliers),
+                 prices, basis_state, stats_state)
+
@@ -22,14 +22,44 @@ Mapping rules (per row):
 
 Usage:
   python scripts/backfill_from_valr_exports.py > scripts/backfill_from_valr_exports.sql
+
+  # Set-based: stage all rows, then one INSERT ... SELECT per table
+  python scripts/backfill_from_valr_exports.py --set-based [--out FILE] [--copy]
+
+  # Directory mode: every customer_<id>_<yyyymmdd>.csv under DIR (latest per
+  # customer), mapped to exchange accounts by a manifest CSV
+  # (customer_id,exchange_account_id[,file]); files are parsed in a process
+  # pool and each customer gets its own SQL file under --out-dir
+  python scripts/backfill_from_valr_exports.py --dir data/valr_exports --manifest manifest.csv \
+      [--out-dir DIR] [--workers N] [--set-based]
+
+  # Incremental (any mode above): no wipe; only events after each customer's
+  # latest occurred_at already in exchange_funding_events, read via PostgREST
+  # (SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY) or from a CSV dump
+  # (customer_id,occurred_at,idempotency_key)
+  python scripts/backfill_from_valr_exports.py --incremental [--existing FILE] > scripts/backfill_incremental.sql
 """
 from __future__ import annotations
+import argparse
 import csv
+import json
+import os
+import re
 import sys
+import time
+import urllib.parse
+import urllib.request
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
 
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "docs"))
+from ingest import epoch_seconds, floats, read_csv_columns, to_datetimes  # noqa: E402
+
 ORG_ID = "b0a77009-03b9-44a1-ae1d-34f157d44a8b"
 
 # customer_id -> (csv_path, exchange_account_id)
@@ -41,14 +71,14 @@ CUSTOMERS = {
 
 ROOT = Path(__file__).resolve().parent.parent
 
-def parse_dt(s: str) -> datetime:
-    # "2026-04-22 18:23:07 Z"
-    s = s.strip().rstrip("Z").rstrip()
-    return datetime.strptime(s, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+PAGE_SIZE = 1000   # rows per PostgREST page when reading existing funding events
 
-def num(s: str) -> float:
-    s = (s or "").strip()
-    return float(s) if s else 0.0
+# Export header; the mapping rules do not read the UNMAPPED_COLUMNS
+EXPORT_COLUMNS = ("date", "transaction type", "debit currency", "debit value",
+                  "credit currency", "credit value", "fee currency", "fee value",
+                  "trade currency pair", "trade price currency", "trade price", "order id",
+                  "address", "transactionHash")
+UNMAPPED_COLUMNS = ("trade price currency", "trade price", "address", "transactionHash")
 
 
 @dataclass
@@ -63,111 +93,126 @@ class Event:
     metadata: dict
 
 
-def emit_events(customer_id: int, csv_path: Path) -> list[Event]:
-    events: list[Event] = []
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for i, row in enumerate(reader, start=1):
-            ts        = parse_dt(row["date"])
-            ttype     = (row["transaction type"] or "").strip()
-            debit_cur = (row["debit currency"] or "").strip()
-            debit_val = num(row["debit value"])
-            cred_cur  = (row["credit currency"] or "").strip()
-            cred_val  = num(row["credit value"])
-            fee_cur   = (row["fee currency"] or "").strip()
-            fee_val   = num(row["fee value"])
-            pair      = (row["trade currency pair"] or "").strip()
-            order_id  = (row["order id"] or "").strip()
-
-            # Build a deterministic, unique synthetic ext_ref for rows without one
-            # (Deposit/Withdraw/Transfer don't carry an order_id in the export).
-            base_ref = order_id or f"VALR_C{customer_id}_{ts.strftime('%Y%m%d%H%M%S')}_{i:03d}"
-
-            ttype_l = ttype.lower()
-
-            if ttype_l in ("deposit",):
-                # Always credit ZAR
-                events.append(Event(customer_id, ts, "zar_deposit", "ZAR", cred_val,
-                                    base_ref, f"VALR_BF_{base_ref}",
-                                    {"source": "csv_backfill", "tx_type": ttype}))
-                continue
+def _stderr(msg: str) -> None:
+    print(msg, file=sys.stderr)
 
-            if ttype_l in ("withdraw", "withdrawal"):
-                # Always debit ZAR; fee is in addition to debit_val
-                total = debit_val + fee_val
-                events.append(Event(customer_id, ts, "zar_withdrawal", "ZAR", -total,
-                                    base_ref, f"VALR_BF_{base_ref}",
-                                    {"source": "csv_backfill", "tx_type": ttype,
-                                     "fee_amount": fee_val, "fee_asset": fee_cur}))
-                continue
-
-            if ttype_l in ("transfer",):
-                # Internal transfer subaccount <-> main
-                if cred_val > 0 and cred_cur:
-                    kind = "zar_deposit" if cred_cur == "ZAR" else "deposit"
-                    events.append(Event(customer_id, ts, kind, cred_cur, cred_val,
-                                        base_ref, f"VALR_BF_{base_ref}",
-                                        {"source": "csv_backfill", "tx_type": "Transfer (in)"}))
-                elif debit_val > 0 and debit_cur:
-                    kind = "zar_withdrawal" if debit_cur == "ZAR" else "withdrawal"
-                    events.append(Event(customer_id, ts, kind, debit_cur, -debit_val,
-                                        base_ref, f"VALR_BF_{base_ref}",
-                                        {"source": "csv_backfill", "tx_type": "Transfer (out)"}))
-                else:
-                    print(f"-- WARN: skipped malformed Transfer row {i}: {row}", file=sys.stderr)
-                continue
-
-            if ttype_l in ("send",):
-                # External crypto withdrawal; fee in addition to debit
-                total = debit_val + fee_val
-                events.append(Event(customer_id, ts, "withdrawal", debit_cur, -total,
-                                    base_ref, f"VALR_BF_{base_ref}",
-                                    {"source": "csv_backfill", "tx_type": "Send",
-                                     "fee_amount": fee_val, "fee_asset": fee_cur}))
-                continue
 
-            if ttype_l in ("receive", "off-chain blockchain deposit"):
+def read_export(csv_path: Path) -> tuple[dict[str, np.ndarray], list[datetime]]:
+    """An export's columns (stripped text) and its parsed UTC timestamps."""
+    cols = read_csv_columns(csv_path, dict.fromkeys(EXPORT_COLUMNS, "text"),
+                            optional=UNMAPPED_COLUMNS)
+    return cols, to_datetimes(epoch_seconds(cols["date"]))
+
+
+def emit_events(customer_id: int, csv_path: Path, warn=_stderr) -> list[Event]:
+    return map_rows(customer_id, *read_export(csv_path), warn)
+
+
+def map_rows(customer_id: int, cols: dict[str, np.ndarray], timestamps: list[datetime],
+             warn=_stderr) -> list[Event]:
+    """Apply the per-row mapping rules to an export's columns."""
+    def row(i: int) -> dict[str, str]:
+        return {name: str(col[i - 1]) for name, col in cols.items()}
+
+    debit_vals, cred_vals, fee_vals = (np.nan_to_num(floats(cols[c])).tolist()
+                                       for c in ("debit value", "credit value", "fee value"))
+    events: list[Event] = []
+    for i, (ttype, debit_cur, debit_val, cred_cur, cred_val, fee_cur, fee_val, pair, order_id,
+            ts) in enumerate(zip(
+                cols["transaction type"].tolist(), cols["debit currency"].tolist(), debit_vals,
+                cols["credit currency"].tolist(), cred_vals, cols["fee currency"].tolist(),
+                fee_vals, cols["trade currency pair"].tolist(), cols["order id"].tolist(),
+                timestamps), start=1):
+
+        # Build a deterministic, unique synthetic ext_ref for rows without one
+        # (Deposit/Withdraw/Transfer don't carry an order_id in the export).
+        base_ref = order_id or f"VALR_C{customer_id}_{ts.strftime('%Y%m%d%H%M%S')}_{i:03d}"
+
+        ttype_l = ttype.lower()
+
+        if ttype_l in ("deposit",):
+            # Always credit ZAR
+            events.append(Event(customer_id, ts, "zar_deposit", "ZAR", cred_val,
+                                base_ref, f"VALR_BF_{base_ref}",
+                                {"source": "csv_backfill", "tx_type": ttype}))
+            continue
+
+        if ttype_l in ("withdraw", "withdrawal"):
+            # Always debit ZAR; fee is in addition to debit_val
+            total = debit_val + fee_val
+            events.append(Event(customer_id, ts, "zar_withdrawal", "ZAR", -total,
+                                base_ref, f"VALR_BF_{base_ref}",
+                                {"source": "csv_backfill", "tx_type": ttype,
+                                 "fee_amount": fee_val, "fee_asset": fee_cur}))
+            continue
+
+        if ttype_l in ("transfer",):
+            # Internal transfer subaccount <-> main
+            if cred_val > 0 and cred_cur:
                 kind = "zar_deposit" if cred_cur == "ZAR" else "deposit"
                 events.append(Event(customer_id, ts, kind, cred_cur, cred_val,
                                     base_ref, f"VALR_BF_{base_ref}",
-                                    {"source": "csv_backfill", "tx_type": ttype}))
-                continue
-
-            if ttype_l in ("simple buy", "limit buy", "market buy",
-                           "simple sell", "limit sell", "market sell"):
-                # Pair trade
-                if "ZAR" in pair:
-                    # Conversion: emit BOTH legs
-                    # Debit side: out of subaccount
-                    if debit_cur and debit_val:
-                        kind_d = "zar_withdrawal" if debit_cur == "ZAR" else "withdrawal"
-                        meta_d = {"source": "csv_backfill", "tx_type": ttype,
-                                  "pair": pair, "leg": "debit",
-                                  "conversion_to": cred_cur,
-                                  "conversion_to_amount": cred_val,
-                                  "fee_amount": fee_val, "fee_asset": fee_cur}
-                        events.append(Event(customer_id, ts, kind_d, debit_cur, -debit_val,
-                                            base_ref, f"VALR_BF_{base_ref}_DEBIT_{i:03d}",
-                                            meta_d))
-                    # Credit side: into subaccount (already net of fee in CSV when fee_cur == cred_cur)
-                    if cred_cur and cred_val:
-                        kind_c = "zar_deposit" if cred_cur == "ZAR" else "deposit"
-                        meta_c = {"source": "csv_backfill", "tx_type": ttype,
-                                  "pair": pair, "leg": "credit",
-                                  "conversion_from": debit_cur,
-                                  "conversion_from_amount": debit_val,
-                                  "fee_amount": fee_val, "fee_asset": fee_cur}
-                        events.append(Event(customer_id, ts, kind_c, cred_cur, cred_val,
-                                            base_ref, f"VALR_BF_{base_ref}_CREDIT_{i:03d}",
-                                            meta_c))
-                elif pair == "BTCUSDT":
-                    # Strategy fill — out of scope for the funding-only backfill
-                    print(f"-- WARN: BTCUSDT trade not booked into funding (handled by order_fills): row {i} cust {customer_id}", file=sys.stderr)
-                else:
-                    print(f"-- WARN: unknown pair {pair} on row {i} cust {customer_id}", file=sys.stderr)
-                continue
-
-            print(f"-- WARN: unhandled transaction type '{ttype}' on row {i} cust {customer_id}: {row}", file=sys.stderr)
+                                    {"source": "csv_backfill", "tx_type": "Transfer (in)"}))
+            elif debit_val > 0 and debit_cur:
+                kind = "zar_withdrawal" if debit_cur == "ZAR" else "withdrawal"
+                events.append(Event(customer_id, ts, kind, debit_cur, -debit_val,
+                                    base_ref, f"VALR_BF_{base_ref}",
+                                    {"source": "csv_backfill", "tx_type": "Transfer (out)"}))
+            else:
+                warn(f"-- WARN: skipped malformed Transfer row {i}: {row(i)}")
+            continue
+
+        if ttype_l in ("send",):
+            # External crypto withdrawal; fee in addition to debit
+            total = debit_val + fee_val
+            events.append(Event(customer_id, ts, "withdrawal", debit_cur, -total,
+                                base_ref, f"VALR_BF_{base_ref}",
+                                {"source": "csv_backfill", "tx_type": "Send",
+                                 "fee_amount": fee_val, "fee_asset": fee_cur}))
+            continue
+
+        if ttype_l in ("receive", "off-chain blockchain deposit"):
+            kind = "zar_deposit" if cred_cur == "ZAR" else "deposit"
+            events.append(Event(customer_id, ts, kind, cred_cur, cred_val,
+                                base_ref, f"VALR_BF_{base_ref}",
+                                {"source": "csv_backfill", "tx_type": ttype}))
+            continue
+
+        if ttype_l in ("simple buy", "limit buy", "market buy",
+                       "simple sell", "limit sell", "market sell"):
+            # Pair trade
+            if "ZAR" in pair:
+                # Conversion: emit BOTH legs
+                # Debit side: out of subaccount
+                if debit_cur and debit_val:
+                    kind_d = "zar_withdrawal" if debit_cur == "ZAR" else "withdrawal"
+                    meta_d = {"source": "csv_backfill", "tx_type": ttype,
+                              "pair": pair, "leg": "debit",
+                              "conversion_to": cred_cur,
+                              "conversion_to_amount": cred_val,
+                              "fee_amount": fee_val, "fee_asset": fee_cur}
+                    events.append(Event(customer_id, ts, kind_d, debit_cur, -debit_val,
+                                        base_ref, f"VALR_BF_{base_ref}_DEBIT_{i:03d}",
+                                        meta_d))
+                # Credit side: into subaccount (already net of fee in CSV when fee_cur == cred_cur)
+                if cred_cur and cred_val:
+                    kind_c = "zar_deposit" if cred_cur == "ZAR" else "deposit"
+                    meta_c = {"source": "csv_backfill", "tx_type": ttype,
+                              "pair": pair, "leg": "credit",
+                              "conversion_from": debit_cur,
+                              "conversion_from_amount": debit_val,
+                              "fee_amount": fee_val, "fee_asset": fee_cur}
+                    events.append(Event(customer_id, ts, kind_c, cred_cur, cred_val,
+                                        base_ref, f"VALR_BF_{base_ref}_CREDIT_{i:03d}",
+                                        meta_c))
+            elif pair == "BTCUSDT":
+                # Strategy fill — out of scope for the funding-only backfill
+                warn(f"-- WARN: BTCUSDT trade not booked into funding (handled by order_fills): row {i} cust {customer_id}")
+            else:
+                warn(f"-- WARN: unknown pair {pair} on row {i} cust {customer_id}")
+            continue
+
+        warn(f"-- WARN: unhandled transaction type '{ttype}' on row {i} cust {customer_id}: {row(i)}")
 
     return events
 
@@ -176,113 +221,357 @@ def sql_str(s: str) -> str:
     return "'" + s.replace("'", "''") + "'"
 
 
-def emit_sql(all_events: list[Event]) -> None:
-    cust_ids = sorted({e.customer_id for e in all_events})
+def sql_lit(v) -> str:
+    if v is None:
+        return "NULL"
+    if isinstance(v, (int, float)):
+        return repr(v)
+    return sql_str(str(v))
+
+
+def sorted_events(all_events: list[Event]) -> list[Event]:
+    return sorted(all_events, key=lambda x: (x.customer_id, x.occurred_at, x.idempotency_key))
+
+
+def ledger_fields(e: Event) -> tuple[str, float, float, float, str]:
+    """(ledger kind, amount_btc, amount_usdt, amount_zar, trade_date) for an event."""
+    ledger_kind = "topup" if e.amount >= 0 else "withdrawal"
+    amt_btc  = e.amount if e.asset == "BTC"  else 0
+    amt_usdt = e.amount if e.asset == "USDT" else 0
+    amt_zar  = e.amount if e.asset == "ZAR"  else 0
+    return ledger_kind, amt_btc, amt_usdt, amt_zar, e.occurred_at.date().isoformat()
+
+
+def write_wipe(out, ids_csv: str) -> None:
+    if not ids_csv:
+        raise ValueError("write_wipe needs at least one customer id")
+    out.write(f"DELETE FROM lth_pvr.balances_daily       WHERE customer_id IN ({ids_csv});\n")
+    out.write(f"DELETE FROM lth_pvr.hodl_balances_daily  WHERE customer_id IN ({ids_csv});\n")
+    out.write(f"DELETE FROM lth_pvr.std_dca_balances_daily WHERE customer_id IN ({ids_csv});\n")
+    out.write(f"DELETE FROM lth_pvr.ledger_lines         WHERE customer_id IN ({ids_csv}) AND kind IN ('topup','withdrawal','deposit','transfer');\n")
+    out.write(f"DELETE FROM lth_pvr.exchange_funding_events WHERE customer_id IN ({ids_csv});\n")
+
+
+def write_event_statement(out, e: Event, skip_existing: bool = False) -> None:
+    """
+    One WITH ins AS (INSERT ... RETURNING) INSERT INTO ledger_lines statement.
+    With skip_existing, an event whose idempotency_key is already present
+    inserts nothing (and so gets no second ledger line).
+    """
+    exch = CUSTOMERS[e.customer_id][1]
+    meta_json = "jsonb_build_object(" + ", ".join(
+        f"{sql_str(k)}, {sql_str(str(v)) if not isinstance(v, (int, float)) else repr(v)}"
+        for k, v in e.metadata.items()
+    ) + ")" if e.metadata else "'{}'::jsonb"
+    # Determine ledger kind + signed amounts per asset
+    ledger_kind, amt_btc, amt_usdt, amt_zar, trade_date = ledger_fields(e)
+    out.write(
+        "WITH ins AS (\n"
+        "  INSERT INTO lth_pvr.exchange_funding_events\n"
+        "    (funding_id, org_id, customer_id, exchange_account_id, kind, asset, amount, ext_ref, occurred_at, idempotency_key, metadata)\n"
+        f"  VALUES (gen_random_uuid(), '{ORG_ID}', {e.customer_id}, '{exch}',\n"
+        f"          {sql_str(e.kind)}, {sql_str(e.asset)}, {e.amount!r}, {sql_str(e.ext_ref)},\n"
+        f"          {sql_str(e.occurred_at.isoformat())}, {sql_str(e.idempotency_key)}, {meta_json})\n"
+        + ("  ON CONFLICT (idempotency_key) DO NOTHING\n" if skip_existing else "") +
+        "  RETURNING funding_id\n"
+        ")\n"
+        "INSERT INTO lth_pvr.ledger_lines\n"
+        "    (org_id, customer_id, trade_date, kind, amount_btc, amount_usdt, amount_zar, fee_btc, fee_usdt, platform_fee_btc, platform_fee_usdt, note)\n"
+        f"SELECT '{ORG_ID}', {e.customer_id}, DATE {sql_str(trade_date)}, {sql_str(ledger_kind)},\n"
+        f"       {amt_btc!r}, {amt_usdt!r}, {amt_zar!r}, 0, 0, 0, 0,\n"
+        "       'funding:' || ins.funding_id::text\n"
+        "FROM ins;\n"
+    )
+
+
+def emit_sql(all_events: list[Event], out=None, customer_ids=None) -> None:
+    out = out or sys.stdout
+    cust_ids = sorted(customer_ids if customer_ids is not None
+                      else {e.customer_id for e in all_events})
     ids_csv = ",".join(str(c) for c in cust_ids)
 
-    print("-- ===========================================================")
-    print("-- One-shot backfill: rebuild funding events + ledger lines for")
-    print(f"-- customers {ids_csv} from VALR CSV exports.")
-    print(f"-- Generated by scripts/backfill_from_valr_exports.py")
-    print(f"-- Timestamp: {datetime.now(timezone.utc).isoformat()}")
-    print("-- ===========================================================")
-    print()
-    print("BEGIN;")
-    print()
-    print(f"-- 1) Wipe existing funding/ledger/balance rows for in-scope customers")
-    print(f"DELETE FROM lth_pvr.balances_daily       WHERE customer_id IN ({ids_csv});")
-    print(f"DELETE FROM lth_pvr.hodl_balances_daily  WHERE customer_id IN ({ids_csv});")
-    print(f"DELETE FROM lth_pvr.std_dca_balances_daily WHERE customer_id IN ({ids_csv});")
-    print(f"DELETE FROM lth_pvr.ledger_lines         WHERE customer_id IN ({ids_csv}) AND kind IN ('topup','withdrawal','deposit','transfer');")
-    print(f"DELETE FROM lth_pvr.exchange_funding_events WHERE customer_id IN ({ids_csv});")
-    print()
-
-    print("-- 2) Insert reconstructed funding events AND matching ledger lines.")
-    print("--    The ledger lines are inserted directly (kind=topup/withdrawal)")
-    print("--    rather than letting ef_post_ledger_and_balances derive them, to avoid")
-    print("--    re-charging the 0.75% platform fee on historical deposits.")
-    print("--    Once the matching note='funding:<uuid>' exists, the edge function will")
-    print("--    skip these funding events on its next run.")
-    print()
-    for e in sorted(all_events, key=lambda x: (x.customer_id, x.occurred_at, x.idempotency_key)):
-        exch = CUSTOMERS[e.customer_id][1]
-        meta_json = "jsonb_build_object(" + ", ".join(
-            f"{sql_str(k)}, {sql_str(str(v)) if not isinstance(v, (int, float)) else repr(v)}"
-            for k, v in e.metadata.items()
-        ) + ")" if e.metadata else "'{}'::jsonb"
-        # Determine ledger kind + signed amounts per asset
-        ledger_kind = "topup" if e.amount >= 0 else "withdrawal"
-        amt_btc  = e.amount if e.asset == "BTC"  else 0
-        amt_usdt = e.amount if e.asset == "USDT" else 0
-        amt_zar  = e.amount if e.asset == "ZAR"  else 0
-        trade_date = e.occurred_at.date().isoformat()
-        print("WITH ins AS (")
-        print("  INSERT INTO lth_pvr.exchange_funding_events")
-        print("    (funding_id, org_id, customer_id, exchange_account_id, kind, asset, amount, ext_ref, occurred_at, idempotency_key, metadata)")
-        print(f"  VALUES (gen_random_uuid(), '{ORG_ID}', {e.customer_id}, '{exch}',")
-        print(f"          {sql_str(e.kind)}, {sql_str(e.asset)}, {e.amount!r}, {sql_str(e.ext_ref)},")
-        print(f"          {sql_str(e.occurred_at.isoformat())}, {sql_str(e.idempotency_key)}, {meta_json})")
-        print("  RETURNING funding_id")
-        print(")")
-        print("INSERT INTO lth_pvr.ledger_lines")
-        print("    (org_id, customer_id, trade_date, kind, amount_btc, amount_usdt, amount_zar, fee_btc, fee_usdt, platform_fee_btc, platform_fee_usdt, note)")
-        print(f"SELECT '{ORG_ID}', {e.customer_id}, DATE {sql_str(trade_date)}, {sql_str(ledger_kind)},")
-        print(f"       {amt_btc!r}, {amt_usdt!r}, {amt_zar!r}, 0, 0, 0, 0,")
-        print("       'funding:' || ins.funding_id::text")
-        print("FROM ins;")
-    print()
-    print("COMMIT;")
-
-
-def emit_sql_to(out, all_events: list[Event], include_wipe: bool, include_tx: bool) -> None:
-    import io, contextlib
-    buf = io.StringIO()
-    with contextlib.redirect_stdout(buf):
-        # Reuse emit_sql's body but skip wipe/tx as requested
-        cust_ids = sorted({e.customer_id for e in all_events})
-        ids_csv = ",".join(str(c) for c in cust_ids)
-        if include_tx:
-            print("BEGIN;")
-            print()
-        if include_wipe:
-            print(f"DELETE FROM lth_pvr.balances_daily       WHERE customer_id IN ({ids_csv});")
-            print(f"DELETE FROM lth_pvr.hodl_balances_daily  WHERE customer_id IN ({ids_csv});")
-            print(f"DELETE FROM lth_pvr.std_dca_balances_daily WHERE customer_id IN ({ids_csv});")
-            print(f"DELETE FROM lth_pvr.ledger_lines         WHERE customer_id IN ({ids_csv}) AND kind IN ('topup','withdrawal','deposit','transfer');")
-            print(f"DELETE FROM lth_pvr.exchange_funding_events WHERE customer_id IN ({ids_csv});")
-            print()
-        for e in sorted(all_events, key=lambda x: (x.customer_id, x.occurred_at, x.idempotency_key)):
-            exch = CUSTOMERS[e.customer_id][1]
-            meta_json = "jsonb_build_object(" + ", ".join(
-                f"{sql_str(k)}, {sql_str(str(v)) if not isinstance(v, (int, float)) else repr(v)}"
-                for k, v in e.metadata.items()
-            ) + ")" if e.metadata else "'{}'::jsonb"
-            ledger_kind = "topup" if e.amount >= 0 else "withdrawal"
-            amt_btc  = e.amount if e.asset == "BTC"  else 0
-            amt_usdt = e.amount if e.asset == "USDT" else 0
-            amt_zar  = e.amount if e.asset == "ZAR"  else 0
-            trade_date = e.occurred_at.date().isoformat()
-            print("WITH ins AS (")
-            print("  INSERT INTO lth_pvr.exchange_funding_events")
-            print("    (funding_id, org_id, customer_id, exchange_account_id, kind, asset, amount, ext_ref, occurred_at, idempotency_key, metadata)")
-            print(f"  VALUES (gen_random_uuid(), '{ORG_ID}', {e.customer_id}, '{exch}',")
-            print(f"          {sql_str(e.kind)}, {sql_str(e.asset)}, {e.amount!r}, {sql_str(e.ext_ref)},")
-            print(f"          {sql_str(e.occurred_at.isoformat())}, {sql_str(e.idempotency_key)}, {meta_json})")
-            print("  RETURNING funding_id")
-            print(")")
-            print("INSERT INTO lth_pvr.ledger_lines")
-            print("    (org_id, customer_id, trade_date, kind, amount_btc, amount_usdt, amount_zar, fee_btc, fee_usdt, platform_fee_btc, platform_fee_usdt, note)")
-            print(f"SELECT '{ORG_ID}', {e.customer_id}, DATE {sql_str(trade_date)}, {sql_str(ledger_kind)},")
-            print(f"       {amt_btc!r}, {amt_usdt!r}, {amt_zar!r}, 0, 0, 0, 0,")
-            print("       'funding:' || ins.funding_id::text")
-            print("FROM ins;")
-        if include_tx:
-            print()
-            print("COMMIT;")
-    out.write(buf.getvalue())
-
+    out.write("-- ===========================================================\n")
+    out.write("-- One-shot backfill: rebuild funding events + ledger lines for\n")
+    out.write(f"-- customers {ids_csv} from VALR CSV exports.\n")
+    out.write("-- Generated by scripts/backfill_from_valr_exports.py\n")
+    out.write(f"-- Timestamp: {datetime.now(timezone.utc).isoformat()}\n")
+    out.write("-- ===========================================================\n")
+    out.write("\n")
+    out.write("BEGIN;\n")
+    out.write("\n")
+    out.write("-- 1) Wipe existing funding/ledger/balance rows for in-scope customers\n")
+    write_wipe(out, ids_csv)
+    out.write("\n")
+
+    out.write("-- 2) Insert reconstructed funding events AND matching ledger lines.\n")
+    out.write("--    The ledger lines are inserted directly (kind=topup/withdrawal)\n")
+    out.write("--    rather than letting ef_post_ledger_and_balances derive them, to avoid\n")
+    out.write("--    re-charging the 0.75% platform fee on historical deposits.\n")
+    out.write("--    Once the matching note='funding:<uuid>' exists, the edge function will\n")
+    out.write("--    skip these funding events on its next run.\n")
+    out.write("\n")
+    for e in sorted_events(all_events):
+        write_event_statement(out, e)
+    out.write("\n")
+    out.write("COMMIT;\n")
+
+
+def emit_sql_to(out, all_events: list[Event], include_wipe: bool, include_tx: bool,
+                skip_existing: bool = False, customer_ids=None) -> None:
+    """customer_ids: customers to wipe (default: those with events)."""
+    cust_ids = sorted(customer_ids if customer_ids is not None
+                      else {e.customer_id for e in all_events})
+    ids_csv = ",".join(str(c) for c in cust_ids)
+    if include_tx:
+        out.write("BEGIN;\n\n")
+    if include_wipe:
+        write_wipe(out, ids_csv)
+        out.write("\n")
+    for e in sorted_events(all_events):
+        write_event_statement(out, e, skip_existing)
+    if include_tx:
+        out.write("\nCOMMIT;\n")
+
+
+# ── Set-based output ──────────────────────────────────────────────────────────
+# Instead of one statement per event, rows are staged into two temp tables
+# (multi-row VALUES, or CSV files loaded with psql's \copy) and written with
+# one INSERT ... SELECT per target table.  Ledger lines pick up their
+# funding_id by joining back on the (unique) idempotency_key.
+
+FUNDING_STAGE = "_bf_funding_stage"
+LEDGER_STAGE  = "_bf_ledger_stage"
+VALUES_CHUNK  = 1000   # rows per multi-row INSERT
+
+FUNDING_COLS = ("customer_id", "exchange_account_id", "kind", "asset", "amount",
+                "ext_ref", "occurred_at", "idempotency_key", "metadata")
+LEDGER_COLS  = ("idempotency_key", "customer_id", "trade_date", "kind",
+                "amount_btc", "amount_usdt", "amount_zar")
+
+
+def funding_row(e: Event) -> tuple:
+    return (e.customer_id, CUSTOMERS[e.customer_id][1], e.kind, e.asset, e.amount,
+            e.ext_ref, e.occurred_at.isoformat(), e.idempotency_key, json.dumps(e.metadata))
+
+
+def ledger_row(e: Event) -> tuple:
+    ledger_kind, amt_btc, amt_usdt, amt_zar, trade_date = ledger_fields(e)
+    return (e.idempotency_key, e.customer_id, trade_date, ledger_kind, amt_btc, amt_usdt, amt_zar)
+
+
+def write_values(out, table: str, cols: tuple, rows) -> None:
+    """Stream rows as multi-row INSERT ... VALUES statements of VALUES_CHUNK rows."""
+    header = f"INSERT INTO {table} ({', '.join(cols)}) VALUES\n"
+    n = 0
+    for row in rows:
+        out.write(header if n % VALUES_CHUNK == 0 else ",\n")
+        out.write("  (" + ", ".join(sql_lit(v) for v in row) + ")")
+        n += 1
+        if n % VALUES_CHUNK == 0:
+            out.write(";\n")
+    if n % VALUES_CHUNK:
+        out.write(";\n")
+
+
+def write_copy(path: Path, cols: tuple, rows) -> None:
+    """Stream rows to a CSV staging file for \\copy."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(cols)
+        for row in rows:
+            w.writerow(["" if v is None else repr(v) if isinstance(v, float) else v for v in row])
+
+
+def emit_set_sql(out, all_events: list[Event], include_wipe: bool = True,
+                 include_tx: bool = True, copy_dir: Path | None = None,
+                 skip_existing: bool = False, customer_ids=None) -> None:
+    """
+    Set-based backfill script.  With copy_dir, staging rows go to
+    <copy_dir>/<stage>.csv and are loaded with psql's \\copy; otherwise they are
+    inlined as multi-row VALUES (works in any SQL client).  With skip_existing,
+    staged events whose idempotency_key is already present are left alone.
+    customer_ids are the customers to wipe (default: those with events).
+    """
+    events = sorted_events(all_events)
+    cust_ids = sorted(customer_ids if customer_ids is not None
+                      else {e.customer_id for e in events})
+    ids_csv = ",".join(str(c) for c in cust_ids)
 
-def main() -> None:
+    out.write("-- ===========================================================\n")
+    out.write("-- Set-based backfill: rebuild funding events + ledger lines for\n")
+    out.write(f"-- customers {ids_csv} from VALR CSV exports ({len(events)} events).\n")
+    out.write("-- Generated by scripts/backfill_from_valr_exports.py --set-based\n")
+    out.write(f"-- Timestamp: {datetime.now(timezone.utc).isoformat()}\n")
+    if copy_dir is not None:
+        out.write("-- Staging rows are loaded from client-side CSV files with \\copy: apply with psql.\n")
+    out.write("-- ===========================================================\n\n")
+    if include_tx:
+        out.write("BEGIN;\n\n")
+    if include_wipe:
+        out.write("-- 1) Wipe existing funding/ledger/balance rows for in-scope customers\n")
+        write_wipe(out, ids_csv)
+        out.write("\n")
+
+    out.write("-- 2) Stage funding events and their ledger lines\n")
+    out.write(f"DROP TABLE IF EXISTS {FUNDING_STAGE}, {LEDGER_STAGE};\n")
+    out.write(f"CREATE TEMP TABLE {FUNDING_STAGE} (\n"
+              "  customer_id bigint not null, exchange_account_id uuid not null,\n"
+              "  kind text not null, asset text not null, amount numeric(38, 8) not null,\n"
+              "  ext_ref text, occurred_at timestamptz not null,\n"
+              "  idempotency_key text primary key, metadata jsonb not null\n"
+              ");\n")
+    out.write(f"CREATE TEMP TABLE {LEDGER_STAGE} (\n"
+              "  idempotency_key text primary key, customer_id bigint not null,\n"
+              "  trade_date date not null, kind text not null,\n"
+              "  amount_btc numeric not null, amount_usdt numeric not null, amount_zar numeric not null\n"
+              ");\n")
+    for table, cols, make in ((FUNDING_STAGE, FUNDING_COLS, funding_row),
+                              (LEDGER_STAGE, LEDGER_COLS, ledger_row)):
+        rows = (make(e) for e in events)
+        if copy_dir is None:
+            write_values(out, table, cols, rows)
+        else:
+            path = copy_dir / f"{table.lstrip('_')}.csv"
+            write_copy(path, cols, rows)
+            out.write(f"\\copy {table} ({', '.join(cols)}) FROM '{path.as_posix()}' WITH (FORMAT csv, HEADER true)\n")
+    out.write("\n")
+
+    out.write("-- 3) One INSERT ... SELECT per target table.  The ledger lines are\n")
+    out.write("--    inserted directly (kind=topup/withdrawal) so the 0.75% platform fee\n")
+    out.write("--    is not re-charged on historical deposits; note='funding:<uuid>' makes\n")
+    out.write("--    ef_post_ledger_and_balances skip these funding events.\n")
+    out.write("INSERT INTO lth_pvr.exchange_funding_events\n"
+              "    (funding_id, org_id, customer_id, exchange_account_id, kind, asset, amount, ext_ref, occurred_at, idempotency_key, metadata)\n"
+              f"SELECT gen_random_uuid(), '{ORG_ID}', s.customer_id, s.exchange_account_id, s.kind, s.asset,\n"
+              "       s.amount, s.ext_ref, s.occurred_at, s.idempotency_key, s.metadata\n"
+              f"FROM {FUNDING_STAGE} s\n"
+              "ORDER BY s.customer_id, s.occurred_at, s.idempotency_key"
+              + ("\nON CONFLICT (idempotency_key) DO NOTHING" if skip_existing else "") + ";\n\n")
+    out.write("INSERT INTO lth_pvr.ledger_lines\n"
+              "    (org_id, customer_id, trade_date, kind, amount_btc, amount_usdt, amount_zar, fee_btc, fee_usdt, platform_fee_btc, platform_fee_usdt, note)\n"
+              f"SELECT '{ORG_ID}', l.customer_id, l.trade_date, l.kind,\n"
+              "       l.amount_btc, l.amount_usdt, l.amount_zar, 0, 0, 0, 0,\n"
+              "       'funding:' || f.funding_id::text\n"
+              f"FROM {LEDGER_STAGE} l\n"
+              "JOIN lth_pvr.exchange_funding_events f ON f.idempotency_key = l.idempotency_key\n"
+              f"JOIN {FUNDING_STAGE} s ON s.idempotency_key = l.idempotency_key\n"
+              + ("WHERE NOT EXISTS (SELECT 1 FROM lth_pvr.ledger_lines x\n"
+                 "                  WHERE x.note = 'funding:' || f.funding_id::text)\n"
+                 if skip_existing else "") +
+              "ORDER BY s.customer_id, s.occurred_at, s.idempotency_key;\n\n")
+    out.write(f"DROP TABLE {FUNDING_STAGE}, {LEDGER_STAGE};\n")
+    if include_tx:
+        out.write("\nCOMMIT;\n")
+
+
+# ── Incremental import ────────────────────────────────────────────────────────
+# Exports list rows newest first and the synthetic ext_ref of a row without an
+# order id carries its row number, so an older row's idempotency_key shifts
+# from one export to the next.  The per-customer watermark (latest occurred_at
+# already imported) is therefore the gate: only events strictly after it are
+# new.  The key set drops exact re-imports; events at or before the watermark
+# with an unknown key are counted and reported, never inserted.
+
+Existing = dict[int, tuple[datetime | None, set[str]]]   # customer_id -> (watermark, keys)
+
+
+def _add_existing(existing: Existing, cust_id: int, occurred_at: datetime, key: str | None) -> None:
+    watermark, keys = existing.setdefault(cust_id, (None, set()))
+    if key:
+        keys.add(key)
+    if watermark is None or occurred_at > watermark:
+        existing[cust_id] = (occurred_at, keys)
+
+
+def fetch_existing(customer_ids) -> Existing:
+    """Watermark + idempotency keys per customer from exchange_funding_events (PostgREST)."""
+    sb_url = os.getenv("SUPABASE_URL", "")
+    sb_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
+    if not sb_url or not sb_key:
+        print("-- ERROR: --incremental needs SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY "
+              "(or --existing FILE)", file=sys.stderr)
+        sys.exit(1)
+    headers = {"apikey": sb_key, "Authorization": f"Bearer {sb_key}", "Accept-Profile": "lth_pvr"}
+    ids = sorted(customer_ids)
+    existing: Existing = {c: (None, set()) for c in ids}
+    offset = 0
+    while True:
+        query = urllib.parse.urlencode({
+            "select":      "customer_id,occurred_at,idempotency_key",
+            "org_id":      f"eq.{ORG_ID}",
+            "customer_id": f"in.({','.join(str(c) for c in ids)})",
+            "order":       "funding_id.asc",
+            "limit":       PAGE_SIZE,
+            "offset":      offset,
+        })
+        req = urllib.request.Request(f"{sb_url}/rest/v1/exchange_funding_events?{query}",
+                                     headers=headers)
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            page = json.load(resp)
+        for r in page:
+            _add_existing(existing, int(r["customer_id"]),
+                          datetime.fromisoformat(r["occurred_at"]), r["idempotency_key"])
+        if len(page) < PAGE_SIZE:
+            return existing
+        offset += PAGE_SIZE
+
+
+def read_existing(path: Path, customer_ids) -> Existing:
+    """Same as fetch_existing, from a customer_id,occurred_at,idempotency_key CSV dump."""
+    existing: Existing = {c: (None, set()) for c in sorted(customer_ids)}
+    cols = read_csv_columns(path, {"customer_id": "float", "occurred_at": "stamp",
+                                   "idempotency_key": "text"}, optional=("idempotency_key",))
+    for cust_id, at, key in zip(cols["customer_id"].astype(np.int64).tolist(),
+                                to_datetimes(cols["occurred_at"]),
+                                cols["idempotency_key"].tolist()):
+        if cust_id in existing:
+            _add_existing(existing, cust_id, at, key or None)
+    return existing
+
+
+def new_events(events: list[Event], watermark: datetime | None, keys: set[str],
+               warn=_stderr) -> list[Event]:
+    """One customer's events after its watermark whose key is not imported yet."""
+    fresh: list[Event] = []
+    stale = 0
+    for e in events:
+        if e.idempotency_key in keys:
+            continue
+        if watermark is not None and e.occurred_at <= watermark:
+            stale += 1
+            continue
+        fresh.append(e)
+    if stale:
+        warn(f"-- WARN: cust {events[0].customer_id}: {stale} events at or before the watermark "
+             f"{watermark.isoformat()} have unknown keys (row-numbered refs shift between exports); not imported")
+    return fresh
+
+
+def recompute_from(events: list[Event]) -> dict[int, str]:
+    """{customer_id: earliest trade_date among the events} — balances from here on are stale."""
+    out: dict[int, str] = {}
+    for e in events:
+        d = e.occurred_at.date().isoformat()
+        if e.customer_id not in out or d < out[e.customer_id]:
+            out[e.customer_id] = d
+    return dict(sorted(out.items()))
+
+
+def incremental_events(all_events: list[Event], existing: Existing) -> list[Event]:
+    by_cust: dict[int, list[Event]] = {}
+    for e in all_events:
+        by_cust.setdefault(e.customer_id, []).append(e)
+    fresh: list[Event] = []
+    for cust_id, events in sorted(by_cust.items()):
+        watermark, keys = existing.get(cust_id, (None, set()))
+        cust_new = new_events(events, watermark, keys)
+        print(f"-- customer {cust_id}: {len(cust_new)} new of {len(events)} events "
+              f"(watermark {watermark.isoformat() if watermark else 'none'})", file=sys.stderr)
+        fresh.extend(cust_new)
+    return fresh
+
+
+def load_events() -> list[Event]:
     all_events: list[Event] = []
     for cust_id, (csv_rel, _exch) in CUSTOMERS.items():
         path = ROOT / csv_rel
@@ -292,31 +581,242 @@ def main() -> None:
         ev = emit_events(cust_id, path)
         print(f"-- customer {cust_id}: {len(ev)} events from {csv_rel}", file=sys.stderr)
         all_events.extend(ev)
+    return all_events
+
+
+# ── Directory import ──────────────────────────────────────────────────────────
+# CUSTOMERS is replaced by the manifest entries and shared with the worker
+# processes through the pool initializer; each worker parses one export,
+# applies the mapping rules and writes that customer's SQL file itself.
+
+EXPORT_RE = re.compile(r"customer_(\d+)_(\d{8})\.csv$")
+
+
+def read_manifest(path: Path) -> dict[int, tuple[str | None, str]]:
+    """customer_id,exchange_account_id[,file] -> {customer_id: (file or None, exchange_account_id)}"""
+    manifest: dict[int, tuple[str | None, str]] = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            cust_id = int(row["customer_id"])
+            manifest[cust_id] = ((row.get("file") or "").strip() or None,
+                                 row["exchange_account_id"].strip())
+    return manifest
+
+
+def discover(export_dir: Path, manifest: dict[int, tuple[str | None, str]]) -> dict[int, tuple[str, str]]:
+    """Resolve each manifest customer to an export file (explicit, else the latest by date)."""
+    latest: dict[int, tuple[str, Path]] = {}
+    for path in export_dir.glob("customer_*_*.csv"):
+        m = EXPORT_RE.match(path.name)
+        if m and (int(m[1]) not in latest or m[2] > latest[int(m[1])][0]):
+            latest[int(m[1])] = (m[2], path)
+
+    customers: dict[int, tuple[str, str]] = {}
+    for cust_id, (file, exch) in sorted(manifest.items()):
+        path = export_dir / file if file else latest.get(cust_id, (None, None))[1]
+        if path is None or not path.exists():
+            print(f"-- WARN: no export for customer {cust_id} in {export_dir}", file=sys.stderr)
+            continue
+        customers[cust_id] = (str(path), exch)
+    for cust_id in sorted(set(latest) - set(manifest)):
+        print(f"-- WARN: {latest[cust_id][1].name} has no manifest entry, skipped", file=sys.stderr)
+    return customers
+
+
+def _init_worker(customers: dict[int, tuple[str, str]]) -> None:
+    CUSTOMERS.clear()
+    CUSTOMERS.update(customers)
+
+
+def import_customer(cust_id: int, out_dir: Path, set_based: bool,
+                    include_wipe: bool, include_tx: bool,
+                    existing: tuple[datetime | None, set[str]] | None = None) -> dict:
+    """
+    Parse, map and write one customer's export; returns its summary.  With
+    existing (watermark, keys) only new events are written, without a wipe.
+    """
+    csv_path = Path(CUSTOMERS[cust_id][0])
+    warnings: list[str] = []
+    cols, timestamps = read_export(csv_path)
+    events = map_rows(cust_id, cols, timestamps, warnings.append)
+    n_mapped = len(events)
+    if not events and include_wipe and existing is None:
+        warnings.append(f"-- WARN: {csv_path.name} maps to no events; "
+                        f"customer_{cust_id}.sql only wipes customer {cust_id}")
+    if existing is not None:
+        events = new_events(events, *existing, warn=warnings.append)
+        include_wipe = False
+
+    out_path = out_dir / f"customer_{cust_id}.sql"
+    with open(out_path, "w", encoding="utf-8") as f:
+        if set_based:
+            emit_set_sql(f, events, include_wipe=include_wipe, include_tx=include_tx,
+                         skip_existing=existing is not None, customer_ids=[cust_id])
+        else:
+            emit_sql_to(f, events, include_wipe=include_wipe, include_tx=include_tx,
+                        skip_existing=existing is not None, customer_ids=[cust_id])
+    return {
+        "customer_id": cust_id,
+        "file": csv_path.name,
+        "out": out_path.name,
+        "rows": len(timestamps),
+        "mapped": n_mapped,
+        "events": len(events),
+        "recompute_from": recompute_from(events).get(cust_id),
+        "types": dict(Counter(cols["transaction type"].tolist())),
+        "warnings": warnings,
+    }
+
+
+def import_dir(customers: dict[int, tuple[str, str]], out_dir: Path, workers: int,
+               set_based: bool, include_wipe: bool, include_tx: bool,
+               existing: Existing | None = None) -> dict:
+    _init_worker(customers)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ids = sorted(customers)
+    args = (out_dir, set_based, include_wipe, include_tx)
+    states = [None if existing is None else existing.get(c, (None, set())) for c in ids]
+
+    t0 = time.perf_counter()
+    if workers == 1 or len(ids) <= 1:
+        results = [import_customer(c, *args, st) for c, st in zip(ids, states)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(ids)),
+                                 initializer=_init_worker, initargs=(customers,)) as pool:
+            results = list(pool.map(import_customer, ids,
+                                    *([a] * len(ids) for a in args), states))
+    elapsed = time.perf_counter() - t0
+
+    types: Counter = Counter()
+    for r in results:
+        types.update(r["types"])
+    n_rows = sum(r["rows"] for r in results)
+    return {
+        "customers": results,
+        "types": dict(sorted(types.items())),
+        "warnings": [w for r in results for w in r["warnings"]],
+        "rows": n_rows,
+        "events": sum(r["events"] for r in results),
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(n_rows / elapsed) if elapsed > 0 else None,
+        "workers": 1 if workers == 1 or len(ids) <= 1 else min(workers, len(ids)),
+        "incremental": existing is not None,
+    }
+
+
+def print_summary(summary: dict) -> None:
+    for r in summary["customers"]:
+        new = ""
+        if summary["incremental"]:
+            since = f", recompute from {r['recompute_from']}" if r["recompute_from"] else ""
+            new = f" ({r['events']} new{since})"
+        print(f"-- customer {r['customer_id']}: {r['rows']} rows -> {r['mapped']} events{new} "
+              f"({r['file']} -> {r['out']}, {len(r['warnings'])} warnings)", file=sys.stderr)
+    print("-- rows per transaction type:", file=sys.stderr)
+    for ttype, n in summary["types"].items():
+        print(f"--   {ttype or '(blank)':<32} {n:>8}", file=sys.stderr)
+    for w in summary["warnings"]:
+        print(w, file=sys.stderr)
+    print(f"-- {summary['rows']} rows / {summary['events']} events from "
+          f"{len(summary['customers'])} files in {summary['seconds']:.3f}s "
+          f"({summary['rows_per_sec']} rows/s, {summary['workers']} workers)", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--set-based", action="store_true",
+                        help="Write staged rows + one INSERT ... SELECT per table to --out")
+    parser.add_argument("--out", type=Path,
+                        default=ROOT / "scripts" / "backfill_from_valr_exports_set.sql",
+                        help="Output file for --set-based")
+    parser.add_argument("--copy", action="store_true",
+                        help="With --set-based: stage rows as CSV files next to --out, loaded via psql \\copy")
+    parser.add_argument("--no-wipe", action="store_true",
+                        help="With --set-based / --dir: do not delete the customers' existing rows first")
+    parser.add_argument("--no-tx", action="store_true",
+                        help="With --set-based / --dir: omit BEGIN/COMMIT")
+    parser.add_argument("--dir", type=Path,
+                        help="Import every customer export under this directory (needs --manifest)")
+    parser.add_argument("--manifest", type=Path,
+                        help="CSV: customer_id,exchange_account_id[,file] (file relative to --dir)")
+    parser.add_argument("--out-dir", type=Path, default=ROOT / "scripts" / "_backfill_customers",
+                        help="With --dir: one customer_<id>.sql per customer + summary.json")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="With --dir: parser processes (1 = inline)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="No wipe: only events after each customer's latest imported occurred_at")
+    parser.add_argument("--existing", type=Path,
+                        help="With --incremental: customer_id,occurred_at,idempotency_key CSV "
+                             "instead of reading exchange_funding_events via PostgREST")
+    args = parser.parse_args()
+
+    def load_existing(customer_ids) -> Existing | None:
+        if not args.incremental:
+            return None
+        if args.existing is not None:
+            return read_existing(args.existing, customer_ids)
+        return fetch_existing(customer_ids)
+
+    if args.dir is not None:
+        if args.manifest is None:
+            parser.error("--dir needs --manifest")
+        if args.copy:
+            parser.error("--copy is not supported with --dir")
+        customers = discover(args.dir, read_manifest(args.manifest))
+        if not customers:
+            print("-- ERROR: no exports to import", file=sys.stderr)
+            sys.exit(1)
+        summary = import_dir(customers, args.out_dir, max(1, args.workers), args.set_based,
+                             include_wipe=not args.no_wipe, include_tx=not args.no_tx,
+                             existing=load_existing(customers))
+        with open(args.out_dir / "summary.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print_summary(summary)
+        return
+
+    all_events = load_events()
+    existing = load_existing(CUSTOMERS)
+    if existing is not None:
+        all_events = incremental_events(all_events, existing)
+        for cust_id, day in recompute_from(all_events).items():
+            print(f"-- customer {cust_id}: recompute balances from {day}", file=sys.stderr)
+
+    if args.set_based:
+        copy_dir = args.out.parent if args.copy else None
+        with open(args.out, "w", encoding="utf-8") as f:
+            emit_set_sql(f, all_events, include_wipe=not args.no_wipe and existing is None,
+                         include_tx=not args.no_tx, copy_dir=copy_dir,
+                         skip_existing=existing is not None, customer_ids=CUSTOMERS)
+        print(f"-- wrote {args.out} ({len(all_events)} events, set-based)", file=sys.stderr)
+        return
+
+    if existing is not None:
+        # Only the new events, no wipe and no full-history chunk files
+        out = sys.stdout
+        out.write("-- Incremental VALR import: new funding events + ledger lines only.\n")
+        out.write(f"-- Timestamp: {datetime.now(timezone.utc).isoformat()}\n")
+        for cust_id, day in recompute_from(all_events).items():
+            out.write(f"-- customer {cust_id}: recompute balances from {day}\n")
+        out.write("\n")
+        emit_sql_to(out, all_events, include_wipe=False, include_tx=not args.no_tx,
+                    skip_existing=True)
+        return
 
     # Always emit the combined transactional file (handy for psql / manual use)
-    emit_sql(all_events)
+    emit_sql(all_events, customer_ids=CUSTOMERS)
 
     # Also emit one per-customer fragment (no BEGIN/COMMIT, no wipe) for chunked apply
     out_dir = ROOT / "scripts" / "_backfill_chunks"
     out_dir.mkdir(parents=True, exist_ok=True)
-    # Wipe chunk first
-    with open(out_dir / "00_wipe.sql", "w", encoding="utf-8") as f:
-        emit_sql_to(f, all_events, include_wipe=True, include_tx=False)
-        # Truncate the inserted events part by re-running with empty list:
-    # Better: write per customer
     for cust_id in sorted({e.customer_id for e in all_events}):
         cust_events = [e for e in all_events if e.customer_id == cust_id]
         with open(out_dir / f"01_customer_{cust_id}.sql", "w", encoding="utf-8") as f:
             emit_sql_to(f, cust_events, include_wipe=False, include_tx=False)
-    # Re-write 00_wipe.sql with only the wipe statements
+    # Wipe chunk: only the wipe statements
     with open(out_dir / "00_wipe.sql", "w", encoding="utf-8") as f:
-        cust_ids = sorted({e.customer_id for e in all_events})
-        ids_csv = ",".join(str(c) for c in cust_ids)
-        f.write(f"DELETE FROM lth_pvr.balances_daily       WHERE customer_id IN ({ids_csv});\n")
-        f.write(f"DELETE FROM lth_pvr.hodl_balances_daily  WHERE customer_id IN ({ids_csv});\n")
-        f.write(f"DELETE FROM lth_pvr.std_dca_balances_daily WHERE customer_id IN ({ids_csv});\n")
-        f.write(f"DELETE FROM lth_pvr.ledger_lines         WHERE customer_id IN ({ids_csv}) AND kind IN ('topup','withdrawal','deposit','transfer');\n")
-        f.write(f"DELETE FROM lth_pvr.exchange_funding_events WHERE customer_id IN ({ids_csv});\n")
+        write_wipe(f, ",".join(str(c) for c in sorted(CUSTOMERS)))
 
 
 if __name__ == "__main__":
@@ -12,6 +12,9 @@ Changes from v3:
     Covers ZAR/USDT, USDT/BTC, and USDT/USDPC conversion fees
   · Finova Capital variant: 20% perf-fee share + 50% platform-fee share, no fixed FSP costs
   · All v3 variable values carried across
+  · --values writes numbers precomputed by scripts/cashflow_forecast.py instead
+    of formulas (files *_values.xlsx); --perf-fee hwm swaps the perf-fee accrual
+    for a per-client high-water mark crystallised every perf_period months
 
 Column layout (40 cols):
   A-C  (1-3)   Period
@@ -25,12 +28,15 @@ Column layout (40 cols):
   AN   (40)    Reserve Fund Balance
 """
 
+import argparse
 from pathlib import Path
 from openpyxl import Workbook
 from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 from openpyxl.chart import LineChart, Reference
 from openpyxl.utils import get_column_letter as gcl
 
+from cashflow_forecast import PERF_FEES, forecast, sheet_columns
+
 OUT_DIR = Path("docs") / "Financial"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -87,7 +93,8 @@ def section_hdr(ws, row, c1, c2, text, fh=TEAL):
 # BUILD VARIABLES SHEET
 # ═══════════════════════════════════════════════════════════════════════════
 def build_variables(ws_v, mode):
-    """Populate the VARIABLES sheet.  Returns the VARS dict of cell references."""
+    """Populate the VARIABLES sheet.  Returns the VARS dict of cell references
+    and the dict of values written."""
     ws_v.sheet_view.showGridLines = False
     ws_v.column_dimensions["A"].width = 55
     ws_v.column_dimensions["B"].width = 22
@@ -110,6 +117,7 @@ def build_variables(ws_v, mode):
     c.fill = fp(L_GOLD); c.font = fn(sz=10, ital=True); c.alignment = al(h="center")
 
     V = {}  # key -> "VARIABLES!$B$N"
+    VALS = {}  # key -> value written to column B
 
     def vr(start_row, title_text, items, title_color=TEAL):
         """Write a variable block and register cell refs in V. Returns next free row."""
@@ -134,6 +142,7 @@ def build_variables(ws_v, mode):
             sc(ws_v, r, 3, val=note, ha="left", fh=WHITE,
                ital=True, sz=9, fc="555555", border=bdr_all)
             V[key] = f"VARIABLES!$B${r}"
+            VALS[key] = value
             r += 1
         return r + 1  # blank gap after block
 
@@ -279,13 +288,15 @@ def build_variables(ws_v, mode):
     c.alignment = al(h="left", wrap=True)
     ws_v.row_dimensions[lr].height = 60
 
-    return V
+    return V, VALS
 
 
 # ═══════════════════════════════════════════════════════════════════════════
 # BUILD FORECAST SHEET
 # ═══════════════════════════════════════════════════════════════════════════
-def build_forecast(ws_f, V, mode):
+def build_forecast(ws_f, V, mode, values=None, perf_fee="accrual"):
+    """values: {column: 96 numbers} from cashflow_forecast.sheet_columns, written
+    in place of the formulas (month labels stay formulas)."""
     ws_f.sheet_view.showGridLines = False
 
     # Column widths
@@ -317,7 +328,9 @@ def build_forecast(ws_f, V, mode):
     ws_f.merge_cells(f"A1:{gcl(40)}1")
     c = ws_f.cell(row=1, column=1,
         value=(f"BitWealth (Pty) Ltd — 96-Month Cashflow Forecast v4.0  ·  "
-               f"FSP: {fsp_label}  ·  All formulas auto-update when VARIABLES sheet changes"))
+               f"FSP: {fsp_label}  ·  " +
+               ("All formulas auto-update when VARIABLES sheet changes" if values is None else
+                f"Precomputed values (perf fee: {perf_fee}) — re-run the builder after changing VARIABLES")))
     c.fill = fp(title_bg); c.font = Font(bold=True, sz=13, color=WHITE, name="Calibri")
     c.alignment = al(h="center"); ws_f.row_dimensions[1].height = 22
 
@@ -504,10 +517,14 @@ def build_forecast(ws_f, V, mode):
     # ────────────────────────────────────────────────────────────────────
     # WRITE DATA ROWS
     # ────────────────────────────────────────────────────────────────────
+    def cv(col, formula, r):
+        """The cell's formula, or its precomputed value."""
+        return formula if values is None else float(values[col][r - DATA_START])
+
     def smf(col, formula, bg=None, bold=False, nf=MONEY, row=None):
         """Set a money/formula cell."""
         cell = ws_f.cell(row=row, column=col)
-        cell.value = formula
+        cell.value = cv(col, formula, row)
         cell.font = fn(sz=10, bold=bold)
         cell.number_format = nf
         cell.alignment = al(h="right", v="center")
@@ -529,7 +546,7 @@ def build_forecast(ws_f, V, mode):
 
         # Monthly return rate
         c3 = ws_f.cell(row=r, column=3)
-        c3.value = f_return(r); c3.fill = fp(bg)
+        c3.value = cv(3, f_return(r), r); c3.fill = fp(bg)
         c3.font = fn(sz=10, ital=True, col="555555")
         c3.alignment = al(h="center"); c3.number_format = "0.00%"; c3.border = bdr_all
 
@@ -563,7 +580,7 @@ def build_forecast(ws_f, V, mode):
 
         # New clients — count (not currency)
         cc = ws_f.cell(row=r, column=20)
-        cc.value = f_nc_count(r); cc.fill = fp(bg); cc.font = fn(sz=10)
+        cc.value = cv(20, f_nc_count(r), r); cc.fill = fp(bg); cc.font = fn(sz=10)
         cc.number_format = "0"; cc.alignment = al(h="center"); cc.border = bdr_all
 
         sm(21, f_nc_contrib(r, 20))
@@ -704,15 +721,16 @@ def build_charts(ws_ch, ws_f, mode):
 # ═══════════════════════════════════════════════════════════════════════════
 # MAIN — build both workbooks
 # ═══════════════════════════════════════════════════════════════════════════
-def build_workbook(mode):
+def build_workbook(mode, precompute=False, perf_fee="accrual"):
     wb = Workbook()
 
     ws_v = wb.active
     ws_v.title = "VARIABLES"
-    V = build_variables(ws_v, mode)
+    V, VALS = build_variables(ws_v, mode)
 
     ws_f = wb.create_sheet("MONTHLY FORECAST")
-    build_forecast(ws_f, V, mode)
+    values = sheet_columns(forecast(VALS, mode, MAX_ROWS, perf_fee)) if precompute else None
+    build_forecast(ws_f, V, mode, values, perf_fee)
 
     ws_ch = wb.create_sheet("CHARTS")
     build_charts(ws_ch, ws_f, mode)
@@ -729,9 +747,19 @@ OUTPUTS = [
     ("finova", "BitWealth_Cashflow_Forecast_v4.0_Finova.xlsx"),
 ]
 
+parser = argparse.ArgumentParser(description="Build the v4.0 cashflow forecast workbooks")
+parser.add_argument("--values", action="store_true",
+                    help="Write values precomputed by scripts/cashflow_forecast.py instead of formulas")
+parser.add_argument("--perf-fee", choices=PERF_FEES, default="accrual",
+                    help="Perf-fee model for --values: the workbook's monthly accrual or a per-client HWM")
+args = parser.parse_args()
+if args.perf_fee != "accrual" and not args.values:
+    parser.error("--perf-fee hwm needs --values (the formulas model the accrual)")
+suffix = "" if not args.values else "_values" if args.perf_fee == "accrual" else f"_values_{args.perf_fee}"
+
 for mode, filename in OUTPUTS:
-    wb = build_workbook(mode)
-    path = OUT_DIR / filename
+    wb = build_workbook(mode, args.values, args.perf_fee)
+    path = OUT_DIR / filename.replace(".xlsx", f"{suffix}.xlsx")
     wb.save(path)
     print(f"Saved ({mode:6s}): {path}")
 
@@ -0,0 +1,303 @@
+"""
+BitWealth (Pty) Ltd — Cashflow forecast engine (NumPy)
+Run    : .\\.venv\\Scripts\\python.exe scripts\\cashflow_forecast.py [--mode finova] [--perf-fee hwm]
+                                         [--set key=value ...] [--grid key=v1,v2,... ...]
+
+The v4 MONTHLY FORECAST sheet computed with arrays instead of spreadsheet
+formulas.  Founding clients (c1_…, c2_…) and new-client cohort batches are
+the rows of a (clients × months) state stepped one month at a time; every
+Variable may also be a 1-D array, which adds a leading scenario axis, so a
+grid of thousands of scenarios runs in one pass.
+
+  · Contributions : lump + monthly in the start month, monthly after
+  · Platform fee  : contribution × platform rate
+  · Perf fee      : "accrual" — (prev AUM + contrib) × monthly return × rate,
+                    the workbook formula;
+                    "hwm" — cost-basis HWM crystallised every perf_period
+                    months per client (run_sim's ClientTracker)
+  · Exchange fee  : prev total AUM × trade % × fee × share + contrib × fee × share
+  · FSP costs     : CAEP onboarding / inflated hosting tiers / annual AUM fee,
+                    or the Finova platform- and perf-fee shares
+  · Reserve       : reserve_pm in bull years (Y1-3, Y5-7), cumulative fund
+
+With perf_fee="accrual" every column equals the v4 workbook's formulas (the
+new-client pool is the sum of its cohorts).  build_cashflow_forecast_v4.py
+--values writes these numbers into the workbook instead of formulas.
+"""
+
+import argparse
+import itertools
+import re
+
+import numpy as np
+
+# ═══════════════════════════════════════════════════════════════
+# 1.  VARIABLES  (defaults = build_cashflow_forecast_v4.py VARIABLES sheet)
+# ═══════════════════════════════════════════════════════════════
+MONTHS    = 96
+MODES     = ("caep", "finova")
+PERF_FEES = ("accrual", "hwm")
+
+V4_VARIABLES = {
+    # Return & performance
+    "ret_y1_3": 0.60, "ret_y4": 0.10, "y4_start": 37, "y5_start": 49,
+    "ret_y5_7": 0.50, "y8_start": 85, "ret_y8": 0.10,
+    "perf_period": 12, "reserve_pm": 10580,
+    # Exchange fee share
+    "exch_fee_rate": 0.001, "exch_fee_share": 0.50, "exch_trade_pct": 0.25,
+    # FSP — CAEP
+    "caep_ob": 57500, "caep_h13": 23000, "caep_h46": 34500, "caep_h7p": 46000,
+    "caep_inflation": 0.06, "caep_aum": 0.0025,
+    # FSP — Finova
+    "finova_perf_share": 0.20, "finova_plat_share": 0.50,
+    "software": 5000, "co_sec": 3000,
+    # Founding clients
+    "c1_start": 1, "c1_lump": 300000,  "c1_monthly": 200000, "c1_plat": 0.0075, "c1_perf": 0.025,
+    "c2_start": 2, "c2_lump": 0,       "c2_monthly": 40000,  "c2_plat": 0.0075, "c2_perf": 0.10,
+    "c3_start": 2, "c3_lump": 5000000, "c3_monthly": 0,      "c3_plat": 0.0075, "c3_perf": 0.10,
+    "c4_start": 2, "c4_lump": 0,       "c4_monthly": 20000,  "c4_plat": 0.0075, "c4_perf": 0.025,
+    # New-client cohorts
+    "nc_max": 94, "nc_start": 3, "nc_interval": 1, "nc_per_cohort": 1,
+    "nc_lump": 50000, "nc_monthly": 5000, "nc_plat": 0.0075, "nc_perf": 0.10,
+    # Forecast parameters
+    "fc_months": 96, "fc_year": 2026, "fc_month": 6,
+}
+
+_MO_NAMES = "Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split()
+
+
+def month_label(m, year=2026, month=6):
+    """Jun-26, Jul-26, … (the workbook's TEXT(DATE(…),"mmm-yy"))."""
+    total = int(month) - 1 + (m - 1)
+    return f"{_MO_NAMES[total % 12]}-{str(int(year) + total // 12)[2:]}"
+
+
+def founding_clients(variables):
+    """["c1", "c2", …] — every prefix with a cN_start Variable, in number order."""
+    return sorted({k[:-6] for k in variables if re.fullmatch(r"c\d+_start", k)},
+                  key=lambda p: int(p[1:]))
+
+
+# ═══════════════════════════════════════════════════════════════
+# 2.  ENGINE
+# ═══════════════════════════════════════════════════════════════
+def forecast(variables=None, mode="caep", months=MONTHS, perf_fee="accrual", cohorts=False):
+    """
+    Run the forecast.  variables overrides V4_VARIABLES; any value may be a
+    1-D array of scenarios.  Returns a dict of arrays, each (…, months) with
+    … the scenario shape (empty for scalar Variables):
+
+      month, ret, nc_clients, contrib, plat, perf, exch_rev, revenue, aum,
+      fsp1, fsp2, fsp3, software, co_sec, costs, reserve, net, cum,
+      reserve_fund
+      client_contrib / _plat / _perf / _aum   (…, founding, months)
+      nc_contrib / _plat / _perf / _aum       new-client pool (…, months)
+      cohort_contrib / _plat / _perf / _aum   (…, cohorts, months) if cohorts
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown mode {mode!r}")
+    if perf_fee not in PERF_FEES:
+        raise ValueError(f"unknown perf_fee {perf_fee!r}")
+    v = {**V4_VARIABLES, **(variables or {})}
+    x = {k: np.asarray(val, dtype=np.float64) for k, val in v.items()}
+    shape = np.broadcast_shapes(*(a.shape for a in x.values()))
+    if len(shape) > 1:
+        raise ValueError("scenario Variables must be scalars or 1-D arrays of one length")
+
+    def g(key):
+        return np.broadcast_to(x[key], shape)
+
+    def col(key):
+        return g(key)[..., None]
+
+    # Client rows: founding clients, then one row per cohort batch
+    prefixes = founding_clients(v)
+    n_f = len(prefixes)
+    n_c = int(min(np.max(g("nc_max")), months)) if np.size(g("nc_max")) else 0
+    k = np.arange(n_c)
+    c_start = np.where(k < col("nc_max"), col("nc_start") + k * col("nc_interval"), months + 1)
+
+    def rows(field, cohort):
+        founding = [g(f"{p}_{field}") for p in prefixes]
+        return np.concatenate([np.stack(founding, -1) if founding else np.zeros(shape + (0,)),
+                               np.broadcast_to(cohort, shape + (n_c,))], -1)
+
+    per = col("nc_per_cohort")
+    start   = rows("start",   c_start)
+    lump    = rows("lump",    per * col("nc_lump"))
+    monthly = rows("monthly", per * col("nc_monthly"))
+    plat_r  = rows("plat",    col("nc_plat"))
+    perf_r  = rows("perf",    col("nc_perf"))
+
+    mo = np.arange(1, months + 1, dtype=np.float64)
+    ret = np.where(mo < col("y4_start"), col("ret_y1_3") / 12,
+          np.where(mo < col("y5_start"), col("ret_y4") / 12,
+          np.where(mo < col("y8_start"), col("ret_y5_7") / 12, col("ret_y8") / 12)))
+    ret = np.broadcast_to(ret, shape + (months,))
+    period = col("perf_period")
+
+    fields = ("contrib", "plat", "perf", "aum")
+    out = {"month": mo.astype(np.int64), "ret": ret}
+    for f in fields:
+        out[f"client_{f}"] = np.zeros(shape + (n_f, months))
+        out[f"nc_{f}"] = np.zeros(shape + (months,))
+        if cohorts:
+            out[f"cohort_{f}"] = np.zeros(shape + (n_c, months))
+    aum = np.zeros(shape + (n_f + n_c,))
+    hwm = np.zeros_like(aum)
+    for j in range(months):
+        m, r = mo[j], ret[..., j, None]
+        on = start <= m
+        contrib = np.where(start == m, lump + monthly, np.where(on, monthly, 0.0))
+        base = aum + contrib
+        if perf_fee == "accrual":
+            perf = np.where(on, base * r * perf_r, 0.0)
+            aum = np.where(on, base * (1 + r) - perf, 0.0)
+        else:
+            hwm = hwm + contrib
+            aum = base + base * r
+            due = on & ((m - start + 1) % period == 0)
+            above = due & (aum > hwm)
+            perf = np.where(above, (aum - hwm) * perf_r, 0.0)
+            aum = aum - perf
+            hwm = np.where(above, aum, hwm)
+        for f, val in zip(fields, (contrib, contrib * plat_r, perf, aum)):
+            out[f"client_{f}"][..., j] = val[..., :n_f]
+            out[f"nc_{f}"][..., j] = val[..., n_f:].sum(-1)
+            if cohorts:
+                out[f"cohort_{f}"][..., j] = val[..., n_f:]
+    for f in fields:
+        out[f] = out[f"client_{f}"].sum(-2) + out[f"nc_{f}"]
+    batches = np.minimum(col("nc_max"), np.floor((mo - col("nc_start")) / col("nc_interval")) + 1)
+    out["nc_clients"] = np.where(mo < col("nc_start"), 0.0, batches * per)
+
+    # Revenue
+    prev_aum = np.concatenate([np.zeros(shape + (1,)), out["aum"][..., :-1]], -1)
+    out["exch_rev"] = (prev_aum * col("exch_trade_pct") * col("exch_fee_rate") * col("exch_fee_share")
+                       + out["contrib"] * col("exch_fee_rate") * col("exch_fee_share"))
+    out["revenue"] = out["plat"] + out["perf"] + out["exch_rev"]
+
+    # Costs
+    zeros = np.zeros(shape + (months,))
+    year_end = mo % 12 == 0
+    if mode == "caep":
+        tier = np.where(mo <= 3, col("caep_h13"), np.where(mo <= 6, col("caep_h46"), col("caep_h7p")))
+        out["fsp1"] = zeros + np.where(mo == 1, col("caep_ob"), 0.0)
+        out["fsp2"] = zeros + tier * (1 + col("caep_inflation")) ** np.floor((mo - 1) / 12)
+        out["fsp3"] = np.where(year_end, out["aum"] * col("caep_aum"), 0.0)
+    else:
+        out["fsp1"] = zeros
+        out["fsp2"] = out["plat"] * col("finova_plat_share")
+        out["fsp3"] = out["perf"] * col("finova_perf_share")
+    out["software"] = zeros + col("software")
+    out["co_sec"] = zeros + np.where(year_end, col("co_sec"), 0.0)
+    out["costs"] = out["fsp1"] + out["fsp2"] + out["fsp3"] + out["software"] + out["co_sec"]
+
+    # Reserve & cashflow
+    bull = (mo < col("y4_start")) | ((mo >= col("y5_start")) & (mo < col("y8_start")))
+    out["reserve"] = zeros + np.where(bull, col("reserve_pm"), 0.0)
+    out["net"] = out["revenue"] - out["costs"] - out["reserve"]
+    out["cum"] = np.cumsum(out["net"], -1)
+    out["reserve_fund"] = np.cumsum(out["reserve"], -1)
+    return out
+
+
+def sheet_columns(out):
+    """
+    {column number: values} for the v4 MONTHLY FORECAST sheet (columns C:AN,
+    layout of build_cashflow_forecast_v4.py), from an unscenario'd forecast.
+    """
+    n_f = out["client_aum"].shape[-2]
+    if n_f != 4 or out["aum"].ndim != 1:
+        raise ValueError("the v4 sheet has four founding clients and no scenario axis")
+    cols = {3: out["ret"]}
+    for i in range(n_f):
+        for off, f in enumerate(("contrib", "plat", "perf", "aum")):
+            cols[4 + 4 * i + off] = out[f"client_{f}"][i]
+    cols[20] = out["nc_clients"]
+    for off, f in enumerate(("contrib", "plat", "perf", "aum")):
+        cols[21 + off] = out[f"nc_{f}"]
+    for c, name in enumerate(("contrib", "plat", "perf", "exch_rev", "revenue", "aum",
+                              "fsp1", "fsp2", "fsp3", "software", "co_sec", "costs",
+                              "reserve", "net", "cum", "reserve_fund"), start=25):
+        cols[c] = out[name]
+    return cols
+
+
+def milestones(out):
+    """First positive net month, cumulative breakeven month (0 = never), peak deficit, final AUM."""
+    def first(mask):
+        return np.where(mask.any(-1), mask.argmax(-1) + 1, 0)
+
+    return {
+        "first_pos_net": first(out["net"] > 0),
+        "breakeven":     first(out["cum"] > 0),
+        "peak_deficit":  np.maximum(-out["cum"].min(-1), 0.0),
+        "final_aum":     out["aum"][..., -1],
+        "final_cum":     out["cum"][..., -1],
+    }
+
+
+# ═══════════════════════════════════════════════════════════════
+# 3.  CLI
+# ═══════════════════════════════════════════════════════════════
+def _number(text):
+    return float(text) if re.search(r"[.eE]", text) else int(text)
+
+
+def _parse_assignments(items, grid=False):
+    out = {}
+    for item in items or ():
+        key, _, val = item.partition("=")
+        if key not in V4_VARIABLES or not val:
+            raise SystemExit(f"Error: bad Variable assignment {item!r}")
+        out[key] = [_number(s) for s in val.split(",")] if grid else _number(val)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="v4 cashflow forecast, computed with NumPy")
+    parser.add_argument("--mode", choices=MODES, default="caep")
+    parser.add_argument("--perf-fee", choices=PERF_FEES, default="accrual")
+    parser.add_argument("--months", type=int, default=MONTHS)
+    parser.add_argument("--set", nargs="*", metavar="KEY=VALUE", help="Override Variables")
+    parser.add_argument("--grid", nargs="*", metavar="KEY=V1,V2,…",
+                        help="Run every combination of these Variable values")
+    args = parser.parse_args()
+
+    base = {**V4_VARIABLES, **_parse_assignments(args.set)}
+    grid = _parse_assignments(args.grid, grid=True)
+
+    if not grid:
+        out = forecast(base, args.mode, args.months, args.perf_fee)
+        print(f"{'Mo':>3} {'Label':>7}  {'AUM':>15}  {'Platform':>10}  {'PerfFee':>10}  {'ExchRev':>10}  "
+              f"{'TotCost':>10}  {'Reserve':>8}  {'Net':>10}  {'Cumulative':>12}")
+        print("-" * 112)
+        for j, m in enumerate(out["month"].tolist()):
+            print(f"{m:>3} {month_label(m, base['fc_year'], base['fc_month']):>7}  "
+                  f"{out['aum'][j]:>15,.0f}  {out['plat'][j]:>10,.0f}  {out['perf'][j]:>10,.0f}  "
+                  f"{out['exch_rev'][j]:>10,.0f}  {out['costs'][j]:>10,.0f}  {out['reserve'][j]:>8,.0f}  "
+                  f"{out['net'][j]:>10,.0f}  {out['cum'][j]:>12,.0f}")
+        ms = milestones(out)
+        print(f"\n  Final AUM            : R {float(ms['final_aum']):,.0f}")
+        print(f"  First +ve net month  : Month {int(ms['first_pos_net'])}")
+        print(f"  Cumulative breakeven : Month {int(ms['breakeven'])}")
+        print(f"  Peak cash required   : R {float(ms['peak_deficit']):,.0f}")
+        return
+
+    keys = list(grid)
+    combos = list(itertools.product(*(grid[k] for k in keys)))
+    scenario = {k: np.array([c[i] for c in combos], dtype=np.float64) for i, k in enumerate(keys)}
+    out = forecast({**base, **scenario}, args.mode, args.months, args.perf_fee)
+    ms = milestones(out)
+    print(f"{len(combos):,} scenarios ({args.mode}, perf fee {args.perf_fee})\n")
+    print("  ".join(f"{k:>14}" for k in keys)
+          + f"  {'Final AUM':>16}  {'Breakeven':>9}  {'Peak deficit':>14}  {'Final cum':>14}")
+    for i, c in enumerate(combos):
+        print("  ".join(f"{val:>14g}" for val in c)
+              + f"  {ms['final_aum'][i]:>16,.0f}  {int(ms['breakeven'][i]):>9}"
+                f"  {ms['peak_deficit'][i]:>14,.0f}  {ms['final_cum'][i]:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+"""
+Reconcile VALR transaction-history exports against lth_pvr.exchange_funding_events.
+
+The exports are mapped with the same rules as backfill_from_valr_exports.py
+(map_rows) and joined with the recorded funding events in bulk:
+
+  matched     same customer, asset and amount (to 1e-8), occurred_at within
+              --window seconds — exact timestamps first, then time buckets
+  duplicated  a recorded event with the same customer / asset / amount within
+              the window of an event that is already matched
+  drifted     left-over pairs with the same customer, asset and direction
+              within the window whose amounts differ by at most --drift
+              (relative), e.g. gross vs net of a fee
+  unmatched   export rows with no recorded event ("missing") and recorded
+              events with no export row ("extra")
+
+plus the running-balance divergence per customer and asset (Σ export − Σ
+recorded along the merged timeline, netted per timestamp; balances that last
+no longer than --window are matched pairs in flight and are not reported).
+Recorded events outside each export's time range are ignored; a customer
+whose export maps to no events has all recorded events reported as extra.
+
+Usage:
+  # exports from CUSTOMERS (or --dir/--manifest), events via PostgREST
+  # (SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY) or from a CSV dump
+  python scripts/reconcile_valr_exports.py [--dir DIR --manifest FILE] [--db-csv FILE] \\
+      [--window 120] [--drift 0.02] [--report FILE.json] [--strict]
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from backfill_from_valr_exports import (
+    CUSTOMERS, ORG_ID, PAGE_SIZE, ROOT, Event, discover, emit_events, read_manifest,
+)
+from ingest import read_csv_columns   # docs/ is on sys.path via the backfill module
+
+UNITS = 10 ** 8   # amounts are compared in 1e-8 units
+
+
+class Side(NamedTuple):
+    customer: np.ndarray   # int64
+    asset: np.ndarray      # str
+    amount: np.ndarray     # float64, signed
+    t: np.ndarray          # int64 epoch seconds
+    kind: np.ndarray       # str
+    ref: np.ndarray        # str: idempotency_key
+
+
+def side_from_events(events: list[Event]) -> Side:
+    return Side(
+        np.array([e.customer_id for e in events], dtype=np.int64),
+        np.array([e.asset for e in events], dtype=str),
+        np.array([e.amount for e in events], dtype=np.float64),
+        np.array([int(e.occurred_at.timestamp()) for e in events], dtype=np.int64),
+        np.array([e.kind for e in events], dtype=str),
+        np.array([e.idempotency_key for e in events], dtype=str),
+    )
+
+
+def side_from_rows(rows: list[dict]) -> Side:
+    """Recorded events (PostgREST JSON rows) as columns."""
+    def epoch(s: str) -> int:
+        dt = datetime.fromisoformat(s.strip())
+        return int((dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp())
+    return Side(
+        np.array([int(r["customer_id"]) for r in rows], dtype=np.int64),
+        np.array([r["asset"] for r in rows], dtype=str),
+        np.array([float(r["amount"]) for r in rows], dtype=np.float64),
+        np.array([epoch(r["occurred_at"]) for r in rows], dtype=np.int64),
+        np.array([r["kind"] for r in rows], dtype=str),
+        np.array([r.get("idempotency_key") or "" for r in rows], dtype=str),
+    )
+
+
+def side_from_csv(path: Path) -> Side:
+    """Recorded events from a CSV dump with the DB_COLS header."""
+    cols = read_csv_columns(path, {"customer_id": "float", "asset": "text", "amount": "float",
+                                   "occurred_at": "stamp", "kind": "text",
+                                   "idempotency_key": "text"}, optional=("idempotency_key",))
+    return Side(cols["customer_id"].astype(np.int64), cols["asset"], cols["amount"],
+                cols["occurred_at"], cols["kind"], cols["idempotency_key"])
+
+
+def take(s: Side, idx: np.ndarray) -> Side:
+    return Side(*(col[idx] for col in s))
+
+
+DB_COLS = "customer_id,kind,asset,amount,occurred_at,idempotency_key"
+
+
+def fetch_recorded(customer_ids, since: int | None = None, until: int | None = None) -> list[dict]:
+    """exchange_funding_events rows of the customers in [since, until] (PostgREST, paged; None = all)."""
+    sb_url = os.getenv("SUPABASE_URL", "")
+    sb_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
+    if not sb_url or not sb_key:
+        sys.exit("-- ERROR: SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY are needed (or --db-csv FILE)")
+    headers = {"apikey": sb_key, "Authorization": f"Bearer {sb_key}", "Accept-Profile": "lth_pvr"}
+    iso = lambda s: datetime.fromtimestamp(s, timezone.utc).isoformat()
+    window = {} if since is None else {
+        "and": f"(occurred_at.gte.{iso(since)},occurred_at.lte.{iso(until)})"}
+    rows: list[dict] = []
+    offset = 0
+    while True:
+        query = urllib.parse.urlencode({
+            "select":      DB_COLS,
+            "org_id":      f"eq.{ORG_ID}",
+            "customer_id": f"in.({','.join(str(c) for c in sorted(customer_ids))})",
+            **window,
+            "order":       "funding_id.asc",
+            "limit":       PAGE_SIZE,
+            "offset":      offset,
+        })
+        req = urllib.request.Request(f"{sb_url}/rest/v1/exchange_funding_events?{query}",
+                                     headers=headers)
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            page = json.load(resp)
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        offset += PAGE_SIZE
+
+
+# ── Join ──────────────────────────────────────────────────────────────────────
+def _codes(a: np.ndarray, b: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Shared integer codes for two string columns."""
+    _, inv = np.unique(np.concatenate([a, b]), return_inverse=True)
+    return inv[:len(a)], inv[len(a):]
+
+
+def _rank_join(ka: np.ndarray, kb: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Join two (n × k) int64 key matrices: the i-th row of a key on one side
+    pairs with the i-th row of the same key on the other (multiset join).
+    Returns row indices (ia, ib) of the pairs.
+    """
+    def ranked(k):
+        order = np.lexsort(k.T[::-1])
+        ks = k[order]
+        new = np.r_[True, np.any(ks[1:] != ks[:-1], axis=1)] if len(ks) else np.zeros(0, bool)
+        start = np.maximum.accumulate(np.where(new, np.arange(len(ks)), 0))
+        rank = np.empty(len(ks), dtype=np.int64)
+        rank[order] = np.arange(len(ks)) - start
+        return np.column_stack([k, rank])
+    ra, rb = ranked(ka), ranked(kb)
+    _, inv = np.unique(np.vstack([ra, rb]), axis=0, return_inverse=True)
+    inv = inv.ravel()
+    _, ia, ib = np.intersect1d(inv[:len(ra)], inv[len(ra):], return_indices=True)
+    return ia, ib
+
+
+def _nearest(gid_a, t_a, gid_b, t_b, span) -> tuple[np.ndarray, np.ndarray]:
+    """For each b: index of the a in the same group nearest in time, and |Δt| (inf if none)."""
+    best = np.full(len(t_b), -1, dtype=np.int64)
+    gap = np.full(len(t_b), np.inf)
+    if not len(t_a):
+        return best, gap
+    order = np.argsort(gid_a * span + t_a, kind="stable")
+    comp = (gid_a * span + t_a)[order]
+    pos = np.searchsorted(comp, gid_b * span + t_b)
+    for cand in (pos - 1, pos):
+        idx = order[np.clip(cand, 0, len(order) - 1)]
+        ok = (cand >= 0) & (cand < len(order)) & (gid_a[idx] == gid_b)
+        d = np.where(ok, np.abs(t_a[idx] - t_b), np.inf)
+        better = d < gap
+        best, gap = np.where(better, idx, best), np.where(better, d, gap)
+    return best, gap
+
+
+def _group_ids(*cols: np.ndarray) -> np.ndarray:
+    """Dense id per distinct row of the given int columns."""
+    if not len(cols[0]):
+        return np.zeros(0, dtype=np.int64)
+    _, inv = np.unique(np.column_stack(cols), axis=0, return_inverse=True)
+    return inv.ravel()
+
+
+def _claim(ga, ta, gb, tb, window, span, accept=None) -> tuple[np.ndarray, np.ndarray]:
+    """One-to-one (ia, ib): each b to its nearest a of the same group within the window, closest first."""
+    near, gap = _nearest(ga, ta, gb, tb, span)
+    ib = np.flatnonzero(gap <= window)
+    ia = near[ib]
+    if accept is not None:
+        ok = accept(ia, ib)
+        ia, ib = ia[ok], ib[ok]
+    order = np.argsort(gap[ib], kind="stable")
+    _, first = np.unique(ia[order], return_index=True)
+    keep = order[first]
+    return ia[keep], ib[keep]
+
+
+def reconcile(exp: Side, rec: Side, window: int, drift: float) -> dict:
+    """Classify every export / recorded row; returns index arrays per class."""
+    ca, cb = _codes(exp.asset, rec.asset)
+    ua = np.rint(exp.amount * UNITS).astype(np.int64)
+    ub = np.rint(rec.amount * UNITS).astype(np.int64)
+    free_a = np.ones(len(ua), bool)
+    free_b = np.ones(len(ub), bool)
+    pairs_a, pairs_b = [], []
+    span = int(max(exp.t.max(initial=0), rec.t.max(initial=0))) + 2 * window + 1
+
+    # Exact timestamps, then two staggered time buckets of width 2·window
+    # (any pair within the window shares a bucket in one of them)
+    width = max(2 * window, 1)
+    for bucket in (lambda t: t, lambda t: t // width, lambda t: (t + window) // width):
+        fa, fb = np.flatnonzero(free_a), np.flatnonzero(free_b)
+        ia, ib = _rank_join(
+            np.column_stack([exp.customer[fa], ca[fa], ua[fa], bucket(exp.t[fa])]),
+            np.column_stack([rec.customer[fb], cb[fb], ub[fb], bucket(rec.t[fb])]),
+        )
+        ia, ib = fa[ia], fb[ib]
+        ok = np.abs(exp.t[ia] - rec.t[ib]) <= window
+        pairs_a.append(ia[ok])
+        pairs_b.append(ib[ok])
+        free_a[ia[ok]] = False
+        free_b[ib[ok]] = False
+
+    # Same amount, within the window, but paired out of order inside a bucket
+    gid = _group_ids(np.r_[exp.customer, rec.customer], np.r_[ca, cb], np.r_[ua, ub])
+    gid_a, gid_b = gid[:len(ua)], gid[len(ua):]
+    fa, fb = np.flatnonzero(free_a), np.flatnonzero(free_b)
+    ia, ib = _claim(gid_a[fa], exp.t[fa], gid_b[fb], rec.t[fb], window, span)
+    pairs_a.append(fa[ia])
+    pairs_b.append(fb[ib])
+    free_a[fa[ia]] = False
+    free_b[fb[ib]] = False
+    matched_a, matched_b = np.concatenate(pairs_a), np.concatenate(pairs_b)
+
+    # Duplicates: a free recorded row next to a matched recorded twin
+    fb = np.flatnonzero(free_b)
+    _, gap = _nearest(gid_b[matched_b], rec.t[matched_b], gid_b[fb], rec.t[fb], span)
+    dup_b = fb[gap <= window]
+    free_b[dup_b] = False
+
+    # Amount drift: same customer, asset and direction, nearest in time
+    fa, fb = np.flatnonzero(free_a), np.flatnonzero(free_b)
+    dir_gid = _group_ids(np.r_[exp.customer[fa], rec.customer[fb]], np.r_[ca[fa], cb[fb]],
+                         np.r_[np.sign(ua[fa]), np.sign(ub[fb])])
+
+    def within_drift(ia, ib):
+        a, b = exp.amount[fa[ia]], rec.amount[fb[ib]]
+        return np.abs(a - b) <= drift * np.maximum(np.abs(a), np.abs(b))
+
+    ia, ib = _claim(dir_gid[:len(fa)], exp.t[fa], dir_gid[len(fa):], rec.t[fb], window, span,
+                    accept=within_drift)
+    drift_a, drift_b = fa[ia], fb[ib]
+    free_a[drift_a] = False
+    free_b[drift_b] = False
+
+    return {
+        "matched": (matched_a, matched_b),
+        "duplicated": dup_b,
+        "drifted": (drift_a, drift_b),
+        "missing": np.flatnonzero(free_a),
+        "extra": np.flatnonzero(free_b),
+    }
+
+
+def divergence(exp: Side, rec: Side, window: int = 0) -> list[dict]:
+    """
+    Running Σ export − Σ recorded per (customer, asset) along the merged
+    timeline, in 1e-8 units.  Deltas are netted per timestamp first, and a
+    balance that holds for no longer than the window (a matched pair whose two
+    sides are a few seconds apart) is not divergence.  Only (customer, asset)
+    pairs with a non-zero final or persisting balance are returned.
+    """
+    cust = np.r_[exp.customer, rec.customer]
+    t = np.r_[exp.t, rec.t]
+    delta = np.rint(np.r_[exp.amount, -rec.amount] * UNITS).astype(np.int64)
+    codes, inv = np.unique(np.r_[exp.asset, rec.asset], return_inverse=True)
+    order = np.lexsort((t, inv, cust))
+    cust, inv, t, delta = cust[order], inv[order], t[order], delta[order]
+    out = []
+    if not len(t):
+        return out
+    new_key = np.r_[True, (cust[1:] != cust[:-1]) | (inv[1:] != inv[:-1])]
+    first = np.flatnonzero(new_key | np.r_[True, t[1:] != t[:-1]])
+    cust, inv, t, delta, new_key = (cust[first], inv[first], t[first],
+                                    np.add.reduceat(delta, first), new_key[first])
+    starts = np.flatnonzero(new_key)
+    for lo, hi in zip(starts, np.r_[starts[1:], len(t)]):
+        run = np.cumsum(delta[lo:hi])
+        held = np.where(np.r_[np.diff(t[lo:hi]) > window, True], np.abs(run), 0)
+        k = int(np.argmax(held))
+        if not run[-1] and not held[k]:
+            continue
+        out.append({
+            "customer_id": int(cust[lo]),
+            "asset": str(codes[inv[lo]]),
+            "final": int(run[-1]) / UNITS,
+            "max_abs": int(held[k]) / UNITS,
+            "max_at": datetime.fromtimestamp(int(t[lo + k]), timezone.utc).isoformat(),
+        })
+    return out
+
+
+def _row(s: Side, i: int) -> dict:
+    return {
+        "customer_id": int(s.customer[i]), "kind": str(s.kind[i]), "asset": str(s.asset[i]),
+        "amount": float(s.amount[i]),
+        "occurred_at": datetime.fromtimestamp(int(s.t[i]), timezone.utc).isoformat(),
+        "idempotency_key": str(s.ref[i]),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--dir", type=Path, help="Export directory (with --manifest) instead of CUSTOMERS")
+    parser.add_argument("--manifest", type=Path, help="CSV: customer_id,exchange_account_id[,file]")
+    parser.add_argument("--db-csv", type=Path,
+                        help=f"Recorded events as CSV ({DB_COLS}) instead of PostgREST")
+    parser.add_argument("--window", type=int, default=120, help="Time window in seconds (default 120)")
+    parser.add_argument("--drift", type=float, default=0.02,
+                        help="Max relative amount difference for a drifted pair (default 0.02)")
+    parser.add_argument("--report", type=Path, help="Write every classified row to this JSON file")
+    parser.add_argument("--strict", action="store_true",
+                        help="Exit 1 if anything is missing, extra, duplicated or drifted")
+    args = parser.parse_args()
+
+    if args.dir is not None:
+        if args.manifest is None:
+            parser.error("--dir needs --manifest")
+        sources = discover(args.dir, read_manifest(args.manifest))
+    else:
+        sources = {c: (str(ROOT / rel), exch) for c, (rel, exch) in CUSTOMERS.items()}
+    CUSTOMERS.clear()
+    CUSTOMERS.update(sources)
+
+    t0 = time.perf_counter()
+    events: list[Event] = []
+    for cust_id, (path, _exch) in sorted(sources.items()):
+        events.extend(emit_events(cust_id, Path(path)))
+    exp = side_from_events(events)
+
+    # Recorded events inside each customer's export range (± window); a
+    # customer whose export maps to no events has every recorded event extra
+    present = set(np.unique(exp.customer).tolist())
+    empty = sorted(set(sources) - present)
+    for c in empty:
+        print(f"-- customer {c}: export maps to no events, all recorded events count as extra",
+              file=sys.stderr)
+    lo = {c: int(exp.t[exp.customer == c].min()) - args.window for c in present}
+    hi = {c: int(exp.t[exp.customer == c].max()) + args.window for c in present}
+    lo.update(dict.fromkeys(empty, np.iinfo(np.int64).min))
+    hi.update(dict.fromkeys(empty, np.iinfo(np.int64).max))
+    if args.db_csv is not None:
+        rec_all = side_from_csv(args.db_csv)
+    else:
+        rows = fetch_recorded(present, min(lo[c] for c in present),
+                              max(hi[c] for c in present)) if present else []
+        rows += fetch_recorded(empty) if empty else []
+        rec_all = side_from_rows(rows)
+    lo_b = np.array([lo.get(int(c), 0) for c in rec_all.customer], dtype=np.int64)
+    hi_b = np.array([hi.get(int(c), -1) for c in rec_all.customer], dtype=np.int64)
+    inside = (rec_all.t >= lo_b) & (rec_all.t <= hi_b)
+    rec = take(rec_all, np.flatnonzero(inside))
+    t1 = time.perf_counter()
+
+    res = reconcile(exp, rec, args.window, args.drift)
+    div = divergence(exp, rec, args.window)
+    t2 = time.perf_counter()
+
+    ma, mb = res["matched"]
+    da, db = res["drifted"]
+    print(f"-- {len(exp.t)} export events, {len(rec.t)} recorded in range "
+          f"({int((~inside).sum())} outside the export range ignored)", file=sys.stderr)
+    for c in sorted(sources):
+        n = lambda idx, s: int((s.customer[idx] == c).sum())
+        print(f"-- customer {c}: matched {n(ma, exp)}, missing {n(res['missing'], exp)}, "
+              f"extra {n(res['extra'], rec)}, duplicated {n(res['duplicated'], rec)}, "
+              f"drifted {n(da, exp)}", file=sys.stderr)
+    for d in div:
+        print(f"--   {d['customer_id']} {d['asset']:<5} divergence final {d['final']:+.8f}, "
+              f"max {d['max_abs']:.8f} at {d['max_at']}", file=sys.stderr)
+    print(f"-- loaded in {t1 - t0:.2f}s, reconciled in {t2 - t1:.3f}s", file=sys.stderr)
+
+    if args.report is not None:
+        report = {
+            "window_s": args.window, "drift": args.drift,
+            "missing": [_row(exp, i) for i in res["missing"].tolist()],
+            "extra": [_row(rec, i) for i in res["extra"].tolist()],
+            "duplicated": [_row(rec, i) for i in res["duplicated"].tolist()],
+            "drifted": [{"export": _row(exp, a), "recorded": _row(rec, b),
+                         "diff": round(float(rec.amount[b] - exp.amount[a]), 8)}
+                        for a, b in zip(da.tolist(), db.tolist())],
+            "divergence": div,
+        }
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"-- wrote {args.report}", file=sys.stderr)
+
+    issues = len(res["missing"]) + len(res["extra"]) + len(res["duplicated"]) + len(da)
+    if args.strict and issues:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Validation of the NumPy cashflow engine (scripts/cashflow_forecast.py).
+Run    : .\\.venv\\Scripts\\python.exe scripts\\validate_cashflow_engine.py
+
+  1. Workbook parity — for each saved v4 workbook (CAEP and Finova) the
+     VARIABLES sheet is read back and the engine must reproduce every cached
+     MONTHLY FORECAST value in columns C:AN (Excel's own results of the
+     formulas).  Read with zipfile, no openpyxl needed.  Month labels are
+     left out: they stay TEXT() formulas, rendered in Excel's locale.
+  2. Engine defaults — V4_VARIABLES must equal the values
+     build_cashflow_forecast_v4.py writes to the VARIABLES sheet.
+  3. HWM mode — with v1's clients, 20 % p.a. and quarterly crystallisation,
+     every client's contribution, platform fee, perf fee and closing AUM must
+     equal run_sim's ClientTracker (ported inline, as in validate_forecast.py).
+
+Fails on any mismatch, then times a 10 000-scenario grid.
+"""
+import ast
+import re
+import sys
+import time
+import zipfile
+from pathlib import Path
+from xml.etree import ElementTree
+
+import numpy as np
+
+from cashflow_forecast import V4_VARIABLES, forecast, sheet_columns
+
+ROOT      = Path(__file__).resolve().parent.parent
+BUILDER   = ROOT / "scripts" / "build_cashflow_forecast_v4.py"
+WORKBOOKS = [("caep",   ROOT / "docs" / "Financial" / "BitWealth_Cashflow_Forecast_v4.0.xlsx"),
+             ("finova", ROOT / "docs" / "Financial" / "BitWealth_Cashflow_Forecast_v4.0_Finova.xlsx")]
+DATA_START, MAX_ROWS = 4, 96
+RTOL = 1e-9
+
+_NS = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+# ═══════════════════════════════════════════════════════════════
+# XLSX (cached values only)
+# ═══════════════════════════════════════════════════════════════
+def col_number(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def read_sheets(path):
+    """{sheet name: {(row, col): value}} with cached formula results."""
+    with zipfile.ZipFile(path) as z:
+        shared = [("".join(t.text or "" for t in si.iter(f"{{{_NS['m']}}}t")))
+                  for si in ElementTree.fromstring(z.read("xl/sharedStrings.xml")).findall("m:si", _NS)]
+        book = ElementTree.fromstring(z.read("xl/workbook.xml"))
+        rels = ElementTree.fromstring(z.read("xl/_rels/workbook.xml.rels"))
+        target = {r.get("Id"): r.get("Target") for r in rels}
+        rid = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+        sheets = {}
+        for sh in book.find("m:sheets", _NS):
+            xml = ElementTree.fromstring(z.read("xl/" + target[sh.get(rid)].lstrip("/").removeprefix("xl/")))
+            cells = {}
+            for c in xml.iter(f"{{{_NS['m']}}}c"):
+                v = c.find("m:v", _NS)
+                if v is None:
+                    continue
+                letters, row = re.fullmatch(r"([A-Z]+)(\d+)", c.get("r")).groups()
+                kind = c.get("t")
+                val = shared[int(v.text)] if kind == "s" else v.text if kind == "str" else float(v.text)
+                cells[(int(row), col_number(letters))] = val
+            sheets[sh.get("name")] = cells
+    return sheets
+
+
+def builder_variables():
+    """[(key, label, value)] from the vr(...) item tuples in the v4 builder."""
+    out = []
+    for node in ast.walk(ast.parse(BUILDER.read_text(encoding="utf-8"))):
+        if (isinstance(node, ast.Tuple) and len(node.elts) == 5
+                and all(isinstance(e, ast.Constant) for e in node.elts)
+                and isinstance(node.elts[0].value, str) and isinstance(node.elts[1].value, str)):
+            out.append((node.elts[0].value, node.elts[1].value, node.elts[2].value))
+    return out
+
+
+# ═══════════════════════════════════════════════════════════════
+# CHECKS
+# ═══════════════════════════════════════════════════════════════
+def check_defaults(items):
+    for key, _, value in items:
+        if key in V4_VARIABLES and V4_VARIABLES[key] != value:
+            sys.exit(f"FAIL: V4_VARIABLES[{key!r}] = {V4_VARIABLES[key]!r}, builder writes {value!r}")
+    missing = {k for k, _, _ in items} - V4_VARIABLES.keys()
+    if missing:
+        sys.exit(f"FAIL: builder Variables missing from V4_VARIABLES: {sorted(missing)}")
+    print(f"  {'engine defaults':<22} {len(items)} Variables match the v4 builder")
+
+
+def check_workbook(mode, path, labels):
+    sheets = read_sheets(path)
+    var_cells, fc_cells = sheets["VARIABLES"], sheets["MONTHLY FORECAST"]
+    variables = {}
+    for (row, col), val in var_cells.items():
+        if col == 1 and val in labels and isinstance(var_cells.get((row, 2)), float):
+            variables[labels[val]] = var_cells[(row, 2)]
+    out = forecast(variables, mode)
+    worst = 0.0
+    for col, values in sheet_columns(out).items():
+        cached = np.array([fc_cells.get((DATA_START + i, col), 0.0) for i in range(MAX_ROWS)])
+        diff = np.abs(values - cached) / np.maximum(1.0, np.abs(cached))
+        if (diff > RTOL).any():
+            i = int(diff.argmax())
+            sys.exit(f"FAIL [{mode}]: column {col} month {i + 1}: engine {values[i]!r} "
+                     f"!= workbook {cached[i]!r}")
+        worst = max(worst, float(diff.max()))
+    print(f"  {path.name:<44} {len(variables)} Variables, 38 × {MAX_ROWS} cells "
+          f"(max rel diff {worst:.1e})")
+
+
+class ClientTracker:
+    """run_sim's per-client stepper (build_cashflow_forecast.py, v1)."""
+
+    def __init__(self, start, lump, monthly, period, ret, plat, perf):
+        self.start, self.lump, self.monthly, self.period = start, lump, monthly, period
+        self.ret, self.plat, self.perf_rate = ret, plat, perf
+        self.aum = self.hwm = 0.0
+        self.since = 0
+
+    def step(self, m):
+        if m < self.start:
+            return 0.0, 0.0, 0.0, 0.0
+        contrib = float(self.lump + self.monthly) if m == self.start else float(self.monthly)
+        self.aum += contrib
+        self.hwm += contrib
+        self.aum += self.aum * self.ret
+        self.since += 1
+        perf = 0.0
+        if self.since >= self.period:
+            if self.aum > self.hwm:
+                perf = (self.aum - self.hwm) * self.perf_rate
+                self.aum -= perf
+                self.hwm = self.aum
+            self.since = 0
+        return contrib, contrib * self.plat, perf, self.aum
+
+
+def check_hwm():
+    months, period, ret = 36, 3, 0.20
+    founding = [(1, 300_000, 200_000), (2, 0, 40_000), (2, 5_000_000, 0)]
+    variables = {"ret_y1_3": ret, "ret_y4": ret, "ret_y5_7": ret, "ret_y8": ret, "perf_period": period,
+                 "c4_start": months + 1,       # v1 has three founding clients
+                 "nc_max": len(range(4, months + 1, 3)), "nc_start": 4, "nc_interval": 3,
+                 "nc_lump": 0, "nc_monthly": 50_000, "nc_plat": 0.0075, "nc_perf": 0.10}
+    for i, (start, lump, monthly) in enumerate(founding, 1):
+        variables.update({f"c{i}_start": start, f"c{i}_lump": lump, f"c{i}_monthly": monthly,
+                          f"c{i}_plat": 0.0075, f"c{i}_perf": 0.10})
+    out = forecast(variables, months=months, perf_fee="hwm", cohorts=True)
+    trackers = [ClientTracker(s, l, mth, period, ret / 12, 0.0075, 0.10) for s, l, mth in founding]
+    trackers += [ClientTracker(s, 0, 50_000, period, ret / 12, 0.0075, 0.10)
+                 for s in range(4, months + 1, 3)]
+    engine = [np.concatenate([out[f"client_{f}"][:3], out[f"cohort_{f}"]])
+              for f in ("contrib", "plat", "perf", "aum")]
+    for m in range(1, months + 1):
+        for k, t in enumerate(trackers):
+            for name, e, ref in zip(("contrib", "plat", "perf", "aum"), engine, t.step(m)):
+                if abs(e[k, m - 1] - ref) > RTOL * max(1.0, abs(ref)):
+                    sys.exit(f"FAIL [hwm]: client {k} month {m} {name} {e[k, m - 1]!r} != {ref!r}")
+    print(f"  {'hwm mode':<22} {len(trackers)} v1 clients × {months} months match ClientTracker")
+
+
+def main():
+    items = builder_variables()
+    check_defaults(items)
+    labels = {label: key for key, label, _ in items}
+    for mode, path in WORKBOOKS:
+        if path.exists():
+            check_workbook(mode, path, labels)
+        else:
+            print(f"  {path.name}: not found, skipped")
+    check_hwm()
+
+    rng = np.random.default_rng(4)
+    n = 10_000
+    grid = {"ret_y5_7": rng.uniform(0, 0.8, n), "ret_y8": rng.uniform(-0.3, 0.2, n),
+            "nc_monthly": rng.choice([2_500, 5_000, 10_000], n), "nc_max": rng.integers(24, 95, n)}
+    for perf_fee in ("accrual", "hwm"):
+        t0 = time.perf_counter()
+        out = forecast(grid, perf_fee=perf_fee)
+        print(f"  {n:,} scenarios × 98 clients × 96 months ({perf_fee}): "
+              f"{time.perf_counter() - t0:.2f}s, median final AUM R {np.median(out['aum'][:, -1]):,.0f}")
+    print("PASS: cashflow engine matches the v4 workbooks and ClientTracker")
+
+
+if __name__ == "__main__":
+    main()
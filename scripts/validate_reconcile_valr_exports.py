@@ -0,0 +1,75 @@
+"""
+Validation of the export ↔ recorded reconciliation (scripts/reconcile_valr_exports.py).
+Run    : .\\.venv\\Scripts\\python.exe scripts\\validate_reconcile_valr_exports.py
+
+  1. Matched book — the recorded side is the export side, with same-timestamp
+     pairs, pairs a few seconds apart (within the window) and interleaved
+     deposits / withdrawals.  Every row must match and divergence() must
+     report nothing.
+  2. Real divergence — dropping a recorded row and changing another's amount
+     must show up as the exact final and persisting divergence of those
+     customers / assets only.
+
+Fails on any mismatch.
+"""
+import sys
+
+import numpy as np
+
+from reconcile_valr_exports import UNITS, Side, divergence, reconcile, take
+
+WINDOW = 120
+
+
+def export_side(n: int, seed: int = 3) -> Side:
+    rng = np.random.default_rng(seed)
+    t = np.sort(rng.integers(1_600_000_000, 1_700_000_000, n))
+    t[1::7] = t[0::7][:len(t[1::7])]                      # shared timestamps
+    return Side(
+        rng.choice([999, 1001, 1002, 1003], n).astype(np.int64),
+        rng.choice(["ZAR", "USDT", "BTC"], n),
+        np.round(rng.choice([1, -1], n) * rng.choice([25_000.0, 0.015, 1_234.5678], n), 8),
+        t,
+        rng.choice(["deposit", "withdrawal"], n),
+        np.array([f"e{i}" for i in range(n)]),
+    )
+
+
+def main():
+    exp = export_side(4000)
+    rng = np.random.default_rng(8)
+    lag = np.where(rng.random(len(exp.t)) < 0.5, 0, rng.integers(-WINDOW // 2, WINDOW // 2, len(exp.t)))
+    rec = exp._replace(t=exp.t + lag, ref=np.array([f"r{i}" for i in range(len(exp.t))]))
+    rec = take(rec, rng.permutation(len(rec.t)))
+
+    res = reconcile(exp, rec, WINDOW, 0.02)
+    n_matched = len(res["matched"][0])
+    if n_matched != len(exp.t) or any(len(res[k]) for k in ("missing", "extra", "duplicated")):
+        sys.exit(f"FAIL [matched]: {n_matched}/{len(exp.t)} matched, "
+                 f"{len(res['missing'])} missing, {len(res['extra'])} extra")
+    div = divergence(exp, rec, WINDOW)
+    if div:
+        sys.exit(f"FAIL [matched]: divergence reported for a matched book: {div[0]}")
+    print(f"  {'matched book':<22} {len(exp.t)} rows matched, no divergence")
+
+    gone, bent = 10, 20
+    keep = np.ones(len(rec.t), bool)
+    keep[gone] = False
+    amount = rec.amount.copy()
+    amount[bent] = np.round(amount[bent] * 1.01, 8)
+    broken = take(rec._replace(amount=amount), np.flatnonzero(keep))
+    expected = {}
+    for i, d in ((gone, rec.amount[gone]), (bent, rec.amount[bent] - amount[bent])):
+        key = (int(rec.customer[i]), str(rec.asset[i]))
+        expected[key] = expected.get(key, 0) + int(np.rint(d * UNITS))
+    expected = {k: v for k, v in expected.items() if v}
+    got = {(d["customer_id"], d["asset"]): int(np.rint(d["final"] * UNITS))
+           for d in divergence(exp, broken, WINDOW)}
+    if got != expected:
+        sys.exit(f"FAIL [divergence]: {got} != {expected}")
+    print(f"  {'real divergence':<22} {len(got)} customer / asset balances flagged exactly")
+    print("PASS: reconciliation reports zero for a matched book and exact divergence otherwise")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+-- 20261019_wft_finish_fold_rpc.sql
+-- =============================================================================
+-- Walk-Forward Testing: single-round-trip fold persistence.
+-- -----------------------------------------------------------------------------
+-- docs/wft/run_walk_forward.py previously wrote each finished fold with
+--   * one POST per 500-row chunk per track into wft_fold_daily (a, b, std_dca),
+--   * one PATCH on wft_folds with the Track A / Track B results,
+--   * one PATCH on wft_runs.folds_completed.
+--
+-- wft_finish_fold() does all three in one call.  Daily rows arrive as parallel
+-- arrays (one element per row) instead of an array of JSON objects, which keeps
+-- the request body small.  p_fold carries only the wft_folds columns to change;
+-- keys that are absent keep their current value.
+-- =============================================================================
+
+create or replace function lth_pvr_bt.wft_finish_fold(
+  p_wft_fold_id     uuid,
+  p_fold            jsonb,
+  p_result_date     date[],
+  p_track           text[],
+  p_nav_usd         numeric[],
+  p_btc_balance     numeric[],
+  p_usdt_balance    numeric[],
+  p_folds_completed int
+) returns void
+language plpgsql
+as $$
+declare
+  v_wft_run_id uuid;
+begin
+  update lth_pvr_bt.wft_folds f
+     set (status, completed_at, error_message,
+          track_a_bt_run_id, track_a_oos_final_nav, track_a_std_dca_final_nav,
+          track_a_oos_cagr_pct, track_a_passed,
+          track_b_best_config, track_b_bt_run_id, track_b_oos_final_nav,
+          track_b_std_dca_final_nav, track_b_oos_cagr_pct, track_b_passed)
+       = (select r.status, r.completed_at, r.error_message,
+                 r.track_a_bt_run_id, r.track_a_oos_final_nav, r.track_a_std_dca_final_nav,
+                 r.track_a_oos_cagr_pct, r.track_a_passed,
+                 r.track_b_best_config, r.track_b_bt_run_id, r.track_b_oos_final_nav,
+                 r.track_b_std_dca_final_nav, r.track_b_oos_cagr_pct, r.track_b_passed
+            from jsonb_populate_record(f, coalesce(p_fold, '{}'::jsonb)) r)
+   where f.wft_fold_id = p_wft_fold_id
+  returning f.wft_run_id into v_wft_run_id;
+
+  if v_wft_run_id is null then
+    raise exception 'wft_fold_id % not found', p_wft_fold_id;
+  end if;
+
+  if coalesce(array_length(p_result_date, 1), 0) > 0 then
+    insert into lth_pvr_bt.wft_fold_daily
+      (wft_fold_id, result_date, track, nav_usd, btc_balance, usdt_balance)
+    select p_wft_fold_id, d.result_date, d.track, d.nav_usd, d.btc_balance, d.usdt_balance
+      from unnest(p_result_date, p_track, p_nav_usd, p_btc_balance, p_usdt_balance)
+           as d(result_date, track, nav_usd, btc_balance, usdt_balance);
+  end if;
+
+  update lth_pvr_bt.wft_runs
+     set folds_completed = p_folds_completed
+   where wft_run_id = v_wft_run_id;
+end;
+$$;
+
+revoke all on function lth_pvr_bt.wft_finish_fold(uuid, jsonb, date[], text[], numeric[], numeric[], numeric[], int)
+  from public, anon, authenticated;
+grant execute on function lth_pvr_bt.wft_finish_fold(uuid, jsonb, date[], text[], numeric[], numeric[], numeric[], int)
+  to service_role;
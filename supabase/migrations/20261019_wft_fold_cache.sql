@@ -0,0 +1,37 @@
+-- 20261019_wft_fold_cache.sql
+-- =============================================================================
+-- Walk-Forward Testing: content-addressed cache of OOS fold simulations.
+-- -----------------------------------------------------------------------------
+-- docs/wft/run_walk_forward.py keys every OOS simulation by
+--
+--     sha256(bt_params payload, band_source, fingerprint of band rows)
+--
+-- where the band fingerprint covers the OOS window plus the 2-year warmup that
+-- ef_bt_execute reads.  A rerun with identical inputs reuses the cached outcome
+-- (and its original bt_run_id) instead of calling ef_bt_execute again.
+--
+-- Only the orchestrator (service role) reads/writes this table.
+-- =============================================================================
+
+create table if not exists lth_pvr_bt.wft_fold_cache (
+  cache_key          text          primary key,
+  bt_run_id          uuid          not null,
+  band_source        text          not null check (band_source in ('ci', 'rb')),
+  oos_start          date          not null,
+  oos_end            date          not null,
+  bt_params          jsonb         not null,
+  final_nav          numeric       not null,
+  std_dca_final_nav  numeric       not null,
+  cagr_pct           numeric       not null,
+  lth_daily          jsonb         not null,   -- [{date, nav_usd, btc_balance, usdt_balance}]
+  std_daily          jsonb         not null,   -- same shape, Std DCA benchmark
+  created_at         timestamptz   not null default now()
+);
+
+create index if not exists wft_fold_cache_bt_run_idx
+  on lth_pvr_bt.wft_fold_cache (bt_run_id);
+
+alter table lth_pvr_bt.wft_fold_cache enable row level security;
+
+comment on table lth_pvr_bt.wft_fold_cache is
+  'Memoised WFT OOS simulations keyed by sha256(bt_params, band_source, band rows fingerprint). Written by docs/wft/run_walk_forward.py.';